@@ -1,4 +1,11 @@
 # Backend module
-from . import models, quiz_generator, score_manager, main
+# Submodules are imported on first access so that importing one of them does not load the others
+import importlib
 
 __all__ = ["models", "quiz_generator", "score_manager", "main"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
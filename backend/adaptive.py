@@ -0,0 +1,189 @@
+import random
+from typing import Dict, Optional
+from backend.models import (
+    AdaptiveAnswerResponse, AdaptiveProgress, AdaptiveQuestion, DifficultyLevel, Quiz, RedactedQuestion
+)
+from backend.question_bank import QuestionBank
+from backend.score_manager import ScoreManager, read_answer_key
+
+
+class QuestionMismatchError(ValueError):
+    """Raised for an answer to another question than the one the adaptive quiz picked"""
+
+
+class AdaptiveQuizzes:
+    """
+    Quizzes that pick each question for the player's estimated ability
+
+    An adaptive quiz is a ScoreManager session over a pool of banked questions
+    on its topic. The session keeps the bank IDs and the two-parameter
+    logistic parameters of the pool ("adaptive" entry), calibrated ones or
+    starting values from their difficulty label; everything else follows from
+    its answers. After every answer the ability is re-estimated and the next
+    question is one of the most informative at that ability (backend.irt), so
+    the quiz stops as soon as the ability is known to target_error or after
+    total_questions questions. The choice is drawn from a generator seeded with
+    the session and its number of answers: every worker picks the same
+    question for a session, without storing it.
+
+    Answers are recorded in the question bank, QuestionBank.calibrate
+    re-estimates the parameters from them. Questions are scored with
+    ScoreManager.scoring_rules at the difficulty level of their calibrated
+    difficulty.
+    """
+
+    def __init__(self, score_manager: ScoreManager, question_bank: QuestionBank, pool_size: int = 50,
+                 candidates: int = 3):
+        """
+        Initialize the adaptive quizzes
+
+        Args:
+            score_manager: Where the sessions are kept
+            question_bank: Where the questions come from and the answers are recorded
+            pool_size: Most questions of a topic a quiz picks from
+            candidates: Number of most informative questions the next one is drawn from
+        """
+        self.score_manager = score_manager
+        self.question_bank = question_bank
+        self.pool_size = pool_size
+        self.candidates = candidates
+
+    def start(self, topic: str, num_questions: int, difficulty: DifficultyLevel, target_error: float) -> AdaptiveProgress:
+        """
+        Open an adaptive quiz on a topic
+
+        Args:
+            topic: Topic of the quiz, its questions come from the question bank
+            num_questions: Most questions asked, fewer when the bank holds fewer
+            difficulty: Level of the player before the first answer
+            target_error: Standard error of the ability at which the quiz ends
+
+        Returns:
+            Progress of the new quiz, with its first question
+
+        Raises:
+            LookupError: The question bank holds no question on the topic
+        """
+        from backend.irt import DEFAULT_DISCRIMINATION, difficulty_label, prior_location
+
+        pool = self.question_bank.find_pool(topic, self.pool_size)
+        if not pool:
+            raise LookupError("No stored questions on this topic yet, generate a quiz on it first")
+
+        questions, a, b = [], [], []
+        for item in pool:
+            location = item.location if item.location is not None else prior_location(item.question.difficulty)
+            a.append(item.discrimination or DEFAULT_DISCRIMINATION)
+            b.append(location)
+            # Scored at the level its answers show, not the one it was generated for
+            questions.append(item.question.model_copy(update={"difficulty": difficulty_label(location)}))
+
+        session_id = self.score_manager.create_adaptive_session(
+            Quiz(topic=topic, questions=questions, total_questions=len(questions)),
+            min(num_questions, len(pool)),
+            {
+                "items": [item.question_id for item in pool],
+                "a": a,
+                "b": b,
+                "prior": prior_location(difficulty),
+                "target_error": target_error
+            }
+        )
+        return self.progress(session_id)
+
+    def progress(self, session_id: str, session: Optional[Dict] = None) -> AdaptiveProgress:
+        """
+        Estimated ability and next question of an adaptive quiz
+
+        Args:
+            session_id: The user session ID
+            session: The session when the caller already loaded it
+
+        Returns:
+            AdaptiveProgress, next_question is None once the quiz is finished
+        """
+        session = self._load(session_id, session)
+        ability, standard_error, finished, next_index = self._state(session_id, session)
+        next_question = None
+        if next_index is not None:
+            question = self.question_bank.get_question(session["adaptive"]["items"][next_index])
+            next_question = AdaptiveQuestion(
+                question_index=next_index,
+                question=RedactedQuestion(
+                    question=question.question,
+                    options=question.options,
+                    difficulty=read_answer_key(session["answer_key"], next_index)[1]
+                )
+            )
+        return AdaptiveProgress(
+            session_id=session_id,
+            questions_answered=len(session["answers"]),
+            total_questions=session["total_questions"],
+            ability=round(ability, 3),
+            standard_error=round(standard_error, 3),
+            finished=finished,
+            next_question=next_question
+        )
+
+    def submit_answer(self, session_id: str, question_index: int, selected_option: int) -> AdaptiveAnswerResponse:
+        """
+        Answer the current question of an adaptive quiz
+
+        Answering an already answered question again returns its first result,
+        as ScoreManager.submit_answer does.
+
+        Args:
+            session_id: The user session ID
+            question_index: Index of the current question
+            selected_option: Index of the selected option (0-3)
+
+        Returns:
+            AdaptiveAnswerResponse with the result and the progress after the answer
+
+        Raises:
+            QuestionMismatchError: question_index is not the current question
+        """
+        with self.score_manager.session_lock(session_id):
+            session = self._load(session_id)
+            if not any(answer["question_index"] == question_index for answer in session["answers"]):
+                _, _, finished, next_index = self._state(session_id, session)
+                if finished:
+                    raise QuestionMismatchError("The quiz is finished")
+                if question_index != next_index:
+                    raise QuestionMismatchError(f"The current question is {next_index}")
+
+            answer = self.score_manager.submit_answer(session_id, question_index, selected_option, session=session)
+        if not answer.duplicate:
+            self.question_bank.record_response(session["adaptive"]["items"][question_index], session_id, answer.correct)
+        # The session holds the answer, submit_answer updated it in place
+        return AdaptiveAnswerResponse(**answer.dict(), progress=self.progress(session_id, session))
+
+    def _load(self, session_id: str, session: Optional[Dict] = None) -> Dict:
+        if session is None:
+            if session_id not in self.score_manager.user_sessions:
+                raise ValueError("Invalid session ID")
+            session = self.score_manager.user_sessions[session_id]
+        if "adaptive" not in session:
+            raise ValueError("Not an adaptive quiz session")
+        return session
+
+    def _state(self, session_id: str, session: Dict):
+        """(ability, standard error, finished, index of the next question or None) of a session"""
+        import numpy as np
+        from backend.irt import estimate_ability, select_item
+
+        adaptive = session["adaptive"]
+        a, b = np.array(adaptive["a"]), np.array(adaptive["b"])
+        answered = [answer["question_index"] for answer in session["answers"]]
+        correct = np.array([answer["is_correct"] for answer in session["answers"]], dtype=bool)
+        ability, standard_error = estimate_ability(a[answered], b[answered], correct, adaptive["prior"])
+
+        finished = len(answered) >= session["total_questions"] or (
+            bool(answered) and standard_error <= adaptive["target_error"]
+        )
+        next_index = None
+        if not finished:
+            rng = random.Random(f"{session_id}:{len(answered)}")
+            next_index = select_item(ability, a, b, answered, rng, self.candidates)
+            finished = next_index is None
+        return ability, standard_error, finished, next_index
@@ -0,0 +1,197 @@
+import re
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from backend.score_manager import DIFFICULTIES, read_answer_key
+# The NumPy statistics are shared with the Django analytics, which cannot import backend
+from django_complete.quiz import item_analysis
+
+
+class AnswerColumns(NamedTuple):
+    """
+    Answers as columns, one entry per answer, and the questions they refer to
+
+    Questions and sessions are numbered from 0 so they can index arrays and be
+    counted with np.bincount.
+    """
+    question: np.ndarray           # int32, question number of each answer
+    session: np.ndarray            # int32, session number of each answer
+    selected: np.ndarray           # int8, chosen option
+    correct: np.ndarray            # bool
+    question_topic: np.ndarray     # int32 per question, index in topics
+    question_answer: np.ndarray    # int8 per question, correct option
+    question_difficulty: np.ndarray  # int8 per question, index in DIFFICULTIES
+    topics: List[str]
+    question_labels: List[str]
+
+
+def _question_key(text: str) -> str:
+    """Lowercased words of a question, equal for copies differing in case or punctuation"""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def columns_from_sessions(sessions: Iterable[Tuple[str, Dict]]) -> AnswerColumns:
+    """
+    Load the answers of ScoreManager sessions into columns
+
+    A question is identified by its topic and normalized text, so the same
+    question served to many sessions, from one quiz or from the question bank,
+    is one question, and questions sharing an explanation stay apart. Sessions
+    created before the question texts were kept fall back to the explanation.
+
+    Args:
+        sessions: (session ID, session) pairs, as in ScoreManager.user_sessions.items()
+
+    Returns:
+        AnswerColumns
+    """
+    question, session, selected, correct = array("i"), array("i"), array("b"), array("b")
+    question_topic, question_answer, question_difficulty = array("i"), array("b"), array("b")
+    topics: List[str] = []
+    topic_numbers: Dict[str, int] = {}
+    labels: List[str] = []
+    question_numbers: Dict[Tuple[int, str], int] = {}
+
+    session_number = 0
+    for _, data in sessions:
+        answers = data["answers"]
+        if not answers:
+            continue
+        topic = topic_numbers.get(data["topic"])
+        if topic is None:
+            topic = topic_numbers[data["topic"]] = len(topics)
+            topics.append(data["topic"])
+        texts = data.get("questions") or data["explanations"]
+        for answer in answers:
+            index = answer["question_index"]
+            text = texts[index]
+            key = (topic, _question_key(text))
+            number = question_numbers.get(key)
+            if number is None:
+                number = question_numbers[key] = len(labels)
+                labels.append(text)
+                correct_option, difficulty = read_answer_key(data["answer_key"], index)
+                question_topic.append(topic)
+                question_answer.append(correct_option)
+                question_difficulty.append(DIFFICULTIES.index(difficulty))
+            question.append(number)
+            session.append(session_number)
+            selected.append(answer["selected_option"])
+            correct.append(answer["is_correct"])
+        session_number += 1
+
+    return AnswerColumns(
+        question=np.frombuffer(question, dtype=np.int32),
+        session=np.frombuffer(session, dtype=np.int32),
+        selected=np.frombuffer(selected, dtype=np.int8),
+        correct=np.frombuffer(correct, dtype=np.int8).astype(bool),
+        question_topic=np.frombuffer(question_topic, dtype=np.int32),
+        question_answer=np.frombuffer(question_answer, dtype=np.int8),
+        question_difficulty=np.frombuffer(question_difficulty, dtype=np.int8),
+        topics=topics,
+        question_labels=labels
+    )
+
+
+def item_statistics(columns: AnswerColumns, group_share: float = 0.27) -> Dict[str, np.ndarray]:
+    """
+    Classical test theory statistics of every question, see django_complete.quiz.item_analysis
+
+    Args:
+        columns: Answers, see columns_from_sessions
+        group_share: Share of sessions in the top and bottom groups
+
+    Returns:
+        Arrays indexed by question number: answers, p_value, discrimination,
+        point_biserial, option_counts, upper_answers and upper_option_counts
+    """
+    return item_analysis.item_statistics(
+        columns.question, columns.session, columns.selected, columns.correct, columns.question_answer, group_share
+    )
+
+
+def flag_questions(columns: AnswerColumns, stats: Dict[str, np.ndarray], min_answers: int = 30,
+                   too_easy: float = 0.9, too_hard: float = 0.2) -> Dict[str, np.ndarray]:
+    """
+    Mark the questions worth reviewing: too_easy, too_hard and ambiguous
+
+    Questions with fewer than min_answers answers are never flagged.
+
+    Returns:
+        Boolean arrays indexed by question number
+    """
+    return item_analysis.flag_questions(columns.question_answer, stats, min_answers, too_easy, too_hard)
+
+
+def topic_accuracy(columns: AnswerColumns) -> Dict[str, np.ndarray]:
+    """Answers, share of correct answers and questions answered of every topic, indexed by topic number"""
+    topics = len(columns.topics)
+    answer_topic = columns.question_topic[columns.question]
+    answers = np.bincount(answer_topic, minlength=topics)
+    return {
+        "answers": answers,
+        "accuracy": item_analysis.ratio(np.bincount(answer_topic, weights=columns.correct, minlength=topics), answers),
+        "questions": np.bincount(columns.question_topic, minlength=topics),
+    }
+
+
+def _number(value: float, digits: int = 4) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def analytics_report(columns: AnswerColumns, min_answers: int = 30, flagged_only: bool = False,
+                     limit: Optional[int] = 100) -> Dict:
+    """
+    JSON report of the topics and questions
+
+    Args:
+        columns: Answers, see columns_from_sessions
+        min_answers: Fewest answers for a question to be flagged
+        flagged_only: Only list the flagged questions
+        limit: Most questions listed, those with the most answers first (None for all)
+
+    Returns:
+        Dictionary with the totals, the topics and the questions
+    """
+    stats = item_statistics(columns)
+    flags = flag_questions(columns, stats, min_answers)
+    topics = topic_accuracy(columns)
+
+    flagged = flags["too_easy"] | flags["too_hard"] | flags["ambiguous"]
+    listed = np.flatnonzero(flagged) if flagged_only else np.arange(len(columns.question_answer))
+    # Most answered first, only the listed questions are turned into dictionaries
+    listed = listed[np.argsort(-stats["answers"][listed], kind="stable")]
+    if limit is not None:
+        listed = listed[:limit]
+
+    return {
+        "answers": int(len(columns.question)),
+        "sessions": int(columns.session.max()) + 1 if len(columns.session) else 0,
+        "questions": int(len(columns.question_answer)),
+        "flagged_questions": int(flagged.sum()),
+        "topics": [
+            {
+                "topic": name,
+                "answers": int(topics["answers"][index]),
+                "questions": int(topics["questions"][index]),
+                "accuracy": _number(topics["accuracy"][index]),
+            }
+            for index, name in enumerate(columns.topics)
+        ],
+        "question_stats": [
+            {
+                "topic": columns.topics[columns.question_topic[number]],
+                "question": columns.question_labels[number],
+                "difficulty": DIFFICULTIES[columns.question_difficulty[number]].value,
+                "correct_option": int(columns.question_answer[number]),
+                "answers": int(stats["answers"][number]),
+                "p_value": _number(stats["p_value"][number]),
+                "discrimination": _number(stats["discrimination"][number]),
+                "point_biserial": _number(stats["point_biserial"][number]),
+                "option_counts": stats["option_counts"][number].tolist(),
+                "flags": [name for name, marked in flags.items() if marked[number]],
+            }
+            for number in listed
+        ],
+    }
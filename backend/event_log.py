@@ -0,0 +1,290 @@
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+from backend.responses import encode_json
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, the log directory is then not locked
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the standard json module is used instead
+    orjson = None
+
+# Payload length and CRC32 of the payload, before every record
+RECORD_HEADER = struct.Struct("<II")
+
+SEGMENT_PATTERN = re.compile(r"^(\d{20})\.log$")
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d{20})\.json$")
+
+
+def _decode(payload: bytes) -> Dict:
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+def _fsync_directory(directory: str) -> None:
+    """Make a file created or renamed in directory survive a crash"""
+    if os.name == "nt":
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class EventLog:
+    """
+    Append-only log of ScoreManager events, split in segment files
+
+    Every record is its payload length and CRC32 followed by the event as JSON.
+    Events are numbered from 1; a segment is named after the number of its
+    first event and a new one starts once the current one reaches
+    segment_bytes. Appends are written straight away but only fsynced by a
+    background thread every fsync_interval seconds (0 fsyncs every append),
+    so a crash loses at most the last interval. A torn record at the end of
+    the last segment is cut off when the log is opened.
+
+    Snapshots hold the whole state after a given event, recovery loads the
+    latest one and replays the events that follow it. Segments are kept after
+    a snapshot, the log is the history of every session.
+
+    Args:
+        directory: Directory holding the segments and snapshots, created if missing
+        segment_bytes: Size after which a new segment is started
+        fsync_interval: Seconds between fsyncs, 0 to fsync every append
+        snapshot_every: Events between snapshots, 0 to never take one
+        keep_snapshots: Snapshots kept, older ones are deleted
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync_interval: float = 0.05,
+                 snapshot_every: int = 100_000, keep_snapshots: int = 2):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock_file = open(os.path.join(directory, "LOCK"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise RuntimeError(f"Event log {directory} is in use by another process")
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = False
+        self.last_seq = 0
+        self._file = None
+        self._segment_size = 0
+
+        segments = self.segments()
+        if segments:
+            first_seq, path = segments[-1]
+            count, valid_bytes = self._scan(path)
+            with open(path, "r+b") as segment:
+                # A record cut short by a crash was never acknowledged as durable
+                segment.truncate(valid_bytes)
+            self.last_seq = first_seq + count - 1
+            self._file = open(path, "ab")
+            self._segment_size = valid_bytes
+        self.last_snapshot_seq = self.latest_snapshot_seq()
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if fsync_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="event-log-fsync", daemon=True)
+            self._flusher.start()
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """(first event number, path) of every segment, oldest first"""
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    @staticmethod
+    def _scan(path: str) -> Tuple[int, int]:
+        """Number of intact records at the start of a segment and the bytes they take"""
+        count = offset = 0
+        with open(path, "rb") as segment:
+            data = segment.read()
+        while offset + RECORD_HEADER.size <= len(data):
+            length, checksum = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if end > len(data) or zlib.crc32(data[offset + RECORD_HEADER.size:end]) != checksum:
+                break
+            count += 1
+            offset = end
+        return count, offset
+
+    def append(self, event: Dict) -> int:
+        """
+        Append an event to the log
+
+        Args:
+            event: JSON serializable event, datetimes are written in ISO format
+
+        Returns:
+            Number of the event
+        """
+        payload = encode_json(event)
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Event log is closed")
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._start_segment()
+            self._file.write(record)
+            self._segment_size += len(record)
+            self.last_seq += 1
+            if self.fsync_interval > 0:
+                self._dirty = True
+            else:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            return self.last_seq
+
+    def _start_segment(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        path = os.path.join(self.directory, f"{self.last_seq + 1:020d}.log")
+        self._file = open(path, "ab")
+        self._segment_size = 0
+        _fsync_directory(self.directory)
+
+    def sync(self) -> None:
+        """Write every appended event to disk"""
+        with self._lock:
+            if self._dirty and self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._dirty = False
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    def replay(self, after_seq: int = 0) -> Iterator[Tuple[int, Dict]]:
+        """
+        Read the logged events
+
+        Args:
+            after_seq: Only events numbered above this are returned
+
+        Yields:
+            (event number, event) pairs in order
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            last_seq = self.last_seq
+        segments = self.segments()
+        for index, (first_seq, path) in enumerate(segments):
+            # Segments entirely before after_seq are skipped without reading them
+            if index + 1 < len(segments) and segments[index + 1][0] <= after_seq + 1:
+                continue
+            seq = first_seq
+            with open(path, "rb") as segment:
+                data = segment.read()
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data) and seq <= last_seq:
+                length, checksum = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                payload = data[start:start + length]
+                if len(payload) != length or zlib.crc32(payload) != checksum:
+                    raise ValueError(f"Corrupted event {seq} in {path}")
+                if seq > after_seq:
+                    yield seq, _decode(payload)
+                offset = start + length
+                seq += 1
+
+    def snapshot_due(self) -> bool:
+        """Whether snapshot_every events were appended since the last snapshot"""
+        return self.snapshot_every > 0 and self.last_seq - self.last_snapshot_seq >= self.snapshot_every
+
+    def write_snapshot(self, seq: int, state: Dict) -> None:
+        """
+        Store the state reached after an event
+
+        The snapshot is written to a temporary file and renamed, a crash leaves
+        either the previous snapshot or the new one.
+
+        Args:
+            seq: Number of the last event included in the state
+            state: JSON serializable state
+        """
+        # Events up to seq must be durable before a snapshot claims to include them
+        self.sync()
+        path = os.path.join(self.directory, f"snapshot-{seq:020d}.json")
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(encode_json(state))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+        _fsync_directory(self.directory)
+        self.last_snapshot_seq = seq
+
+        for old_seq, old_path in self._snapshots()[:-self.keep_snapshots]:
+            os.remove(old_path)
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.directory):
+            match = SNAPSHOT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def latest_snapshot_seq(self) -> int:
+        """Number of the last event in the latest snapshot, 0 without snapshots"""
+        snapshots = self._snapshots()
+        return snapshots[-1][0] if snapshots else 0
+
+    def load_snapshot(self) -> Tuple[int, Optional[Dict]]:
+        """
+        Load the latest snapshot
+
+        Returns:
+            (number of its last event, state), (0, None) without snapshots
+        """
+        snapshots = self._snapshots()
+        if not snapshots:
+            return 0, None
+        seq, path = snapshots[-1]
+        with open(path, "rb") as snapshot:
+            return seq, _decode(snapshot.read())
+
+    def close(self) -> None:
+        """Stop the fsync thread and write the remaining events to disk"""
+        if self._closed:
+            return
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.sync()
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+        self._lock_file.close()
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,121 @@
+"""
+Offline stand-in for the Google chat model
+
+Set QUIZBOT_FAKE_LLM=1 to make QuizGenerator answer every prompt with a
+well-formed quiz instead of calling the Generative AI API. The response goes
+through the same output parser as a real one, so load tests and benchmarks
+exercise the whole generation path without network access or an API key.
+
+QUIZBOT_FAKE_LLM_FAILURE_RATE makes a share of the answers unparseable, either
+one rate for every model tier ("0.1") or one per tier ("fast=0.3,standard=0.1"),
+to exercise escalation between tiers.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, List
+
+
+def fake_llm_enabled() -> bool:
+    """True when QUIZBOT_FAKE_LLM asks for the offline model"""
+    return os.getenv("QUIZBOT_FAKE_LLM", "").lower() in ("1", "true", "yes")
+
+
+def fake_failure_rate(tier: str) -> float:
+    """Share of unparseable answers QUIZBOT_FAKE_LLM_FAILURE_RATE sets for a model tier"""
+    spec = os.getenv("QUIZBOT_FAKE_LLM_FAILURE_RATE", "").strip()
+    if not spec:
+        return 0.0
+    if "=" not in spec:
+        return float(spec)
+    rates = dict(entry.strip().split("=", 1) for entry in spec.split(","))
+    return float(rates.get(tier, 0.0))
+
+
+class FakeMessage:
+    """Minimal chat message carrying the generated text"""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Chat model returning generated quizzes after a simulated latency
+
+    Args:
+        latency_ms: Mean response time, defaults to QUIZBOT_FAKE_LLM_LATENCY_MS (200)
+        jitter: Relative spread of the response time around the mean
+        failure_rate: Share of answers cut short so that they fail to parse
+    """
+
+    def __init__(self, latency_ms: float = None, jitter: float = 0.25, failure_rate: float = 0.0):
+        if latency_ms is None:
+            latency_ms = float(os.getenv("QUIZBOT_FAKE_LLM_LATENCY_MS", "200"))
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    def _delay(self) -> float:
+        spread = self.latency_ms * self.jitter
+        return max(0.0, random.uniform(self.latency_ms - spread, self.latency_ms + spread)) / 1000
+
+    def invoke(self, messages: List) -> FakeMessage:
+        time.sleep(self._delay())
+        return FakeMessage(self._answer(messages[-1].content))
+
+    async def ainvoke(self, messages: List) -> FakeMessage:
+        await asyncio.sleep(self._delay())
+        return FakeMessage(self._answer(messages[-1].content))
+
+    def _answer(self, prompt: str) -> str:
+        content = self.respond(prompt)
+        if self.failure_rate and random.random() < self.failure_rate:
+            # A truncated answer, as a model running out of output tokens gives
+            return content[:len(content) // 2]
+        return content
+
+    def respond(self, prompt: str) -> str:
+        """Build a quiz matching the topic, size and difficulty requested by the prompt"""
+        topic = _prompt_field(prompt, "Topic", "General Knowledge")
+        num_questions = int(_prompt_field(prompt, "Number of questions", "5"))
+        difficulty = _prompt_field(prompt, "Difficulty level", "medium").lower()
+
+        # Seeded by the prompt so the same request always yields the same quiz
+        seed = int(hashlib.sha1(prompt.encode()).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        questions = [_fake_question(topic, difficulty, rng) for _ in range(num_questions)]
+        return json.dumps({"topic": topic, "questions": questions, "total_questions": num_questions})
+
+
+def _prompt_field(prompt: str, label: str, default: str) -> str:
+    match = re.search(rf"^\s*{label}:\s*(.+?)\s*$", prompt, re.MULTILINE)
+    return match.group(1) if match else default
+
+
+_CONCEPTS = (
+    "abstraction caching concurrency configuration debugging deployment documentation encapsulation "
+    "exceptions indexing inheritance interfaces latency memory modules naming packaging parsing "
+    "performance portability profiling recursion refactoring scalability scheduling security "
+    "serialization state storage streaming testing throughput typing validation versioning"
+).split()
+
+
+def _fake_question(topic: str, difficulty: str, rng: random.Random) -> Dict:
+    first, second, third = rng.sample(_CONCEPTS, 3)
+    correct = rng.randrange(4)
+    return {
+        "question": f"In {topic}, how does {first} relate to {second} and {third}?",
+        "options": [
+            f"{'Correct' if i == correct else 'Wrong'} link {i + 1} between {first} and {second}"
+            for i in range(4)
+        ],
+        "correct_answer": correct,
+        "explanation": f"Option {correct + 1} describes how {first} relates to {second} in {topic}.",
+        "difficulty": difficulty,
+    }
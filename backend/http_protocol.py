@@ -0,0 +1,19 @@
+import socket
+from uvicorn.protocols.http.auto import AutoHTTPProtocol
+
+
+class NoDelayHTTPProtocol(AutoHTTPProtocol):
+    """
+    uvicorn HTTP protocol (httptools when installed, else h11) that disables Nagle's algorithm
+
+    With several workers uvicorn binds the listening socket itself, and asyncio
+    does not set TCP_NODELAY on the connections it accepts from that socket, so
+    every response on a keep-alive connection waits for the client's delayed ACK
+    (about 40ms). uvloop sets the option on its own; this covers the asyncio loop.
+    """
+
+    def connection_made(self, transport) -> None:
+        sock = transport.get_extra_info("socket")
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().connection_made(transport)
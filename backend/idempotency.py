@@ -0,0 +1,303 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.rate_limit import identify_client
+
+# Longest key accepted, keys are meant to be UUIDs or similar
+MAX_KEY_LENGTH = 255
+# Response headers replayed along with the body
+REPLAYED_HEADERS = ("content-type", "location", "retry-after")
+
+
+class StoredResponse(NamedTuple):
+    """Response recorded for an idempotency key"""
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+# What begin() found for a key: nothing (the caller now owns the key), a response to
+# replay, a request still running, or a different request sent with the same key
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+BeginResult = Union[None, str, StoredResponse]
+
+
+class MemoryIdempotencyStore:
+    """
+    Recorded responses of one process, for up to ttl seconds
+
+    At most max_keys keys are kept, the oldest being dropped first. A key
+    whose request is running is held for lease seconds, so a request that
+    never completes does not block its key until the TTL.
+    """
+
+    def __init__(self, ttl: float = 86400, max_keys: int = 10_000, lease: float = 60):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.lease = lease
+        # key -> (fingerprint, expiry, response or None while running)
+        self._entries: "OrderedDict[str, Tuple[str, float, Optional[StoredResponse]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key: str, fingerprint: str) -> BeginResult:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                stored_fingerprint, _, response = entry
+                if stored_fingerprint != fingerprint:
+                    return MISMATCH
+                return response if response is not None else IN_PROGRESS
+            self._entries.pop(key, None)
+            self._entries[key] = (fingerprint, now + self.lease, None)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return None
+
+    def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        with self._lock:
+            self._entries[key] = (fingerprint, time.monotonic() + self.ttl, response)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteIdempotencyStore:
+    """Recorded responses in a SQLite file shared by every worker process, see MemoryIdempotencyStore"""
+
+    def __init__(self, db_path: str, ttl: float = 86400, max_keys: int = 10_000, lease: float = 60):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.lease = lease
+        self._local = threading.local()
+        self._inserts = 0
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                status INTEGER,
+                headers TEXT,
+                body BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idempotency_expiry_idx ON idempotency_keys (expires_at);
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def begin(self, key: str, fingerprint: str) -> BeginResult:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT fingerprint, status, headers, body FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                connection.execute("COMMIT")
+                if row[0] != fingerprint:
+                    return MISMATCH
+                if row[1] is None:
+                    return IN_PROGRESS
+                return StoredResponse(row[1], [tuple(header) for header in json.loads(row[2])], row[3])
+
+            connection.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, expires_at) VALUES (?, ?, ?)",
+                (key, fingerprint, now + self.lease)
+            )
+            self._inserts += 1
+            if self._inserts % 100 == 0:
+                # Past max_keys the keys closest to expiry go first, checked now and then as it walks the index
+                connection.execute(
+                    "DELETE FROM idempotency_keys WHERE key IN ("
+                    " SELECT key FROM idempotency_keys ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_keys,)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return None
+
+    def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, expires_at, status, headers, body)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, fingerprint, time.time() + self.ttl, response.status, json.dumps(response.headers), response.body)
+        )
+
+    def release(self, key: str) -> None:
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+
+def create_idempotency_store(url: str = "memory", **store_options):
+    """
+    Build the idempotency key store described by a URL
+
+    Args:
+        url: "off", "memory" for responses kept per process, or "sqlite:///path/to/file"
+             for responses shared by every worker process
+        store_options: ttl, max_keys and lease of the store
+
+    Returns:
+        Store, or None when idempotency keys are off
+    """
+    if url == "off":
+        return None
+    if url == "memory":
+        return MemoryIdempotencyStore(**store_options)
+    if url.startswith("sqlite:///"):
+        return SQLiteIdempotencyStore(url[len("sqlite:///"):], **store_options)
+    raise ValueError(f"Unsupported idempotency store: {url}")
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"error": detail, "status_code": status_code})
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the recorded response of a request retried with the same Idempotency-Key
+
+    Applies to POST requests to the given paths that carry an Idempotency-Key
+    header. Keys belong to a client (see identify_client) and a path, and are
+    bound to a fingerprint of the query string and body: reusing a key for a
+    different request is rejected with a 422, and a retry arriving while the
+    first request is still running gets a 409. Responses with a 5xx or 429
+    status are not recorded, the request may succeed when tried again.
+
+    Runs before routing, so a replay never reaches the endpoint or its
+    dependencies, rate limiting included.
+
+    Args:
+        app: ASGI application
+        store: Where the responses are recorded, see create_idempotency_store
+        paths: Paths of the endpoints accepting idempotency keys
+        trust_forwarded: Passed to identify_client
+    """
+
+    def __init__(self, app: ASGIApp, store, paths: Iterable[str], trust_forwarded: bool = False):
+        self.app = app
+        self.store = store
+        self.paths = frozenset(paths)
+        self.trust_forwarded = trust_forwarded
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (self.store is None or scope["type"] != "http" or scope["method"] != "POST"
+                or scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = Headers(scope=scope).get("idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _error(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")(scope, receive, send)
+            return
+
+        # The whole body is needed for the fingerprint, it is replayed to the app afterwards
+        messages = []
+        digest = hashlib.sha256(scope.get("query_string", b""))
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            digest.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        fingerprint = digest.hexdigest()
+
+        client = identify_client(HTTPConnection(scope), trust_forwarded=self.trust_forwarded)
+        key = f"{client.key} {scope['path']} {idempotency_key}"
+        found = await self._call(self.store.begin, key, fingerprint)
+        if found == MISMATCH:
+            await _error(422, "Idempotency-Key was already used for a different request")(scope, receive, send)
+            return
+        if found == IN_PROGRESS:
+            response = _error(409, "A request with this Idempotency-Key is still in progress")
+            response.headers["Retry-After"] = "1"
+            await response(scope, receive, send)
+            return
+        if found is not None:
+            await self._replay(found, send)
+            return
+
+        async def replay_receive() -> Message:
+            return messages.pop(0) if messages else await receive()
+
+        recorder = _ResponseRecorder(send)
+        try:
+            await self.app(scope, replay_receive, recorder.send)
+        except BaseException:
+            await self._call(self.store.release, key)
+            raise
+        if recorder.status is None or recorder.status >= 500 or recorder.status == 429:
+            await self._call(self.store.release, key)
+        else:
+            await self._call(
+                self.store.complete, key, fingerprint, StoredResponse(recorder.status, recorder.headers, recorder.body)
+            )
+
+    async def _call(self, method, *args):
+        """Call the store, in the threadpool unless it is in memory: SQLite waits up to 30s for a lock"""
+        if isinstance(self.store, MemoryIdempotencyStore):
+            return method(*args)
+        return await run_in_threadpool(method, *args)
+
+    @staticmethod
+    async def _replay(response: StoredResponse, send: Send) -> None:
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response.headers]
+        headers.append((b"content-length", str(len(response.body)).encode()))
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
+
+
+class _ResponseRecorder:
+    """Wraps send for one response, keeping a copy of its status, headers and body"""
+
+    def __init__(self, send: Send):
+        self._send = send
+        self.status: Optional[int] = None
+        self.headers: List[Tuple[str, str]] = []
+        self._chunks: List[bytes] = []
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(self._chunks)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            self.headers = [
+                (name.decode("latin-1"), value.decode("latin-1"))
+                for name, value in message.get("headers", [])
+                if name.decode("latin-1").lower() in REPLAYED_HEADERS
+            ]
+        elif message["type"] == "http.response.body":
+            self._chunks.append(message.get("body", b""))
+        await self._send(message)
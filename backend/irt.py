@@ -0,0 +1,188 @@
+import random
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from backend.models import DifficultyLevel
+
+# Ability scale: players are standard normal, a question of difficulty b is answered
+# correctly half of the time by a player of ability b
+GRID = np.linspace(-4.0, 4.0, 33)
+
+# Difficulty of questions not calibrated yet, from the label they were generated with
+DIFFICULTY_LOCATIONS = {
+    DifficultyLevel.EASY: -1.0,
+    DifficultyLevel.MEDIUM: 0.0,
+    DifficultyLevel.HARD: 1.0
+}
+DEFAULT_DISCRIMINATION = 1.0
+
+# Priors keeping the fitted parameters of rarely answered questions near their starting point
+DISCRIMINATION_PRIOR_VARIANCE = 0.5
+INTERCEPT_PRIOR_VARIANCE = 4.0
+DISCRIMINATION_RANGE = (0.2, 4.0)
+
+
+def prior_location(difficulty: DifficultyLevel) -> float:
+    """Starting difficulty of a question, or starting ability of a player, at a difficulty level"""
+    return DIFFICULTY_LOCATIONS[difficulty]
+
+
+def difficulty_label(b: float) -> DifficultyLevel:
+    """Difficulty level of a calibrated question, scored by ScoreManager.scoring_rules"""
+    if b < -0.5:
+        return DifficultyLevel.EASY
+    if b > 0.5:
+        return DifficultyLevel.HARD
+    return DifficultyLevel.MEDIUM
+
+
+def probability(theta: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Chance of a correct answer under the two-parameter logistic model"""
+    return 1.0 / (1.0 + np.exp(-a * (theta - b)))
+
+
+def item_information(theta: float, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Fisher information of each question at an ability, a^2 P (1 - P)"""
+    p = probability(theta, a, b)
+    return a * a * p * (1.0 - p)
+
+
+def _log_normal_prior(mean: float) -> np.ndarray:
+    return -0.5 * (GRID - mean) ** 2
+
+
+def estimate_ability(a: np.ndarray, b: np.ndarray, correct: np.ndarray, prior_mean: float = 0.0) -> Tuple[float, float]:
+    """
+    Expected a posteriori ability of a player
+
+    The posterior over GRID is the normal prior times the likelihood of the
+    answers; unlike the maximum likelihood estimate it is finite after all
+    correct or all wrong answers.
+
+    Args:
+        a: Discrimination of the answered questions
+        b: Difficulty of the answered questions
+        correct: Whether each answer was correct
+        prior_mean: Expected ability before the first answer
+
+    Returns:
+        (ability, standard error), the posterior mean and standard deviation
+    """
+    sign = np.where(correct, 1.0, -1.0)[:, None]
+    z = a[:, None] * (GRID[None, :] - b[:, None])
+    log_posterior = _log_normal_prior(prior_mean) - np.logaddexp(0.0, -sign * z).sum(axis=0)
+    posterior = np.exp(log_posterior - log_posterior.max())
+    posterior /= posterior.sum()
+    theta = float(posterior @ GRID)
+    return theta, float(np.sqrt(posterior @ (GRID - theta) ** 2))
+
+
+def select_item(theta: float, a: np.ndarray, b: np.ndarray, answered: Iterable[int],
+                rng: Optional[random.Random] = None, candidates: int = 3) -> Optional[int]:
+    """
+    Pick the next question of an adaptive quiz
+
+    One of the `candidates` most informative questions at the current ability
+    is drawn at random, so players starting at the same level do not all get
+    the same sequence and no question is overexposed.
+
+    Args:
+        theta: Current ability estimate
+        a: Discrimination of the questions of the pool
+        b: Difficulty of the questions of the pool
+        answered: Indices of the questions already asked
+        rng: Source of the draw, the most informative question is taken without one
+        candidates: Number of questions drawn from
+
+    Returns:
+        Index of the question in the pool, None once every question was asked
+    """
+    information = item_information(theta, a, b)
+    information[list(answered)] = -1.0
+    available = int((information >= 0).sum())
+    if not available:
+        return None
+    count = min(candidates, available) if rng is not None else 1
+    best = np.argpartition(-information, count - 1)[:count]
+    best = best[np.argsort(-information[best])]
+    return int(best[rng.randrange(count)] if rng is not None else best[0])
+
+
+def fit_items(item: np.ndarray, person: np.ndarray, correct: np.ndarray, a: np.ndarray, b: np.ndarray,
+              iterations: int = 25, tolerance: float = 1e-3, newton_steps: int = 3) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Estimate the parameters of every question from all the answers, by marginal maximum likelihood
+
+    Expectation-maximization over GRID (Bock-Aitkin): the E-step computes each
+    player's posterior over the ability grid and, from it, the expected number
+    of players and of correct answers of every question at every grid point;
+    the M-step takes a few Newton steps on each question's logistic curve
+    through those counts. Every step is a pass of np.bincount or array
+    arithmetic over all questions at once, one grid point at a time, so memory
+    stays proportional to the number of answers.
+
+    Args:
+        item: Question number of each answer, from 0
+        person: Player number of each answer, from 0
+        correct: Whether each answer was correct
+        a: Starting discrimination of each question
+        b: Starting difficulty of each question
+        iterations: Most EM iterations
+        tolerance: Largest change in difficulty at which the fit stops
+        newton_steps: Newton steps of each M-step
+
+    Returns:
+        (discrimination, difficulty, iterations run)
+    """
+    items = len(a)
+    persons = int(person.max()) + 1 if len(person) else 0
+    # Answers only differ by their question and outcome: (question, outcome) codes index small tables
+    outcome = item.astype(np.int64) * 2 + correct
+    log_prior = _log_normal_prior(0.0)
+    a = np.asarray(a, dtype=np.float64).copy()
+    d = -a * np.asarray(b, dtype=np.float64)  # intercept, a * theta + d
+    nodes = len(GRID)
+
+    iteration = 0
+    for iteration in range(1, iterations + 1):
+        # E-step: each player's posterior over the grid, from the log-likelihood of
+        # every (question, outcome) at every grid point
+        z = GRID[:, None] * a[None, :] + d[None, :]
+        log_likelihood = np.empty((nodes, 2 * items))
+        log_likelihood[:, 0::2] = -np.logaddexp(0.0, z)
+        log_likelihood[:, 1::2] = -np.logaddexp(0.0, -z)
+        log_posterior = np.empty((nodes, persons))
+        for k in range(nodes):
+            log_posterior[k] = np.bincount(person, weights=log_likelihood[k][outcome], minlength=persons)
+        log_posterior += log_prior[:, None]
+        log_posterior -= log_posterior.max(axis=0)
+        posterior = np.exp(log_posterior)
+        posterior /= posterior.sum(axis=0)
+
+        # Expected wrong and correct answers of each question at each grid point
+        counts = np.empty((items * 2, nodes))
+        for k in range(nodes):
+            counts[:, k] = np.bincount(outcome, weights=posterior[k][person], minlength=items * 2)
+        r = counts[1::2]
+        n = counts[0::2] + r
+
+        # M-step: Newton steps on (a, d) of every question at once, with normal priors
+        previous_b = -d / a
+        for _ in range(newton_steps):
+            p = 1.0 / (1.0 + np.exp(-(a[:, None] * GRID + d[:, None])))
+            residual = r - n * p
+            w = n * p * (1.0 - p)
+            gradient_a = residual @ GRID - (a - DEFAULT_DISCRIMINATION) / DISCRIMINATION_PRIOR_VARIANCE
+            gradient_d = residual.sum(axis=1) - d / INTERCEPT_PRIOR_VARIANCE
+            hessian_aa = -(w @ (GRID * GRID)) - 1.0 / DISCRIMINATION_PRIOR_VARIANCE
+            hessian_ad = -(w @ GRID)
+            hessian_dd = -w.sum(axis=1) - 1.0 / INTERCEPT_PRIOR_VARIANCE
+            determinant = hessian_aa * hessian_dd - hessian_ad * hessian_ad
+            a = a - (hessian_dd * gradient_a - hessian_ad * gradient_d) / determinant
+            d = d - (hessian_aa * gradient_d - hessian_ad * gradient_a) / determinant
+            a = np.clip(a, *DISCRIMINATION_RANGE)
+
+        if np.max(np.abs(-d / a - previous_b), initial=0.0) < tolerance:
+            break
+
+    return a, -d / a, iteration
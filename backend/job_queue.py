@@ -0,0 +1,350 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+FINISHED_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue served by a local pool of worker threads
+
+    Jobs are dispatched by weighted fair queuing: every job gets a virtual
+    start and finish tag, its start being the later of the queue's virtual
+    time and the finish of the same client's previous job still pending, and
+    its finish adding cost / weight to that. Workers take the job with the
+    smallest finish tag, so a client that queues many jobs only pushes back
+    its own jobs, while a client with an empty backlog gets its next job
+    dispatched right after the jobs already started.
+
+    A running job holds a lease: the workers refresh its updated_at while the
+    handler runs, and a job left without a refresh for lease_seconds, its
+    worker or process having died, is put back in the queue by the next claim.
+    """
+
+    def __init__(self, handler: Callable[[Dict], Dict], db_path: str = "quizbot_jobs.sqlite3",
+                 concurrency: int = 4, lease_seconds: int = 600, poll_interval: float = 0.5):
+        """
+        Initialize the job queue
+
+        Args:
+            handler: Function run for each job payload, returning the job result
+            db_path: SQLite file holding the jobs, so they survive restarts
+            concurrency: Number of worker threads
+            lease_seconds: Time without a heartbeat after which a running job is considered abandoned
+            poll_interval: Seconds an idle worker waits before checking the table again
+        """
+        self.handler = handler
+        self.db_path = db_path
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._workers: List[threading.Thread] = []
+        self._heartbeat: Optional[threading.Thread] = None
+        # Jobs run by this process, their leases are refreshed every lease_seconds / 3
+        self._leased: Set[str] = set()
+        self._leased_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _init_db(self) -> None:
+        connection = self._connect()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                client TEXT NOT NULL DEFAULT '',
+                start_tag REAL NOT NULL DEFAULT 0,
+                finish_tag REAL NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        # Job tables created before fair queuing
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (("client", "TEXT NOT NULL DEFAULT ''"),
+                                   ("start_tag", "REAL NOT NULL DEFAULT 0"),
+                                   ("finish_tag", "REAL NOT NULL DEFAULT 0")):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        connection.executescript("""
+            DROP INDEX IF EXISTS jobs_pending_idx;
+            CREATE INDEX IF NOT EXISTS jobs_fair_idx ON jobs (status, finish_tag, priority, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_start_idx ON jobs (status, start_tag);
+            CREATE INDEX IF NOT EXISTS jobs_client_idx ON jobs (client, status, finish_tag);
+            CREATE INDEX IF NOT EXISTS jobs_finished_idx ON jobs (status, updated_at);
+        """)
+
+    def start(self) -> None:
+        """Start the worker threads and the thread keeping their jobs leased"""
+        if self._workers:
+            return
+
+        self._stopping.clear()
+        for i in range(self.concurrency):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def stop(self, timeout: Optional[float] = None) -> int:
+        """
+        Stop the workers after their current job
+
+        Args:
+            timeout: Maximum seconds to wait for the in-flight jobs to drain, in total
+
+        Returns:
+            Number of workers still running a job when the timeout expired
+        """
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        still_running = sum(1 for worker in self._workers if worker.is_alive())
+        self._workers = []
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        return still_running
+
+    def submit(self, payload: Dict, priority: int = 0, client: str = "", cost: float = 1.0,
+               weight: float = 1.0) -> str:
+        """
+        Enqueue a job
+
+        Args:
+            payload: JSON-serializable job arguments
+            priority: Breaks ties between equal finish tags, lower values run first
+            client: Who submitted the job, jobs are shared fairly between clients
+            cost: Work the job represents, such as the number of questions to generate
+            weight: Share of the workers the client is entitled to, relative to other clients
+
+        Returns:
+            Job ID
+        """
+        if weight <= 0:
+            raise ValueError("Job weight must be positive")
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            start_tag = max(self._virtual_time(connection), self._client_finish(connection, client))
+            connection.execute(
+                "INSERT INTO jobs (id, status, priority, client, start_tag, finish_tag, payload, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JobStatus.QUEUED.value, priority, client, start_tag, start_tag + cost / weight,
+                 json.dumps(payload), now, now)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """
+        Get the current state of a job
+
+        Args:
+            job_id: The job ID
+
+        Returns:
+            Dictionary with the job state, or None for unknown jobs
+        """
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"]
+        }
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (JobStatus.QUEUED.value,)
+        ).fetchone()[0]
+
+    def purge_finished(self, max_age_seconds: int) -> int:
+        """
+        Delete completed and failed jobs, with their results, finished longer ago than the given age
+
+        Args:
+            max_age_seconds: Age after which a finished job is deleted
+
+        Returns:
+            Number of jobs deleted
+        """
+        finished_before = (datetime.now() - timedelta(seconds=max_age_seconds)).isoformat()
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (*FINISHED_STATUSES, finished_before)
+        ).rowcount
+
+    @staticmethod
+    def _virtual_time(connection: sqlite3.Connection) -> float:
+        """Start tag of the oldest waiting job, or of the latest started one when none is waiting"""
+        waiting = connection.execute(
+            "SELECT MIN(start_tag) FROM jobs WHERE status = ?", (JobStatus.QUEUED.value,)
+        ).fetchone()[0]
+        if waiting is not None:
+            return waiting
+        # Tags only need to be consistent between unfinished jobs, an idle queue starts over from 0
+        running = connection.execute(
+            "SELECT MAX(start_tag) FROM jobs WHERE status = ?", (JobStatus.RUNNING.value,)
+        ).fetchone()[0]
+        return running or 0.0
+
+    @staticmethod
+    def _client_finish(connection: sqlite3.Connection, client: str) -> float:
+        """Finish tag of the client's last unfinished job, 0 without any"""
+        finish = connection.execute(
+            "SELECT MAX(finish_tag) FROM jobs WHERE client = ? AND status IN (?, ?)",
+            (client, JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+        ).fetchone()[0]
+        return finish or 0.0
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        """Atomically requeue the jobs whose lease expired, mark the next queued job as running and return it"""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = datetime.now()
+            requeued = connection.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (JobStatus.QUEUED.value, now.isoformat(), JobStatus.RUNNING.value,
+                 (now - timedelta(seconds=self.lease_seconds)).isoformat())
+            ).rowcount
+            if requeued:
+                logger.warning(f"Requeued {requeued} jobs whose lease expired")
+            row = connection.execute(
+                "SELECT id, payload FROM jobs WHERE status = ? ORDER BY finish_tag, priority, created_at LIMIT 1",
+                (JobStatus.QUEUED.value,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                    (JobStatus.RUNNING.value, now.isoformat(), row["id"])
+                )
+            connection.execute("COMMIT")
+            return row
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _finish(self, job_id: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        status = JobStatus.FAILED if error is not None else JobStatus.COMPLETED
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status.value, json.dumps(result) if result is not None else None, error,
+             datetime.now().isoformat(), job_id)
+        )
+
+    def renew_leases(self) -> int:
+        """
+        Refresh updated_at of the jobs this process is running
+
+        Returns:
+            Number of jobs whose lease was renewed
+        """
+        with self._leased_lock:
+            job_ids = list(self._leased)
+        if not job_ids:
+            return 0
+        return self._connect().execute(
+            f"UPDATE jobs SET updated_at = ? WHERE status = ? AND id IN ({', '.join('?' * len(job_ids))})",
+            (datetime.now().isoformat(), JobStatus.RUNNING.value, *job_ids)
+        ).rowcount
+
+    def _renew_leases(self) -> None:
+        """Heartbeat loop: renew the leases of running jobs until stopped"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self.renew_leases()
+            except Exception as e:
+                logger.error(f"Renewing job leases failed: {e}")
+
+    def run_next(self) -> bool:
+        """
+        Claim and run a single job in the calling thread
+
+        The job's lease is renewed while it runs once start() was called.
+
+        Returns:
+            True if a job was run, False if the queue was empty
+        """
+        row = self._claim_next()
+        if row is None:
+            return False
+
+        job_id = row["id"]
+        started = time.perf_counter()
+        with self._leased_lock:
+            self._leased.add(job_id)
+        try:
+            result = self.handler(json.loads(row["payload"]))
+            self._finish(job_id, result=result)
+            logger.info(f"Job {job_id} completed in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._finish(job_id, error=str(e))
+        finally:
+            with self._leased_lock:
+                self._leased.discard(job_id)
+        return True
+
+    def _work(self) -> None:
+        """Worker loop: run jobs until stopped, sleeping while the queue is empty"""
+        while not self._stopping.is_set():
+            try:
+                if self.run_next():
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
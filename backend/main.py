@@ -1,16 +1,38 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from backend.models import (
     QuizRequest, QuizResponse, AnswerRequest, AnswerResponse, 
-    ScoreResponse, DifficultyLevel
+    ScoreResponse, DifficultyLevel, Quiz, RoomRequest,
+    AdaptiveQuizRequest, AdaptiveProgress, AdaptiveAnswerResponse
 )
 from backend.quiz_generator import QuizGenerator
-from backend.score_manager import ScoreManager
-from typing import Dict, List
+from backend.score_manager import ScoreManager, InvalidCursorError
+from backend.job_queue import JobQueue, FINISHED_STATUSES
+from backend.session_store import create_session_store, SessionStoreBusyError, WriteBehindSessionStore
+from backend.event_log import EventLog
+from backend.question_bank import QuestionBank
+from backend.responses import LeanJSONResponse, select_fields
+from backend.compression import CompressionMiddleware
+from backend.rooms import RoomManager
+from backend.rate_limit import Client, create_rate_limiter, identify_client, parse_weights
+from backend.idempotency import IdempotencyMiddleware, create_idempotency_store
+from backend.adaptive import AdaptiveQuizzes, QuestionMismatchError
+from dotenv import load_dotenv
+from typing import Dict, List, Optional
+import asyncio
+import json
 import logging
+import math
+import os
+import secrets
+import threading
+import time
 from datetime import datetime
 
+# Load environment variables
+load_dotenv()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,7 +41,26 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Quiz Bot API",
     description="A smart quiz bot that generates quizzes on any topic using LangChain and Google's Generative AI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=LeanJSONResponse
+)
+
+# Only behind a proxy that sets X-Forwarded-For, clients could pick their address otherwise
+TRUST_FORWARDED = os.getenv("QUIZBOT_TRUST_FORWARDED", "0") == "1"
+
+# Responses to POSTs sent with an Idempotency-Key are recorded and replayed to retries: "memory"
+# per process, "sqlite:///path" shared by every worker, "off" disables it. Added first so it runs
+# innermost, replays then go through CORS and compression like any other response
+idempotency_store = create_idempotency_store(
+    os.getenv("QUIZBOT_IDEMPOTENCY", "memory"),
+    ttl=float(os.getenv("QUIZBOT_IDEMPOTENCY_TTL", "86400")),
+    max_keys=int(os.getenv("QUIZBOT_IDEMPOTENCY_MAX_KEYS", "10000"))
+)
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    paths=("/quiz/generate", "/quiz/answer", "/quiz/adaptive"),
+    trust_forwarded=TRUST_FORWARDED
 )
 
 # Add CORS middleware
@@ -31,20 +72,218 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global instances
-quiz_generator = None
-score_manager = ScoreManager()
+# Responses of at least QUIZBOT_COMPRESSION_MIN_SIZE bytes are sent gzip or brotli encoded
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("QUIZBOT_COMPRESSION_MIN_SIZE", "500"))
+)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the quiz generator on startup"""
-    global quiz_generator
+# Quizzes with at most this many questions win ties with longer ones in the queue
+SHORT_QUIZ_QUESTIONS = int(os.getenv("QUIZBOT_SHORT_QUIZ_QUESTIONS", "5"))
+
+
+def run_generation_job(payload: Dict) -> Dict:
+    """
+    Build a quiz for a queued job and open a session for it
+    
+    Questions come from the question bank first; the LLM only generates the shortfall.
+    
+    Args:
+        payload: QuizRequest fields
+        
+    Returns:
+        Dictionary with the quiz, its session ID and how many questions came from the bank
+    """
+    request = QuizRequest(**payload)
+    banked = []
+    if question_bank is not None:
+        banked = question_bank.find_questions(request.topic, request.difficulty, request.num_questions)
+    
+    missing = request.num_questions - len(banked)
+    if missing:
+        # Jobs accepted while warming up wait for the generator
+        generator_ready.wait(GENERATOR_WARMUP_TIMEOUT)
+        if quiz_generator is None:
+            raise RuntimeError("Quiz generator is not available")
+        
+        try:
+            generated = quiz_generator.generate_questions(
+                topic=request.topic,
+                num_questions=missing,
+                difficulty=request.difficulty,
+                exclude=banked
+            )
+            if question_bank is not None:
+                question_bank.add_questions(request.topic, generated)
+        except Exception as e:
+            logger.error(f"Question generation failed: {e}")
+            # A shorter quiz of real questions beats placeholders; without any, fall back as before
+            generated = [] if banked else quiz_generator.generate_fallback_quiz(
+                request.topic, request.num_questions, request.difficulty
+            ).questions
+    else:
+        generated = []
+    
+    questions = banked + generated
+    quiz = Quiz(topic=request.topic, questions=questions, total_questions=len(questions))
+    
+    # Validate the quiz
+    errors = quiz_generator.validate_quiz(quiz) if quiz_generator is not None else []
+    if errors:
+        raise ValueError(f"Quiz validation failed: {'; '.join(errors)}")
+    
+    session_id = score_manager.create_session(quiz)
+    # The job is marked completed once this returns, its session must survive a crash by then
+    persist_sessions()
+    logger.info(f"Quiz ready ({len(banked)} questions from the bank). Session ID: {session_id}")
+    
+    return {
+        "success": True,
+        # Answers stay on the server, /quiz/answer checks them against the session's answer key
+        "quiz": quiz.redacted().dict(),
+        "session_id": session_id,
+        "questions_from_bank": len(banked)
+    }
+
+
+def persist_sessions() -> None:
+    """Write buffered session changes out now, before a new session ID reaches a client"""
+    if isinstance(session_store, WriteBehindSessionStore):
+        session_store.flush()
+
+
+# Seconds a queued job waits for the generator to finish warming up
+GENERATOR_WARMUP_TIMEOUT = float(os.getenv("QUIZBOT_WARMUP_TIMEOUT", "60"))
+
+
+def warm_up_generator() -> None:
+    """Build the quiz generator (LangChain imports and LLM client) off the request path"""
+    global quiz_generator, generator_state
+    started = time.perf_counter()
     try:
         quiz_generator = QuizGenerator()
-        logger.info("Quiz generator initialized successfully")
+        generator_state = "ready"
+        logger.info(f"Quiz generator initialized successfully in {time.perf_counter() - started:.2f}s")
     except Exception as e:
         logger.error(f"Failed to initialize quiz generator: {e}")
         quiz_generator = None
+        generator_state = "unavailable"
+    finally:
+        generator_ready.set()
+
+
+# Global instances
+quiz_generator = None
+generator_state = "warming"  # "warming" until the generator is built, then "ready" or "unavailable"
+generator_ready = threading.Event()
+# "memory" keeps sessions in this process; multi-worker deployments need a shared store
+session_store_url = os.getenv("QUIZBOT_SESSION_STORE", "memory")
+# Directory of the answer event log the in-memory sessions are rebuilt from after a restart
+event_log_path = os.getenv("QUIZBOT_EVENT_LOG", "off")
+event_log = None
+if event_log_path != "off":
+    if session_store_url != "memory":
+        raise ValueError("QUIZBOT_EVENT_LOG needs the in-memory session store")
+    event_log = EventLog(
+        event_log_path,
+        fsync_interval=float(os.getenv("QUIZBOT_EVENT_LOG_FSYNC_INTERVAL", "0.05")),
+        snapshot_every=int(os.getenv("QUIZBOT_EVENT_LOG_SNAPSHOT_EVERY", "100000"))
+    )
+# With a SQLite store, "1" buffers session writes and flushes them in batches off the request path
+session_store = create_session_store(
+    session_store_url,
+    write_behind=os.getenv("QUIZBOT_SESSION_WRITE_BEHIND", "0") == "1",
+    flush_interval=float(os.getenv("QUIZBOT_SESSION_FLUSH_INTERVAL", "0.05")),
+    batch_size=int(os.getenv("QUIZBOT_SESSION_FLUSH_BATCH", "1000")),
+    max_pending=int(os.getenv("QUIZBOT_SESSION_MAX_PENDING", "10000"))
+)
+score_manager = ScoreManager(session_store, event_log=event_log)
+# Endpoints using the sessions, the job queue or a shared rate limit store are plain def functions:
+# FastAPI runs them in its threadpool, so waiting on another worker's SQLite lock never blocks the event loop
+# Questions generated for earlier quizzes, reused before calling the LLM ("off" disables it)
+question_bank_path = os.getenv("QUIZBOT_QUESTION_BANK", "quizbot_questions.sqlite3")
+question_bank = QuestionBank(question_bank_path) if question_bank_path != "off" else None
+# Adaptive quizzes pick their questions from the bank, out of the QUIZBOT_ADAPTIVE_POOL best matches
+adaptive_quizzes = AdaptiveQuizzes(
+    score_manager, question_bank, pool_size=int(os.getenv("QUIZBOT_ADAPTIVE_POOL", "50"))
+) if question_bank is not None else None
+# Multiplayer rooms live in the worker that opened them
+room_manager = RoomManager(
+    standings_interval=float(os.getenv("QUIZBOT_ROOM_STANDINGS_INTERVAL", "0.25")),
+    max_players=int(os.getenv("QUIZBOT_ROOM_MAX_PLAYERS", "5000"))
+)
+job_queue = JobQueue(
+    handler=run_generation_job,
+    db_path=os.getenv("QUIZBOT_JOB_DB", "quizbot_jobs.sqlite3"),
+    concurrency=int(os.getenv("QUIZBOT_JOB_WORKERS", "4")),
+    lease_seconds=int(os.getenv("QUIZBOT_JOB_LEASE_SECONDS", "600"))
+)
+# Token buckets per API key or client address: "memory" per process, "sqlite:///path" shared
+# by every worker, "off" disables rate limiting
+rate_limiter = create_rate_limiter(
+    os.getenv("QUIZBOT_RATE_LIMIT", "memory"),
+    rate=float(os.getenv("QUIZBOT_RATE_LIMIT_RATE", "2")),
+    burst=float(os.getenv("QUIZBOT_RATE_LIMIT_BURST", "60")),
+    costs={
+        "generate": float(os.getenv("QUIZBOT_RATE_COST_GENERATE", "10")),
+        # Starting an adaptive quiz creates a session and searches the bank, without calling the LLM
+        "adaptive": float(os.getenv("QUIZBOT_RATE_COST_ADAPTIVE", "5")),
+        "answer": float(os.getenv("QUIZBOT_RATE_COST_ANSWER", "1"))
+    }
+)
+# Fair queuing weight of API keys ("key=weight,..."), other clients weigh 1
+CLIENT_WEIGHTS = parse_weights(os.getenv("QUIZBOT_CLIENT_WEIGHTS", ""))
+
+
+def rate_limited(operation: str):
+    """
+    Dependency charging an operation to the client of the request
+
+    Args:
+        operation: Name of the operation in the rate limiter costs
+
+    Returns:
+        Dependency returning the Client, raising a 429 with Retry-After when its bucket is empty
+    """
+    # Plain def: FastAPI runs it in its threadpool, a shared SQLite bucket store may wait on a lock
+    def charge(request: Request) -> Client:
+        client = identify_client(request, CLIENT_WEIGHTS, TRUST_FORWARDED)
+        if rate_limiter is not None:
+            retry_after = rate_limiter.acquire(client.key, operation)
+            if retry_after:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Rate limit exceeded, please slow down",
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+        return client
+    return charge
+
+@app.on_event("startup")
+async def startup_event():
+    """Start warming up the quiz generator and the question bank index without delaying the first request"""
+    threading.Thread(target=warm_up_generator, name="generator-warmup", daemon=True).start()
+    if question_bank is not None:
+        threading.Thread(target=question_bank.load_similarity_index, name="question-index", daemon=True).start()
+    job_queue.start()
+
+# Seconds a shutting down worker waits for in-flight generations to finish
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("QUIZBOT_SHUTDOWN_GRACE", "30"))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the generation workers, letting in-flight generations finish"""
+    await room_manager.stop()
+    still_running = await asyncio.to_thread(job_queue.stop, SHUTDOWN_GRACE_SECONDS)
+    if still_running:
+        logger.warning(f"{still_running} generations still running after {SHUTDOWN_GRACE_SECONDS}s, "
+                       f"another worker requeues them once their lease expires")
+    if isinstance(session_store, WriteBehindSessionStore):
+        await asyncio.to_thread(session_store.close)
+    if event_log is not None:
+        # The next start loads this snapshot instead of replaying the events
+        await asyncio.to_thread(score_manager.write_snapshot)
+        event_log.close()
 
 @app.get("/")
 async def root():
@@ -54,9 +293,16 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "generate_quiz": "/quiz/generate",
+            "job_status": "/quiz/jobs/{job_id}",
+            "job_events": "/quiz/jobs/{job_id}/events",
             "submit_answer": "/quiz/answer",
             "get_score": "/quiz/score/{session_id}",
             "get_session": "/quiz/session/{session_id}",
+            "adaptive_quiz": "/quiz/adaptive",
+            "create_room": "/rooms",
+            "room_socket": "/rooms/{room_id}/ws",
+            "model_stats": "/quiz/models",
+            "analytics": "/quiz/analytics",
             "health": "/health"
         }
     }
@@ -65,68 +311,97 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {
-        "status": "healthy",
+        "status": "warming" if generator_state == "warming" else "healthy",
         "timestamp": datetime.now().isoformat(),
-        "quiz_generator_available": quiz_generator is not None
+        "quiz_generator_available": quiz_generator is not None,
+        "quiz_generator_state": generator_state,
+        "pending_jobs": job_queue.pending_count()
     }
 
-@app.post("/quiz/generate", response_model=QuizResponse)
-async def generate_quiz(request: QuizRequest):
+@app.post("/quiz/generate", status_code=202)
+def generate_quiz(request: QuizRequest, client: Client = Depends(rate_limited("generate"))):
     """
-    Generate a new quiz on the given topic
+    Queue the generation of a new quiz on the given topic
     
     Args:
         request: QuizRequest with topic, number of questions, and difficulty
+        client: Who asked, generations are shared fairly between clients
         
     Returns:
-        QuizResponse with generated quiz or error message
+        Job ID to poll at /quiz/jobs/{job_id} or subscribe to at /quiz/jobs/{job_id}/events
     """
-    if quiz_generator is None:
+    if generator_state == "unavailable":
         raise HTTPException(
             status_code=503, 
             detail="Quiz generator is not available. Please check the API configuration."
         )
     
     try:
-        logger.info(f"Generating quiz for topic: {request.topic}")
-        
-        # Generate the quiz
-        quiz = quiz_generator.generate_quiz(
-            topic=request.topic,
-            num_questions=request.num_questions,
-            difficulty=request.difficulty
-        )
-        
-        # Validate the quiz
-        errors = quiz_generator.validate_quiz(quiz)
-        if errors:
-            logger.warning(f"Quiz validation errors: {errors}")
-            return QuizResponse(
-                success=False,
-                error=f"Quiz validation failed: {'; '.join(errors)}"
-            )
-        
-        # Create a session for this quiz
-        session_id = score_manager.create_session(quiz)
-        
-        # Add session_id to the response
-        response_data = QuizResponse(success=True, quiz=quiz)
+        logger.info(f"Queueing quiz for topic: {request.topic}")
         
-        # Add session_id to the response (we'll modify the response model if needed)
-        logger.info(f"Quiz generated successfully. Session ID: {session_id}")
+        # A job costs its number of questions in the fair queue, short quizzes win ties
+        priority = 0 if request.num_questions <= SHORT_QUIZ_QUESTIONS else 1
+        job_id = job_queue.submit(request.dict(), priority=priority, client=client.key,
+                                  cost=request.num_questions, weight=client.weight)
         
-        return JSONResponse(content={
+        return JSONResponse(status_code=202, content={
             "success": True,
-            "quiz": quiz.dict(),
-            "session_id": session_id
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/quiz/jobs/{job_id}",
+            "events_url": f"/quiz/jobs/{job_id}/events"
         })
         
     except Exception as e:
-        logger.error(f"Error generating quiz: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
+        logger.error(f"Error queueing quiz: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue quiz: {str(e)}")
 
-@app.post("/quiz/answer", response_model=AnswerResponse)
-async def submit_answer(request: AnswerRequest, session_id: str):
+@app.get("/quiz/jobs/{job_id}")
+def get_job(job_id: str, fields: Optional[str] = None):
+    """
+    Get the status of a quiz generation job
+    
+    Args:
+        job_id: Job ID returned by /quiz/generate
+        fields: Comma separated fields to return, e.g. "status,result.quiz.questions.question"
+        
+    Returns:
+        Job status, with the quiz and session_id once completed
+    """
+    job = job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return LeanJSONResponse(select_fields(job, fields))
+
+@app.get("/quiz/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream the status of a quiz generation job as server-sent events
+    
+    Args:
+        job_id: Job ID returned by /quiz/generate
+        
+    Returns:
+        Event stream that ends once the job has completed or failed
+    """
+    if await asyncio.to_thread(job_queue.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_status = None
+        while True:
+            job = await asyncio.to_thread(job_queue.get_job, job_id)
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: {last_status}\ndata: {json.dumps(job)}\n\n"
+            if last_status in FINISHED_STATUSES:
+                break
+            await asyncio.sleep(job_queue.poll_interval)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.post("/quiz/answer", response_model=AnswerResponse, dependencies=[Depends(rate_limited("answer"))])
+def submit_answer(request: AnswerRequest, session_id: str):
     """
     Submit an answer for a quiz question
     
@@ -150,12 +425,81 @@ async def submit_answer(request: AnswerRequest, session_id: str):
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except SessionStoreBusyError:
+        raise
     except Exception as e:
         logger.error(f"Error submitting answer: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to submit answer: {str(e)}")
 
+def require_adaptive_quizzes() -> AdaptiveQuizzes:
+    """Dependency returning the adaptive quizzes, a 503 without a question bank"""
+    if adaptive_quizzes is None:
+        raise HTTPException(status_code=503, detail="Adaptive quizzes need the question bank")
+    return adaptive_quizzes
+
+@app.post("/quiz/adaptive", status_code=201, response_model=AdaptiveProgress,
+          dependencies=[Depends(rate_limited("adaptive"))])
+async def start_adaptive_quiz(request: AdaptiveQuizRequest, quizzes: AdaptiveQuizzes = Depends(require_adaptive_quizzes)):
+    """
+    Start an adaptive quiz on questions from the bank
+    
+    Args:
+        request: AdaptiveQuizRequest with topic, most questions, starting level and target error
+        
+    Returns:
+        AdaptiveProgress with the session ID and the first question
+    """
+    try:
+        progress = await asyncio.to_thread(
+            quizzes.start, request.topic, request.num_questions, request.difficulty, request.target_error
+        )
+        await asyncio.to_thread(persist_sessions)
+        return progress
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/quiz/adaptive/{session_id}", response_model=AdaptiveProgress)
+def get_adaptive_quiz(session_id: str, quizzes: AdaptiveQuizzes = Depends(require_adaptive_quizzes)):
+    """
+    Get the estimated ability and current question of an adaptive quiz
+    
+    Args:
+        session_id: User session ID
+        
+    Returns:
+        AdaptiveProgress, next_question is null once the quiz is finished
+    """
+    try:
+        return quizzes.progress(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/quiz/adaptive/{session_id}/answer", response_model=AdaptiveAnswerResponse,
+          dependencies=[Depends(rate_limited("answer"))])
+def submit_adaptive_answer(
+    session_id: str,
+    request: AnswerRequest,
+    quizzes: AdaptiveQuizzes = Depends(require_adaptive_quizzes)
+):
+    """
+    Answer the current question of an adaptive quiz
+    
+    Args:
+        session_id: User session ID
+        request: AnswerRequest with the current question's index and the selected option
+        
+    Returns:
+        AdaptiveAnswerResponse with the result, the new ability estimate and the next question
+    """
+    try:
+        return quizzes.submit_answer(session_id, request.question_index, request.selected_option)
+    except QuestionMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/quiz/score/{session_id}", response_model=ScoreResponse)
-async def get_score(session_id: str):
+def get_score(session_id: str):
     """
     Get the current score for a session
     
@@ -176,28 +520,39 @@ async def get_score(session_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to get score: {str(e)}")
 
 @app.get("/quiz/session/{session_id}")
-async def get_session(session_id: str):
+def get_session(
+    session_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
     Get complete session information
     
     Args:
         session_id: User session ID
+        limit: Maximum number of answers to return
+        cursor: next_cursor of the previous page of answers
+        fields: Comma separated fields to return, e.g. "score,answers.is_correct"
         
     Returns:
-        Dictionary with session summary
+        Dictionary with session summary and a page of its answers
     """
     try:
-        session_summary = score_manager.get_session_summary(session_id)
-        return session_summary
+        session_summary = score_manager.get_session_summary(session_id, limit=limit, cursor=cursor)
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting session: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get session: {str(e)}")
+    
+    return LeanJSONResponse(select_fields(session_summary, fields))
 
 @app.post("/quiz/reset/{session_id}")
-async def reset_session(session_id: str):
+def reset_session(session_id: str):
     """
     Reset a user session (clear answers and score)
     
@@ -213,28 +568,169 @@ async def reset_session(session_id: str):
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except SessionStoreBusyError:
+        raise
     except Exception as e:
         logger.error(f"Error resetting session: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to reset session: {str(e)}")
 
 @app.get("/quiz/leaderboard")
-async def get_leaderboard(limit: int = 10):
+def get_leaderboard(
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
     Get the leaderboard of top sessions
     
     Args:
         limit: Maximum number of entries to return
+        cursor: next_cursor of the previous page
+        fields: Comma separated fields of each entry to return, e.g. "topic,score"
         
     Returns:
-        List of top sessions
+        Page of top sessions and the cursor of the next page
     """
     try:
-        leaderboard = score_manager.get_leaderboard(limit)
-        return {"leaderboard": leaderboard}
+        page = score_manager.get_leaderboard_page(limit, cursor)
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting leaderboard: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get leaderboard: {str(e)}")
+    
+    page["leaderboard"] = select_fields(page["leaderboard"], fields)
+    return LeanJSONResponse(page)
+
+@app.post("/rooms", status_code=201)
+async def create_room(request: RoomRequest):
+    """
+    Open a multiplayer room playing the quiz of a completed generation job
+    
+    Args:
+        request: RoomRequest with the job ID and an optional time limit per question
+        
+    Returns:
+        Room code, the host token needed to drive the room, and the WebSocket URL
+    """
+    job = await asyncio.to_thread(job_queue.get_job, request.job_id)
+    if job is None or job["status"] != "completed":
+        raise HTTPException(status_code=404, detail="No completed generation job with this ID")
+    
+    result = job["result"]
+    template = await asyncio.to_thread(score_manager.user_sessions.get, result["session_id"])
+    if template is None:
+        raise HTTPException(status_code=404, detail="The quiz of this job has expired")
+    
+    room = room_manager.create_room(
+        quiz=result["quiz"],
+        template=template,
+        question_seconds=request.question_seconds
+    )
+    return {
+        "room_id": room.room_id,
+        "host_token": room.host_token,
+        "websocket_url": f"/rooms/{room.room_id}/ws",
+        "topic": result["quiz"]["topic"],
+        "total_questions": result["quiz"]["total_questions"]
+    }
+
+@app.get("/rooms/{room_id}")
+async def get_room(room_id: str):
+    """
+    Get the state of a multiplayer room
+    
+    Args:
+        room_id: Room code
+        
+    Returns:
+        Room state, current question index and number of players
+    """
+    room = room_manager.get_room(room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return room.status()
+
+@app.websocket("/rooms/{room_id}/ws")
+async def room_socket(websocket: WebSocket, room_id: str, name: Optional[str] = None, host_token: Optional[str] = None):
+    """
+    Join a room as a player (?name=...) or as its host (?host_token=...)
+    
+    Args:
+        websocket: The client connection
+        room_id: Room code
+        name: Player name shown in the standings
+        host_token: Token returned when the room was created
+    """
+    await room_manager.serve(websocket, room_id, name, host_token)
+
+@app.get("/quiz/models")
+async def get_model_stats():
+    """
+    Get the model tiers quizzes are generated with and how each one performed
+    
+    Returns:
+        Tiers, fastest first, with their attempts, success rate, errors and latency
+    """
+    if quiz_generator is None:
+        raise HTTPException(status_code=503, detail=f"Quiz generator is {generator_state}")
+    
+    return {"tiers": quiz_generator.router.stats()}
+
+# Admin endpoints need this token in the X-Admin-Token header, they are disabled while it is unset
+ADMIN_TOKEN = os.getenv("QUIZBOT_ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency rejecting requests without the admin token"""
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/quiz/analytics", dependencies=[Depends(require_admin)])
+async def get_analytics(
+    min_answers: int = Query(30, ge=1),
+    flagged_only: bool = False,
+    limit: int = Query(100, ge=1, le=10000)
+):
+    """
+    Get the answer statistics of every topic and question
+    
+    Args:
+        min_answers: Fewest answers for a question to be flagged
+        flagged_only: Only list the questions flagged too easy, too hard or ambiguous
+        limit: Most questions listed, the most answered first
+        
+    Returns:
+        Per-topic accuracy and per-question p-value, discrimination, point-biserial
+        correlation, option choices and flags
+    """
+    # NumPy is only imported once analytics are requested, keeping the API import light
+    from backend.analytics import analytics_report, columns_from_sessions
+    
+    sessions = score_manager.user_sessions
+    if isinstance(sessions, dict):
+        # Copied here, requests keep adding sessions while the thread reads them
+        sessions = dict(sessions)
+    
+    def build_report():
+        return analytics_report(columns_from_sessions(sessions.items()), min_answers, flagged_only, limit)
+    
+    return await asyncio.to_thread(build_report)
+
+@app.post("/quiz/adaptive/calibrate", dependencies=[Depends(require_admin)])
+async def calibrate_questions(min_responses: int = Query(30, ge=1)):
+    """
+    Re-estimate the item response theory parameters of the banked questions
+    
+    Args:
+        min_responses: Fewest adaptive quiz answers for a question's parameters to be updated
+        
+    Returns:
+        Number of responses read, questions answered and questions calibrated
+    """
+    if question_bank is None:
+        raise HTTPException(status_code=503, detail="Calibration needs the question bank")
+    return await asyncio.to_thread(question_bank.calibrate, min_responses)
 
 @app.get("/quiz/topics")
 async def get_suggested_topics():
@@ -272,7 +768,7 @@ async def get_suggested_topics():
 @app.post("/quiz/cleanup")
 async def cleanup_old_sessions(background_tasks: BackgroundTasks, max_age_hours: int = 24):
     """
-    Clean up old sessions (background task)
+    Clean up old sessions and finished jobs (background task)
     
     Args:
         max_age_hours: Maximum age in hours before cleanup
@@ -283,6 +779,10 @@ async def cleanup_old_sessions(background_tasks: BackgroundTasks, max_age_hours:
     def cleanup_task():
         cleaned_count = score_manager.cleanup_old_sessions(max_age_hours)
         logger.info(f"Cleaned up {cleaned_count} old sessions")
+        purged_count = job_queue.purge_finished(max_age_hours * 3600)
+        logger.info(f"Purged {purged_count} finished jobs")
+        if rate_limiter is not None and hasattr(rate_limiter.store, "prune"):
+            rate_limiter.store.prune(max_age_hours * 3600)
     
     background_tasks.add_task(cleanup_task)
     return {"message": "Cleanup task scheduled"}
@@ -293,7 +793,17 @@ async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
     return JSONResponse(
         status_code=exc.status_code,
-        content={"error": exc.detail, "status_code": exc.status_code}
+        content={"error": exc.detail, "status_code": exc.status_code},
+        headers=getattr(exc, "headers", None)
+    )
+
+@app.exception_handler(SessionStoreBusyError)
+async def session_store_busy_handler(request, exc):
+    """Session writes are backed up, the client should retry shortly"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc), "status_code": 503},
+        headers={"Retry-After": "1"}
     )
 
 @app.exception_handler(Exception)
@@ -307,4 +817,11 @@ async def general_exception_handler(request, exc):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers are started from the import string so each one builds its own app
+    uvicorn.run(
+        "backend.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("QUIZBOT_WORKERS", "1")),
+        timeout_graceful_shutdown=int(SHUTDOWN_GRACE_SECONDS)
+    )
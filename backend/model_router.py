@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fastest tier first: name=model:temperature
+DEFAULT_TIERS = "fast=gemini-1.5-flash-8b:0.7,standard=gemini-1.5-flash:0.7,strong=gemini-1.5-pro:0.4"
+# Tier each difficulty starts on, short quizzes always start on the fastest tier
+DEFAULT_ROUTES = "easy=fast,medium=standard,hard=standard"
+
+
+def parse_tiers(spec: str) -> List[Tuple[str, str, float]]:
+    """
+    Read a tier list such as "fast=gemini-1.5-flash-8b:0.7,strong=gemini-1.5-pro:0.4"
+
+    Args:
+        spec: Comma separated name=model:temperature entries, fastest first
+
+    Returns:
+        (name, model, temperature) tuples
+    """
+    tiers = []
+    for entry in spec.split(","):
+        name, separator, model = entry.strip().partition("=")
+        if not separator or not name or not model:
+            raise ValueError(f"Invalid model tier: {entry!r}")
+        model, _, temperature = model.partition(":")
+        tiers.append((name.strip(), model.strip(), float(temperature) if temperature else 0.7))
+    return tiers
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """Read a route list such as "easy=fast,hard=strong" into a difficulty to tier name mapping"""
+    routes = {}
+    for entry in spec.split(","):
+        difficulty, separator, tier = entry.strip().partition("=")
+        if not separator:
+            raise ValueError(f"Invalid model route: {entry!r}")
+        routes[difficulty.strip().lower()] = tier.strip()
+    return routes
+
+
+def _first_line(error: BaseException) -> str:
+    """Short form of an error for the logs, parser errors span many lines"""
+    lines = str(error).strip().splitlines()
+    return f"{type(error).__name__}: {lines[0] if lines else ''}"[:200]
+
+
+class TierStats:
+    """Attempts, outcomes and recent latencies of one tier"""
+
+    def __init__(self, window: int = 500):
+        self.attempts = 0
+        self.successes = 0
+        self.errors: Counter = Counter()
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.attempts += 1
+            self._latencies.append(seconds)
+            if error is None:
+                self.successes += 1
+            else:
+                self.errors[type(error).__name__] += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            summary = {
+                "attempts": self.attempts,
+                "successes": self.successes,
+                "success_rate": round(self.successes / self.attempts, 4) if self.attempts else None,
+                "errors": dict(self.errors),
+            }
+        if latencies:
+            summary["latency_ms"] = {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 1),
+                "p50": round(latencies[len(latencies) // 2] * 1000, 1),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            }
+        return summary
+
+
+class ModelTier:
+    """A chat model the router can send prompts to"""
+
+    def __init__(self, name: str, model: str, temperature: float, llm: Any):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.llm = llm
+        self.stats = TierStats()
+
+
+class ModelRouter:
+    """
+    Choose the model tier for a generation and escalate when it fails
+
+    Tiers are ordered fastest (cheapest) first. A generation starts on the
+    tier routed for its difficulty, or the fastest one when it asks for at
+    most short_quiz_questions questions. When the model errors or its answer
+    fails to parse or validate, the same prompt goes to the next stronger
+    tier; only when the strongest tier fails too is the last error raised.
+    Every attempt is recorded in the tier's stats, so routes can be tuned
+    from observed latency and success rate.
+
+    Args:
+        tiers: Tiers, fastest first
+        routes: Difficulty to the name of the tier it starts on
+        short_quiz_questions: Quizzes up to this size start on the fastest tier
+    """
+
+    def __init__(self, tiers: List[ModelTier], routes: Optional[Dict[str, str]] = None, short_quiz_questions: int = 5):
+        if not tiers:
+            raise ValueError("At least one model tier is needed")
+        self.tiers = tiers
+        self.short_quiz_questions = short_quiz_questions
+        names = [tier.name for tier in tiers]
+        self.routes: Dict[str, int] = {}
+        for difficulty, name in (routes or {}).items():
+            if name not in names:
+                raise ValueError(f"Route {difficulty!r} names an unknown tier: {name!r}")
+            self.routes[difficulty] = names.index(name)
+
+    @classmethod
+    def from_spec(cls, make_llm: Callable[[int, str, str, float], Any], tiers: str = DEFAULT_TIERS,
+                  routes: str = DEFAULT_ROUTES, short_quiz_questions: int = 5) -> "ModelRouter":
+        """
+        Build a router from tier and route strings
+
+        Args:
+            make_llm: Builds the chat model of a tier from its position, name, model and temperature
+            tiers: Tier list, see parse_tiers
+            routes: Route list, see parse_routes
+            short_quiz_questions: Quizzes up to this size start on the fastest tier
+
+        Returns:
+            ModelRouter
+        """
+        built = [
+            ModelTier(name, model, temperature, make_llm(index, name, model, temperature))
+            for index, (name, model, temperature) in enumerate(parse_tiers(tiers))
+        ]
+        return cls(built, parse_routes(routes), short_quiz_questions)
+
+    def start_tier(self, difficulty: str, num_questions: int) -> int:
+        """Position of the tier a generation starts on"""
+        if num_questions <= self.short_quiz_questions:
+            return 0
+        return self.routes.get(difficulty, 0)
+
+    def generate(self, messages: Any, difficulty: str, num_questions: int, parse: Callable[[Any], Any]) -> Any:
+        """
+        Send a prompt to the routed tier, escalating until an answer parses
+
+        Args:
+            messages: Prompt passed to the chat model's invoke
+            difficulty: Difficulty of the quiz, picks the starting tier
+            num_questions: Questions asked for, short quizzes start on the fastest tier
+            parse: Turns a model response into the result, raising when it is unusable
+
+        Returns:
+            The parsed result of the first tier that succeeded
+        """
+        error = None
+        for tier in self.tiers[self.start_tier(difficulty, num_questions):]:
+            started = time.perf_counter()
+            try:
+                result = parse(tier.llm.invoke(messages))
+            except Exception as e:
+                error = e
+                tier.stats.record(time.perf_counter() - started, e)
+                logger.warning(f"Model tier '{tier.name}' failed, escalating: {_first_line(e)}")
+                continue
+            tier.stats.record(time.perf_counter() - started)
+            return result
+        raise error
+
+    async def agenerate(self, messages: Any, difficulty: str, num_questions: int, parse: Callable[[Any], Any]) -> Any:
+        """Async version of generate, using the chat models' ainvoke"""
+        error = None
+        for tier in self.tiers[self.start_tier(difficulty, num_questions):]:
+            started = time.perf_counter()
+            try:
+                result = parse(await tier.llm.ainvoke(messages))
+            except Exception as e:
+                error = e
+                tier.stats.record(time.perf_counter() - started, e)
+                logger.warning(f"Model tier '{tier.name}' failed, escalating: {_first_line(e)}")
+                continue
+            tier.stats.record(time.perf_counter() - started)
+            return result
+        raise error
+
+    def stats(self) -> List[Dict]:
+        """Configuration and stats of every tier, fastest first"""
+        return [
+            {"name": tier.name, "model": tier.model, "temperature": tier.temperature, **tier.stats.summary()}
+            for tier in self.tiers
+        ]
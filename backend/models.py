@@ -28,6 +28,31 @@ class Quiz(BaseModel):
         """Automatically set total_questions based on the questions list"""
         self.total_questions = len(self.questions)
 
+    def redacted(self) -> "RedactedQuiz":
+        """The quiz as sent to players, without answers or explanations"""
+        return RedactedQuiz(
+            topic=self.topic,
+            questions=[
+                RedactedQuestion(question=question.question, options=question.options, difficulty=question.difficulty)
+                for question in self.questions
+            ],
+            total_questions=self.total_questions
+        )
+
+
+class RedactedQuestion(BaseModel):
+    """Quiz question without its answer, answers are checked server-side"""
+    question: str
+    options: List[str]
+    difficulty: DifficultyLevel
+
+
+class RedactedQuiz(BaseModel):
+    """Quiz as sent to players"""
+    topic: str
+    questions: List[RedactedQuestion]
+    total_questions: int
+
 
 class QuizRequest(BaseModel):
     """Request model for generating a quiz"""
@@ -36,6 +61,20 @@ class QuizRequest(BaseModel):
     difficulty: DifficultyLevel = Field(default=DifficultyLevel.MEDIUM, description="Difficulty level")
 
 
+class AdaptiveQuizRequest(BaseModel):
+    """Request model for starting an adaptive quiz"""
+    topic: str = Field(..., description="Topic for the quiz", min_length=3)
+    num_questions: int = Field(default=10, description="Most questions asked", ge=1, le=30)
+    difficulty: DifficultyLevel = Field(default=DifficultyLevel.MEDIUM, description="Level the first question is picked at")
+    target_error: float = Field(default=0.4, description="The quiz ends once the ability is known this precisely", gt=0, le=2)
+
+
+class RoomRequest(BaseModel):
+    """Request model for opening a multiplayer room"""
+    job_id: str = Field(..., description="Completed generation job whose quiz the room plays")
+    question_seconds: Optional[float] = Field(default=None, description="Time limit per question, none by default", gt=0, le=600)
+
+
 class QuizResponse(BaseModel):
     """Response model for quiz generation"""
     success: bool
@@ -55,6 +94,29 @@ class AnswerResponse(BaseModel):
     correct_answer: int
     explanation: str
     score_change: int  # Points gained or lost
+    duplicate: bool = False  # The question was already answered, nothing changed
+
+
+class AdaptiveQuestion(BaseModel):
+    """Question picked for a player of an adaptive quiz"""
+    question_index: int  # Index to answer it with
+    question: RedactedQuestion
+
+
+class AdaptiveProgress(BaseModel):
+    """State of an adaptive quiz"""
+    session_id: str
+    questions_answered: int
+    total_questions: int  # Most questions asked
+    ability: float  # Estimated ability, 0 is the average player
+    standard_error: float
+    finished: bool
+    next_question: Optional[AdaptiveQuestion] = None
+
+
+class AdaptiveAnswerResponse(AnswerResponse):
+    """Response model for an adaptive quiz answer, with the next question"""
+    progress: AdaptiveProgress
 
 
 class ScoreResponse(BaseModel):
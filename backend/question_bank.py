@@ -0,0 +1,363 @@
+import json
+import re
+import sqlite3
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from backend.models import QuizQuestion, DifficultyLevel
+
+_TERM_PATTERN = re.compile(r"\w+")
+
+
+class BankItem(NamedTuple):
+    """Stored question with its item response theory parameters, None until calibrated"""
+    question_id: int
+    question: QuizQuestion
+    discrimination: Optional[float]
+    location: Optional[float]
+
+
+class QuestionBank:
+    """
+    Persistent store of generated questions, searchable by topic
+
+    Questions are kept in SQLite with an FTS5 index over their topic and text,
+    so a new quiz can be assembled from questions generated for earlier quizzes
+    on the same subject. Near-duplicates are not stored twice.
+    """
+
+    def __init__(self, db_path: str = "quizbot_questions.sqlite3", similarity_threshold: float = 0.7):
+        """
+        Initialize the question bank
+
+        Args:
+            db_path: SQLite database file, created if missing
+            similarity_threshold: Estimated Jaccard similarity from which a question is not stored again
+        """
+        self.db_path = db_path
+        self.similarity_threshold = similarity_threshold
+        self._local = threading.local()
+        self._index: Optional["MinHashIndex"] = None
+        self._indexed_id = 0
+        self._index_lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _init_db(self) -> None:
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct_answer INTEGER NOT NULL,
+                explanation TEXT NOT NULL,
+                served_count INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                topic, question, content='questions', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+                INSERT INTO questions_fts (rowid, topic, question) VALUES (new.id, new.topic, new.question);
+            END;
+            CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, topic, question)
+                VALUES ('delete', old.id, old.topic, old.question);
+            END;
+            CREATE TABLE IF NOT EXISTS responses (
+                question_id INTEGER NOT NULL,
+                person TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                PRIMARY KEY (question_id, person)
+            ) WITHOUT ROWID;
+        """)
+        connection = self._connect()
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(questions)")}
+        if "irt_a" not in columns:
+            # Banks created before adaptive quizzes
+            connection.execute("ALTER TABLE questions ADD COLUMN irt_a REAL")
+            connection.execute("ALTER TABLE questions ADD COLUMN irt_b REAL")
+            connection.execute("ALTER TABLE questions ADD COLUMN irt_responses INTEGER NOT NULL DEFAULT 0")
+
+    def _catch_up_index(self, connection: sqlite3.Connection) -> "MinHashIndex":
+        """
+        Index the questions stored since the index was last brought up to date
+
+        The whole bank is indexed the first time, then only the questions committed
+        since, by this worker or another one. Called with _index_lock held.
+        """
+        # NumPy is only imported once questions are stored, keeping the API import light
+        from backend.similarity import MinHashIndex
+        if self._index is None:
+            self._index = MinHashIndex(threshold=self.similarity_threshold)
+        rows = connection.execute(
+            "SELECT id, question FROM questions WHERE id > ? ORDER BY id", (self._indexed_id,)
+        ).fetchall()
+        if rows:
+            self._index.add_many([row[1] for row in rows])
+            self._indexed_id = rows[-1][0]
+        return self._index
+
+    def load_similarity_index(self) -> None:
+        """Build the similarity index from the stored questions, so the first add_questions does not wait on it"""
+        with self._index_lock:
+            self._catch_up_index(self._connect())
+
+    def add_questions(self, topic: str, questions: List[QuizQuestion]) -> int:
+        """
+        Store generated questions, skipping near-duplicates of stored ones
+
+        The duplicate check runs inside the write transaction, after indexing the
+        questions other workers committed, and the index only takes the new
+        questions once they are committed: a failed insert leaves no trace in it.
+
+        Args:
+            topic: Topic the questions were generated for
+            questions: Questions to store
+
+        Returns:
+            Number of questions stored
+        """
+        from backend.similarity import MinHashIndex
+        now = datetime.now().isoformat()
+        connection = self._connect()
+        with self._index_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                index = self._catch_up_index(connection)
+                # Near-duplicates within the batch are skipped too
+                batch = MinHashIndex(threshold=self.similarity_threshold)
+                rows = [
+                    (topic, question.difficulty.value, question.question, json.dumps(question.options),
+                     question.correct_answer, question.explanation, now)
+                    for question in questions
+                    if index.find_duplicate(question.question) is None
+                    and batch.add_if_new(question.question) is not None
+                ]
+                connection.executemany("""
+                    INSERT INTO questions (topic, difficulty, question, options, correct_answer, explanation, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            self._catch_up_index(connection)
+        return len(rows)
+
+    def find_questions(self, topic: str, difficulty: DifficultyLevel, limit: int) -> List[QuizQuestion]:
+        """
+        Find stored questions for a topic
+
+        Every word of the topic must appear in a question's topic or text. The least
+        served questions come first so repeated topics rotate through the bank,
+        then the best full-text matches, with the topic weighted above the text.
+
+        Args:
+            topic: Requested topic
+            difficulty: Requested difficulty, questions must match it exactly
+            limit: Maximum number of questions to return
+
+        Returns:
+            Matching questions, their served count is incremented
+        """
+        from backend.similarity import STOPWORDS
+        terms = [term for term in _TERM_PATTERN.findall(topic.lower()) if term not in STOPWORDS]
+        if not terms or limit <= 0:
+            return []
+
+        # Quoted terms cannot be read as FTS5 operators
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        connection = self._connect()
+        rows = connection.execute("""
+            SELECT q.id, q.question, q.options, q.correct_answer, q.explanation, q.difficulty
+            FROM questions_fts
+            JOIN questions AS q ON q.id = questions_fts.rowid
+            WHERE questions_fts MATCH ? AND q.difficulty = ?
+            ORDER BY q.served_count, bm25(questions_fts, 4.0, 1.0)
+            LIMIT ?
+        """, (match, difficulty.value, limit)).fetchall()
+
+        if rows:
+            connection.execute(
+                f"UPDATE questions SET served_count = served_count + 1 WHERE id IN ({','.join('?' * len(rows))})",
+                [row[0] for row in rows]
+            )
+
+        return [
+            QuizQuestion(
+                question=question,
+                options=json.loads(options),
+                correct_answer=correct_answer,
+                explanation=explanation,
+                difficulty=DifficultyLevel(question_difficulty)
+            )
+            for _, question, options, correct_answer, explanation, question_difficulty in rows
+        ]
+
+    def find_pool(self, topic: str, limit: int) -> List[BankItem]:
+        """
+        Find the questions an adaptive quiz on a topic picks from
+
+        Same match as find_questions, across every difficulty, the best full-text
+        matches first. Served counts are left alone: the quiz only asks some of them.
+
+        Args:
+            topic: Requested topic
+            limit: Maximum number of questions to return
+
+        Returns:
+            Matching questions with their parameters
+        """
+        from backend.similarity import STOPWORDS
+        terms = [term for term in _TERM_PATTERN.findall(topic.lower()) if term not in STOPWORDS]
+        if not terms or limit <= 0:
+            return []
+
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        rows = self._connect().execute("""
+            SELECT q.id, q.question, q.options, q.correct_answer, q.explanation, q.difficulty, q.irt_a, q.irt_b
+            FROM questions_fts
+            JOIN questions AS q ON q.id = questions_fts.rowid
+            WHERE questions_fts MATCH ?
+            ORDER BY bm25(questions_fts, 4.0, 1.0)
+            LIMIT ?
+        """, (match, limit)).fetchall()
+
+        return [
+            BankItem(
+                question_id,
+                QuizQuestion(
+                    question=question,
+                    options=json.loads(options),
+                    correct_answer=correct_answer,
+                    explanation=explanation,
+                    difficulty=DifficultyLevel(difficulty)
+                ),
+                irt_a,
+                irt_b
+            )
+            for question_id, question, options, correct_answer, explanation, difficulty, irt_a, irt_b in rows
+        ]
+
+    def get_question(self, question_id: int) -> Optional[QuizQuestion]:
+        """Stored question by ID"""
+        row = self._connect().execute(
+            "SELECT question, options, correct_answer, explanation, difficulty FROM questions WHERE id = ?",
+            (question_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        question, options, correct_answer, explanation, difficulty = row
+        return QuizQuestion(
+            question=question,
+            options=json.loads(options),
+            correct_answer=correct_answer,
+            explanation=explanation,
+            difficulty=DifficultyLevel(difficulty)
+        )
+
+    def record_response(self, question_id: int, person: str, correct: bool) -> None:
+        """Keep an answer to a stored question for the next calibration, one per question and person"""
+        self._connect().execute(
+            "INSERT OR IGNORE INTO responses (question_id, person, correct) VALUES (?, ?, ?)",
+            (question_id, person, int(correct))
+        )
+
+    def calibrate(self, min_responses: int = 30, iterations: int = 25) -> Dict[str, int]:
+        """
+        Re-estimate the parameters of the answered questions from every recorded response
+
+        All the questions are fitted together (see backend.irt.fit_items), starting
+        from their current parameters, or from their difficulty label for those
+        never calibrated. Only questions with at least min_responses responses are
+        updated, the others keep their starting values.
+
+        Args:
+            min_responses: Fewest responses for a question's parameters to be stored
+            iterations: Most EM iterations
+
+        Returns:
+            Counts of responses, questions answered and questions calibrated, and the iterations run
+        """
+        import numpy as np
+        from backend.irt import DEFAULT_DISCRIMINATION, fit_items, prior_location
+
+        connection = self._connect()
+        question_ids, person, correct = array("q"), array("i"), array("b")
+        person_numbers: Dict[str, int] = {}
+        for question_id, person_key, answered_correctly in connection.execute(
+                "SELECT question_id, person, correct FROM responses"):
+            question_ids.append(question_id)
+            person.append(person_numbers.setdefault(person_key, len(person_numbers)))
+            correct.append(answered_correctly)
+        if not person_numbers:
+            return {"responses": 0, "questions": 0, "calibrated": 0, "iterations": 0}
+        del person_numbers
+
+        ids, item = np.unique(np.frombuffer(question_ids, dtype=np.int64), return_inverse=True)
+        starting = {
+            question_id: (difficulty, irt_a, irt_b)
+            for question_id, difficulty, irt_a, irt_b in connection.execute(
+                "SELECT id, difficulty, irt_a, irt_b FROM questions")
+        }
+        a = np.array([starting[question_id][1] or DEFAULT_DISCRIMINATION for question_id in ids.tolist()])
+        b = np.array([
+            starting[question_id][2] if starting[question_id][2] is not None
+            else prior_location(DifficultyLevel(starting[question_id][0]))
+            for question_id in ids.tolist()
+        ])
+
+        a, b, iterations_run = fit_items(
+            item, np.frombuffer(person, dtype=np.int32), np.frombuffer(correct, dtype=np.int8).astype(bool),
+            a, b, iterations=iterations
+        )
+        answers = np.bincount(item, minlength=len(ids))
+        updates = [
+            (float(a[number]), float(b[number]), int(answers[number]), int(ids[number]))
+            for number in np.flatnonzero(answers >= min_responses)
+        ]
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("UPDATE questions SET irt_a = ?, irt_b = ?, irt_responses = ? WHERE id = ?", updates)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return {"responses": len(item), "questions": len(ids), "calibrated": len(updates), "iterations": iterations_run}
+
+    def all_questions(self) -> Iterator[Tuple[str, QuizQuestion]]:
+        """
+        Iterate over every stored question
+
+        Returns:
+            (topic, question) pairs grouped by topic, in insertion order within a topic
+        """
+        rows = self._connect().execute("""
+            SELECT topic, question, options, correct_answer, explanation, difficulty
+            FROM questions ORDER BY topic, id
+        """)
+        for topic, question, options, correct_answer, explanation, difficulty in rows:
+            yield topic, QuizQuestion(
+                question=question,
+                options=json.loads(options),
+                correct_answer=correct_answer,
+                explanation=explanation,
+                difficulty=DifficultyLevel(difficulty)
+            )
+
+    def count(self) -> int:
+        """Number of stored questions"""
+        return self._connect().execute("SELECT COUNT(*) FROM questions").fetchone()[0]
@@ -1,32 +1,65 @@
 import os
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
+import logging
+import threading
 from backend.models import Quiz, QuizQuestion, DifficultyLevel
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import json
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Most previously served questions listed in a refill prompt
+MAX_AVOID_QUESTIONS = 20
 
 
 class QuizGenerator:
     def __init__(self):
         """Initialize the quiz generator with Google's Generative AI"""
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=api_key,
-            temperature=0.7
+        # LangChain and the Google SDK are imported here rather than at module load,
+        # so importing the API stays cheap and the client can be built off the critical path
+        from dotenv import load_dotenv
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from langchain_core.output_parsers import PydanticOutputParser
+        
+        from backend.fake_llm import FakeChatModel, fake_llm_enabled, fake_failure_rate
+        from backend.model_router import ModelRouter, DEFAULT_TIERS, DEFAULT_ROUTES
+        
+        # Load environment variables
+        load_dotenv()
+        
+        if fake_llm_enabled():
+            # Offline mode for load tests and benchmarks, stronger tiers answer more slowly
+            latency_ms = float(os.getenv("QUIZBOT_FAKE_LLM_LATENCY_MS", "200"))
+            
+            def make_llm(index: int, name: str, model: str, temperature: float):
+                return FakeChatModel(latency_ms=latency_ms * (index + 1), failure_rate=fake_failure_rate(name))
+        else:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            
+            def make_llm(index: int, name: str, model: str, temperature: float):
+                return ChatGoogleGenerativeAI(
+                    model=model,
+                    google_api_key=api_key,
+                    temperature=temperature
+                )
+        
+        # Easy and short quizzes go to the fastest model, failed answers escalate to stronger ones
+        self.router = ModelRouter.from_spec(
+            make_llm,
+            tiers=os.getenv("QUIZBOT_MODEL_TIERS", DEFAULT_TIERS),
+            routes=os.getenv("QUIZBOT_MODEL_ROUTES", DEFAULT_ROUTES),
+            short_quiz_questions=int(os.getenv("QUIZBOT_SHORT_QUIZ_QUESTIONS", "5"))
         )
         
         # Set up the output parser
         self.output_parser = PydanticOutputParser(pydantic_object=Quiz)
+        self.format_instructions = self.output_parser.get_format_instructions()
+        
+        # Questions already served, per topic, to keep near-duplicates out of new quizzes
+        self.similarity_threshold = float(os.getenv("QUIZBOT_DUPLICATE_THRESHOLD", "0.7"))
+        self.served_questions: Dict[str, "MinHashIndex"] = {}
+        self._served_lock = threading.Lock()
     
     def generate_quiz(self, topic: str, num_questions: int = 5, difficulty: DifficultyLevel = DifficultyLevel.MEDIUM) -> Quiz:
         """
@@ -41,6 +74,70 @@ class QuizGenerator:
             Quiz object with structured questions
         """
         
+        try:
+            questions = self.generate_questions(topic, num_questions, difficulty)
+            return Quiz(topic=topic, questions=questions, total_questions=len(questions))
+            
+        except Exception as e:
+            # If parsing fails, try to generate a fallback quiz
+            print(f"Error generating quiz: {e}")
+            return self.generate_fallback_quiz(topic, num_questions, difficulty)
+    
+    def generate_questions(self, topic: str, num_questions: int, difficulty: DifficultyLevel,
+                           exclude: Optional[List[QuizQuestion]] = None) -> List[QuizQuestion]:
+        """
+        Generate new questions, without the fallback used by generate_quiz
+        
+        Args:
+            topic: The topic for the quiz
+            num_questions: Number of questions to generate
+            difficulty: Difficulty level of the quiz
+            exclude: Questions already in the quiz, the new ones must not duplicate them
+            
+        Returns:
+            Exactly num_questions questions
+            
+        Raises:
+            ValueError: If the model's answer cannot be parsed or holds too few usable questions
+        """
+        exclude = exclude or []
+        questions = self._request_questions(topic, num_questions, difficulty, avoid=exclude)
+        
+        fresh, repeats = self._split_duplicates(topic, questions, existing=exclude)
+        
+        # Ask once more for the questions lost to duplicates, avoiding the ones already served
+        if len(fresh) < num_questions:
+            missing = num_questions - len(fresh)
+            logger.info(f"Dropped {len(questions) - len(fresh)} duplicate questions on '{topic}', requesting {missing} more")
+            extra = self._request_questions(topic, missing, difficulty, avoid=exclude + fresh + repeats)
+            extra_fresh, _ = self._split_duplicates(topic, extra, existing=exclude + fresh)
+            fresh.extend(extra_fresh[:missing])
+        
+        # Questions seen in earlier quizzes are better than a short quiz
+        questions = (fresh + repeats)[:num_questions]
+        if len(questions) != num_questions:
+            raise ValueError(f"Expected {num_questions} questions, got {len(questions)}")
+        
+        self._remember(topic, questions)
+        return questions
+    
+    def _request_questions(self, topic: str, num_questions: int, difficulty: DifficultyLevel,
+                           avoid: Optional[List[QuizQuestion]] = None) -> List[QuizQuestion]:
+        """
+        Ask the model for questions and parse its answer
+        
+        Args:
+            topic: The topic for the quiz
+            num_questions: Number of questions to generate
+            difficulty: Difficulty level of the quiz
+            avoid: Questions the model must not repeat
+            
+        Returns:
+            Parsed and validated questions, from the first model tier whose answer passed
+        """
+        from langchain_core.prompts import PromptTemplate
+        from langchain_core.messages import HumanMessage
+        
         # Create the prompt template
         prompt_template = """
         You are an expert quiz generator. Create a comprehensive quiz on the given topic.
@@ -63,51 +160,90 @@ class QuizGenerator:
         - EASY: Basic concepts, definitions, simple facts
         - MEDIUM: Application of concepts, moderate analysis
         - HARD: Complex analysis, advanced concepts, critical thinking
-        
+        {avoid}
         {format_instructions}
         
         Generate the quiz now:
         """
         
+        avoid_text = ""
+        if avoid:
+            listed = "\n".join(f"        - {question.question}" for question in avoid[:MAX_AVOID_QUESTIONS])
+            avoid_text = f"\n        Do not repeat or rephrase any of these questions:\n{listed}\n"
+        
         prompt = PromptTemplate(
             template=prompt_template,
-            input_variables=["topic", "num_questions", "difficulty"],
-            partial_variables={"format_instructions": self.output_parser.get_format_instructions()}
+            input_variables=["topic", "num_questions", "difficulty", "avoid"],
+            partial_variables={"format_instructions": self.format_instructions}
         )
         
         # Format the prompt
         formatted_prompt = prompt.format(
             topic=topic,
             num_questions=num_questions,
-            difficulty=difficulty.value
+            difficulty=difficulty.value,
+            avoid=avoid_text
         )
         
-        try:
-            # Generate the quiz
-            response = self.llm.invoke([HumanMessage(content=formatted_prompt)])
-            
-            # Parse the response
-            quiz = self.output_parser.parse(response.content)
-            
-            # Validate the quiz
-            if len(quiz.questions) != num_questions:
-                raise ValueError(f"Expected {num_questions} questions, got {len(quiz.questions)}")
-            
-            # Validate each question
-            for i, question in enumerate(quiz.questions):
-                if len(question.options) != 4:
-                    raise ValueError(f"Question {i+1} must have exactly 4 options")
-                if question.correct_answer < 0 or question.correct_answer > 3:
-                    raise ValueError(f"Question {i+1} correct_answer must be between 0 and 3")
-            
-            return quiz
+        def parse(response) -> List[QuizQuestion]:
+            questions = self.output_parser.parse(response.content).questions
+            # Validate the questions, a failure sends the prompt to the next tier
+            errors = self.validate_quiz(Quiz(topic=topic, questions=questions, total_questions=len(questions)))
+            if errors:
+                raise ValueError(f"Quiz validation failed: {'; '.join(errors)}")
+            return questions
+        
+        # Generate and parse the quiz
+        return self.router.generate(
+            [HumanMessage(content=formatted_prompt)], difficulty.value, num_questions, parse
+        )
+    
+    def _served_index(self, topic: str) -> "MinHashIndex":
+        """Index of the questions already served on a topic"""
+        from backend.similarity import MinHashIndex
+        key = " ".join(topic.lower().split())
+        with self._served_lock:
+            if key not in self.served_questions:
+                self.served_questions[key] = MinHashIndex(threshold=self.similarity_threshold)
+            return self.served_questions[key]
+    
+    def _split_duplicates(self, topic: str, questions: List[QuizQuestion],
+                          existing: Optional[List[QuizQuestion]] = None) -> Tuple[List[QuizQuestion], List[QuizQuestion]]:
+        """
+        Drop near-duplicate questions
+        
+        Args:
+            topic: The topic of the questions
+            questions: Generated questions
+            existing: Questions already kept for the quiz being built
             
-        except Exception as e:
-            # If parsing fails, try to generate a fallback quiz
-            print(f"Error generating quiz: {e}")
-            return self._generate_fallback_quiz(topic, num_questions, difficulty)
+        Returns:
+            (new questions, questions already served in an earlier quiz on the topic)
+        """
+        from backend.similarity import MinHashIndex
+        served = self._served_index(topic)
+        in_quiz = MinHashIndex(threshold=self.similarity_threshold)
+        for question in existing or []:
+            in_quiz.add(question.question)
+        
+        fresh, repeats = [], []
+        for question in questions:
+            # Duplicates within the quiz are always dropped
+            if in_quiz.add_if_new(question.question) is None:
+                continue
+            if served.find_duplicate(question.question) is None:
+                fresh.append(question)
+            else:
+                repeats.append(question)
+        return fresh, repeats
+    
+    def _remember(self, topic: str, questions: List[QuizQuestion]) -> None:
+        """Record the questions of a served quiz"""
+        served = self._served_index(topic)
+        for question in questions:
+            served.add_if_new(question.question)
     
-    def _generate_fallback_quiz(self, topic: str, num_questions: int, difficulty: DifficultyLevel) -> Quiz:
+    def generate_fallback_quiz(self, topic: str, num_questions: int, difficulty: DifficultyLevel) -> Quiz:
         """
         Generate a fallback quiz with basic questions about the topic
         """
@@ -0,0 +1,384 @@
+"""
+Quiz packs: a compact binary format for shipping quizzes and question banks
+
+Layout (little-endian), version 1:
+
+    header      magic "QZPK", version, codec, quiz/question/string counts,
+                CRC32 of the body, section offsets into the body
+    body        (compressed as a whole when codec is gzip or zstd)
+      strings   u32 start offset per string, then the strings themselves,
+                each as a u32 length followed by its UTF-8 bytes
+      quizzes   fixed 12 byte records: topic string, first question, question count
+      questions fixed 28 byte records: question, 4 options and explanation strings,
+                correct answer, difficulty
+
+Every string is stored once however many questions use it (options such as
+"True"/"False" or repeated topics). Fixed size records let an uncompressed pack be
+memory-mapped and read question by question without parsing the rest of the file.
+
+Usage:
+    python -m backend.quiz_pack export quizbot_questions.sqlite3 bank.qpk --codec gzip
+    python -m backend.quiz_pack import bank.qpk quizbot_questions.sqlite3
+    python -m backend.quiz_pack info bank.qpk
+    python -m backend.quiz_pack show bank.qpk --question 42
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import struct
+import zlib
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional
+from backend.models import Quiz, QuizQuestion, DifficultyLevel
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, only needed for zstd packs
+    zstandard = None
+
+MAGIC = b"QZPK"
+VERSION = 1
+
+# magic, version, codec, reserved, quiz count, question count, string count, body CRC32,
+# offsets of the string index, quiz table and question table within the body
+HEADER = struct.Struct("<4sHBBIIIIQQQ")
+QUIZ_RECORD = struct.Struct("<III")
+QUESTION_RECORD = struct.Struct("<IIIIIIBBxx")
+STRING_LENGTH = struct.Struct("<I")
+
+CODECS = {"none": 0, "gzip": 1, "zstd": 2}
+CODEC_NAMES = {value: name for name, value in CODECS.items()}
+
+DIFFICULTIES = list(DifficultyLevel)
+DIFFICULTY_CODES = {difficulty: code for code, difficulty in enumerate(DIFFICULTIES)}
+
+
+class QuizPackError(ValueError):
+    """Raised when a file is not a valid quiz pack"""
+
+
+def _compress(body: bytes, codec: str) -> bytes:
+    if codec == "none":
+        return body
+    if codec == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if zstandard is None:
+        raise QuizPackError("zstd packs need the zstandard package")
+    return zstandard.ZstdCompressor(level=19).compress(body)
+
+
+def _decompress(payload: bytes, codec: int) -> bytes:
+    if codec == CODECS["gzip"]:
+        try:
+            return gzip.decompress(payload)
+        except (OSError, EOFError, zlib.error) as e:
+            raise QuizPackError(f"Quiz pack is corrupted ({e})")
+    if codec == CODECS["zstd"]:
+        if zstandard is None:
+            raise QuizPackError("zstd packs need the zstandard package")
+        try:
+            return zstandard.ZstdDecompressor().decompress(payload)
+        except zstandard.ZstdError as e:
+            raise QuizPackError(f"Quiz pack is corrupted ({e})")
+    raise QuizPackError(f"Unknown codec {codec}")
+
+
+def dumps_pack(quizzes: Iterable[Quiz], codec: str = "none") -> bytes:
+    """
+    Serialize quizzes to the quiz pack format
+
+    Args:
+        quizzes: Quizzes to pack, in order
+        codec: "none" (memory-mappable), "gzip" or "zstd"
+
+    Returns:
+        The pack as bytes
+    """
+    if codec not in CODECS:
+        raise QuizPackError(f"Unknown codec '{codec}', expected one of {list(CODECS)}")
+
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    quiz_records = bytearray()
+    question_records = bytearray()
+    question_count = 0
+    quiz_count = 0
+    for quiz in quizzes:
+        quiz_records += QUIZ_RECORD.pack(intern(quiz.topic), question_count, len(quiz.questions))
+        for question in quiz.questions:
+            question_records += QUESTION_RECORD.pack(
+                intern(question.question),
+                *(intern(option) for option in question.options),
+                intern(question.explanation),
+                question.correct_answer,
+                DIFFICULTY_CODES[question.difficulty]
+            )
+        question_count += len(quiz.questions)
+        quiz_count += 1
+
+    # String index first, then the length-prefixed strings
+    blob = bytearray()
+    starts = []
+    for text in strings:
+        encoded = text.encode("utf-8")
+        starts.append(len(blob))
+        blob += STRING_LENGTH.pack(len(encoded)) + encoded
+
+    string_index_size = 4 * len(starts)
+    string_index = struct.pack(f"<{len(starts)}I", *(string_index_size + start for start in starts))
+
+    quizzes_offset = string_index_size + len(blob)
+    # Keep the fixed size records 4 byte aligned
+    padding = b"\0" * (-quizzes_offset % 4)
+    quizzes_offset += len(padding)
+    questions_offset = quizzes_offset + len(quiz_records)
+    body = b"".join([string_index, bytes(blob), padding, bytes(quiz_records), bytes(question_records)])
+
+    header = HEADER.pack(
+        MAGIC, VERSION, CODECS[codec], 0, quiz_count, question_count, len(strings),
+        zlib.crc32(body), 0, quizzes_offset, questions_offset
+    )
+    return header + _compress(body, codec)
+
+
+def write_pack(path: str, quizzes: Iterable[Quiz], codec: str = "none") -> int:
+    """
+    Write quizzes to a pack file
+
+    Returns:
+        Size of the file in bytes
+    """
+    data = dumps_pack(quizzes, codec)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+class QuizPack:
+    """
+    Read access to a quiz pack
+
+    Uncompressed packs are memory-mapped: opening one costs the same whatever
+    its size, and a question is decoded only when it is read. Compressed packs
+    are decompressed into memory on open.
+
+    Args:
+        data: Pack contents (bytes or an mmap)
+        verify: Check the body CRC32, which reads the whole body
+    """
+
+    def __init__(self, data, verify: bool = False):
+        self._mmap = data if isinstance(data, mmap.mmap) else None
+        if len(data) < HEADER.size:
+            raise QuizPackError("File too short for a quiz pack")
+
+        (magic, version, codec, _, self.quiz_count, self.question_count, self.string_count,
+         crc, self._strings_offset, self._quizzes_offset, self._questions_offset) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise QuizPackError("Not a quiz pack")
+        if version != VERSION:
+            raise QuizPackError(f"Unsupported quiz pack version {version}")
+        self.version = version
+        self.codec = CODEC_NAMES.get(codec, str(codec))
+
+        if codec == CODECS["none"]:
+            self._body = memoryview(data)[HEADER.size:]
+        else:
+            self._body = memoryview(_decompress(bytes(data[HEADER.size:]), codec))
+
+        if verify and zlib.crc32(self._body) != crc:
+            raise QuizPackError("Quiz pack is corrupted (CRC mismatch)")
+
+    @classmethod
+    def open(cls, path: str, verify: bool = False) -> "QuizPack":
+        """Open a pack file, memory-mapping it when it is not compressed"""
+        with open(path, "rb") as f:
+            # An empty file cannot be mapped at all
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise QuizPackError("File too short for a quiz pack")
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), verify=verify)
+
+    @classmethod
+    def loads(cls, data: bytes, verify: bool = True) -> "QuizPack":
+        """Read a pack held in memory"""
+        return cls(data, verify=verify)
+
+    def close(self) -> None:
+        self._body.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self) -> "QuizPack":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.question_count
+
+    def string(self, index: int) -> str:
+        """Decode one interned string"""
+        if not 0 <= index < self.string_count:
+            raise QuizPackError(f"String {index} out of range")
+        start = STRING_LENGTH.unpack_from(self._body, self._strings_offset + 4 * index)[0]
+        length = STRING_LENGTH.unpack_from(self._body, start)[0]
+        return str(self._body[start + 4:start + 4 + length], "utf-8")
+
+    def question(self, index: int) -> QuizQuestion:
+        """
+        Read one question by its position in the pack
+
+        Args:
+            index: Question index, 0 to len(pack) - 1
+
+        Returns:
+            The question
+        """
+        if not 0 <= index < self.question_count:
+            raise IndexError(f"Question {index} out of range")
+        (question, a, b, c, d, explanation, correct_answer, difficulty) = QUESTION_RECORD.unpack_from(
+            self._body, self._questions_offset + index * QUESTION_RECORD.size
+        )
+        return QuizQuestion(
+            question=self.string(question),
+            options=[self.string(a), self.string(b), self.string(c), self.string(d)],
+            correct_answer=correct_answer,
+            explanation=self.string(explanation),
+            difficulty=DIFFICULTIES[difficulty]
+        )
+
+    def quiz(self, index: int) -> Quiz:
+        """Read one quiz with its questions"""
+        if not 0 <= index < self.quiz_count:
+            raise IndexError(f"Quiz {index} out of range")
+        topic, first, count = QUIZ_RECORD.unpack_from(self._body, self._quizzes_offset + index * QUIZ_RECORD.size)
+        questions = [self.question(i) for i in range(first, first + count)]
+        return Quiz(topic=self.string(topic), questions=questions, total_questions=count)
+
+    def strings(self) -> List[str]:
+        """Decode the whole string table"""
+        starts = struct.unpack_from(f"<{self.string_count}I", self._body, self._strings_offset)
+        body = self._body
+        strings = []
+        for start in starts:
+            length = STRING_LENGTH.unpack_from(body, start)[0]
+            strings.append(str(body[start + 4:start + 4 + length], "utf-8"))
+        return strings
+
+    def quizzes(self) -> Iterator[Quiz]:
+        """Iterate over every quiz of the pack, decoding each string once"""
+        strings = self.strings()
+        # Both tables are unpacked up front: no view of the body outlives this call, so the pack
+        # can be closed while the generator is only partly consumed
+        with self._body[self._quizzes_offset:self._questions_offset] as quiz_table:
+            quizzes = list(QUIZ_RECORD.iter_unpack(quiz_table))
+        questions_end = self._questions_offset + self.question_count * QUESTION_RECORD.size
+        with self._body[self._questions_offset:questions_end] as question_table:
+            records = list(QUESTION_RECORD.iter_unpack(question_table))
+        for topic, first, count in quizzes:
+            questions = [
+                QuizQuestion(
+                    question=strings[question],
+                    options=[strings[a], strings[b], strings[c], strings[d]],
+                    correct_answer=correct_answer,
+                    explanation=strings[explanation],
+                    difficulty=DIFFICULTIES[difficulty]
+                )
+                for question, a, b, c, d, explanation, correct_answer, difficulty in records[first:first + count]
+            ]
+            yield Quiz(topic=strings[topic], questions=questions, total_questions=count)
+
+
+def export_bank(bank, path: str, codec: str = "none") -> int:
+    """
+    Write a question bank to a pack, one quiz per topic
+
+    Returns:
+        Number of questions written
+    """
+    quizzes = []
+    for topic, group in groupby(bank.all_questions(), key=lambda item: item[0]):
+        questions = [question for _, question in group]
+        quizzes.append(Quiz(topic=topic, questions=questions, total_questions=len(questions)))
+    write_pack(path, quizzes, codec)
+    return sum(len(quiz.questions) for quiz in quizzes)
+
+
+def import_bank(bank, path: str) -> int:
+    """
+    Add the questions of a pack to a question bank, skipping near-duplicates
+
+    Returns:
+        Number of questions added
+    """
+    with QuizPack.open(path, verify=True) as pack:
+        return sum(bank.add_questions(quiz.topic, quiz.questions) for quiz in pack.quizzes())
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.quiz_pack", description="Export and import quiz packs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Write a question bank to a pack")
+    export_cmd.add_argument("bank", help="Question bank SQLite file")
+    export_cmd.add_argument("pack", help="Pack file to write")
+    export_cmd.add_argument("--codec", choices=list(CODECS), default="none",
+                            help="Compression, only uncompressed packs can be memory-mapped")
+
+    import_cmd = commands.add_parser("import", help="Add the questions of a pack to a question bank")
+    import_cmd.add_argument("pack", help="Pack file to read")
+    import_cmd.add_argument("bank", help="Question bank SQLite file, created if missing")
+
+    info_cmd = commands.add_parser("info", help="Describe a pack")
+    info_cmd.add_argument("pack")
+
+    show_cmd = commands.add_parser("show", help="Print a question or a quiz as JSON")
+    show_cmd.add_argument("pack")
+    target = show_cmd.add_mutually_exclusive_group(required=True)
+    target.add_argument("--question", type=int, help="Question index")
+    target.add_argument("--quiz", type=int, help="Quiz index")
+
+    args = parser.parse_args(argv)
+    try:
+        _run(args)
+    except QuizPackError as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+
+
+def _run(args: argparse.Namespace) -> None:
+    if args.command in ("export", "import"):
+        from backend.question_bank import QuestionBank
+        if args.command == "export":
+            count = export_bank(QuestionBank(args.bank), args.pack, args.codec)
+            print(f"Exported {count} questions to {args.pack}")
+        else:
+            count = import_bank(QuestionBank(args.bank), args.pack)
+            print(f"Imported {count} new questions into {args.bank}")
+        return
+
+    with QuizPack.open(args.pack) as pack:
+        if args.command == "info":
+            print(json.dumps({
+                "version": pack.version,
+                "codec": pack.codec,
+                "quizzes": pack.quiz_count,
+                "questions": pack.question_count,
+                "strings": pack.string_count,
+            }, indent=2))
+        elif args.question is not None:
+            print(json.dumps(pack.question(args.question).dict(), indent=2, ensure_ascii=False))
+        else:
+            print(json.dumps(pack.quiz(args.quiz).dict(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
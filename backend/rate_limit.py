@@ -0,0 +1,210 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from starlette.requests import HTTPConnection
+
+
+class Client(NamedTuple):
+    """Who a request is counted against"""
+    key: str
+    weight: float = 1.0
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Read a weight list such as "partner-key=4,batch-key=0.5" into an API key to weight mapping"""
+    weights = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        api_key, separator, weight = entry.strip().rpartition("=")
+        if not separator or not api_key:
+            raise ValueError(f"Invalid client weight: {entry!r}")
+        weights[api_key] = float(weight)
+    return weights
+
+
+def identify_client(connection: HTTPConnection, weights: Optional[Dict[str, float]] = None,
+                    trust_forwarded: bool = False) -> Client:
+    """
+    Identify the client of a request by its API key, or by its address without one
+
+    API keys are hashed so that the keys themselves never reach the job table.
+
+    Args:
+        connection: Incoming request
+        weights: API key to fair queuing weight, other clients weigh 1
+        trust_forwarded: Use the first X-Forwarded-For address, only behind a proxy that sets it
+
+    Returns:
+        Client
+    """
+    api_key = connection.headers.get("x-api-key")
+    if api_key:
+        digest = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return Client(f"key:{digest}", (weights or {}).get(api_key, 1.0))
+
+    address = connection.client.host if connection.client else "unknown"
+    if trust_forwarded:
+        forwarded = connection.headers.get("x-forwarded-for")
+        if forwarded:
+            address = forwarded.split(",")[0].strip()
+    return Client(f"ip:{address}")
+
+
+def refill(tokens: float, updated_at: float, now: float, rate: float, burst: float) -> float:
+    """Tokens in a bucket after refilling it at rate per second since updated_at"""
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+def take(tokens: float, cost: float, rate: float) -> Tuple[float, float]:
+    """
+    Take cost tokens from a refilled bucket
+
+    Returns:
+        (tokens left, seconds to wait before cost tokens are available, 0 when taken)
+    """
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """
+    Token buckets of one process
+
+    Buckets that were not used for a while are dropped once max_keys clients
+    are tracked; a dropped bucket starts full again, as an idle one would be.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens, retry_after = take(refill(tokens, updated_at, now, rate, burst), cost, rate)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by every worker process"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def acquire(self, key: str, cost: float, rate: float, burst: float) -> float:
+        connection = self._connect()
+        # Wall clock time, monotonic clocks are not comparable between processes
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated_at = row if row is not None else (burst, now)
+            tokens, retry_after = take(refill(tokens, updated_at, now, rate, burst), cost, rate)
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def prune(self, idle_seconds: float) -> int:
+        """Delete the buckets not used for idle_seconds, they would be full again anyway"""
+        return self._connect().execute(
+            "DELETE FROM rate_buckets WHERE updated_at < ?", (time.time() - idle_seconds,)
+        ).rowcount
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter
+
+    Every client has a bucket holding up to burst tokens, refilled at rate
+    tokens per second. A request takes the cost of its operation from the
+    bucket of its client and is rejected when the bucket holds less than
+    that, so expensive operations such as quiz generation drain a bucket
+    faster than answers do.
+
+    Args:
+        store: Where the buckets are kept
+        rate: Tokens added to every bucket per second
+        burst: Size of a bucket, the most a client can spend at once
+        costs: Operation name to the tokens it takes
+    """
+
+    def __init__(self, store, rate: float, burst: float, costs: Dict[str, float]):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("Rate limit rate and burst must be positive")
+        for operation, cost in costs.items():
+            if cost > burst:
+                raise ValueError(f"Cost of {operation!r} ({cost}) is more than the burst ({burst})")
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.costs = costs
+
+    def acquire(self, key: str, operation: str) -> float:
+        """
+        Charge an operation to a client
+
+        Args:
+            key: Client key
+            operation: Name of the operation, see costs
+
+        Returns:
+            0 when the request may go ahead, otherwise the seconds until it would be allowed
+        """
+        return self.store.acquire(key, self.costs[operation], self.rate, self.burst)
+
+
+def create_rate_limiter(url: str = "memory", **limiter_options) -> Optional[RateLimiter]:
+    """
+    Build the rate limiter described by a URL
+
+    Args:
+        url: "off", "memory" for buckets per process, or "sqlite:///path/to/file"
+             for buckets shared by every worker process
+        limiter_options: RateLimiter settings
+
+    Returns:
+        RateLimiter, or None when rate limiting is off
+    """
+    if url == "off":
+        return None
+    if url == "memory":
+        return RateLimiter(MemoryBucketStore(), **limiter_options)
+    if url.startswith("sqlite:///"):
+        return RateLimiter(SQLiteBucketStore(url[len("sqlite:///"):]), **limiter_options)
+    raise ValueError(f"Unsupported rate limit store: {url}")
@@ -0,0 +1,106 @@
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the standard json module is used instead
+    orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    """Encode the types API payloads hold that json does not know"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class LeanJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson when it is installed
+
+    Endpoints returning this response directly skip FastAPI's jsonable_encoder
+    pass, datetimes, enums and pydantic models are encoded by the renderer.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[List[str]]]:
+    """
+    Parse a ?fields= query parameter
+
+    Args:
+        fields: Comma separated field paths, nested fields joined by dots
+                (for example "session_id,quiz.questions.question")
+
+    Returns:
+        Field paths split into their parts, None when every field is wanted
+    """
+    if not fields:
+        return None
+    paths = [field.strip().split(".") for field in fields.split(",") if field.strip()]
+    if any(not all(path) for path in paths):
+        raise HTTPException(status_code=400, detail=f"Invalid fields parameter: {fields}")
+    return paths or None
+
+
+def _build_tree(paths: Iterable[List[str]]) -> Dict:
+    tree: Dict = {}
+    for path in paths:
+        node = tree
+        for part in path[:-1]:
+            # A shorter path already selects the whole field
+            if node.get(part, {}) is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[path[-1]] = True
+    return tree
+
+
+def _select(value: Any, tree: Dict) -> Any:
+    if isinstance(value, list):
+        return [_select(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: value[key] if subtree is True else _select(value[key], subtree)
+        for key, subtree in tree.items()
+        if key in value
+    }
+
+
+def select_fields(data: Any, fields: Optional[str]) -> Any:
+    """
+    Keep only the requested fields of a payload
+
+    Lists are traversed, so "questions.question" keeps the text of every
+    question. Fields missing from the payload are left out.
+
+    Args:
+        data: Payload made of dicts and lists
+        fields: Value of the ?fields= query parameter
+
+    Returns:
+        The trimmed payload, or data itself when fields is empty
+    """
+    paths = parse_fields(fields)
+    if paths is None:
+        return data
+    return _select(data, _build_tree(paths))
@@ -0,0 +1,465 @@
+import asyncio
+import json
+import logging
+import secrets
+import time
+from typing import Dict, List, Optional, Set
+from fastapi import WebSocket, WebSocketDisconnect
+from backend.responses import encode_json
+from backend.score_manager import ScoreManager, read_answer_key
+
+logger = logging.getLogger(__name__)
+
+# Room codes avoid characters that are easy to misread when written on a board
+ROOM_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+ROOM_CODE_LENGTH = 6
+
+# WebSocket close codes
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+CLOSE_REJECTED = 4409
+CLOSE_ROOM_CLOSED = 4410
+CLOSE_TOO_SLOW = 1013
+
+
+class RoomError(ValueError):
+    """Raised for a message or request a room cannot accept"""
+
+
+class Connection:
+    """
+    One WebSocket with its queue of outgoing messages
+
+    Broadcasts only enqueue, a sender task per connection does the writing, so
+    a slow client never holds up the others. A client whose queue fills up is
+    disconnected: it would only receive stale questions and standings.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+        self.too_slow = False
+
+    def send(self, text: str) -> None:
+        """Queue a message, already encoded so a broadcast encodes it once"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self.too_slow = True
+            self.close()
+
+    def send_message(self, message: Dict) -> None:
+        self.send(encode_json(message).decode("utf-8"))
+
+    def close(self) -> None:
+        """Stop sending, the sender task exits once it reaches the end of the queue"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.too_slow:
+            # Nothing queued is worth delivering any more
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def terminate(self, code: int) -> None:
+        """Stop the sender task and close the WebSocket, the client's receive loop then ends"""
+        self.closed = True
+        if self.sender is not None:
+            self.sender.cancel()
+            await asyncio.gather(self.sender, return_exceptions=True)
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            # Already disconnected
+            pass
+
+    async def run_sender(self) -> None:
+        try:
+            while True:
+                text = await self.queue.get()
+                if text is None:
+                    break
+                await self.websocket.send_text(text)
+            if self.too_slow:
+                await self.websocket.close(code=CLOSE_TOO_SLOW)
+        except Exception:
+            # The client went away, the receive loop cleans up
+            self.closed = True
+
+
+class Player:
+    """Player of a room, graded through their own ScoreManager session"""
+
+    def __init__(self, player_id: str, name: str, session_id: str, connection: Connection):
+        self.player_id = player_id
+        self.name = name
+        self.session_id = session_id
+        self.connection = connection
+        self.answered: Set[int] = set()
+
+
+class Room:
+    """
+    A quiz played in lock-step by every player of a room
+
+    The host moves the room through lobby -> question -> reveal -> question ...
+    -> finished, and the room is closed once finished and empty or idle. Answers are graded as they arrive but scores only show in the
+    standings once the question is revealed, so they do not give the answer away.
+    """
+
+    def __init__(self, room_id: str, quiz: Dict, template: Dict, scores: ScoreManager,
+                 question_seconds: Optional[float], max_players: int):
+        self.room_id = room_id
+        self.host_token = secrets.token_urlsafe(16)
+        self.quiz = quiz
+        self.template = template
+        self.scores = scores
+        self.question_seconds = question_seconds
+        self.max_players = max_players
+        self.state = "lobby"
+        self.question_index = -1
+        self.deadline: Optional[float] = None
+        self.players: Dict[str, Player] = {}
+        self.hosts: Set[Connection] = set()
+        self.last_activity = time.monotonic()
+        self.standings_version = 0
+        self._changed: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._unrevealed: Set[str] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def connection_count(self) -> int:
+        return len(self.players) + len(self.hosts)
+
+    def status(self) -> Dict:
+        return {
+            "room_id": self.room_id,
+            "topic": self.quiz["topic"],
+            "total_questions": self.quiz["total_questions"],
+            "state": self.state,
+            "question_index": self.question_index,
+            "players": len(self.players),
+        }
+
+    def broadcast(self, message: Dict) -> None:
+        """Send a message to every player and host, encoded once"""
+        text = encode_json(message).decode("utf-8")
+        for player in self.players.values():
+            player.connection.send(text)
+        for host in self.hosts:
+            host.send(text)
+
+    def _question_message(self) -> Dict:
+        return {
+            "type": "question",
+            "question_index": self.question_index,
+            "deadline_in": round(self.deadline - time.monotonic(), 3) if self.deadline else None,
+            **self.quiz["questions"][self.question_index],
+        }
+
+    def _score(self, player: Player) -> int:
+        return self.scores.user_sessions[player.session_id]["score"]
+
+    def standings(self) -> List[Dict]:
+        """Every player with their revealed score, best first"""
+        entries = [
+            {"player_id": player.player_id, "name": player.name, "score": self._revealed_score(player)}
+            for player in self.players.values()
+        ]
+        entries.sort(key=lambda entry: -entry["score"])
+        return entries
+
+    def _revealed_score(self, player: Player) -> int:
+        score = self._score(player)
+        if player.player_id in self._unrevealed:
+            # Take back the answer to the open question
+            score -= self.scores.user_sessions[player.session_id]["answers"][-1]["score_change"]
+        return score
+
+    def welcome(self, player: Optional[Player]) -> Dict:
+        """Full state for a newly connected player or host, later updates are diffs"""
+        message = {
+            "type": "welcome",
+            "player_id": player.player_id if player else None,
+            "room": self.status(),
+            "standings_version": self.standings_version,
+            "standings": self.standings(),
+        }
+        if self.state == "question":
+            message["question"] = self._question_message()
+        return message
+
+    def add_host(self, connection: Connection) -> None:
+        self.hosts.add(connection)
+        self.last_activity = time.monotonic()
+        connection.send_message(self.welcome(None))
+
+    def remove_host(self, connection: Connection) -> None:
+        self.hosts.discard(connection)
+
+    def join(self, name: str, connection: Connection) -> Player:
+        """Add a player, they get their own session for the room's quiz"""
+        if self.state == "finished":
+            raise RoomError("The quiz in this room has finished")
+        if len(self.players) >= self.max_players:
+            raise RoomError("The room is full")
+
+        session_id = self.scores.create_session_like(self.template)
+        player = Player(secrets.token_hex(4), name[:40] or "Player", session_id, connection)
+        self.players[player.player_id] = player
+        self._changed.add(player.player_id)
+        self.last_activity = time.monotonic()
+        connection.send_message(self.welcome(player))
+        return player
+
+    def leave(self, player: Player) -> None:
+        if self.players.pop(player.player_id, None) is None:
+            return
+        self.scores.delete_session(player.session_id)
+        self._changed.discard(player.player_id)
+        self._unrevealed.discard(player.player_id)
+        self._removed.add(player.player_id)
+        # The player who left may have been the last one the question waited for
+        self._reveal_if_all_answered()
+
+    def host_command(self, command: str) -> None:
+        """Apply a host command: "next" moves the room one step forward, "end" finishes it"""
+        self.last_activity = time.monotonic()
+        if command == "end":
+            self._finish()
+        elif command != "next":
+            raise RoomError(f"Unknown command: {command}")
+        elif self.state in ("lobby", "reveal"):
+            if self.question_index + 1 < len(self.quiz["questions"]):
+                self._open_question(self.question_index + 1)
+            else:
+                self._finish()
+        elif self.state == "question":
+            self._reveal()
+        else:
+            raise RoomError("The quiz in this room has finished")
+
+    def _open_question(self, index: int) -> None:
+        self.state = "question"
+        self.question_index = index
+        self.deadline = None
+        if self.question_seconds:
+            self.deadline = time.monotonic() + self.question_seconds
+            self._timer = asyncio.get_running_loop().call_later(self.question_seconds, self._on_deadline, index)
+        self.broadcast(self._question_message())
+
+    def _on_deadline(self, index: int) -> None:
+        if self.state == "question" and self.question_index == index:
+            self._reveal()
+
+    def _reveal(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.state = "reveal"
+        self.deadline = None
+        correct_answer, _ = read_answer_key(self.template["answer_key"], self.question_index)
+        self.broadcast({
+            "type": "reveal",
+            "question_index": self.question_index,
+            "correct_answer": correct_answer,
+            "explanation": self.template["explanations"][self.question_index],
+        })
+        self._changed |= self._unrevealed
+        self._unrevealed.clear()
+
+    def _finish(self) -> None:
+        if self.state == "question":
+            self._reveal()
+        self.state = "finished"
+        self.broadcast({"type": "finished", "standings": self.standings()})
+
+    def answer(self, player: Player, question_index: int, selected_option: int) -> None:
+        """Grade a player's answer to the open question"""
+        if player.player_id not in self.players:
+            raise RoomError("You are no longer in this room")
+        if self.state != "question" or question_index != self.question_index:
+            raise RoomError("This question is not open")
+        if question_index in player.answered:
+            raise RoomError("Question already answered")
+        if not 0 <= selected_option <= 3:
+            raise RoomError("Invalid option")
+
+        self.scores.submit_answer(player.session_id, question_index, selected_option)
+        player.answered.add(question_index)
+        self._unrevealed.add(player.player_id)
+        self.last_activity = time.monotonic()
+        player.connection.send_message({"type": "answer_received", "question_index": question_index})
+
+        self._reveal_if_all_answered()
+
+    def _reveal_if_all_answered(self) -> None:
+        # No need to wait for the deadline once everyone has answered
+        if self.state == "question" and self.players and len(self._unrevealed) == len(self.players):
+            self._reveal()
+
+    def standings_diff(self) -> Optional[Dict]:
+        """Scores changed since the previous diff, None when nothing changed"""
+        if not self._changed and not self._removed:
+            return None
+        self.standings_version += 1
+        message = {
+            "type": "standings",
+            "version": self.standings_version,
+            "changed": [
+                {"player_id": player.player_id, "name": player.name, "score": self._revealed_score(player)}
+                for player in (self.players[player_id] for player_id in self._changed)
+            ],
+            "removed": list(self._removed),
+        }
+        self._changed.clear()
+        self._removed.clear()
+        return message
+
+    async def close(self) -> None:
+        """Remove every player and close every connection with CLOSE_ROOM_CLOSED"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.state = "closed"
+        connections = [player.connection for player in self.players.values()] + list(self.hosts)
+        for player in list(self.players.values()):
+            self.leave(player)
+        self.hosts.clear()
+        await asyncio.gather(*(connection.terminate(CLOSE_ROOM_CLOSED) for connection in connections))
+
+
+class RoomManager:
+    """
+    Multiplayer rooms of this process
+
+    Standings are pushed as diffs at most every standings_interval seconds,
+    however many answers arrive in between, by one task for all rooms. Rooms
+    live in the worker that created them and grade with an in-memory
+    ScoreManager, so grading never waits on a shared store.
+
+    Args:
+        standings_interval: Seconds between two standings diffs of a room
+        max_players: Players allowed in one room
+        queue_size: Outgoing messages buffered per connection before it is dropped
+        idle_timeout: Seconds after which an inactive room is closed
+    """
+
+    def __init__(self, standings_interval: float = 0.25, max_players: int = 5000,
+                 queue_size: int = 64, idle_timeout: float = 3600):
+        self.standings_interval = standings_interval
+        self.max_players = max_players
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        self.scores = ScoreManager()
+        self.rooms: Dict[str, Room] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def create_room(self, quiz: Dict, template: Dict, question_seconds: Optional[float] = None) -> Room:
+        """
+        Open a room for a generated quiz
+
+        Args:
+            quiz: Redacted quiz as returned by a generation job
+            template: ScoreManager session of that quiz, its answer key grades the players
+            question_seconds: Time limit per question, None to let the host move on
+
+        Returns:
+            The new room
+        """
+        room_id = "".join(secrets.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+        while room_id in self.rooms:
+            room_id = "".join(secrets.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+        room = Room(room_id, quiz, template, self.scores, question_seconds, self.max_players)
+        self.rooms[room_id] = room
+        logger.info(f"Room {room_id} opened for '{quiz['topic']}'")
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_standings())
+        return room
+
+    def get_room(self, room_id: str) -> Optional[Room]:
+        return self.rooms.get(room_id.upper())
+
+    async def _flush_standings(self) -> None:
+        while self.rooms:
+            await asyncio.sleep(self.standings_interval)
+            now = time.monotonic()
+            for room_id, room in list(self.rooms.items()):
+                diff = room.standings_diff()
+                if diff is not None:
+                    room.broadcast(diff)
+                finished = room.state == "finished" and not room.connection_count
+                if finished or now - room.last_activity > self.idle_timeout:
+                    del self.rooms[room_id]
+                    await room.close()
+                    logger.info(f"Room {room_id} closed")
+
+    async def serve(self, websocket: WebSocket, room_id: str, name: Optional[str], host_token: Optional[str]) -> None:
+        """
+        Run one WebSocket of a room until it disconnects
+
+        Players send {"type": "answer", "question_index": i, "selected_option": o},
+        the host sends {"type": "next"} or {"type": "end"}.
+        """
+        room = self.get_room(room_id)
+        if room is None:
+            await websocket.close(code=CLOSE_NOT_FOUND)
+            return
+        is_host = host_token is not None
+        if is_host and not secrets.compare_digest(host_token, room.host_token):
+            await websocket.close(code=CLOSE_FORBIDDEN)
+            return
+
+        await websocket.accept()
+        connection = Connection(websocket, self.queue_size)
+        sender = connection.sender = asyncio.create_task(connection.run_sender())
+        player = None
+        try:
+            if is_host:
+                room.add_host(connection)
+            else:
+                try:
+                    player = room.join(name or "Player", connection)
+                except RoomError as e:
+                    connection.send_message({"type": "error", "detail": str(e)})
+                    connection.close()
+                    await sender
+                    await websocket.close(code=CLOSE_REJECTED)
+                    return
+
+            while not connection.closed:
+                try:
+                    text = await websocket.receive_text()
+                    if connection.closed:
+                        # The room was closed while this message was on its way
+                        break
+                    message = json.loads(text)
+                    if is_host:
+                        room.host_command(message.get("type"))
+                    elif message.get("type") == "answer":
+                        room.answer(player, int(message["question_index"]), int(message["selected_option"]))
+                    else:
+                        raise RoomError(f"Unknown message type: {message.get('type')}")
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    connection.send_message({"type": "error", "detail": str(e) or "Invalid message"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if player is not None:
+                room.leave(player)
+            room.remove_host(connection)
+            connection.close()
+            sender.cancel()
+
+    async def stop(self) -> None:
+        """Close every room and its connections"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+        rooms, self.rooms = list(self.rooms.values()), {}
+        await asyncio.gather(*(room.close() for room in rooms))
@@ -1,13 +1,140 @@
-from typing import Dict, List
-from backend.models import Quiz, QuizQuestion, AnswerResponse, ScoreResponse
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple
+from backend.models import Quiz, AnswerResponse, ScoreResponse, DifficultyLevel
+import base64
+import bisect
+import json
+import logging
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = list(DifficultyLevel)
+# Locks sessions are spread over, two sessions sharing one only wait on each other
+SESSION_LOCK_STRIPES = 64
+
+
+def build_answer_key(quiz: Quiz) -> bytes:
+    """
+    Pack the answers of a quiz into one byte per question
+
+    Args:
+        quiz: The quiz object
+
+    Returns:
+        Answer key, the low two bits of each byte hold the correct option
+        and the next two the difficulty
+    """
+    return bytes(
+        question.correct_answer | DIFFICULTIES.index(question.difficulty) << 2
+        for question in quiz.questions
+    )
+
+
+def read_answer_key(answer_key: bytes, question_index: int) -> Tuple[int, DifficultyLevel]:
+    """Correct option and difficulty of a question in an answer key"""
+    entry = answer_key[question_index]
+    return entry & 0b11, DIFFICULTIES[entry >> 2]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(position: List[Any]) -> str:
+    """Opaque cursor for the position of the last item of a page"""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Position encoded in a cursor returned by encode_cursor"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(position, list):
+        raise InvalidCursorError("Invalid cursor")
+    return position
+
+
+def session_percentage(session: Dict) -> float:
+    """Share of correct answers in a session, in percent"""
+    total_answered = len(session["answers"])
+    return (session["correct_count"] / total_answered) * 100 if total_answered else 0.0
+
+
+def ranking_key(session_id: str, session: Dict) -> Optional[Tuple[int, float, str]]:
+    """
+    Position of a session on the leaderboard
+
+    Args:
+        session_id: The user session ID
+        session: Session dictionary
+
+    Returns:
+        Key sorting the best session first (negated score, negated percentage,
+        then the session ID to break ties), None for sessions without answers
+    """
+    if not session["answers"]:
+        return None
+    return -session["score"], -session_percentage(session), session_id
+
+
+class Ranking:
+    """
+    Sessions sorted by leaderboard position, for stores without an index of their own
+
+    Pages are read with a binary search from the cursor, so their cost
+    depends on the page size rather than on the number of sessions.
+    """
 
-class ScoreManager:
     def __init__(self):
-        """Initialize the score manager"""
-        self.user_sessions: Dict[str, Dict] = {}
+        self._keys: List[Tuple[int, float, str]] = []
+        self._key_of: Dict[str, Tuple[int, float, str]] = {}
+
+    def update(self, session_id: str, session: Optional[Dict]) -> None:
+        """Move a session to its current position, or drop it when session is None"""
+        old_key = self._key_of.pop(session_id, None)
+        if old_key is not None:
+            del self._keys[bisect.bisect_left(self._keys, old_key)]
+        new_key = ranking_key(session_id, session) if session is not None else None
+        if new_key is not None:
+            bisect.insort(self._keys, new_key)
+            self._key_of[session_id] = new_key
+
+    def page(self, after: Optional[Tuple], limit: int) -> List[str]:
+        """IDs of up to limit sessions ranked after the given key"""
+        start = bisect.bisect_right(self._keys, after) if after is not None else 0
+        return [key[2] for key in self._keys[start:start + limit]]
+
+
+class ScoreManager:
+    def __init__(self, store: Optional[MutableMapping[str, Dict]] = None, event_log=None):
+        """
+        Initialize the score manager
+        
+        Every change to the sessions is an event ("created", "answered", "reset",
+        "deleted") applied by _apply_event. With an event log, events are appended
+        to it before they are applied, and the sessions are rebuilt on startup from
+        its latest snapshot and the events logged after it.
+        
+        Args:
+            store: Mapping holding the sessions, defaults to an in-process dict.
+                   Modified sessions are always assigned back so persistent stores see the change.
+            event_log: EventLog recording every change, the store should start empty
+        """
+        self.user_sessions: MutableMapping[str, Dict] = store if store is not None else {}
+        self.event_log = event_log
+        # Keeps the log order and the order events are applied in the same
+        self._event_lock = threading.RLock()
+        # One snapshot is written at a time, _snapshot_claimed is set under _event_lock
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_claimed = False
+        # Answers to one session are checked and recorded one at a time, endpoints run in a threadpool.
+        # Stores shared between processes also lock the session across workers, see session_lock
+        self._session_locks = [threading.RLock() for _ in range(SESSION_LOCK_STRIPES)]
         self.scoring_rules = {
             "correct_easy": 1,
             "correct_medium": 2,
@@ -16,78 +143,292 @@ class ScoreManager:
             "incorrect_medium": -2,
             "incorrect_hard": -3
         }
+        self._ranking: Optional[Ranking] = None
+        if event_log is not None:
+            self._recover()
+        # Stores that rank sessions themselves (SQLiteSessionStore) are shared between
+        # processes, an in-process ranking would miss the other workers' answers
+        if not hasattr(self.user_sessions, "ranked_sessions"):
+            self._ranking = Ranking()
+            for session_id, session in self.user_sessions.items():
+                self._ranking.update(session_id, session)
+    
+    def _recover(self) -> None:
+        """Rebuild the sessions from the latest snapshot and the events that follow it"""
+        from backend.session_store import session_from_dict
+        
+        snapshot_seq, state = self.event_log.load_snapshot()
+        if state is not None:
+            for session_id, data in state["sessions"].items():
+                self.user_sessions[session_id] = session_from_dict(data)
+        for _, event in self.event_log.replay(after_seq=snapshot_seq):
+            self._apply_event(event)
+    
+    def write_snapshot(self) -> None:
+        """Snapshot every session in the event log, recovery then starts from here"""
+        from backend.session_store import session_to_dict
+        
+        with self._snapshot_lock:
+            with self._event_lock:
+                seq = self.event_log.last_seq
+                sessions = {session_id: session_to_dict(session) for session_id, session in self.user_sessions.items()}
+            # Answers keep flowing while the snapshot is encoded and written
+            self.event_log.write_snapshot(seq, {"sessions": sessions})
+    
+    def _snapshot_in_background(self) -> None:
+        """Write the snapshot claimed by _record, a failure only delays recovery"""
+        try:
+            self.write_snapshot()
+        except Exception as e:
+            logger.error(f"Writing a session snapshot failed, the next event retries: {e}")
+        finally:
+            with self._event_lock:
+                self._snapshot_claimed = False
+    
+    def _record(self, event: Dict, session: Optional[Dict] = None) -> Optional[Dict]:
+        """Log an event when there is an event log, then apply it"""
+        if self.event_log is None:
+            return self._apply_event(event, session)
+        with self._event_lock:
+            self.event_log.append(event)
+            applied = self._apply_event(event, session)
+            # Claimed here so that a single thread writes it, the event is recorded whatever happens to it
+            snapshot_due = self.event_log.snapshot_due() and not self._snapshot_claimed
+            if snapshot_due:
+                self._snapshot_claimed = True
+        if snapshot_due:
+            threading.Thread(target=self._snapshot_in_background, name="session-snapshot", daemon=True).start()
+        return applied
+    
+    def _apply_event(self, event: Dict, session: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Apply one event to the sessions, as it happens or replayed from the log
+        
+        Args:
+            event: Event dictionary, its "at" time as a datetime or in ISO format
+            session: The event's session when the caller already loaded it
+            
+        Returns:
+            The answer entry of an "answered" event, None for the other events
+        """
+        kind = event["type"]
+        session_id = event["session_id"]
+        at = event.get("at")
+        if isinstance(at, str):
+            at = datetime.fromisoformat(at)
+        
+        if kind == "deleted":
+            # Replayed after the session expired again, or logged twice by concurrent cleanups
+            self.user_sessions.pop(session_id, None)
+            self._update_ranking(session_id, None)
+            return None
+        
+        if kind == "created":
+            session = {
+                "topic": event["topic"],
+                "total_questions": event["total_questions"],
+                "answer_key": bytes.fromhex(event["answer_key"]),
+                "explanations": event["explanations"],
+                "questions": event.get("questions"),
+                "score": 0,
+                "answers": [],
+                "correct_count": 0,
+                "incorrect_count": 0,
+                "started_at": at,
+                "last_activity": at
+            }
+            if "adaptive" in event:
+                session["adaptive"] = event["adaptive"]
+            self.user_sessions[session_id] = session
+            return None
+        
+        if session is None:
+            session = self.user_sessions[session_id]
+        answer = None
+        if kind == "answered":
+            question_index = event["question_index"]
+            correct_answer, difficulty = read_answer_key(session["answer_key"], question_index)
+            is_correct = event["selected_option"] == correct_answer
+            
+            # Calculate score change
+            difficulty = difficulty.value
+            if is_correct:
+                score_change = self.scoring_rules[f"correct_{difficulty}"]
+                session["correct_count"] += 1
+            else:
+                score_change = self.scoring_rules[f"incorrect_{difficulty}"]
+                session["incorrect_count"] += 1
+            
+            session["score"] += score_change
+            answer = {
+                "question_index": question_index,
+                "selected_option": event["selected_option"],
+                "is_correct": is_correct,
+                "score_change": score_change,
+                "timestamp": at
+            }
+            session["answers"].append(answer)
+        elif kind == "reset":
+            session["score"] = 0
+            session["answers"] = []
+            session["correct_count"] = 0
+            session["incorrect_count"] = 0
+        else:
+            raise ValueError(f"Unknown event type: {kind}")
+        
+        session["last_activity"] = at
+        self.user_sessions[session_id] = session
+        self._update_ranking(session_id, session)
+        return answer
     
     def create_session(self, quiz: Quiz) -> str:
         """
         Create a new user session for a quiz
         
+        Only what answers are checked and reported against is kept: the answer
+        key, the explanations and the question texts, the options stay with the player.
+        
         Args:
             quiz: The quiz object
             
         Returns:
             Session ID
         """
+        return self._new_session(
+            quiz.topic, quiz.total_questions, build_answer_key(quiz),
+            [question.explanation for question in quiz.questions], [question.question for question in quiz.questions]
+        )
+    
+    def create_session_like(self, template: Dict) -> str:
+        """
+        Create a new session for the same quiz as an existing session
+        
+        Args:
+            template: Session whose answer key, explanations and questions are reused, possibly
+                      held by another ScoreManager
+            
+        Returns:
+            Session ID
+        """
+        return self._new_session(
+            template["topic"], template["total_questions"], template["answer_key"], template["explanations"],
+            template.get("questions")
+        )
+    
+    def create_adaptive_session(self, quiz: Quiz, total_questions: int, adaptive: Dict) -> str:
+        """
+        Create a session for an adaptive quiz, asking total_questions questions of a pool
+        
+        Args:
+            quiz: The pool the questions are picked from
+            total_questions: Most questions asked
+            adaptive: JSON state of the adaptive quiz, see backend.adaptive
+            
+        Returns:
+            Session ID
+        """
+        return self._new_session(
+            quiz.topic, total_questions, build_answer_key(quiz),
+            [question.explanation for question in quiz.questions], [question.question for question in quiz.questions],
+            adaptive
+        )
+    
+    def _new_session(self, topic: str, total_questions: int, answer_key: bytes, explanations: List[str],
+                     questions: Optional[List[str]], adaptive: Optional[Dict] = None) -> str:
         session_id = str(uuid.uuid4())
-        self.user_sessions[session_id] = {
-            "quiz": quiz,
-            "score": 0,
-            "answers": [],
-            "correct_count": 0,
-            "incorrect_count": 0,
-            "started_at": datetime.now(),
-            "last_activity": datetime.now()
+        event = {
+            "type": "created",
+            "session_id": session_id,
+            "topic": topic,
+            "total_questions": total_questions,
+            "answer_key": answer_key.hex(),
+            "explanations": explanations,
+            "questions": questions,
+            "at": datetime.now()
         }
+        if adaptive is not None:
+            event["adaptive"] = adaptive
+        self._record(event)
         return session_id
     
-    def submit_answer(self, session_id: str, question_index: int, selected_option: int) -> AnswerResponse:
+    @contextmanager
+    def session_lock(self, session_id: str):
+        """
+        Hold a session while it is read, checked and written back
+        
+        Threads of this process wait on a striped lock. A store with a transaction()
+        (SQLiteSessionStore) is also locked, so that a worker process answering the
+        same session meanwhile cannot overwrite the change. Nested holds are allowed.
+        """
+        with self._session_locks[hash(session_id) % SESSION_LOCK_STRIPES]:
+            transaction = getattr(self.user_sessions, "transaction", None)
+            if transaction is None:
+                yield
+            else:
+                with transaction():
+                    yield
+    
+    def submit_answer(self, session_id: str, question_index: int, selected_option: int,
+                      session: Optional[Dict] = None) -> AnswerResponse:
         """
         Submit an answer for a question and update score
         
+        A question is scored once: answering it again, such as a client retrying
+        after a timeout, returns the first answer's result with duplicate set and
+        changes nothing.
+        
         Args:
             session_id: The user session ID
             question_index: Index of the question being answered
             selected_option: Index of the selected option (0-3)
+            session: The session when the caller already loaded it. Adaptive sessions
+                     are only answered this way, by backend.adaptive, which checks
+                     the question is the one it picked
             
         Returns:
             AnswerResponse with result and score change
         """
-        if session_id not in self.user_sessions:
-            raise ValueError("Invalid session ID")
+        with self.session_lock(session_id):
+            return self._submit_answer(session_id, question_index, selected_option, session)
+    
+    def _submit_answer(self, session_id: str, question_index: int, selected_option: int,
+                       session: Optional[Dict]) -> AnswerResponse:
+        if session is None:
+            if session_id not in self.user_sessions:
+                raise ValueError("Invalid session ID")
+            session = self.user_sessions[session_id]
+            if "adaptive" in session:
+                raise ValueError("Adaptive quizzes are answered at /quiz/adaptive/{session_id}/answer")
         
-        session = self.user_sessions[session_id]
-        quiz = session["quiz"]
+        answer_key = session["answer_key"]
         
-        if question_index < 0 or question_index >= len(quiz.questions):
+        if question_index < 0 or question_index >= len(answer_key):
             raise ValueError("Invalid question index")
         
-        question = quiz.questions[question_index]
-        is_correct = selected_option == question.correct_answer
-        
-        # Calculate score change
-        difficulty = question.difficulty.value
-        if is_correct:
-            score_change = self.scoring_rules[f"correct_{difficulty}"]
-            session["correct_count"] += 1
-        else:
-            score_change = self.scoring_rules[f"incorrect_{difficulty}"]
-            session["incorrect_count"] += 1
+        # Sessions hold one answer per question at most, a scan is cheaper than an index
+        for answer in session["answers"]:
+            if answer["question_index"] == question_index:
+                return AnswerResponse(
+                    correct=answer["is_correct"],
+                    correct_answer=read_answer_key(answer_key, question_index)[0],
+                    explanation=session["explanations"][question_index],
+                    score_change=answer["score_change"],
+                    duplicate=True
+                )
         
-        # Update session
-        session["score"] += score_change
-        session["answers"].append({
+        answer = self._record({
+            "type": "answered",
+            "session_id": session_id,
             "question_index": question_index,
             "selected_option": selected_option,
-            "is_correct": is_correct,
-            "score_change": score_change,
-            "timestamp": datetime.now()
-        })
-        session["last_activity"] = datetime.now()
+            "at": datetime.now()
+        }, session)
         
         return AnswerResponse(
-            correct=is_correct,
-            correct_answer=question.correct_answer,
-            explanation=question.explanation,
-            score_change=score_change
+            correct=answer["is_correct"],
+            correct_answer=read_answer_key(answer_key, question_index)[0],
+            explanation=session["explanations"][question_index],
+            score_change=answer["score_change"]
         )
     
     def get_score(self, session_id: str) -> ScoreResponse:
@@ -103,41 +444,58 @@ class ScoreManager:
         if session_id not in self.user_sessions:
             raise ValueError("Invalid session ID")
         
-        session = self.user_sessions[session_id]
-        total_answered = len(session["answers"])
-        
-        percentage = 0.0
-        if total_answered > 0:
-            percentage = (session["correct_count"] / total_answered) * 100
-        
+        return self._score_from_session(self.user_sessions[session_id])
+    
+    def _score_from_session(self, session: Dict) -> ScoreResponse:
+        """Build the score of an already loaded session"""
         return ScoreResponse(
             current_score=session["score"],
-            total_questions_answered=total_answered,
+            total_questions_answered=len(session["answers"]),
             correct_answers=session["correct_count"],
             incorrect_answers=session["incorrect_count"],
-            percentage=percentage
+            percentage=session_percentage(session)
         )
     
-    def get_session_summary(self, session_id: str) -> Dict:
+    def _update_ranking(self, session_id: str, session: Optional[Dict]) -> None:
+        if self._ranking is not None:
+            self._ranking.update(session_id, session)
+    
+    def get_session_summary(self, session_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
         """
         Get a complete summary of a user session
         
         Args:
             session_id: The user session ID
+            limit: Maximum number of answers to include, all of them when None
+            cursor: next_cursor of the previous page of answers
             
         Returns:
-            Dictionary with session summary
+            Dictionary with session summary, next_cursor is set while answers remain
         """
         if session_id not in self.user_sessions:
             raise ValueError("Invalid session ID")
         
         session = self.user_sessions[session_id]
-        score_response = self.get_score(session_id)
+        score_response = self._score_from_session(session)
+        
+        if limit is not None and limit < 1:
+            raise ValueError("Limit must be at least 1")
+        
+        # Answers are only ever appended, their position in the list is a stable key
+        start = 0
+        if cursor is not None:
+            position = decode_cursor(cursor)
+            if len(position) != 1 or not isinstance(position[0], int) or position[0] < 0:
+                raise InvalidCursorError("Invalid cursor")
+            start = position[0]
+        end = len(session["answers"]) if limit is None else start + limit
+        answers = session["answers"][start:end]
+        next_cursor = encode_cursor([end]) if end < len(session["answers"]) else None
         
         return {
             "session_id": session_id,
-            "quiz_topic": session["quiz"].topic,
-            "total_questions": session["quiz"].total_questions,
+            "quiz_topic": session["topic"],
+            "total_questions": session["total_questions"],
             "score": score_response.current_score,
             "questions_answered": score_response.total_questions_answered,
             "correct_answers": score_response.correct_answers,
@@ -145,7 +503,8 @@ class ScoreManager:
             "percentage": score_response.percentage,
             "started_at": session["started_at"],
             "last_activity": session["last_activity"],
-            "answers": session["answers"]
+            "answers": answers,
+            "next_cursor": next_cursor
         }
     
     def reset_session(self, session_id: str) -> None:
@@ -155,15 +514,12 @@ class ScoreManager:
         Args:
             session_id: The user session ID
         """
-        if session_id not in self.user_sessions:
-            raise ValueError("Invalid session ID")
-        
-        session = self.user_sessions[session_id]
-        session["score"] = 0
-        session["answers"] = []
-        session["correct_count"] = 0
-        session["incorrect_count"] = 0
-        session["last_activity"] = datetime.now()
+        with self.session_lock(session_id):
+            if session_id not in self.user_sessions:
+                raise ValueError("Invalid session ID")
+            
+            # The answers stay in the event log
+            self._record({"type": "reset", "session_id": session_id, "at": datetime.now()})
     
     def delete_session(self, session_id: str) -> None:
         """
@@ -173,7 +529,7 @@ class ScoreManager:
             session_id: The user session ID
         """
         if session_id in self.user_sessions:
-            del self.user_sessions[session_id]
+            self._record({"type": "deleted", "session_id": session_id})
     
     def cleanup_old_sessions(self, max_age_hours: int = 24) -> int:
         """
@@ -188,13 +544,13 @@ class ScoreManager:
         current_time = datetime.now()
         sessions_to_delete = []
         
-        for session_id, session in self.user_sessions.items():
+        for session_id, session in list(self.user_sessions.items()):
             age = current_time - session["last_activity"]
             if age.total_seconds() > max_age_hours * 3600:
                 sessions_to_delete.append(session_id)
         
         for session_id in sessions_to_delete:
-            del self.user_sessions[session_id]
+            self._record({"type": "deleted", "session_id": session_id})
         
         return len(sessions_to_delete)
     
@@ -208,19 +564,54 @@ class ScoreManager:
         Returns:
             List of top sessions sorted by score
         """
-        leaderboard = []
+        return self.get_leaderboard_page(limit)["leaderboard"]
+    
+    def get_leaderboard_page(self, limit: int = 10, cursor: Optional[str] = None) -> Dict:
+        """
+        Get one page of the leaderboard
+        
+        Sessions are ordered by score, then percentage, then session ID, and a
+        page starts right after the position held in the cursor. Deep pages cost
+        the same as the first one, and sessions moving between requests do not
+        shift the following pages.
         
-        for session_id, session in self.user_sessions.items():
-            if len(session["answers"]) > 0:  # Only include sessions with answers
-                leaderboard.append({
-                    "session_id": session_id[:8],  # Shortened for display
-                    "topic": session["quiz"].topic,
-                    "score": session["score"],
-                    "percentage": self.get_score(session_id).percentage,
-                    "questions_answered": len(session["answers"])
-                })
+        Args:
+            limit: Maximum number of entries to return
+            cursor: next_cursor of the previous page
+            
+        Returns:
+            Dictionary with the entries and the cursor of the next page (None on the last page)
+        """
+        if limit < 1:
+            raise ValueError("Limit must be at least 1")
+        after = None
+        if cursor is not None:
+            position = decode_cursor(cursor)
+            if (len(position) != 3 or not isinstance(position[0], int)
+                    or not isinstance(position[1], (int, float)) or not isinstance(position[2], str)):
+                raise InvalidCursorError("Invalid cursor")
+            after = tuple(position)
+        
+        # One extra entry tells whether another page follows
+        if self._ranking is not None:
+            session_ids = self._ranking.page(after, limit + 1)
+            ranked = [(session_id, self.user_sessions[session_id]) for session_id in session_ids]
+        else:
+            ranked = self.user_sessions.ranked_sessions(after, limit + 1)
         
-        # Sort by score (descending) then by percentage
-        leaderboard.sort(key=lambda x: (-x["score"], -x["percentage"]))
+        leaderboard = [
+            {
+                "session_id": session_id[:8],  # Shortened for display
+                "topic": session["topic"],
+                "score": session["score"],
+                "percentage": session_percentage(session),
+                "questions_answered": len(session["answers"])
+            }
+            for session_id, session in ranked[:limit]
+        ]
+        next_cursor = None
+        if len(ranked) > limit:
+            session_id, session = ranked[limit - 1]
+            next_cursor = encode_cursor(list(ranking_key(session_id, session)))
         
-        return leaderboard[:limit]
+        return {"leaderboard": leaderboard, "next_cursor": next_cursor}
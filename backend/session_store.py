@@ -0,0 +1,456 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from backend.models import Quiz
+from backend.score_manager import build_answer_key, ranking_key
+
+logger = logging.getLogger(__name__)
+
+# Row of the sessions table: id, data, last_activity, rank_score, rank_percentage
+SessionRow = Tuple[str, str, str, Optional[int], Optional[float]]
+
+
+def session_to_dict(session: Dict) -> Dict:
+    """
+    Convert a ScoreManager session to JSON compatible values
+
+    Args:
+        session: Session dictionary as stored by ScoreManager
+
+    Returns:
+        Dictionary holding only JSON types
+    """
+    data = dict(session)
+    data["answer_key"] = session["answer_key"].hex()
+    data["started_at"] = session["started_at"].isoformat()
+    data["last_activity"] = session["last_activity"].isoformat()
+    data["answers"] = [
+        {**answer, "timestamp": answer["timestamp"].isoformat()} for answer in session["answers"]
+    ]
+    return data
+
+
+def session_from_dict(data: Dict) -> Dict:
+    """
+    Rebuild a ScoreManager session from the values produced by session_to_dict
+
+    Args:
+        data: Dictionary of JSON values, modified in place
+
+    Returns:
+        Session dictionary
+    """
+    if "quiz" in data:
+        # Sessions stored before answer keys kept the whole quiz
+        quiz = Quiz(**data.pop("quiz"))
+        data["topic"] = quiz.topic
+        data["total_questions"] = quiz.total_questions
+        data["answer_key"] = build_answer_key(quiz)
+        data["explanations"] = [question.explanation for question in quiz.questions]
+        data["questions"] = [question.question for question in quiz.questions]
+    else:
+        data["answer_key"] = bytes.fromhex(data["answer_key"])
+    data["started_at"] = datetime.fromisoformat(data["started_at"])
+    data["last_activity"] = datetime.fromisoformat(data["last_activity"])
+    for answer in data["answers"]:
+        answer["timestamp"] = datetime.fromisoformat(answer["timestamp"])
+    return data
+
+
+def serialize_session(session: Dict) -> str:
+    """
+    Serialize a ScoreManager session to JSON
+
+    Args:
+        session: Session dictionary as stored by ScoreManager
+
+    Returns:
+        JSON string
+    """
+    return json.dumps(session_to_dict(session))
+
+
+def deserialize_session(payload: str) -> Dict:
+    """
+    Rebuild a ScoreManager session from its JSON form
+
+    Args:
+        payload: JSON string produced by serialize_session
+
+    Returns:
+        Session dictionary
+    """
+    return session_from_dict(json.loads(payload))
+
+
+class SessionStoreBusyError(RuntimeError):
+    """Raised when session writes are backed up and a writer cannot wait any longer"""
+
+
+class SQLiteSessionStore(MutableMapping):
+    """
+    Session mapping persisted in SQLite
+
+    Every process opening the same file sees the same sessions, which lets
+    several server workers share quiz sessions. Values are copies: callers
+    must assign a modified session back for the change to be stored, inside
+    transaction() when the change depends on what was read.
+    """
+
+    def __init__(self, db_path: str = "quizbot_sessions.sqlite3"):
+        self.db_path = db_path
+        self._local = threading.local()
+        connection = self._connect()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                last_activity TEXT NOT NULL,
+                rank_score INTEGER,
+                rank_percentage REAL
+            )
+        """)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(sessions)")}
+        if "rank_score" not in columns:
+            self._add_ranking_columns(connection)
+        # Leaderboard order: the ranking columns hold the negated score and percentage
+        # so that a page is a single ascending range scan from the cursor
+        connection.execute("""
+            CREATE INDEX IF NOT EXISTS sessions_ranking ON sessions (rank_score, rank_percentage, id)
+            WHERE rank_score IS NOT NULL
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Hold the database write lock until the block ends
+
+        Reads and writes of the calling thread in the block form one transaction,
+        so a session read, checked and assigned back cannot overwrite a change
+        another worker made in between. Nested blocks join the outer one.
+        """
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def _add_ranking_columns(self, connection: sqlite3.Connection) -> None:
+        """Add the ranking columns to a store created before the leaderboard was paginated"""
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have migrated the table while this one waited for the lock
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(sessions)")}
+            if "rank_score" in columns:
+                connection.execute("COMMIT")
+                return
+            connection.execute("ALTER TABLE sessions ADD COLUMN rank_score INTEGER")
+            connection.execute("ALTER TABLE sessions ADD COLUMN rank_percentage REAL")
+            rows = connection.execute("SELECT id, data FROM sessions").fetchall()
+            for session_id, data in rows:
+                key = ranking_key(session_id, deserialize_session(data))
+                if key is not None:
+                    connection.execute(
+                        "UPDATE sessions SET rank_score = ?, rank_percentage = ? WHERE id = ?",
+                        (key[0], key[1], session_id)
+                    )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def __getitem__(self, session_id: str) -> Dict:
+        row = self._connect().execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        return deserialize_session(row[0])
+
+    @staticmethod
+    def session_row(session_id: str, session: Dict) -> SessionRow:
+        """Row storing a session"""
+        key = ranking_key(session_id, session) or (None, None, None)
+        return session_id, serialize_session(session), session["last_activity"].isoformat(), key[0], key[1]
+
+    def __setitem__(self, session_id: str, session: Dict) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sessions (id, data, last_activity, rank_score, rank_percentage) VALUES (?, ?, ?, ?, ?)",
+            self.session_row(session_id, session)
+        )
+
+    def write_batch(self, changes: Dict[str, Optional[SessionRow]]) -> None:
+        """
+        Store several sessions in one transaction
+
+        Args:
+            changes: Session ID to the row to store, or None to delete the session
+        """
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO sessions (id, data, last_activity, rank_score, rank_percentage) VALUES (?, ?, ?, ?, ?)",
+                [row for row in changes.values() if row is not None]
+            )
+            connection.executemany(
+                "DELETE FROM sessions WHERE id = ?",
+                [(session_id,) for session_id, row in changes.items() if row is None]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def __delitem__(self, session_id: str) -> None:
+        deleted = self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+        if not deleted:
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id) -> bool:
+        return self._connect().execute(
+            "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self._connect().execute("SELECT id FROM sessions")])
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        """All sessions, loaded in a single query"""
+        rows = self._connect().execute("SELECT id, data FROM sessions").fetchall()
+        return [(session_id, deserialize_session(data)) for session_id, data in rows]
+
+
+    def ranked_sessions(self, after: Optional[Tuple[int, float, str]], limit: int) -> List[Tuple[str, Dict]]:
+        """
+        Sessions with answers in leaderboard order
+
+        Args:
+            after: Ranking key of the last session of the previous page, None for the first page
+            limit: Maximum number of sessions to return
+
+        Returns:
+            (session ID, session) pairs
+        """
+        if after is None:
+            rows = self._connect().execute("""
+                SELECT id, data FROM sessions WHERE rank_score IS NOT NULL
+                ORDER BY rank_score, rank_percentage, id LIMIT ?
+            """, (limit,)).fetchall()
+        else:
+            rows = self._connect().execute("""
+                SELECT id, data FROM sessions
+                WHERE rank_score IS NOT NULL AND (rank_score, rank_percentage, id) > (?, ?, ?)
+                ORDER BY rank_score, rank_percentage, id LIMIT ?
+            """, (*after, limit)).fetchall()
+        return [(session_id, deserialize_session(data)) for session_id, data in rows]
+
+
+class WriteBehindSessionStore(MutableMapping):
+    """
+    SQLite session store whose writes are buffered and flushed in batches
+
+    Assigning or deleting a session only serializes it into a pending buffer,
+    a background thread writes the buffer in one transaction every
+    flush_interval seconds, or as soon as batch_size sessions are pending.
+    Several changes to a session between two flushes are written once. Reads
+    see pending changes before the database.
+
+    When max_pending sessions are waiting (the disk cannot keep up), writers
+    block until a flush makes room, and give up with a SessionStoreBusyError
+    after backpressure_timeout seconds. Writers must run off the event loop. close() flushes what is left; changes made
+    in the last flush_interval before a crash are lost.
+
+    Reads only see the buffer of this process, so the store must have a single
+    writer process: another worker sharing the file would read a session's old
+    row, write it back and drop the buffered change. run_server.py refuses
+    write-behind with more than one worker. Other readers of the file, such as
+    the Django admin or a reporting job, see a change once it is flushed.
+
+    Args:
+        store: SQLite store the sessions are flushed to
+        flush_interval: Longest time in seconds a change stays in the buffer
+        batch_size: Pending sessions that trigger a flush before the interval is up
+        max_pending: Pending sessions above which writers wait
+        backpressure_timeout: Seconds a writer waits for room in the buffer
+    """
+
+    def __init__(self, store: SQLiteSessionStore, flush_interval: float = 0.05, batch_size: int = 1000,
+                 max_pending: int = 10_000, backpressure_timeout: float = 5.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.backpressure_timeout = backpressure_timeout
+        self._pending: Dict[str, Optional[SessionRow]] = {}
+        # The batch being written, still visible to readers until it is committed
+        self._flushing: Dict[str, Optional[SessionRow]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name="session-flusher", daemon=True)
+        self._flusher.start()
+
+    def _buffered(self, session_id: str):
+        """Pending row of a session, None for a pending deletion, KeyError when nothing is pending"""
+        with self._lock:
+            if session_id in self._pending:
+                return self._pending[session_id]
+            return self._flushing[session_id]
+
+    def _put(self, session_id: str, row: Optional[SessionRow]) -> None:
+        with self._lock:
+            deadline = time.monotonic() + self.backpressure_timeout
+            while len(self._pending) >= self.max_pending and session_id not in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._space.wait(remaining):
+                    raise SessionStoreBusyError("Session writes are backed up")
+            self._pending[session_id] = row
+            if len(self._pending) >= self.batch_size:
+                self._wake.notify()
+
+    def __getitem__(self, session_id: str) -> Dict:
+        try:
+            row = self._buffered(session_id)
+        except KeyError:
+            return self.store[session_id]
+        if row is None:
+            raise KeyError(session_id)
+        return deserialize_session(row[1])
+
+    def __setitem__(self, session_id: str, session: Dict) -> None:
+        # Serialized now: the caller may keep modifying the dictionary
+        self._put(session_id, SQLiteSessionStore.session_row(session_id, session))
+
+    def __delitem__(self, session_id: str) -> None:
+        if session_id not in self:
+            raise KeyError(session_id)
+        self._put(session_id, None)
+
+    def __contains__(self, session_id) -> bool:
+        try:
+            return self._buffered(session_id) is not None
+        except KeyError:
+            return session_id in self.store
+
+    # Whole-store reads write the buffer out first, the database then has every session
+
+    def __iter__(self) -> Iterator[str]:
+        self.flush()
+        return iter(self.store)
+
+    def __len__(self) -> int:
+        self.flush()
+        return len(self.store)
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        """All sessions, loaded in a single query"""
+        self.flush()
+        return self.store.items()
+
+    def ranked_sessions(self, after: Optional[Tuple[int, float, str]], limit: int) -> List[Tuple[str, Dict]]:
+        """Sessions with answers in leaderboard order, see SQLiteSessionStore.ranked_sessions"""
+        self.flush()
+        return self.store.ranked_sessions(after, limit)
+
+    def flush(self) -> int:
+        """
+        Write the pending changes in one transaction
+
+        Returns:
+            Number of sessions written or deleted
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            try:
+                self.store.write_batch(batch)
+            except Exception:
+                with self._lock:
+                    # Put the batch back, changes made since then are newer
+                    batch.update(self._pending)
+                    self._pending = batch
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+                self._space.notify_all()
+            return len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self._pending) < self.batch_size:
+                    self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Flushing sessions failed, retrying: {e}")
+                self._stop.wait(self.flush_interval)
+
+    def close(self) -> None:
+        """Stop the flusher thread and write the remaining changes"""
+        self._stop.set()
+        with self._lock:
+            self._wake.notify()
+        self._flusher.join()
+        self.flush()
+
+
+def create_session_store(url: str = "memory", write_behind: bool = False, **write_behind_options) -> MutableMapping:
+    """
+    Build the session store described by a URL
+
+    Args:
+        url: "memory" for a per-process dict, or "sqlite:///path/to/file" for a store
+             shared by every worker process
+        write_behind: Buffer the writes to a SQLite store and flush them in batches
+        write_behind_options: WriteBehindSessionStore settings
+
+    Returns:
+        Mapping of session ID to session dictionary
+    """
+    if url == "memory":
+        return {}
+    if url.startswith("sqlite:///"):
+        store = SQLiteSessionStore(url[len("sqlite:///"):])
+        return WriteBehindSessionStore(store, **write_behind_options) if write_behind else store
+    raise ValueError(f"Unsupported session store: {url}")
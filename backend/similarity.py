@@ -0,0 +1,266 @@
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Words that say nothing about what a question asks
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how in is it its of on or the this that
+to was were what when where which who whom whose why will with would you your
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Largest prime below 2**32, keeps every MinHash value within uint32
+_PRIME = np.uint64(4294967291)
+
+
+def normalize_question(text: str) -> List[str]:
+    """
+    Reduce a question to its content words
+
+    Lowercases the text, drops punctuation and stopwords, and strips a plural "s"
+    so that rephrasings of the same question share their words.
+
+    Args:
+        text: Question text
+
+    Returns:
+        List of normalized words
+    """
+    words = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def question_features(text: str) -> Set[str]:
+    """Set of features compared between questions (the distinct content words)"""
+    features = set(normalize_question(text))
+    # A question made only of stopwords is compared on its whole text
+    return features or {text.strip().lower()}
+
+
+class MinHashIndex:
+    """
+    Near-duplicate index over question text using MinHash and locality sensitive hashing
+
+    Each question is reduced to a MinHash signature of its content words. The
+    signature is cut into bands and questions sharing a band are candidates;
+    a candidate is a duplicate when the signatures estimate a Jaccard similarity
+    of at least `threshold`. Bands are kept in sorted NumPy arrays, with recent
+    inserts in small dictionaries merged in periodically, so a million questions
+    take about 250MB.
+
+    Args:
+        threshold: Estimated Jaccard similarity from which two questions are duplicates
+        num_perm: Number of hash functions in a signature
+        bands: Number of LSH bands, must divide num_perm
+        seed: Seed of the hash functions, indexes must share it to be comparable
+        merge_every: Recent inserts kept in dictionaries before merging into the sorted arrays
+    """
+
+    def __init__(self, threshold: float = 0.7, num_perm: int = 32, bands: int = 8,
+                 seed: int = 1, merge_every: int = 65536):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.merge_every = merge_every
+
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * x + b below 2**64 for 32 bit x
+        self._a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2**63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._size = 0
+        self._sorted_keys = [np.empty(0, dtype=np.uint64) for _ in range(bands)]
+        self._sorted_ids = [np.empty(0, dtype=np.int64) for _ in range(bands)]
+        self._recent: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+        self._recent_count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the signature and band arrays"""
+        return (self._signatures.nbytes
+                + sum(keys.nbytes for keys in self._sorted_keys)
+                + sum(ids.nbytes for ids in self._sorted_ids))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a question"""
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode()) for feature in question_features(text)), dtype=np.uint64
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """MinHash signatures of many questions at once, one row per question"""
+        features = [question_features(text) for text in texts]
+        lengths = np.fromiter((len(f) for f in features), dtype=np.int64, count=len(features))
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode()) for group in features for feature in group),
+            dtype=np.uint64, count=int(lengths.sum())
+        )
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        # One hash function at a time keeps the temporary arrays small
+        for i in range(self.num_perm):
+            permuted = (self._a[i] * hashes + self._b[i]) % _PRIME
+            signatures[:, i] = np.minimum.reduceat(permuted, starts)
+        return signatures
+
+    def _band_keys(self, signature: np.ndarray) -> np.ndarray:
+        """One 64 bit key per band, for one signature or a row of keys per signature"""
+        bands = signature.reshape(*signature.shape[:-1], self.bands, self.rows).astype(np.uint64)
+        return (bands * self._band_mix).sum(axis=-1)
+
+    def _candidates(self, keys: np.ndarray) -> Set[int]:
+        candidates = set()
+        for band, key in enumerate(keys):
+            sorted_keys = self._sorted_keys[band]
+            lo = np.searchsorted(sorted_keys, key, side="left")
+            hi = np.searchsorted(sorted_keys, key, side="right")
+            if hi > lo:
+                candidates.update(self._sorted_ids[band][lo:hi].tolist())
+            candidates.update(self._recent[band].get(int(key), ()))
+        return candidates
+
+    def _similar(self, signature: np.ndarray, keys: np.ndarray) -> List[Tuple[int, float]]:
+        candidates = self._candidates(keys)
+        if not candidates:
+            return []
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self._signatures[ids] == signature).mean(axis=1)
+        keep = similarities >= self.threshold
+        order = np.argsort(-similarities[keep], kind="stable")
+        return [(int(i), float(s)) for i, s in zip(ids[keep][order], similarities[keep][order])]
+
+    def query(self, text: str) -> List[Tuple[int, float]]:
+        """
+        Find the indexed questions similar to a question
+
+        Args:
+            text: Question text
+
+        Returns:
+            (question ID, estimated similarity) pairs at or above the threshold, most similar first
+        """
+        signature = self.signature(text)
+        with self._lock:
+            return self._similar(signature, self._band_keys(signature))
+
+    def find_duplicate(self, text: str) -> Optional[int]:
+        """ID of the most similar indexed question, or None when the question is new"""
+        matches = self.query(text)
+        return matches[0][0] if matches else None
+
+    def add(self, text: str) -> int:
+        """
+        Index a question
+
+        Args:
+            text: Question text
+
+        Returns:
+            ID of the question, IDs are assigned in insertion order from 0
+        """
+        signature = self.signature(text)
+        with self._lock:
+            return self._insert(signature, self._band_keys(signature))
+
+    def add_if_new(self, text: str) -> Optional[int]:
+        """
+        Index a question unless a near-duplicate is already indexed
+
+        Returns:
+            ID of the new question, or None if it was a duplicate
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        with self._lock:
+            if self._similar(signature, keys):
+                return None
+            return self._insert(signature, keys)
+
+    def add_many(self, texts: List[str]) -> range:
+        """
+        Index many questions without checking them for duplicates
+
+        Much faster than repeated add() calls, meant for building an index from
+        an existing question collection.
+
+        Args:
+            texts: Question texts
+
+        Returns:
+            IDs of the questions
+        """
+        if not texts:
+            return range(self._size, self._size)
+        signatures = self.signatures(texts)
+        keys = self._band_keys(signatures)
+        with self._lock:
+            first_id = self._size
+            self._reserve(first_id + len(texts))
+            self._signatures[first_id:first_id + len(texts)] = signatures
+            self._size += len(texts)
+            ids = np.arange(first_id, self._size, dtype=np.int64)
+            for band in range(self.bands):
+                self._merge_sorted(band, keys[:, band], ids)
+        return range(first_id, first_id + len(texts))
+
+    def _reserve(self, size: int) -> None:
+        """Grow the signature array to hold at least `size` questions"""
+        capacity = len(self._signatures)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        grown = np.empty((capacity, self.num_perm), dtype=np.uint32)
+        grown[:self._size] = self._signatures[:self._size]
+        self._signatures = grown
+
+    def _insert(self, signature: np.ndarray, keys: np.ndarray) -> int:
+        question_id = self._size
+        self._reserve(question_id + 1)
+        self._signatures[question_id] = signature
+        self._size += 1
+
+        for band, key in enumerate(keys.tolist()):
+            self._recent[band].setdefault(key, []).append(question_id)
+        self._recent_count += 1
+        if self._recent_count >= self.merge_every:
+            self._merge_recent()
+        return question_id
+
+    def _merge_recent(self) -> None:
+        """Move the recent inserts into the sorted band arrays"""
+        for band in range(self.bands):
+            pairs = [(key, i) for key, ids in self._recent[band].items() for i in ids]
+            new_keys = np.fromiter((key for key, _ in pairs), dtype=np.uint64, count=len(pairs))
+            new_ids = np.fromiter((i for _, i in pairs), dtype=np.int64, count=len(pairs))
+            self._merge_sorted(band, new_keys, new_ids)
+            self._recent[band] = {}
+        self._recent_count = 0
+
+    def _merge_sorted(self, band: int, new_keys: np.ndarray, new_ids: np.ndarray) -> None:
+        order = np.argsort(new_keys, kind="stable")
+        new_keys, new_ids = new_keys[order], new_ids[order]
+        positions = np.searchsorted(self._sorted_keys[band], new_keys)
+        self._sorted_keys[band] = np.insert(self._sorted_keys[band], positions, new_keys)
+        self._sorted_ids[band] = np.insert(self._sorted_ids[band], positions, new_ids)
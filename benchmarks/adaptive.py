@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Adaptive quizzes against fixed difficulty quizzes, and the calibration fit
+
+Players of standard normal ability answer questions whose answers follow a
+two-parameter logistic model. Each player takes:
+- an adaptive quiz, each question picked for the current ability estimate
+  (backend.irt.select_item) from a pool of --pool questions
+- a fixed quiz of random questions at the medium level, as /quiz/generate
+  serves them
+Both stop once the standard error of the ability is at most --target-error,
+or after --max-questions questions. The report gives the questions asked and
+the error of the final ability estimate.
+
+Then --answers simulated answers are fitted with backend.irt.fit_items, from
+starting values as uninformed as a difficulty label, and the recovered
+parameters are compared with the true ones.
+
+Usage:
+    python benchmarks/adaptive.py
+    python benchmarks/adaptive.py --players 5000 --answers 5000000 --json adaptive.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.irt import estimate_ability, probability, select_item, fit_items  # noqa: E402
+
+
+def take_quiz(ability: float, a: np.ndarray, b: np.ndarray, order, target_error: float, max_questions: int,
+              rng: np.random.Generator):
+    """Questions asked and final estimate of a player, order picks the next question from the answers so far"""
+    asked, correct = [], []
+    estimate, error = estimate_ability(a[:0], b[:0], np.zeros(0, dtype=bool))
+    while len(asked) < max_questions:
+        index = order(estimate, asked)
+        if index is None:
+            break
+        asked.append(index)
+        correct.append(rng.random() < probability(ability, a[index], b[index]))
+        estimate, error = estimate_ability(a[asked], b[asked], np.array(correct))
+        if error <= target_error:
+            break
+    return len(asked), estimate, error
+
+
+def compare_quizzes(args, report: dict) -> None:
+    rng = np.random.default_rng(args.seed)
+    a = rng.uniform(0.5, 2.0, args.pool)
+    b = rng.normal(size=args.pool)
+    medium = np.flatnonzero(np.abs(b) <= 0.5)
+    abilities = rng.normal(size=args.players)
+
+    for name in ("adaptive", "fixed"):
+        asked, errors, reached = [], [], 0
+        started = time.perf_counter()
+        for player, ability in enumerate(abilities):
+            if name == "adaptive":
+                draw = random.Random(player)
+                def order(estimate, answered):
+                    return select_item(estimate, a, b, answered, draw)
+            else:
+                sequence = rng.permutation(medium).tolist()
+                def order(estimate, answered):
+                    return sequence[len(answered)] if len(answered) < len(sequence) else None
+            count, estimate, error = take_quiz(ability, a, b, order, args.target_error, args.max_questions, rng)
+            asked.append(count)
+            errors.append(estimate - ability)
+            reached += error <= args.target_error
+        report[f"{name}_questions_mean"] = round(float(np.mean(asked)), 2)
+        report[f"{name}_reached_target"] = round(reached / args.players, 3)
+        report[f"{name}_ability_rmse"] = round(float(np.sqrt(np.mean(np.square(errors)))), 3)
+        report[f"{name}_s"] = round(time.perf_counter() - started, 2)
+    report["questions_saved"] = round(1 - report["adaptive_questions_mean"] / report["fixed_questions_mean"], 3)
+
+
+def calibration(args, report: dict) -> None:
+    rng = np.random.default_rng(args.seed + 1)
+    per_player = 20
+    players = args.answers // per_player
+    a = rng.uniform(0.5, 2.0, args.questions)
+    b = rng.normal(size=args.questions)
+    person = np.repeat(np.arange(players, dtype=np.int32), per_player)
+    item = rng.integers(0, args.questions, size=players * per_player)
+    correct = rng.random(len(item)) < probability(rng.normal(size=players)[person], a[item], b[item])
+    # Starting values as a difficulty label gives them
+    labels = np.clip(np.round(b), -1, 1)
+
+    started = time.perf_counter()
+    fitted_a, fitted_b, iterations = fit_items(item, person, correct, np.ones(args.questions), labels)
+    report["fit_answers"] = len(item)
+    report["fit_s"] = round(time.perf_counter() - started, 2)
+    report["fit_iterations"] = iterations
+    report["fit_b_rmse"] = round(float(np.sqrt(np.mean((fitted_b - b) ** 2))), 3)
+    report["fit_b_correlation"] = round(float(np.corrcoef(fitted_b, b)[0, 1]), 3)
+    report["fit_a_correlation"] = round(float(np.corrcoef(fitted_a, a)[0, 1]), 3)
+    report["label_b_rmse"] = round(float(np.sqrt(np.mean((labels - b) ** 2))), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive quizzes and the IRT calibration")
+    parser.add_argument("--players", type=int, default=2000, help="Players taking both quizzes")
+    parser.add_argument("--pool", type=int, default=200, help="Questions of the topic")
+    parser.add_argument("--target-error", type=float, default=0.4, help="Standard error the quizzes stop at")
+    parser.add_argument("--max-questions", type=int, default=30, help="Most questions of a quiz")
+    parser.add_argument("--answers", type=int, default=2_000_000, help="Answers fitted by the calibration")
+    parser.add_argument("--questions", type=int, default=2_000, help="Questions of the calibration")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    compare_quizzes(args, report)
+    calibration(args, report)
+
+    for key, value in report.items():
+        print(f"{key:<26}{value:>12}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Throughput of the answer analytics
+
+Simulates --answers answers with a two-parameter logistic model (players of
+varying ability answering questions of varying difficulty and discrimination,
+some with a miskeyed answer) straight into AnswerColumns, then times each
+vectorized pass: item statistics, flags, topic accuracy and the JSON report.
+Loading columns from ScoreManager sessions is a Python loop, its rate is
+measured separately on --load-answers answers.
+
+Usage:
+    python benchmarks/analytics.py
+    python benchmarks/analytics.py --answers 50000000 --json analytics.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.analytics import (  # noqa: E402
+    AnswerColumns, analytics_report, columns_from_sessions, flag_questions, item_statistics, topic_accuracy
+)
+from backend.score_manager import DIFFICULTIES  # noqa: E402
+
+ANSWERS_PER_SESSION = 10
+
+
+def simulate(answers: int, questions: int, topics: int, miskeyed: float, seed: int) -> AnswerColumns:
+    """Answers of sessions of ANSWERS_PER_SESSION random questions each"""
+    rng = np.random.default_rng(seed)
+    sessions = answers // ANSWERS_PER_SESSION
+    answers = sessions * ANSWERS_PER_SESSION
+    ability = rng.normal(size=sessions).astype(np.float32)
+    difficulty = rng.normal(size=questions).astype(np.float32)
+    slope = rng.uniform(0.3, 2.0, size=questions).astype(np.float32)
+    question_answer = rng.integers(0, 4, size=questions, dtype=np.int8)
+    # Options the strong players pick, different from the key for miskeyed questions
+    preferred = question_answer.copy()
+    bad = rng.random(questions) < miskeyed
+    preferred[bad] = (question_answer[bad] + 1) % 4
+
+    session = np.repeat(np.arange(sessions, dtype=np.int32), ANSWERS_PER_SESSION)
+    question = rng.integers(0, questions, size=answers, dtype=np.int32)
+    knows = rng.random(answers, dtype=np.float32) < 1 / (1 + np.exp(-slope[question] * (ability[session] - difficulty[question])))
+    guess = rng.integers(0, 4, size=answers, dtype=np.int8)
+    selected = np.where(knows, preferred[question], guess).astype(np.int8)
+    return AnswerColumns(
+        question=question,
+        session=session,
+        selected=selected,
+        correct=selected == question_answer[question],
+        question_topic=rng.integers(0, topics, size=questions, dtype=np.int32),
+        question_answer=question_answer,
+        question_difficulty=rng.integers(0, len(DIFFICULTIES), size=questions, dtype=np.int8),
+        topics=[f"Topic {index}" for index in range(topics)],
+        question_labels=[f"Question {index}?" for index in range(questions)]
+    )
+
+
+def fake_sessions(count: int, questions: int, seed: int):
+    """ScoreManager-shaped sessions of ANSWERS_PER_SESSION answers each"""
+    rng = np.random.default_rng(seed)
+    texts = [f"Question {index}?" for index in range(questions)]
+    explanations = [f"Explanation {index}" for index in range(questions)]
+    answer_key = bytes(rng.integers(0, 4, size=questions, dtype=np.uint8))
+    for number in range(count):
+        picked = rng.choice(questions, ANSWERS_PER_SESSION, replace=False).tolist()
+        options = rng.integers(0, 4, size=ANSWERS_PER_SESSION).tolist()
+        yield str(number), {
+            "topic": f"Topic {number % 50}",
+            "answer_key": answer_key,
+            "explanations": explanations,
+            "questions": texts,
+            "answers": [
+                {"question_index": index, "selected_option": option, "is_correct": option == answer_key[index] & 0b11}
+                for index, option in zip(picked, options)
+            ],
+        }
+
+
+def timed(report: dict, name: str, function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    report[f"{name}_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the answer analytics")
+    parser.add_argument("--answers", type=int, default=20_000_000, help="Answers simulated into columns")
+    parser.add_argument("--questions", type=int, default=20_000, help="Distinct questions")
+    parser.add_argument("--topics", type=int, default=200, help="Distinct topics")
+    parser.add_argument("--miskeyed", type=float, default=0.02, help="Share of questions with a wrong answer key")
+    parser.add_argument("--load-answers", type=int, default=1_000_000, help="Answers loaded from session dicts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {"answers": args.answers, "questions": args.questions}
+    columns = timed(report, "simulate", simulate, args.answers, args.questions, args.topics, args.miskeyed, args.seed)
+    stats = timed(report, "item_statistics", item_statistics, columns)
+    flags = timed(report, "flags", flag_questions, columns, stats)
+    timed(report, "topic_accuracy", topic_accuracy, columns)
+    result = timed(report, "report", analytics_report, columns, flagged_only=True, limit=None)
+    report["answers_per_s"] = round(len(columns.question) / (report["item_statistics_s"] + report["flags_s"]
+                                                              + report["topic_accuracy_s"]))
+    report["flagged_ambiguous"] = int(flags["ambiguous"].sum())
+    report["flagged_total"] = result["flagged_questions"]
+    del columns, stats, flags, result
+
+    sessions = list(fake_sessions(args.load_answers // ANSWERS_PER_SESSION, args.questions, args.seed))
+    timed(report, "load_sessions", columns_from_sessions, sessions)
+    report["load_answers_per_s"] = round(args.load_answers / report["load_sessions_s"])
+
+    for key, value in report.items():
+        print(f"{key:<24}{value:>14}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
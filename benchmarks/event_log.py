@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Append throughput and recovery time of the answer event log
+
+Drives a ScoreManager with an EventLog through --events events: sessions of
+ten questions are created and answered, and the oldest sessions are deleted
+once --live-sessions are open, as the cleanup endpoint would. Then measures:
+- append throughput with fsyncs batched every 50 ms, and with an fsync per
+  append on a smaller sample
+- raw replay throughput of the whole log
+- recovery time by replaying every event, against loading the latest
+  snapshot and replaying the events after it
+
+Usage:
+    python benchmarks/event_log.py
+    python benchmarks/event_log.py --events 10000000 --json event_log.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.event_log import EventLog  # noqa: E402
+from backend.models import Quiz, QuizQuestion, DifficultyLevel  # noqa: E402
+from backend.score_manager import ScoreManager  # noqa: E402
+
+QUESTIONS = 10
+
+
+def make_quiz(rng: random.Random) -> Quiz:
+    return Quiz(
+        topic="Operating Systems",
+        questions=[
+            QuizQuestion(
+                question=f"What does the scheduler do in case {index}?",
+                options=[f"Option {option}" for option in range(4)],
+                correct_answer=rng.randrange(4),
+                explanation="The scheduler picks the next runnable thread.",
+                difficulty=rng.choice(list(DifficultyLevel))
+            )
+            for index in range(QUESTIONS)
+        ],
+        total_questions=QUESTIONS
+    )
+
+
+def drive(manager: ScoreManager, events: int, live_sessions: int, rng: random.Random) -> None:
+    """Create, answer and delete sessions until the log holds the given number of events"""
+    quiz = make_quiz(rng)
+    open_sessions = []
+    log = manager.event_log
+    while log.last_seq < events:
+        session_id = manager.create_session(quiz)
+        open_sessions.append(session_id)
+        for index in range(min(QUESTIONS, events - log.last_seq)):
+            manager.submit_answer(session_id, index, rng.randrange(4))
+        if len(open_sessions) > live_sessions and log.last_seq < events:
+            manager.delete_session(open_sessions.pop(0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the answer event log")
+    parser.add_argument("--events", type=int, default=1_000_000, help="Events written to the log")
+    parser.add_argument("--live-sessions", type=int, default=100_000, help="Sessions kept open")
+    parser.add_argument("--snapshot-every", type=int, default=100_000, help="Events between snapshots")
+    parser.add_argument("--sync-sample", type=int, default=2000, help="Events appended with an fsync each")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {"events": args.events, "live_sessions": args.live_sessions}
+    with tempfile.TemporaryDirectory() as directory:
+        with EventLog(str(Path(directory) / "per_append"), fsync_interval=0, snapshot_every=0) as log:
+            manager = ScoreManager(event_log=log)
+            started = time.perf_counter()
+            drive(manager, args.sync_sample, args.live_sessions, rng)
+            report["fsync_per_append_events_per_s"] = round(args.sync_sample / (time.perf_counter() - started))
+
+        log_dir = str(Path(directory) / "batched")
+        with EventLog(log_dir, snapshot_every=args.snapshot_every) as log:
+            manager = ScoreManager(event_log=log)
+            started = time.perf_counter()
+            drive(manager, args.events, args.live_sessions, rng)
+            log.sync()
+            elapsed = time.perf_counter() - started
+            report["batched_events_per_s"] = round(args.events / elapsed)
+            report["log_bytes"] = sum(Path(path).stat().st_size for _, path in log.segments())
+            sessions = len(manager.user_sessions)
+            del manager
+
+        with EventLog(log_dir, snapshot_every=0) as log:
+            started = time.perf_counter()
+            replayed = sum(1 for _ in log.replay())
+            report["raw_replay_events_per_s"] = round(replayed / (time.perf_counter() - started))
+
+            # Snapshots moved aside, recovery replays the whole log
+            hidden = Path(directory) / "hidden"
+            hidden.mkdir()
+            snapshots = list(Path(log_dir).glob("snapshot-*.json"))
+            for path in snapshots:
+                path.rename(hidden / path.name)
+            started = time.perf_counter()
+            manager = ScoreManager(event_log=log)
+            report["full_replay_recovery_s"] = round(time.perf_counter() - started, 2)
+            assert len(manager.user_sessions) == sessions
+            del manager
+            for path in snapshots:
+                (hidden / path.name).rename(path)
+
+            started = time.perf_counter()
+            manager = ScoreManager(event_log=log)
+            report["snapshot_recovery_s"] = round(time.perf_counter() - started, 2)
+            report["events_after_snapshot"] = log.last_seq - log.latest_snapshot_seq()
+            assert len(manager.user_sessions) == sessions
+
+    for key, value in report.items():
+        print(f"{key:<32}{value:>14}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Size and speed of quiz packs against JSON
+
+Writes the same synthetic quizzes as JSON (plain and gzipped) and as quiz packs
+(uncompressed, gzip and zstd when zstandard is installed), then measures:
+- file size
+- write time
+- time to load every quiz
+- time to open the file and read random questions by index
+
+Usage:
+    python benchmarks/quiz_pack.py
+    python benchmarks/quiz_pack.py --quizzes 5000 --json quiz_pack.json
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.models import Quiz, QuizQuestion, DifficultyLevel  # noqa: E402
+from backend import quiz_pack  # noqa: E402
+from backend.quiz_pack import QuizPack, write_pack  # noqa: E402
+
+TOPICS = ["Python", "World History", "Astronomy", "Machine Learning", "Chemistry", "Music Theory"]
+SHARED_OPTIONS = ["True", "False", "All of the above", "None of the above"]
+
+
+def make_quizzes(count: int, questions_per_quiz: int, seed: int):
+    """Synthetic quizzes, with the repeated options and topics real quizzes have"""
+    rng = random.Random(seed)
+    quizzes = []
+    for quiz_index in range(count):
+        topic = rng.choice(TOPICS)
+        questions = []
+        for question_index in range(questions_per_quiz):
+            options = [f"{topic} answer {rng.randrange(400)}" for _ in range(2)] + rng.sample(SHARED_OPTIONS, 2)
+            rng.shuffle(options)
+            questions.append(QuizQuestion(
+                question=f"In {topic}, what happens in case {quiz_index}-{question_index}?",
+                options=options,
+                correct_answer=rng.randrange(4),
+                explanation=f"Case {quiz_index}-{question_index} is explained by {options[0].lower()}.",
+                difficulty=rng.choice(list(DifficultyLevel))
+            ))
+        quizzes.append(Quiz(topic=topic, questions=questions, total_questions=len(questions)))
+    return quizzes
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, round((time.perf_counter() - started) * 1000, 2)
+
+
+def bench_json(path: Path, quizzes, compressed: bool, reads: int, seed: int):
+    opener = gzip.open if compressed else open
+
+    def write():
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump([quiz.dict() for quiz in quizzes], f)
+
+    def load_all():
+        with opener(path, "rt", encoding="utf-8") as f:
+            return [Quiz(**quiz) for quiz in json.load(f)]
+
+    def random_reads():
+        # JSON has no index, reading one question means parsing the whole file
+        with opener(path, "rt", encoding="utf-8") as f:
+            questions = [question for quiz in json.load(f) for question in quiz["questions"]]
+        rng = random.Random(seed)
+        return [QuizQuestion(**questions[rng.randrange(len(questions))]) for _ in range(reads)]
+
+    _, write_ms = timed(write)
+    _, load_ms = timed(load_all)
+    _, reads_ms = timed(random_reads)
+    return {"bytes": path.stat().st_size, "write_ms": write_ms, "load_all_ms": load_ms, "random_reads_ms": reads_ms}
+
+
+def bench_pack(path: Path, quizzes, codec: str, reads: int, seed: int):
+    def load_all():
+        with QuizPack.open(str(path)) as pack:
+            return list(pack.quizzes())
+
+    def random_reads():
+        with QuizPack.open(str(path)) as pack:
+            rng = random.Random(seed)
+            return [pack.question(rng.randrange(len(pack))) for _ in range(reads)]
+
+    _, write_ms = timed(lambda: write_pack(str(path), quizzes, codec))
+    _, load_ms = timed(load_all)
+    _, reads_ms = timed(random_reads)
+    return {"bytes": path.stat().st_size, "write_ms": write_ms, "load_all_ms": load_ms, "random_reads_ms": reads_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare quiz packs with JSON")
+    parser.add_argument("--quizzes", type=int, default=2000, help="Quizzes to write")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per quiz")
+    parser.add_argument("--reads", type=int, default=100, help="Random questions read by index")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    quizzes = make_quizzes(args.quizzes, args.questions, args.seed)
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        report["json"] = bench_json(tmp / "quizzes.json", quizzes, False, args.reads, args.seed)
+        report["json+gzip"] = bench_json(tmp / "quizzes.json.gz", quizzes, True, args.reads, args.seed)
+        codecs = ["none", "gzip"] + (["zstd"] if quiz_pack.zstandard is not None else [])
+        for codec in codecs:
+            report[f"pack+{codec}"] = bench_pack(tmp / f"quizzes.{codec}.qpk", quizzes, codec, args.reads, args.seed)
+
+    print(f"{args.quizzes} quizzes, {args.quizzes * args.questions} questions, {args.reads} random reads\n")
+    print(f"{'format':<12}{'bytes':>12}{'write ms':>12}{'load all ms':>14}{'random reads ms':>18}")
+    for name, result in report.items():
+        print(f"{name:<12}{result['bytes']:>12}{result['write_ms']:>12}"
+              f"{result['load_all_ms']:>14}{result['random_reads_ms']:>18}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
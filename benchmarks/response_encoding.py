@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Bandwidth and CPU cost of API response encoding
+
+For the payloads of /quiz/jobs/{id} (a completed 20 question quiz),
+/quiz/session/{id} (a session with every answer) and /quiz/leaderboard,
+measures:
+- serialization time with FastAPI's default path (jsonable_encoder + json)
+  against LeanJSONResponse (orjson when installed)
+- body size and compression time as identity, gzip and brotli (when installed)
+- body size with a typical ?fields= selection
+
+Usage:
+    python benchmarks/response_encoding.py
+    python benchmarks/response_encoding.py --answers 50 --json encoding.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from backend.models import Quiz, QuizQuestion, DifficultyLevel  # noqa: E402
+from backend.score_manager import ScoreManager  # noqa: E402
+from backend.responses import LeanJSONResponse, select_fields  # noqa: E402
+from backend import compression  # noqa: E402
+
+FIELDS = {
+    "job": "status,result.session_id,result.quiz.questions.question,result.quiz.questions.options",
+    "session": "score,questions_answered,answers.is_correct",
+    "leaderboard": "leaderboard.topic,leaderboard.score",
+}
+
+
+def make_quiz(questions: int, rng: random.Random) -> Quiz:
+    return Quiz(
+        topic="Machine Learning Basics",
+        questions=[
+            QuizQuestion(
+                question=f"Which statement about gradient descent variant {index} is correct?",
+                options=[f"It converges because of property {rng.randrange(1000)} of the loss" for _ in range(4)],
+                correct_answer=rng.randrange(4),
+                explanation="Gradient descent follows the negative gradient, the step size sets how far. " * 2,
+                difficulty=rng.choice(list(DifficultyLevel))
+            )
+            for index in range(questions)
+        ],
+        total_questions=questions
+    )
+
+
+def make_payloads(answers: int, sessions: int, seed: int):
+    rng = random.Random(seed)
+    manager = ScoreManager()
+    quiz = make_quiz(max(answers, 20), rng)
+    job = {
+        "job_id": "3f1c0d2e-5b8a-4c71-9e0f-2a6d4b8c1e57",
+        "status": "completed",
+        "result": {"success": True, "quiz": quiz.redacted().dict(), "session_id": "s", "questions_from_bank": 0},
+    }
+
+    session_ids = [manager.create_session(quiz) for _ in range(sessions)]
+    for session_id in session_ids:
+        for index in range(rng.randrange(1, answers + 1)):
+            manager.submit_answer(session_id, index, rng.randrange(4))
+    full_session = session_ids[0]
+    for index in range(len(manager.user_sessions[full_session]["answers"]), answers):
+        manager.submit_answer(full_session, index, rng.randrange(4))
+
+    return {
+        "job": job,
+        "session": manager.get_session_summary(full_session),
+        "leaderboard": manager.get_leaderboard(sessions),
+    }
+
+
+def per_call_us(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return round((time.perf_counter() - started) / repeat * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API response encoding")
+    parser.add_argument("--answers", type=int, default=20, help="Answers in the session payload")
+    parser.add_argument("--sessions", type=int, default=100, help="Entries in the leaderboard payload")
+    parser.add_argument("--repeat", type=int, default=2000, help="Encodings timed per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    for name, payload in make_payloads(args.answers, args.sessions, args.seed).items():
+        if name == "leaderboard":
+            payload = {"leaderboard": payload}
+        lean_body = LeanJSONResponse(payload).body
+        selected_body = LeanJSONResponse(select_fields(payload, FIELDS[name])).body
+
+        result = {
+            "default_encode_us": per_call_us(lambda: JSONResponse(jsonable_encoder(payload)).body, args.repeat),
+            "lean_encode_us": per_call_us(lambda: LeanJSONResponse(payload).body, args.repeat),
+            "identity_bytes": len(lean_body),
+            "fields_bytes": len(selected_body),
+        }
+        result["gzip_bytes"] = len(zlib.compress(lean_body, 6))
+        result["gzip_us"] = per_call_us(lambda: zlib.compress(lean_body, 6), args.repeat)
+        if compression.brotli is not None:
+            result["brotli_bytes"] = len(compression.brotli.compress(lean_body, quality=4))
+            result["brotli_us"] = per_call_us(lambda: compression.brotli.compress(lean_body, quality=4), args.repeat)
+        report[name] = result
+
+    print(f"{'payload':<14}" + "".join(f"{key:>19}" for key in next(iter(report.values()))))
+    for name, result in report.items():
+        print(f"{name:<14}" + "".join(f"{value:>19}" for value in result.values()))
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Fan-out benchmark for multiplayer quiz rooms
+
+Starts a backend with the fake LLM (or uses --url), opens a room from a
+generated quiz and connects a host and --players WebSocket players. For every
+question it measures:
+- the broadcast latency, from the host's "next" to each player receiving the question
+- the reveal latency, from the last answer to each player receiving the reveal
+- the standings messages each player received, against the answers sent
+
+Needs a uvicorn with WebSocket support (uvicorn[standard], or the websockets package).
+
+Usage:
+    python benchmarks/room_fanout.py
+    python benchmarks/room_fanout.py --players 2000 --questions 5 --json fanout.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+SERVER_BOOTSTRAP = """
+import sys, uvicorn
+uvicorn.run("backend.main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning",
+            ws_max_queue=64)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Backend exited during startup")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=1) as response:
+                if json.loads(response.read())["status"] == "healthy":
+                    return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"Backend did not become healthy within {timeout}s")
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+    return {"p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": round(samples[-1] * 1000, 2)}
+
+
+class Player:
+    def __init__(self, socket, rng: random.Random):
+        self.socket = socket
+        self.rng = rng
+        self.received = {}
+        self.standings_messages = 0
+
+    async def run(self, answer_delay: float):
+        async for message in self.socket:
+            data = json.loads(message.data)
+            now = time.perf_counter()
+            if data["type"] == "question":
+                self.received[("question", data["question_index"])] = now
+                await asyncio.sleep(self.rng.random() * answer_delay)
+                await self.socket.send_str(json.dumps({
+                    "type": "answer",
+                    "question_index": data["question_index"],
+                    "selected_option": self.rng.randrange(4),
+                }))
+            elif data["type"] == "reveal":
+                self.received[("reveal", data["question_index"])] = now
+            elif data["type"] == "standings":
+                self.standings_messages += 1
+            elif data["type"] == "finished":
+                return
+
+
+async def create_room(session: aiohttp.ClientSession, base_url: str, questions: int):
+    async with session.post(f"{base_url}/quiz/generate", json={
+        "topic": "Distributed Systems", "num_questions": questions, "difficulty": "medium"
+    }) as response:
+        job = await response.json()
+    while True:
+        async with session.get(f"{base_url}{job['status_url']}") as response:
+            status = await response.json()
+        if status["status"] == "completed":
+            break
+        if status["status"] == "failed":
+            raise RuntimeError(f"Generation failed: {status}")
+        await asyncio.sleep(0.05)
+    async with session.post(f"{base_url}/rooms", json={"job_id": job["job_id"]}) as response:
+        return await response.json()
+
+
+async def run_benchmark(base_url: str, args) -> dict:
+    ws_url = base_url.replace("http", "ws", 1)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        room = await create_room(session, base_url, args.questions)
+        room_url = f"{ws_url}{room['websocket_url']}"
+
+        host = await session.ws_connect(f"{room_url}?host_token={room['host_token']}")
+        await host.receive_json()
+
+        started = time.perf_counter()
+        sockets = await asyncio.gather(*(
+            session.ws_connect(f"{room_url}?name=player{index}") for index in range(args.players)
+        ))
+        connect_seconds = time.perf_counter() - started
+        for player_socket in sockets:
+            await player_socket.receive_json()
+
+        rng = random.Random(args.seed)
+        players = [Player(player_socket, random.Random(rng.random())) for player_socket in sockets]
+        tasks = [asyncio.create_task(player.run(args.answer_delay)) for player in players]
+
+        broadcast, reveal = [], []
+        for index in range(args.questions):
+            sent = time.perf_counter()
+            await host.send_str(json.dumps({"type": "next"}))
+            # Everyone answering reveals the question early, the host sees the reveal too
+            async for message in host:
+                data = json.loads(message.data)
+                if data["type"] == "reveal":
+                    revealed = time.perf_counter()
+                    break
+            await asyncio.sleep(0.1)
+            broadcast += [player.received[("question", index)] - sent for player in players]
+            reveal += [player.received[("reveal", index)] - revealed for player in players
+                       if ("reveal", index) in player.received]
+
+        await host.send_str(json.dumps({"type": "end"}))
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=30)
+        await asyncio.gather(*(player.socket.close() for player in players), host.close())
+
+    return {
+        "players": args.players,
+        "questions": args.questions,
+        "connect_all_s": round(connect_seconds, 3),
+        "question_broadcast": percentiles(broadcast),
+        "reveal_broadcast": percentiles(reveal),
+        "standings_messages_per_player": statistics.mean(player.standings_messages for player in players),
+        "answers_per_question": args.players,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multiplayer room fan-out")
+    parser.add_argument("--players", type=int, default=500, help="WebSocket players in the room")
+    parser.add_argument("--questions", type=int, default=3, help="Questions played")
+    parser.add_argument("--answer-delay", type=float, default=1.0, help="Players answer within this many seconds")
+    parser.add_argument("--url", help="Use a running backend instead of starting one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    process = tmp = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        tmp = tempfile.TemporaryDirectory()
+        env = {
+            **os.environ,
+            "QUIZBOT_FAKE_LLM": "1",
+            "QUIZBOT_FAKE_LLM_LATENCY_MS": "10",
+            "QUIZBOT_QUESTION_BANK": "off",
+            "QUIZBOT_RATE_LIMIT": "off",
+            "QUIZBOT_JOB_DB": str(Path(tmp.name) / "jobs.sqlite3"),
+        }
+        process = subprocess.Popen(
+            [sys.executable, "-c", SERVER_BOOTSTRAP, str(port)],
+            cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        wait_healthy(base_url, process)
+
+    try:
+        report = asyncio.run(run_benchmark(base_url, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+            tmp.cleanup()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
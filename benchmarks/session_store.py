@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Cost of /quiz/answer on each session store
+
+Answers --answers questions spread over --sessions sessions through a
+ScoreManager backed by the in-memory store, the SQLite store (one write per
+answer) and the write-behind SQLite store, and reports the answer throughput
+and p50/p99 submit_answer latency. For the write-behind store the time
+close() takes to flush what is left is reported separately.
+
+Usage:
+    python benchmarks/session_store.py
+    python benchmarks/session_store.py --answers 50000 --json session_store.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.models import Quiz, QuizQuestion, DifficultyLevel  # noqa: E402
+from backend.score_manager import ScoreManager  # noqa: E402
+from backend.session_store import create_session_store  # noqa: E402
+
+QUESTIONS = 20
+
+
+def make_quiz(rng: random.Random) -> Quiz:
+    return Quiz(
+        topic="Databases",
+        questions=[
+            QuizQuestion(
+                question=f"What does isolation level {index} prevent?",
+                options=[f"Anomaly {option}" for option in range(4)],
+                correct_answer=rng.randrange(4),
+                explanation="Stricter isolation levels rule out more anomalies.",
+                difficulty=rng.choice(list(DifficultyLevel))
+            )
+            for index in range(QUESTIONS)
+        ],
+        total_questions=QUESTIONS
+    )
+
+
+def run(store, answers: int, sessions: int, rng: random.Random) -> dict:
+    manager = ScoreManager(store)
+    quiz = make_quiz(rng)
+    session_ids = [manager.create_session(quiz) for _ in range(sessions)]
+    latencies = []
+    started = time.perf_counter()
+    for number in range(answers):
+        session_id = session_ids[number % sessions]
+        sent = time.perf_counter()
+        # Questions in order, a question answered twice is not written again
+        manager.submit_answer(session_id, number // sessions % QUESTIONS, rng.randrange(4))
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "answers_per_s": round(answers / elapsed),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+    }
+    if hasattr(store, "close"):
+        started = time.perf_counter()
+        store.close()
+        result["close_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the session stores")
+    parser.add_argument("--answers", type=int, default=20000, help="Answers submitted per store")
+    parser.add_argument("--sessions", type=int, default=1000, help="Sessions the answers are spread over")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            "memory": lambda: create_session_store("memory"),
+            "sqlite": lambda: create_session_store(f"sqlite:///{directory}/sync.sqlite3"),
+            "write_behind": lambda: create_session_store(f"sqlite:///{directory}/behind.sqlite3", write_behind=True),
+        }
+        for name, build in stores.items():
+            report[name] = run(build(), args.answers, args.sessions, random.Random(args.seed))
+
+    print(f"{'store':<14}" + "".join(f"{key:>16}" for key in report["write_behind"]))
+    for name, result in report.items():
+        print(f"{name:<14}" + "".join(f"{result.get(key, '-'):>16}" for key in report["write_behind"]))
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the question similarity index
+
+Builds a MinHashIndex over synthetic questions and measures:
+- bulk insert throughput (add_many, used to load an existing collection)
+- single insert throughput with the duplicate check (add_if_new, the serving path)
+- query throughput and the duplicate detection rate for rephrased questions
+
+Usage:
+    python benchmarks/similarity_index.py
+    python benchmarks/similarity_index.py --questions 100000 --json similarity.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.similarity import MinHashIndex  # noqa: E402
+
+TEMPLATES = [
+    "What is the role of {0} in {1}?",
+    "How does {0} affect {1} when using {2}?",
+    "Which statement about {0} and {2} in {1} is correct?",
+    "Why would a developer choose {0} over {2} for {1}?",
+]
+
+
+def make_questions(count: int, vocabulary: int, seed: int):
+    """Synthetic questions built from random words, mostly distinct from each other"""
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(vocabulary)]
+    return [
+        rng.choice(TEMPLATES).format(*rng.sample(words, 3)) + " " + " ".join(rng.sample(words, 4))
+        for _ in range(count)
+    ]
+
+
+def rephrase(question: str) -> str:
+    """Same question with different casing, punctuation and stopwords"""
+    return "So, " + question.upper().replace("?", " ?") + " Explain it."
+
+
+def rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the question similarity index")
+    parser.add_argument("--questions", type=int, default=1_000_000, help="Questions loaded in bulk")
+    parser.add_argument("--inserts", type=int, default=20_000, help="Questions inserted one at a time")
+    parser.add_argument("--queries", type=int, default=20_000, help="Queries to run")
+    parser.add_argument("--vocabulary", type=int, default=50_000, help="Distinct words in the questions")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions + args.inserts, args.vocabulary, args.seed)
+    bulk, singles = questions[:args.questions], questions[args.questions:]
+    index = MinHashIndex()
+    report = {"questions": args.questions}
+
+    started = time.perf_counter()
+    for offset in range(0, len(bulk), 100_000):
+        index.add_many(bulk[offset:offset + 100_000])
+    elapsed = time.perf_counter() - started
+    report["bulk_insert_per_s"] = rate(len(bulk), elapsed)
+    report["index_memory_mb"] = round(index.nbytes / 2**20, 1)
+
+    started = time.perf_counter()
+    added = sum(index.add_if_new(question) is not None for question in singles)
+    elapsed = time.perf_counter() - started
+    report["insert_if_new_per_s"] = rate(len(singles), elapsed)
+    report["insert_false_duplicates"] = len(singles) - added
+
+    rng = random.Random(args.seed + 1)
+    probes = [rephrase(question) for question in rng.sample(bulk, min(args.queries, len(bulk)))]
+    started = time.perf_counter()
+    found = sum(bool(index.query(probe)) for probe in probes)
+    elapsed = time.perf_counter() - started
+    report["query_per_s"] = rate(len(probes), elapsed)
+    report["rephrased_duplicates_found"] = round(found / len(probes), 4)
+
+    for key, value in report.items():
+        print(f"{key:<30}{value:>14}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the FastAPI backend
+
+Measures, over several fresh processes:
+- the import time of backend.main (python -X importtime)
+- the time until /health first answers (the server accepts traffic)
+- the time until /health reports "healthy" (the quiz generator is warm)
+
+The "eager" mode builds the QuizGenerator before uvicorn starts, which is what
+the old synchronous startup event did, so both modes can be compared.
+
+Usage:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+SERVER_BOOTSTRAP = """
+import sys, uvicorn
+if sys.argv[2] == "eager":
+    from backend.quiz_generator import QuizGenerator
+    QuizGenerator()
+uvicorn.run("backend.main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time_ms(env: dict) -> float:
+    """Cumulative import time of backend.main in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    for line in result.stderr.splitlines():
+        if line.rstrip().endswith("| backend.main"):
+            return int(line.split("|")[1]) / 1000
+    raise RuntimeError(f"backend.main import failed:\n{result.stderr[-2000:]}")
+
+
+def poll_health(port: int):
+    """Return the /health status, or None while the server is not listening"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+            return json.loads(response.read())["status"]
+    except OSError:
+        return None
+
+
+def server_start_ms(mode: str, env: dict, timeout: float = 60.0):
+    """Start a server and return (ms to first /health answer, ms to healthy)"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER_BOOTSTRAP, str(port), mode],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first_response = ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            status = poll_health(port)
+            elapsed = (time.perf_counter() - started) * 1000
+            if status is not None and first_response is None:
+                first_response = elapsed
+            if status == "healthy":
+                ready = elapsed
+                break
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    if ready is None:
+        raise RuntimeError(f"Server in {mode} mode did not become healthy within {timeout}s")
+    return first_response, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "benchmark-dummy-key"),
+            "QUIZBOT_JOB_DB": str(Path(tmp) / "jobs.sqlite3"),
+        }
+
+        imports = [import_time_ms(env) for _ in range(args.runs)]
+        report = {"import_backend_main_ms": round(statistics.median(imports), 1)}
+        print(f"import backend.main: {report['import_backend_main_ms']:.1f} ms")
+
+        print(f"\n{'mode':<8}{'first /health ms':>18}{'healthy ms':>12}")
+        for mode in ("lazy", "eager"):
+            samples = [server_start_ms(mode, env) for _ in range(args.runs)]
+            report[mode] = {
+                "first_response_ms": round(statistics.median(s[0] for s in samples), 1),
+                "healthy_ms": round(statistics.median(s[1] for s in samples), 1),
+            }
+            print(f"{mode:<8}{report[mode]['first_response_ms']:>18.1f}{report[mode]['healthy_ms']:>12.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import pytest
+from backend.models import DifficultyLevel, Quiz, QuizQuestion
+
+# backend.main builds its stores when imported: keep them out of the working tree and offline
+STATE_DIRECTORY = tempfile.mkdtemp(prefix="quizbot-tests-")
+os.environ.update({
+    "QUIZBOT_FAKE_LLM": "1",
+    "QUIZBOT_FAKE_LLM_LATENCY_MS": "1",
+    "QUIZBOT_JOB_DB": os.path.join(STATE_DIRECTORY, "jobs.sqlite3"),
+    "QUIZBOT_QUESTION_BANK": os.path.join(STATE_DIRECTORY, "questions.sqlite3"),
+    "QUIZBOT_SESSION_STORE": "memory",
+    "QUIZBOT_RATE_LIMIT": "off",
+    "QUIZBOT_IDEMPOTENCY": "memory",
+})
+
+
+@pytest.fixture
+def make_quiz():
+    """Build a quiz of num_questions questions whose correct answer is option index % 4"""
+    def build(num_questions: int = 5, topic: str = "Testing") -> Quiz:
+        questions = [
+            QuizQuestion(
+                question=f"Question {index} about {topic}?",
+                options=[f"Option {option}" for option in "ABCD"],
+                correct_answer=index % 4,
+                explanation=f"Explanation {index}",
+                difficulty=list(DifficultyLevel)[index % 3]
+            )
+            for index in range(num_questions)
+        ]
+        return Quiz(topic=topic, questions=questions, total_questions=num_questions)
+    return build
+
+
+@pytest.fixture
+def client():
+    """TestClient of the backend app, its startup and shutdown handlers run around the test"""
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+Query latency benchmark for the quiz views
+
+Seeds a scratch database with quizzes, questions, sessions and answers, then
+times the queries issued by quiz_detail, submit_answer, quiz_results and
+quiz_status and reports p50/p99 latencies.
+
+Usage:
+    python benchmarks/query_latency.py --answers 1000000
+    python benchmarks/query_latency.py --answers 1000000 --compare
+
+--compare runs every query twice: once with the composite indexes from
+migration 0002 in place and once with them dropped. To compare the UUID
+storage change as well, run the script on a checkout from before that
+migration with the same --db path removed.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizbot.settings')
+
+import django
+
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from quiz.models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+
+
+QUESTIONS_PER_QUIZ = 10
+BATCH_SIZE = 5000
+
+# Indexes added by migration 0002 that --compare drops for the "before" run
+COMPOSITE_INDEXES = [
+    (QuizQuestion, 'quiz_question_quiz_order_idx'),
+    (QuizAnswer, 'quiz_answer_session_time_idx'),
+]
+
+
+def use_scratch_database(path: Path) -> None:
+    """Point the default connection at a scratch SQLite file"""
+    connection.close()
+    connection.settings_dict['NAME'] = str(path)
+
+
+def seed(num_answers: int) -> None:
+    """Create enough fully answered quizzes to reach num_answers answers"""
+    num_quizzes = max(1, num_answers // QUESTIONS_PER_QUIZ)
+    existing = Quiz.objects.count()
+    if existing >= num_quizzes:
+        print(f"Using existing data: {existing} quizzes")
+        return
+
+    print(f"Seeding {num_quizzes - existing} quizzes / {(num_quizzes - existing) * QUESTIONS_PER_QUIZ} answers...")
+    started = time.perf_counter()
+    for offset in range(existing, num_quizzes, BATCH_SIZE // QUESTIONS_PER_QUIZ):
+        count = min(BATCH_SIZE // QUESTIONS_PER_QUIZ, num_quizzes - offset)
+        with transaction.atomic():
+            quizzes = Quiz.objects.bulk_create([
+                Quiz(topic=f"Topic {(offset + i) % 500}", difficulty='medium', total_questions=QUESTIONS_PER_QUIZ)
+                for i in range(count)
+            ])
+            questions = QuizQuestion.objects.bulk_create([
+                QuizQuestion(
+                    quiz=quiz,
+                    question=f"Question {order + 1} about {quiz.topic}?",
+                    option_a='Option A',
+                    option_b='Option B',
+                    option_c='Option C',
+                    option_d='Option D',
+                    correct_answer=order % 4,
+                    explanation='Seeded explanation',
+                    difficulty='medium',
+                    order=order
+                )
+                for quiz in quizzes for order in range(QUESTIONS_PER_QUIZ)
+            ])
+            sessions = QuizSession.objects.bulk_create([
+                QuizSession(
+                    quiz=quiz,
+                    current_score=QUESTIONS_PER_QUIZ // 2,
+                    current_question_index=QUESTIONS_PER_QUIZ,
+                    is_completed=True
+                )
+                for quiz in quizzes
+            ])
+            QuizStatistics.objects.bulk_create([
+                QuizStatistics(session=session, total_questions_answered=QUESTIONS_PER_QUIZ)
+                for session in sessions
+            ])
+            QuizAnswer.objects.bulk_create([
+                QuizAnswer(
+                    session=sessions[idx // QUESTIONS_PER_QUIZ],
+                    question=question,
+                    selected_option=random.randrange(4),
+                    is_correct=random.random() < 0.5,
+                    score_change=1
+                )
+                for idx, question in enumerate(questions)
+            ])
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+
+def view_queries():
+    """Return the queries issued per request by each view, keyed by view name"""
+    def detail(session_id, question_index):
+        quiz_session = QuizSession.objects.select_related('quiz').get(quiz__session_id=session_id)
+        list(quiz_session.quiz.questions.all()[question_index:question_index + 1])
+
+    def submit(session_id, question_index):
+        quiz_session = QuizSession.objects.select_related('quiz').get(quiz__session_id=session_id)
+        question = quiz_session.quiz.questions.all()[question_index]
+        QuizAnswer.objects.filter(session=quiz_session, question=question).first()
+
+    def results(session_id, question_index):
+        quiz_session = QuizSession.objects.select_related('quiz', 'statistics').get(quiz__session_id=session_id)
+        list(quiz_session.answers.select_related('question').order_by('question__order'))
+
+    def history(session_id, question_index):
+        quiz_session = QuizSession.objects.only('id').get(quiz__session_id=session_id)
+        list(quiz_session.answers.order_by('answered_at')[:QUESTIONS_PER_QUIZ])
+
+    def status(session_id, question_index):
+        QuizSession.objects.select_related('quiz', 'statistics').get(quiz__session_id=session_id)
+
+    return {
+        'quiz_detail': detail,
+        'submit_answer': submit,
+        'quiz_results': results,
+        'answer_history': history,
+        'quiz_status': status,
+    }
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(samples: int, session_ids) -> dict:
+    """Time each view's queries over random sessions and return latency stats in ms"""
+    results = {}
+    for name, run in view_queries().items():
+        timings = []
+        for _ in range(samples):
+            session_id = random.choice(session_ids)
+            question_index = random.randrange(QUESTIONS_PER_QUIZ)
+            started = time.perf_counter()
+            run(session_id, question_index)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(percentile(timings, 0.50), 4),
+            'p99_ms': round(percentile(timings, 0.99), 4),
+            'mean_ms': round(statistics.fmean(timings), 4),
+        }
+    return results
+
+
+def set_composite_indexes(enabled: bool) -> None:
+    """Create or drop the composite indexes added by migration 0002"""
+    with connection.schema_editor() as schema_editor:
+        for model, index_name in COMPOSITE_INDEXES:
+            index = next(i for i in model._meta.indexes if i.name == index_name)
+            if enabled:
+                schema_editor.add_index(model, index)
+            else:
+                schema_editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def print_table(title: str, results: dict) -> None:
+    print(f"\n{title}")
+    print(f"{'view':<16}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['mean_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz view queries")
+    parser.add_argument('--answers', type=int, default=1_000_000, help="Number of answers to seed")
+    parser.add_argument('--samples', type=int, default=2000, help="Timed requests per view")
+    parser.add_argument('--db', type=Path, default=BASE_DIR / 'benchmarks' / 'query_latency.sqlite3',
+                        help="Scratch SQLite database (reused between runs)")
+    parser.add_argument('--compare', action='store_true', help="Also measure with the composite indexes dropped")
+    parser.add_argument('--json', type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    use_scratch_database(args.db)
+    call_command('migrate', verbosity=0)
+    seed(args.answers)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    session_ids = list(Quiz.objects.values_list('session_id', flat=True))
+    report = {'answers': QuizAnswer.objects.count(), 'samples': args.samples}
+
+    report['after'] = measure(args.samples, session_ids)
+    print_table("With composite indexes", report['after'])
+
+    if args.compare:
+        set_composite_indexes(False)
+        try:
+            report['before'] = measure(args.samples, session_ids)
+        finally:
+            set_composite_indexes(True)
+        print_table("Without composite indexes", report['before'])
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
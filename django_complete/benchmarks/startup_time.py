@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Startup time benchmark for manage.py commands
+
+Runs each command under ``python -X importtime`` and reports the median wall
+time, the total import time and the slowest top-level imports. The "eager"
+mode forces the AI service to build its LLM client before the command runs,
+which is what every command paid when the service was created at import time,
+so the two modes show the gain from lazy initialization.
+
+Usage:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10 --commands check "showmigrations quiz"
+"""
+
+import argparse
+import json
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_COMMANDS = ['check', 'showmigrations quiz', 'migrate --check']
+
+# Runs manage.py after building the LLM client, like the old import-time construction did
+EAGER_BOOTSTRAP = """
+import os, runpy, sys
+sys.argv = ['manage.py'] + sys.argv[1:]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizbot.settings')
+import django
+django.setup()
+from quiz.ai_service import ai_quiz_service
+ai_quiz_service.setup_ai()
+runpy.run_path('manage.py', run_name='__main__')
+"""
+
+
+def parse_importtime(stderr: str):
+    """Return (total self time in ms, top-level imports sorted by cumulative ms)"""
+    total_us = 0
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        # Top-level imports are indented by a single space
+        if name.startswith(' ') and not name.startswith('  '):
+            top_level.append((name.strip(), int(cumulative_us) / 1000))
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, top_level
+
+
+def run_command(command: str, eager: bool):
+    """Run one manage.py command and return (wall ms, import ms, top-level imports)"""
+    if eager:
+        argv = [sys.executable, '-X', 'importtime', '-c', EAGER_BOOTSTRAP] + shlex.split(command)
+    else:
+        argv = [sys.executable, '-X', 'importtime', 'manage.py'] + shlex.split(command)
+
+    started = time.perf_counter()
+    result = subprocess.run(argv, cwd=BASE_DIR, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    import_ms, top_level = parse_importtime(result.stderr)
+    return wall_ms, import_ms, top_level
+
+
+def measure(command: str, eager: bool, runs: int) -> dict:
+    """Median timings of a command over several runs"""
+    run_command(command, eager)  # Warm the bytecode and filesystem caches
+    samples = [run_command(command, eager) for _ in range(runs)]
+    return {
+        'wall_ms': round(statistics.median(sample[0] for sample in samples), 1),
+        'import_ms': round(statistics.median(sample[1] for sample in samples), 1),
+        'slowest_imports': [
+            {'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in samples[-1][2][:5]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark manage.py startup time")
+    parser.add_argument('--runs', type=int, default=5, help="Runs per command and mode")
+    parser.add_argument('--commands', nargs='+', default=DEFAULT_COMMANDS, help="manage.py commands to time")
+    parser.add_argument('--json', type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    print(f"{'command':<22}{'mode':<8}{'wall ms':>10}{'import ms':>11}")
+    for command in args.commands:
+        report[command] = {}
+        for mode in ('lazy', 'eager'):
+            stats = measure(command, mode == 'eager', args.runs)
+            report[command][mode] = stats
+            print(f"{command:<22}{mode:<8}{stats['wall_ms']:>10.1f}{stats['import_ms']:>11.1f}")
+
+        lazy, eager = report[command]['lazy'], report[command]['eager']
+        print(f"{'':<22}{'saved':<8}{eager['wall_ms'] - lazy['wall_ms']:>10.1f}"
+              f"{eager['import_ms'] - lazy['import_ms']:>11.1f}")
+        slowest = ', '.join(f"{item['module']} {item['cumulative_ms']:.0f}ms" for item in lazy['slowest_imports'][:3])
+        print(f"{'':<22}slowest lazy imports: {slowest}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,102 @@
-from django.contrib import admin
-from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .cache import forget_quiz
+from .maintenance import purge_quizzes, recompute_statistics
+from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, GenerationJob
+
+
+def estimated_row_count(model):
+    """Cheap estimate of a table's row count: PostgreSQL's planner statistics, else the largest primary key"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table was first vacuumed or analyzed
+        if row and row[0] >= 0:
+            return int(row[0])
+        return None
+    # Read from the end of the primary key index; deleted rows make it an overestimate
+    return model.objects.aggregate(largest=Max('pk'))['largest'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator counting unfiltered big tables from an estimate rather than COUNT(*)
+    Deleted rows make the estimate too high, so a page coming back short switches to the exact count and a page
+    past the last row shows the last page instead of an invalid page error
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > settings.QUIZ_ADMIN_EXACT_COUNT_LIMIT:
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        # The first page is left lazy, bulk actions posted from it never read its rows
+        if self.estimated and page.number > 1 and len(page) < self.per_page:
+            self.estimated = False
+            self.__dict__['count'] = super().count
+            self.__dict__.pop('num_pages', None)
+            if page.number > self.num_pages:
+                page = super().page(self.num_pages)
+        return page
+
+    def get_elided_page_range(self, number=1, **kwargs):
+        # The changelist asks for the links around the page number requested, maybe past the counted pages
+        return super().get_elided_page_range(min(int(number), self.num_pages), **kwargs)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin of a table that grows with every quiz played"""
+    paginator = EstimatedCountPaginator
+    # The "N selected of M" total of filtered lists costs another count of the whole table
+    show_full_result_count = False
+
+
+class AgeListFilter(admin.SimpleListFilter):
+    """Quizzes older than a number of days, to purge them"""
+    title = 'age'
+    parameter_name = 'older_than'
+
+    def lookups(self, request, model_admin):
+        return [('30', 'Older than 30 days'), ('90', 'Older than 90 days'), ('365', 'Older than a year')]
+
+    def queryset(self, request, queryset):
+        if self.value() in ('30', '90', '365'):
+            return queryset.filter(created_at__lt=timezone.now() - timedelta(days=int(self.value())))
+        return queryset
 
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
+class QuizAdmin(LargeTableAdmin):
     list_display = ['topic', 'difficulty', 'total_questions', 'created_at']
-    list_filter = ['difficulty', 'created_at']
+    list_filter = ['difficulty', AgeListFilter, 'created_at']
     search_fields = ['topic', 'session_id']
     readonly_fields = ['session_id', 'created_at', 'updated_at']
+    actions = ['purge_selected']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        forget_quiz(obj.session_id)
+
+    @admin.action(description='Purge selected quizzes with their questions, sessions and answers', permissions=['delete'])
+    def purge_selected(self, request, queryset):
+        deleted = purge_quizzes(queryset, settings.QUIZ_ADMIN_BATCH_SIZE)
+        self.message_user(request, f'Purged {deleted} quizzes.', messages.SUCCESS)
 
 
 class QuizQuestionInline(admin.TabularInline):
@@ -18,34 +107,65 @@ class QuizQuestionInline(admin.TabularInline):
 
 
 @admin.register(QuizQuestion)
-class QuizQuestionAdmin(admin.ModelAdmin):
+class QuizQuestionAdmin(LargeTableAdmin):
     list_display = ['quiz', 'question_preview', 'correct_answer', 'difficulty', 'order']
     list_filter = ['difficulty', 'quiz__difficulty']
+    list_select_related = ['quiz']
     search_fields = ['question', 'quiz__topic']
-    
+    raw_id_fields = ['quiz']
+
+    # Quizzes are cached whole, an edited question shows once its quiz is loaded again
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        forget_quiz(obj.quiz.session_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        forget_quiz(obj.quiz.session_id)
+
     def question_preview(self, obj):
         return obj.question[:50] + "..." if len(obj.question) > 50 else obj.question
     question_preview.short_description = "Question"
 
 
 @admin.register(QuizSession)
-class QuizSessionAdmin(admin.ModelAdmin):
+class QuizSessionAdmin(LargeTableAdmin):
     list_display = ['quiz', 'current_score', 'current_question_index', 'is_completed', 'started_at']
     list_filter = ['is_completed', 'started_at']
+    list_select_related = ['quiz']
     readonly_fields = ['started_at', 'last_activity']
+    raw_id_fields = ['quiz']
 
 
 @admin.register(QuizAnswer)
-class QuizAnswerAdmin(admin.ModelAdmin):
+class QuizAnswerAdmin(LargeTableAdmin):
     list_display = ['session', 'question_preview', 'selected_option', 'is_correct', 'answered_at']
     list_filter = ['is_correct', 'answered_at']
-    
+    list_select_related = ['session__quiz', 'question']
+    raw_id_fields = ['session', 'question']
+
     def question_preview(self, obj):
         return obj.question.question[:30] + "..." if len(obj.question.question) > 30 else obj.question.question
     question_preview.short_description = "Question"
 
 
 @admin.register(QuizStatistics)
-class QuizStatisticsAdmin(admin.ModelAdmin):
+class QuizStatisticsAdmin(LargeTableAdmin):
     list_display = ['session', 'total_questions_answered', 'correct_answers', 'percentage']
+    list_select_related = ['session__quiz']
     readonly_fields = ['total_questions_answered', 'correct_answers', 'incorrect_answers', 'percentage']
+    raw_id_fields = ['session']
+    actions = ['recompute_selected']
+
+    @admin.action(description='Recompute selected statistics from the answers', permissions=['change'])
+    def recompute_selected(self, request, queryset):
+        updated = recompute_statistics(queryset, settings.QUIZ_ADMIN_BATCH_SIZE)
+        self.message_user(request, f'Recomputed {updated} statistics.', messages.SUCCESS)
+
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(LargeTableAdmin):
+    list_display = ['topic', 'num_questions', 'difficulty', 'status', 'priority', 'created_at']
+    list_filter = ['status', 'difficulty', 'created_at']
+    search_fields = ['topic']
+    readonly_fields = ['quiz', 'error', 'created_at', 'updated_at']
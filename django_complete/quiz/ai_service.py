@@ -4,15 +4,15 @@ Integrates LangChain with Google Generative AI for quiz creation
 """
 
 import os
+import re
+import json
+import threading
 from typing import List, Dict, Any
 from django.conf import settings
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.output_parsers import PydanticOutputParser
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import HumanMessage
 from pydantic import BaseModel, Field
 
+from .model_router import ModelRouter
+
 
 class QuizQuestionPydantic(BaseModel):
     """Pydantic model for quiz question validation"""
@@ -31,13 +31,25 @@ class QuizPydantic(BaseModel):
     topic: str = Field(description="Quiz topic")
     difficulty: str = Field(description="Overall difficulty level")
     questions: List[QuizQuestionPydantic] = Field(description="List of quiz questions")
+    is_fallback: bool = Field(default=False, description="Placeholder quiz built because generation failed")
 
 
 class AIQuizService:
     """Service class for AI-powered quiz generation"""
     
     def __init__(self):
-        self.setup_ai()
+        # The LLM clients are built on first use so importing this module stays cheap
+        self._router = None
+        self._lock = threading.Lock()
+    
+    @property
+    def router(self):
+        """Model tiers quizzes are generated with, created on first use"""
+        if self._router is None:
+            with self._lock:
+                if self._router is None:
+                    self.setup_ai()
+        return self._router
     
     def setup_ai(self):
         """Initialize Google Generative AI"""
@@ -51,22 +63,36 @@ class AIQuizService:
             if not api_key:
                 raise ValueError("Google Generative AI API key not found in settings or environment")
             
-            genai.configure(api_key=api_key)
+            # Heavy SDK imports, deferred until a quiz is actually generated
+            import google.generativeai as genai
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            from langchain.output_parsers import PydanticOutputParser
             
-            # Initialize LangChain LLM
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=api_key,
-                temperature=0.7
-            )
+            genai.configure(api_key=api_key)
             
             # Setup output parser
             self.output_parser = PydanticOutputParser(pydantic_object=QuizPydantic)
             
+            # One LangChain LLM per tier, easy and short quizzes go to the fastest one
+            self._router = ModelRouter.from_spec(
+                lambda model, temperature: ChatGoogleGenerativeAI(
+                    model=model,
+                    google_api_key=api_key,
+                    temperature=temperature
+                ),
+                tiers=settings.QUIZ_MODEL_TIERS,
+                routes=settings.QUIZ_MODEL_ROUTES,
+                short_quiz_questions=settings.QUIZ_SHORT_QUIZ_QUESTIONS
+            )
+            
         except Exception as e:
             print(f"Error setting up AI service: {e}")
             raise
     
+    def model_stats(self):
+        """Latency and success rate of each model tier, empty until the first generation"""
+        return self._router.stats() if self._router is not None else []
+    
     def generate_quiz_prompt(self, topic: str, difficulty: str, num_questions: int) -> str:
         """Generate the prompt for quiz creation"""
         
@@ -117,36 +143,48 @@ Generate the quiz now:"""
             # Create the prompt
             prompt = self.generate_quiz_prompt(topic, difficulty, num_questions)
             
-            # Generate response using LLM directly
-            response = self.llm.invoke(prompt)
+            # Answers that do not parse go to the next stronger model
+            return self.router.generate(prompt, difficulty, num_questions, self.parse_quiz_response)
             
-            # Parse the response content
-            if hasattr(response, 'content'):
-                content = response.content
-            else:
-                content = str(response)
-            
-            # Try to extract JSON from the response
-            import json
-            import re
+        except Exception as e:
+            print(f"Error generating quiz: {e}")
+            # Every tier failed, return a fallback quiz structure
+            return self.create_fallback_quiz(topic, difficulty, num_questions)
+    
+    async def agenerate_quiz(self, topic: str, difficulty: str = "medium", num_questions: int = 10) -> QuizPydantic:
+        """Generate a complete quiz using AI without blocking the event loop"""
+        try:
+            prompt = self.generate_quiz_prompt(topic, difficulty, num_questions)
             
-            # Look for JSON object in the response
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                quiz_data = json.loads(json_str)
-                
-                # Validate and create QuizPydantic object
-                return QuizPydantic(**quiz_data)
-            else:
-                # If no JSON found, return fallback
-                return self.create_fallback_quiz(topic, difficulty, num_questions)
+            # Async LLM calls, the worker is free to serve other requests meanwhile
+            return await self.router.agenerate(prompt, difficulty, num_questions, self.parse_quiz_response)
             
         except Exception as e:
             print(f"Error generating quiz: {e}")
-            # Return a fallback quiz structure
             return self.create_fallback_quiz(topic, difficulty, num_questions)
     
+    def parse_quiz_response(self, response) -> QuizPydantic:
+        """Extract the quiz JSON from an LLM response, raising ValueError when it holds no usable quiz"""
+        # Parse the response content
+        if hasattr(response, 'content'):
+            content = response.content
+        else:
+            content = str(response)
+        
+        # Look for JSON object in the response
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            json_str = json_match.group()
+            quiz_data = json.loads(json_str)
+            
+            # Validate and create QuizPydantic object
+            quiz = QuizPydantic(**quiz_data)
+            if not quiz.questions:
+                raise ValueError("The quiz in the response has no questions")
+            return quiz
+        
+        raise ValueError("No quiz JSON in the response")
+    
     def create_fallback_quiz(self, topic: str, difficulty: str, num_questions: int) -> QuizPydantic:
         """Create a basic fallback quiz if AI generation fails"""
         questions = []
@@ -167,7 +205,8 @@ Generate the quiz now:"""
         return QuizPydantic(
             topic=topic,
             difficulty=difficulty,
-            questions=questions
+            questions=questions,
+            is_fallback=True
         )
     
     def validate_quiz_data(self, quiz_data: Dict[str, Any]) -> QuizPydantic:
@@ -179,5 +218,5 @@ Generate the quiz now:"""
             raise ValueError(f"Invalid quiz data: {e}")
 
 
-# Global instance
+# Global instance, the LLM client is created lazily on the first generation
 ai_quiz_service = AIQuizService()
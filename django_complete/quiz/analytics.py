@@ -0,0 +1,97 @@
+"""
+Answer analytics for Django
+Answers are loaded into NumPy columns and every statistic is computed for all questions at once:
+p-value, upper-lower discrimination, item-rest point-biserial correlation and option choices (see item_analysis)
+"""
+
+from itertools import chain
+
+import numpy as np
+
+from .item_analysis import flag_questions, item_statistics, ratio
+from .models import QuizAnswer, QuizQuestion
+from .question_bank import question_key
+
+ANSWER_COLUMNS = ('session_id', 'question_id', 'selected_option', 'is_correct')
+
+
+def load_answers():
+    """Answer columns and the questions they refer to, copies of a bank question counting as one question"""
+    rows = QuizAnswer.objects.values_list(*ANSWER_COLUMNS).order_by()
+    flat = np.fromiter(chain.from_iterable(rows.iterator(chunk_size=10000)), dtype=np.int64)
+    session_ids, question_ids, selected, correct = flat.reshape(-1, len(ANSWER_COLUMNS)).T
+
+    answered = QuizQuestion.objects.filter(id__in=QuizAnswer.objects.values('question_id')).order_by('id')
+    groups, labels, topics, topic_numbers = {}, [], [], {}
+    row_ids, row_group, row_topic, group_topic, group_answer = [], [], [], [], []
+    for question_id, text, correct_answer, topic in answered.values_list('id', 'question', 'correct_answer', 'quiz__topic'):
+        if topic not in topic_numbers:
+            topic_numbers[topic] = len(topics)
+            topics.append(topic)
+        group = groups.get(question_key(text))
+        if group is None:
+            group = groups[question_key(text)] = len(labels)
+            labels.append(text)
+            group_topic.append(topic_numbers[topic])
+            group_answer.append(correct_answer)
+        row_ids.append(question_id)
+        row_group.append(group)
+        row_topic.append(topic_numbers[topic])
+
+    rows_of_answers = np.searchsorted(np.array(row_ids, dtype=np.int64), question_ids)
+    return {
+        'question': np.array(row_group, dtype=np.int32)[rows_of_answers],
+        'session': np.unique(session_ids, return_inverse=True)[1].astype(np.int32),
+        'selected': selected.astype(np.int8),
+        'correct': correct.astype(bool),
+        'topic': np.array(row_topic, dtype=np.int32)[rows_of_answers],
+        'question_topic': np.array(group_topic, dtype=np.int32),
+        'question_answer': np.array(group_answer, dtype=np.int8),
+        'topics': topics,
+        'labels': labels,
+    }
+
+
+def rounded(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def analytics_report(columns, min_answers=30, flagged_only=False, limit=100):
+    """JSON-serializable per-topic accuracy and per-question statistics, most answered questions first"""
+    stats = item_statistics(
+        columns['question'], columns['session'], columns['selected'], columns['correct'], columns['question_answer']
+    )
+    flags = flag_questions(columns['question_answer'], stats, min_answers)
+    flagged = flags['too_easy'] | flags['too_hard'] | flags['ambiguous']
+
+    topic_count = len(columns['topics'])
+    topic_answers = np.bincount(columns['topic'], minlength=topic_count)
+    topic_accuracy = ratio(np.bincount(columns['topic'], weights=columns['correct'], minlength=topic_count), topic_answers)
+
+    listed = np.flatnonzero(flagged) if flagged_only else np.arange(len(columns['question_answer']))
+    listed = listed[np.argsort(-stats['answers'][listed], kind='stable')][:limit]
+
+    return {
+        'answers': int(len(columns['question'])),
+        'sessions': int(columns['session'].max()) + 1 if len(columns['session']) else 0,
+        'questions': int(len(columns['question_answer'])),
+        'flagged_questions': int(flagged.sum()),
+        'topics': [
+            {'topic': name, 'answers': int(topic_answers[index]), 'accuracy': rounded(topic_accuracy[index])}
+            for index, name in enumerate(columns['topics'])
+        ],
+        'question_stats': [
+            {
+                'topic': columns['topics'][columns['question_topic'][number]],
+                'question': columns['labels'][number],
+                'correct_option': int(columns['question_answer'][number]),
+                'answers': int(stats['answers'][number]),
+                'p_value': rounded(stats['p_value'][number]),
+                'discrimination': rounded(stats['discrimination'][number]),
+                'point_biserial': rounded(stats['point_biserial'][number]),
+                'option_counts': stats['option_counts'][number].tolist(),
+                'flags': [name for name, marked in flags.items() if marked[number]],
+            }
+            for number in listed
+        ],
+    }
@@ -0,0 +1,53 @@
+"""
+Caching of generated quizzes
+Quizzes and their questions never change once generated, they are cached whole and read through.
+Session state is always read from the database, so every worker sees the latest answer
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.shortcuts import get_object_or_404
+
+from .models import Quiz, QuizQuestion
+
+
+# Cached quizzes are tuples of these field values, bump the version of the key when they change
+QUIZ_FIELDS = tuple(field.attname for field in Quiz._meta.concrete_fields)
+CACHED_QUESTION_FIELDS = tuple(field.attname for field in QuizQuestion._meta.concrete_fields)
+
+
+def quiz_cache_key(session_id) -> str:
+    """Build the cache key for a quiz with its questions"""
+    return f"quiz:object:v1:{session_id}"
+
+
+def quiz_cache():
+    return caches[getattr(settings, 'QUIZ_OBJECT_CACHE', 'default')]
+
+
+def cache_quiz(quiz, questions) -> None:
+    """Cache a quiz with its questions in order, as tuples of field values"""
+    quiz_cache().set(quiz_cache_key(quiz.session_id), (
+        tuple(getattr(quiz, name) for name in QUIZ_FIELDS),
+        [tuple(getattr(question, name) for name in CACHED_QUESTION_FIELDS) for question in questions],
+    ))
+
+
+def get_quiz(session_id):
+    """Return a quiz and the list of its questions in order, loading and caching them on a miss (404 if unknown)"""
+    cached = quiz_cache().get(quiz_cache_key(session_id))
+    if cached is None:
+        quiz = get_object_or_404(Quiz, session_id=session_id)
+        questions = list(quiz.questions.order_by('order'))
+        cache_quiz(quiz, questions)
+        return quiz, questions
+
+    quiz_values, question_values = cached
+    quiz = Quiz.from_db(DEFAULT_DB_ALIAS, QUIZ_FIELDS, quiz_values)
+    return quiz, [QuizQuestion.from_db(DEFAULT_DB_ALIAS, CACHED_QUESTION_FIELDS, values) for values in question_values]
+
+
+def forget_quiz(session_id) -> None:
+    """Drop a cached quiz, only needed when it is edited in the admin"""
+    quiz_cache().delete(quiz_cache_key(session_id))
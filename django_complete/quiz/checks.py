@@ -0,0 +1,30 @@
+"""
+System checks of the quiz settings, run by manage.py check, migrate and runserver
+"""
+
+import os
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def rate_limit_cache_check(app_configs, **kwargs):
+    """Warn when several workers would each keep their own rate limit buckets"""
+    alias = getattr(settings, 'QUIZ_RATE_LIMIT_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    # gunicorn takes its default number of workers from WEB_CONCURRENCY
+    workers = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    if getattr(settings, 'QUIZ_RATE_LIMIT_RATE', 0) <= 0 or backend not in PER_PROCESS_CACHES or workers <= 1:
+        return []
+    return [Warning(
+        f"Rate limit buckets are kept per process in the '{alias}' cache, {workers} workers allow {workers} times "
+        f"QUIZ_RATE_LIMIT_RATE",
+        hint="Set QUIZ_RATE_LIMIT_CACHE_BACKEND to file or redis",
+        id='quiz.W001',
+    )]
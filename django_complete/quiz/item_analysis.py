@@ -0,0 +1,91 @@
+"""
+Item analysis shared by the Django and FastAPI answer analytics
+Plain NumPy, no Django import, so that backend.analytics can use it as django_complete.quiz.item_analysis.
+Answers are columns of equal length: question and session numbers counted from 0, chosen option, correctness
+"""
+
+import numpy as np
+
+OPTIONS = 4
+
+
+def ratio(numerator, denominator):
+    """numerator / denominator, NaN where the denominator is 0"""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def item_statistics(question, session, selected, correct, question_answer, group_share=0.27):
+    """
+    Per-question statistics, in vectorized passes over the answers
+
+    - p_value: share of correct answers, the question's easiness
+    - discrimination: p_value among the sessions in the top group_share by score minus p_value among the bottom
+    - point_biserial: correlation of a correct answer with the share correct of the session's other answers
+    - option_counts / upper_option_counts: how often each option was chosen, by everyone and by the top group
+    """
+    questions = len(question_answer)
+    q = question
+    x = correct.astype(np.float64)
+
+    answers = np.bincount(q, minlength=questions)
+    p_value = ratio(np.bincount(q, weights=x, minlength=questions), answers)
+
+    # Sessions are ranked by their share of correct answers, they answered different numbers of questions
+    session_answers = np.bincount(session)
+    session_hits = np.bincount(session, weights=x)
+    session_score = session_hits / np.maximum(session_answers, 1)
+    lower_cut, upper_cut = np.quantile(session_score, [group_share, 1 - group_share]) if len(session_score) else (0, 0)
+    answer_score = session_score[session]
+    upper = answer_score >= upper_cut
+    lower = answer_score <= lower_cut
+    upper_answers = np.bincount(q[upper], minlength=questions)
+    p_upper = ratio(np.bincount(q[upper], weights=x[upper], minlength=questions), upper_answers)
+    p_lower = ratio(np.bincount(q[lower], weights=x[lower], minlength=questions), np.bincount(q[lower], minlength=questions))
+
+    # Item-rest correlation, the rest being the session's other answers
+    own = session_answers[session]
+    known = own > 1
+    rest = (session_hits[session] - x)[known] / (own[known] - 1)
+    qr, xr = q[known], x[known]
+    n = np.maximum(np.bincount(qr, minlength=questions), 1)
+    sum_x = np.bincount(qr, weights=xr, minlength=questions)
+    sum_y = np.bincount(qr, weights=rest, minlength=questions)
+    covariance = np.bincount(qr, weights=xr * rest, minlength=questions) - sum_x * sum_y / n
+    variance_x = sum_x - sum_x * sum_x / n  # x is 0 or 1, so x * x = x
+    variance_y = np.bincount(qr, weights=rest * rest, minlength=questions) - sum_y * sum_y / n
+
+    option = q.astype(np.int64) * OPTIONS + selected
+    return {
+        'answers': answers,
+        'p_value': p_value,
+        'discrimination': p_upper - p_lower,
+        'point_biserial': ratio(covariance, np.sqrt(np.clip(variance_x * variance_y, 0, None))),
+        'option_counts': np.bincount(option, minlength=questions * OPTIONS).reshape(questions, OPTIONS),
+        'upper_answers': upper_answers,
+        'upper_option_counts': np.bincount(option[upper], minlength=questions * OPTIONS).reshape(questions, OPTIONS),
+    }
+
+
+def flag_questions(question_answer, stats, min_answers=30, too_easy=0.9, too_hard=0.2):
+    """
+    Questions worth reviewing, never those with fewer than min_answers answers
+
+    - too_easy / too_hard: p_value at or above too_easy, or at or below too_hard
+    - ambiguous: the top group picks a wrong option at least as often as the correct one, or does worse than
+      the bottom group (negative discrimination), usually a second defensible answer or a wrong answer key
+    """
+    enough = stats['answers'] >= min_answers
+    rows = np.arange(len(question_answer))
+    upper_counts = stats['upper_option_counts']
+    upper_correct = upper_counts[rows, question_answer]
+    distractors = upper_counts.copy()
+    distractors[rows, question_answer] = -1
+    ambiguous = ((distractors.max(axis=1, initial=-1) >= upper_correct) & (stats['upper_answers'] > 0)
+                 | (stats['discrimination'] < 0))
+    return {
+        'too_easy': enough & (stats['p_value'] >= too_easy),
+        'too_hard': enough & (stats['p_value'] <= too_hard),
+        'ambiguous': enough & ambiguous,
+    }
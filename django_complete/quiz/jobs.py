@@ -0,0 +1,250 @@
+"""
+Background quiz generation for Django
+Generation requests are persisted as GenerationJob rows and run by a local pool of worker threads
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .ai_service import ai_quiz_service
+from .cache import cache_quiz
+from .models import Quiz, QuizQuestion, QuizSession, QuizStatistics, GenerationJob, JobStatusChoice
+from .question_bank import find_bank_questions, merge_quiz_data
+
+logger = logging.getLogger(__name__)
+
+
+def create_quiz_records(quiz_data):
+    """Persist a generated quiz with its questions, session and statistics"""
+    with transaction.atomic():
+        # Create the quiz
+        quiz = Quiz.objects.create(
+            topic=quiz_data.topic,
+            difficulty=quiz_data.difficulty,
+            total_questions=len(quiz_data.questions),
+            is_fallback=quiz_data.is_fallback
+        )
+
+        # Create questions in a single insert
+        questions = QuizQuestion.objects.bulk_create([
+            QuizQuestion(
+                quiz=quiz,
+                question=question_data.question,
+                option_a=question_data.option_a,
+                option_b=question_data.option_b,
+                option_c=question_data.option_c,
+                option_d=question_data.option_d,
+                correct_answer=question_data.correct_answer,
+                explanation=question_data.explanation,
+                difficulty=question_data.difficulty,
+                order=idx
+            )
+            for idx, question_data in enumerate(quiz_data.questions)
+        ])
+
+        # Create quiz session
+        quiz_session = QuizSession.objects.create(quiz=quiz)
+
+        # Create statistics
+        QuizStatistics.objects.create(session=quiz_session)
+
+    # Warm the quiz cache, unless the database did not return the question IDs of the bulk insert
+    if all(question.pk is not None for question in questions):
+        cache_quiz(quiz, questions)
+
+    return quiz
+
+
+def build_quiz_data(topic: str, difficulty: str, num_questions: int):
+    """Take what the question bank has for the topic and generate only the rest"""
+    banked = find_bank_questions(topic, difficulty, num_questions)
+    missing = num_questions - len(banked)
+    generated = ai_quiz_service.generate_quiz(topic, difficulty, missing) if missing else None
+    return merge_quiz_data(topic, difficulty, banked, generated)
+
+
+def virtual_time():
+    """Start tag of the oldest waiting job, or of the latest started one when none is waiting"""
+    waiting = GenerationJob.objects.filter(status=JobStatusChoice.QUEUED).aggregate(tag=Min('start_tag'))['tag']
+    if waiting is not None:
+        return waiting
+    # Tags only need to be consistent between unfinished jobs, an idle queue starts over from 0
+    running = GenerationJob.objects.filter(status=JobStatusChoice.RUNNING).aggregate(tag=Max('start_tag'))['tag']
+    return running or 0.0
+
+
+def enqueue_generation(topic: str, difficulty: str, num_questions: int, client: str = '',
+                       weight: float = 1.0) -> GenerationJob:
+    """Queue a quiz generation request with its weighted fair queuing tags and wake up the workers"""
+    short_limit = getattr(settings, 'QUIZ_SHORT_QUIZ_QUESTIONS', 5)
+    with transaction.atomic():
+        # A client's jobs queue behind its own unfinished ones, not behind other clients' backlogs
+        client_finish = GenerationJob.objects.filter(
+            client=client, status__in=[JobStatusChoice.QUEUED, JobStatusChoice.RUNNING]
+        ).aggregate(tag=Max('finish_tag'))['tag']
+        start_tag = max(virtual_time(), client_finish or 0.0)
+        job = GenerationJob.objects.create(
+            topic=topic,
+            difficulty=difficulty,
+            num_questions=num_questions,
+            priority=0 if num_questions <= short_limit else 1,
+            client=client,
+            start_tag=start_tag,
+            finish_tag=start_tag + num_questions / weight
+        )
+    worker_pool.notify()
+    return job
+
+
+def claim_next_job():
+    """
+    Mark the queued job with the smallest finish tag as running and return it, or None if the queue is empty
+    Jobs whose lease expired are put back in the queue first, in the same transaction
+    """
+    with transaction.atomic():
+        requeued = requeue_stale_jobs()
+        if requeued:
+            logger.warning(f"Requeued {requeued} generation jobs whose lease expired")
+
+        while True:
+            job = GenerationJob.objects.filter(status=JobStatusChoice.QUEUED).order_by(
+                'finish_tag', 'priority', 'created_at'
+            ).first()
+            if job is None:
+                return None
+
+            # Conditional update so that only one worker wins the job
+            claimed = GenerationJob.objects.filter(pk=job.pk, status=JobStatusChoice.QUEUED).update(
+                status=JobStatusChoice.RUNNING, updated_at=timezone.now()
+            )
+            if claimed:
+                job.status = JobStatusChoice.RUNNING
+                return job
+
+
+def run_generation_job(job: GenerationJob) -> None:
+    """Generate and store the quiz of a claimed job"""
+    try:
+        quiz_data = build_quiz_data(job.topic, job.difficulty, job.num_questions)
+        job.quiz = create_quiz_records(quiz_data)
+        job.status = JobStatusChoice.COMPLETED
+    except Exception as e:
+        logger.error(f"Generation job {job.pk} failed: {e}")
+        job.status = JobStatusChoice.FAILED
+        job.error = str(e)
+
+    job.save(update_fields=['quiz', 'status', 'error', 'updated_at'])
+
+
+def run_next_job() -> bool:
+    """Claim and run a single job in the calling thread, returns False if the queue was empty"""
+    job = claim_next_job()
+    if job is None:
+        return False
+
+    run_generation_job(job)
+    return True
+
+
+def requeue_stale_jobs() -> int:
+    """Put jobs whose worker stopped renewing their lease (crashed thread or process) back in the queue"""
+    lease = getattr(settings, 'QUIZ_GENERATION_LEASE_SECONDS', 600)
+    return GenerationJob.objects.filter(
+        status=JobStatusChoice.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(seconds=lease)
+    ).update(status=JobStatusChoice.QUEUED, updated_at=timezone.now())
+
+
+def renew_leases(job_ids) -> int:
+    """Refresh updated_at of running jobs, so that jobs longer than the lease are not run twice"""
+    if not job_ids:
+        return 0
+    return GenerationJob.objects.filter(pk__in=job_ids, status=JobStatusChoice.RUNNING).update(
+        updated_at=timezone.now()
+    )
+
+
+class GenerationWorkerPool:
+    """Local pool of threads running queued generation jobs, a heartbeat thread renews the leases of their jobs"""
+
+    def __init__(self, poll_interval: float = 1.0):
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    def ensure_started(self, concurrency=None):
+        """Start the workers on first use, QUIZ_GENERATION_WORKERS = 0 disables them"""
+        if concurrency is None:
+            concurrency = getattr(settings, 'QUIZ_GENERATION_WORKERS', 2)
+        if concurrency <= 0:
+            return
+
+        with self._lock:
+            if self._threads:
+                return
+
+            for i in range(concurrency):
+                thread = threading.Thread(target=self._work, name=f"quiz-generation-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            threading.Thread(target=self._heartbeat, name="quiz-generation-heartbeat", daemon=True).start()
+
+    def join(self):
+        """Block until the worker threads exit"""
+        for thread in self._threads:
+            thread.join()
+
+    def notify(self):
+        """Wake up an idle worker"""
+        self.ensure_started()
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def _work(self):
+        while True:
+            close_old_connections()
+            try:
+                job = claim_next_job()
+                if job is not None:
+                    with self._running_lock:
+                        self._running.add(job.pk)
+                    try:
+                        run_generation_job(job)
+                    finally:
+                        with self._running_lock:
+                            self._running.discard(job.pk)
+                    continue
+            except Exception as e:
+                logger.error(f"Generation worker error: {e}")
+            finally:
+                close_old_connections()
+
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    def _heartbeat(self):
+        interval = getattr(settings, 'QUIZ_GENERATION_LEASE_SECONDS', 600) / 3
+        while True:
+            time.sleep(interval)
+            with self._running_lock:
+                job_ids = list(self._running)
+            close_old_connections()
+            try:
+                renew_leases(job_ids)
+            except Exception as e:
+                logger.error(f"Renewing generation job leases failed: {e}")
+            finally:
+                close_old_connections()
+
+
+worker_pool = GenerationWorkerPool()
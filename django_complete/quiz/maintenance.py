@@ -0,0 +1,62 @@
+"""
+Bulk maintenance of the quiz tables
+Rows are purged and statistics recomputed a batch at a time, each batch in a fixed number of SQL statements
+"""
+
+from django.db import transaction
+from django.db.models import Count, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import GenerationJob, Quiz, QuizAnswer, QuizQuestion, QuizSession, QuizStatistics
+
+
+def batches(queryset, batch_size):
+    """Primary keys of a queryset in ascending batches"""
+    last = None
+    while True:
+        page = queryset.order_by('pk')
+        if last is not None:
+            page = page.filter(pk__gt=last)
+        keys = list(page.values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return
+        yield keys
+        last = keys[-1]
+
+
+def purge_quizzes(quizzes, batch_size=500):
+    """Delete quizzes with their questions, session, answers and statistics, returns the number of quizzes deleted"""
+    deleted = 0
+    for keys in batches(quizzes, batch_size):
+        with transaction.atomic():
+            # Children first, then every table in one DELETE; QuerySet.delete() would fetch the
+            # questions and sessions to cascade by hand, a few hundred at a time
+            QuizAnswer.objects.filter(session__quiz__in=keys)._raw_delete(QuizAnswer.objects.db)
+            QuizStatistics.objects.filter(session__quiz__in=keys)._raw_delete(QuizStatistics.objects.db)
+            GenerationJob.objects.filter(quiz__in=keys).update(quiz=None)
+            QuizSession.objects.filter(quiz__in=keys)._raw_delete(QuizSession.objects.db)
+            QuizQuestion.objects.filter(quiz__in=keys)._raw_delete(QuizQuestion.objects.db)
+            deleted += Quiz.objects.filter(pk__in=keys)._raw_delete(Quiz.objects.db)
+    return deleted
+
+
+def answer_count(**filters):
+    """Number of answers of the outer statistics row's session"""
+    answers = QuizAnswer.objects.filter(session=OuterRef('session'), **filters).order_by()
+    return Coalesce(Subquery(answers.values('session').annotate(count=Count('pk')).values('count')), 0)
+
+
+def recompute_statistics(statistics, batch_size=500):
+    """Recount the answers of statistics rows in one UPDATE per batch, returns the number of rows updated"""
+    total, correct = answer_count(), answer_count(is_correct=True)
+    updated = 0
+    for keys in batches(statistics, batch_size):
+        updated += QuizStatistics.objects.filter(pk__in=keys).update(
+            total_questions_answered=total,
+            correct_answers=correct,
+            incorrect_answers=answer_count(is_correct=False),
+            percentage=Coalesce(
+                Cast(correct, FloatField()) * 100.0 / NullIf(Cast(total, FloatField()), 0.0), 0.0
+            ),
+        )
+    return updated
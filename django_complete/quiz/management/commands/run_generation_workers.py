@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from quiz.jobs import GenerationWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run quiz generation workers in a dedicated process"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Number of worker threads")
+
+    def handle(self, *args, **options):
+        pool = GenerationWorkerPool()
+        pool.ensure_started(concurrency=options['workers'])
+
+        self.stdout.write(self.style.SUCCESS(f"Running {options['workers']} generation workers, press Ctrl+C to stop"))
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping generation workers")
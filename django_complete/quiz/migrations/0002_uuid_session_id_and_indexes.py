@@ -0,0 +1,94 @@
+from django.db import migrations, models
+import logging
+import uuid
+
+
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def copy_session_ids_to_uuid(apps, schema_editor):
+    """Parse the stored session id strings into native UUIDs, unparseable ones get a new UUID and are logged"""
+    Quiz = apps.get_model("quiz", "Quiz")
+    batch = []
+    replaced = 0
+    for quiz in Quiz.objects.only("id", "session_id").iterator(chunk_size=BATCH_SIZE):
+        try:
+            quiz.session_uuid = uuid.UUID(str(quiz.session_id))
+        except ValueError:
+            # Links to /quiz/<old id>/ stop working, the log maps them to the new ones
+            quiz.session_uuid = uuid.uuid4()
+            replaced += 1
+            logger.warning("Quiz %s: session id %r is not a UUID, replaced by %s", quiz.id, quiz.session_id, quiz.session_uuid)
+        batch.append(quiz)
+        if len(batch) >= BATCH_SIZE:
+            Quiz.objects.bulk_update(batch, ["session_uuid"])
+            batch = []
+    if batch:
+        Quiz.objects.bulk_update(batch, ["session_uuid"])
+    if replaced:
+        logger.warning("%d quiz session ids were not UUIDs and were replaced, links to them no longer work", replaced)
+
+
+def copy_uuid_to_session_ids(apps, schema_editor):
+    """Write the UUIDs back as their canonical string form"""
+    Quiz = apps.get_model("quiz", "Quiz")
+    batch = []
+    for quiz in Quiz.objects.only("id", "session_uuid").iterator(chunk_size=BATCH_SIZE):
+        quiz.session_id = str(quiz.session_uuid)
+        batch.append(quiz)
+        if len(batch) >= BATCH_SIZE:
+            Quiz.objects.bulk_update(batch, ["session_id"])
+            batch = []
+    if batch:
+        Quiz.objects.bulk_update(batch, ["session_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0001_initial"),
+    ]
+
+    operations = [
+        # Native UUID storage for Quiz.session_id (uuid on PostgreSQL, char(32) on SQLite)
+        migrations.AddField(
+            model_name="quiz",
+            name="session_uuid",
+            field=models.UUIDField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="quiz",
+            name="session_id",
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.RunPython(copy_session_ids_to_uuid, copy_uuid_to_session_ids),
+        migrations.RemoveField(
+            model_name="quiz",
+            name="session_id",
+        ),
+        migrations.RenameField(
+            model_name="quiz",
+            old_name="session_uuid",
+            new_name="session_id",
+        ),
+        migrations.AlterField(
+            model_name="quiz",
+            name="session_id",
+            field=models.UUIDField(default=uuid.uuid4, unique=True),
+        ),
+        # Composite indexes for the hot lookups
+        migrations.AddIndex(
+            model_name="quizquestion",
+            index=models.Index(
+                fields=["quiz", "order"], name="quiz_question_quiz_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quizanswer",
+            index=models.Index(
+                fields=["session", "answered_at"], name="quiz_answer_session_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_generation_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='is_fallback',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_quiz_is_fallback'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='quizanswer',
+            name='quiz_answer_session_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='quizanswer',
+            index=models.Index(fields=['session', 'answered_at', 'id'], name='quiz_answer_session_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('current_question_index__gt', 0)), fields=['-current_score', 'id'], name='quiz_session_ranking_idx'),
+        ),
+    ]
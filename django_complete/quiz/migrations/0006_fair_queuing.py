@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_paginated_ordering'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='generationjob',
+            name='quiz_job_pending_idx',
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='client',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='finish_tag',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='start_tag',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='generationjob',
+            index=models.Index(fields=['status', 'finish_tag', 'priority', 'created_at'], name='quiz_job_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generationjob',
+            index=models.Index(fields=['status', 'start_tag'], name='quiz_job_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generationjob',
+            index=models.Index(fields=['client', 'status', 'finish_tag'], name='quiz_job_client_idx'),
+        ),
+    ]
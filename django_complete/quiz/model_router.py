@@ -0,0 +1,161 @@
+"""
+Model tiering for quiz generation
+Easy and short quizzes go to the fastest model; an answer that fails to parse or
+validate is sent again to the next stronger tier before falling back to placeholders
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tiers(spec):
+    """(name, model, temperature) tuples from "fast=gemini-1.5-flash-8b:0.7,strong=gemini-1.5-pro:0.4" """
+    tiers = []
+    for entry in spec.split(','):
+        name, separator, model = entry.strip().partition('=')
+        if not separator or not name or not model:
+            raise ValueError(f'Invalid model tier: {entry!r}')
+        model, _, temperature = model.partition(':')
+        tiers.append((name.strip(), model.strip(), float(temperature) if temperature else 0.7))
+    return tiers
+
+
+def parse_routes(spec):
+    """Difficulty to starting tier name mapping from "easy=fast,hard=strong" """
+    routes = {}
+    for entry in spec.split(','):
+        difficulty, separator, tier = entry.strip().partition('=')
+        if not separator:
+            raise ValueError(f'Invalid model route: {entry!r}')
+        routes[difficulty.strip().lower()] = tier.strip()
+    return routes
+
+
+class TierStats:
+    """Attempts, outcomes and recent latencies of one tier"""
+
+    def __init__(self, window=500):
+        self.attempts = 0
+        self.successes = 0
+        self.errors = Counter()
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=None):
+        """Count one attempt"""
+        with self._lock:
+            self.attempts += 1
+            self._latencies.append(seconds)
+            if error is None:
+                self.successes += 1
+            else:
+                self.errors[type(error).__name__] += 1
+
+    def summary(self):
+        """Success rate, errors and latency percentiles in milliseconds"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            summary = {
+                'attempts': self.attempts,
+                'successes': self.successes,
+                'success_rate': round(self.successes / self.attempts, 4) if self.attempts else None,
+                'errors': dict(self.errors),
+            }
+        if latencies:
+            summary['latency_ms'] = {
+                'mean': round(sum(latencies) / len(latencies) * 1000, 1),
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            }
+        return summary
+
+
+class ModelTier:
+    """A chat model the router can send prompts to"""
+
+    def __init__(self, name, model, temperature, llm):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.llm = llm
+        self.stats = TierStats()
+
+
+class ModelRouter:
+    """Send a prompt to the tier routed for the quiz, escalating to stronger tiers on failure"""
+
+    def __init__(self, tiers, routes=None, short_quiz_questions=5):
+        if not tiers:
+            raise ValueError('At least one model tier is needed')
+        self.tiers = tiers
+        self.short_quiz_questions = short_quiz_questions
+        names = [tier.name for tier in tiers]
+        self.routes = {}
+        for difficulty, name in (routes or {}).items():
+            if name not in names:
+                raise ValueError(f'Route {difficulty!r} names an unknown tier: {name!r}')
+            self.routes[difficulty] = names.index(name)
+
+    @classmethod
+    def from_spec(cls, make_llm, tiers, routes, short_quiz_questions=5):
+        """Router whose tier models are built by make_llm(model, temperature)"""
+        built = [
+            ModelTier(name, model, temperature, make_llm(model, temperature))
+            for name, model, temperature in parse_tiers(tiers)
+        ]
+        return cls(built, parse_routes(routes), short_quiz_questions)
+
+    def start_tier(self, difficulty, num_questions):
+        """Position of the tier a generation starts on"""
+        if num_questions <= self.short_quiz_questions:
+            return 0
+        return self.routes.get(difficulty, 0)
+
+    def _attempts(self, difficulty, num_questions):
+        return self.tiers[self.start_tier(difficulty, num_questions):]
+
+    def _failed(self, tier, started, error):
+        tier.stats.record(time.perf_counter() - started, error)
+        first_line = (str(error).strip().splitlines() or [''])[0]
+        logger.warning(f"Model tier '{tier.name}' failed, escalating: {type(error).__name__}: {first_line[:200]}")
+
+    def generate(self, prompt, difficulty, num_questions, parse):
+        """Result of parse() on the first tier answer that passes it, or the last error"""
+        error = None
+        for tier in self._attempts(difficulty, num_questions):
+            started = time.perf_counter()
+            try:
+                result = parse(tier.llm.invoke(prompt))
+            except Exception as e:
+                error = e
+                self._failed(tier, started, e)
+                continue
+            tier.stats.record(time.perf_counter() - started)
+            return result
+        raise error
+
+    async def agenerate(self, prompt, difficulty, num_questions, parse):
+        """Async version of generate, using the chat models' ainvoke"""
+        error = None
+        for tier in self._attempts(difficulty, num_questions):
+            started = time.perf_counter()
+            try:
+                result = parse(await tier.llm.ainvoke(prompt))
+            except Exception as e:
+                error = e
+                self._failed(tier, started, e)
+                continue
+            tier.stats.record(time.perf_counter() - started)
+            return result
+        raise error
+
+    def stats(self):
+        """Configuration and stats of every tier, fastest first"""
+        return [
+            {'name': tier.name, 'model': tier.model, 'temperature': tier.temperature, **tier.stats.summary()}
+            for tier in self.tiers
+        ]
@@ -12,10 +12,11 @@ class DifficultyChoice(models.TextChoices):
 
 class Quiz(models.Model):
     """Django model for Quiz"""
-    session_id = models.CharField(max_length=100, unique=True, default=uuid.uuid4)
+    session_id = models.UUIDField(unique=True, default=uuid.uuid4)
     topic = models.CharField(max_length=200)
     difficulty = models.CharField(max_length=10, choices=DifficultyChoice.choices, default=DifficultyChoice.MEDIUM)
     total_questions = models.IntegerField(default=10)
+    is_fallback = models.BooleanField(default=False)  # Placeholder questions, never reused by the question bank
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -38,6 +39,9 @@ class QuizQuestion(models.Model):
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['quiz', 'order'], name='quiz_question_quiz_order_idx'),
+        ]
     
     @property
     def options(self):
@@ -57,6 +61,15 @@ class QuizSession(models.Model):
     last_activity = models.DateTimeField(auto_now=True)
     is_completed = models.BooleanField(default=False)
     
+    class Meta:
+        indexes = [
+            # Leaderboard order, only sessions with answers are ranked
+            models.Index(
+                fields=['-current_score', 'id'], name='quiz_session_ranking_idx',
+                condition=models.Q(current_question_index__gt=0),
+            ),
+        ]
+    
     def __str__(self):
         return f"Session for {self.quiz.topic} - Score: {self.current_score}"
 
@@ -72,6 +85,9 @@ class QuizAnswer(models.Model):
     
     class Meta:
         unique_together = ['session', 'question']
+        indexes = [
+            models.Index(fields=['session', 'answered_at', 'id'], name='quiz_answer_session_time_idx'),
+        ]
     
     def __str__(self):
         return f"Answer to Q{self.question.order + 1} - {'Correct' if self.is_correct else 'Incorrect'}"
@@ -99,5 +115,53 @@ class QuizStatistics(models.Model):
         
         self.save()
     
+    def record_answer(self, is_correct):
+        """Count one new answer without reading the others again"""
+        self.total_questions_answered += 1
+        if is_correct:
+            self.correct_answers += 1
+        else:
+            self.incorrect_answers += 1
+        self.percentage = (self.correct_answers / self.total_questions_answered) * 100
+        self.save()
+    
     def __str__(self):
         return f"Stats for {self.session.quiz.topic} - {self.percentage:.1f}%"
+
+
+class JobStatusChoice(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    COMPLETED = 'completed', 'Completed'
+    FAILED = 'failed', 'Failed'
+
+
+class GenerationJob(models.Model):
+    """Django model for queued AI quiz generation requests"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    topic = models.CharField(max_length=200)
+    difficulty = models.CharField(max_length=10, choices=DifficultyChoice.choices, default=DifficultyChoice.MEDIUM)
+    num_questions = models.IntegerField(default=10)
+    priority = models.IntegerField(default=0)  # Lower wins ties between equal finish tags
+    client = models.CharField(max_length=100, blank=True)  # Hashed API key or address of the requester
+    start_tag = models.FloatField(default=0)  # Weighted fair queuing virtual times
+    finish_tag = models.FloatField(default=0)
+    status = models.CharField(max_length=10, choices=JobStatusChoice.choices, default=JobStatusChoice.QUEUED)
+    quiz = models.ForeignKey(Quiz, on_delete=models.SET_NULL, null=True, blank=True, related_name='generation_jobs')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'finish_tag', 'priority', 'created_at'], name='quiz_job_pending_idx'),
+            models.Index(fields=['status', 'start_tag'], name='quiz_job_start_idx'),
+            models.Index(fields=['client', 'status', 'finish_tag'], name='quiz_job_client_idx'),
+        ]
+    
+    @property
+    def is_finished(self):
+        return self.status in (JobStatusChoice.COMPLETED, JobStatusChoice.FAILED)
+    
+    def __str__(self):
+        return f"Job for {self.topic} ({self.num_questions} questions) - {self.status}"
@@ -0,0 +1,65 @@
+"""
+Cursor pagination for the quiz JSON APIs
+A page starts right after the ordering key of the previous page's last row,
+so deep pages cost the same as the first one and rows added meanwhile do not shift them
+"""
+
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor or page size cannot be used"""
+
+
+def encode_cursor(value, pk):
+    """Opaque cursor for the ordering value and primary key of a row"""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    payload = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse_value):
+    """Ordering value and primary key held in a cursor, the value read with parse_value"""
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        value = parse_value(value)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if value is None or not isinstance(pk, int):
+        raise InvalidCursor('Invalid cursor')
+    return value, pk
+
+
+def page_size(request, default, maximum=100):
+    """Page size requested with ?limit=, between 1 and maximum"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise InvalidCursor('Invalid limit')
+    if not 1 <= limit <= maximum:
+        raise InvalidCursor(f'Limit must be between 1 and {maximum}')
+    return limit
+
+
+def keyset_page(queryset, field, limit, cursor=None, parse_value=int, descending=False):
+    """One page of a queryset ordered by field then primary key, with the cursor of the next page"""
+    ordering = (f'-{field}' if descending else field, 'pk')
+    if cursor is None:
+        rows = list(queryset.order_by(*ordering)[:limit + 1])
+    else:
+        value, pk = decode_cursor(cursor, parse_value)
+        # Rows tied with the cursor, then the rows past it: two range scans over the
+        # (field, id) index instead of one OR query the database would have to sort
+        rows = list(queryset.filter(**{field: value, 'pk__gt': pk}).order_by('pk')[:limit + 1])
+        if len(rows) <= limit:
+            past = f'{field}__lt' if descending else f'{field}__gt'
+            rows += list(queryset.filter(**{past: value}).order_by(*ordering)[:limit + 1 - len(rows)])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
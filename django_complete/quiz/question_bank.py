@@ -0,0 +1,86 @@
+"""
+Question bank for Django
+Questions generated for earlier quizzes are reused for new quizzes on the same topic,
+so the LLM only has to write the questions the bank cannot supply
+"""
+
+import random
+import re
+
+from django.conf import settings
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .ai_service import QuizPydantic, QuizQuestionPydantic
+from .models import QuizQuestion
+
+BANK_QUESTION_FIELDS = (
+    'question', 'option_a', 'option_b', 'option_c', 'option_d',
+    'correct_answer', 'explanation', 'difficulty',
+)
+
+# Candidates fetched per requested question, the extra ones absorb duplicates and add variety
+CANDIDATES_PER_QUESTION = 5
+
+
+def topic_terms(topic):
+    """Words of a topic worth matching on"""
+    return [word for word in re.findall(r'\w+', topic.lower()) if len(word) > 2]
+
+
+def question_key(text):
+    """Normalised question text, equal for copies of the same question"""
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def find_bank_questions(topic, difficulty, limit):
+    """Stored questions matching every word of the topic, exact topic matches first"""
+    terms = topic_terms(topic)
+    if not getattr(settings, 'QUIZ_QUESTION_BANK', True) or not terms or limit <= 0:
+        return []
+
+    topic_filter = Q()
+    for term in terms:
+        topic_filter &= Q(quiz__topic__icontains=term)
+
+    candidates = (
+        QuizQuestion.objects
+        .filter(topic_filter, difficulty=difficulty, quiz__is_fallback=False)
+        .annotate(topic_rank=Case(
+            When(quiz__topic__iexact=topic, then=Value(0)), default=Value(1), output_field=IntegerField()
+        ))
+        .order_by('topic_rank', '-quiz__created_at')
+        .only(*BANK_QUESTION_FIELDS)[:limit * CANDIDATES_PER_QUESTION]
+    )
+
+    # Reused questions are copied into each new quiz, keep one of each
+    unique = {}
+    for candidate in candidates:
+        unique.setdefault(question_key(candidate.question), candidate)
+
+    # Shuffle within each rank so repeated topics do not always get the same quiz
+    ranked = {}
+    for candidate in unique.values():
+        ranked.setdefault(candidate.topic_rank, []).append(candidate)
+    picked = []
+    for rank in sorted(ranked):
+        random.shuffle(ranked[rank])
+        picked.extend(ranked[rank])
+
+    return [
+        QuizQuestionPydantic(**{field: getattr(question, field) for field in BANK_QUESTION_FIELDS})
+        for question in picked[:limit]
+    ]
+
+
+def merge_quiz_data(topic, difficulty, banked, generated=None):
+    """Combine bank questions with newly generated ones into a single quiz"""
+    if generated is None:
+        return QuizPydantic(topic=topic, difficulty=difficulty, questions=banked)
+
+    # Placeholder questions are only worth serving when the bank had nothing
+    if generated.is_fallback:
+        return generated if not banked else QuizPydantic(topic=topic, difficulty=difficulty, questions=banked)
+
+    seen = {question_key(question.question) for question in banked}
+    new_questions = [question for question in generated.questions if question_key(question.question) not in seen]
+    return QuizPydantic(topic=topic, difficulty=difficulty, questions=banked + new_questions)
@@ -0,0 +1,93 @@
+"""
+Per-client rate limiting for Django
+Every client has a token bucket in the cache; generating a quiz takes more tokens than answering a question
+"""
+
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+
+def parse_weights(spec):
+    """API key to fair queuing weight mapping from "partner-key=4,batch-key=0.5" """
+    weights = {}
+    for entry in spec.split(','):
+        if not entry.strip():
+            continue
+        api_key, separator, weight = entry.strip().rpartition('=')
+        if not separator or not api_key:
+            raise ValueError(f'Invalid client weight: {entry!r}')
+        weights[api_key] = float(weight)
+    return weights
+
+
+def identify_client(request):
+    """(client key, fair queuing weight) of a request, by API key or by address"""
+    api_key = request.headers.get('X-Api-Key')
+    if api_key:
+        weight = parse_weights(getattr(settings, 'QUIZ_CLIENT_WEIGHTS', '')).get(api_key, 1.0)
+        return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}", weight
+
+    address = request.META.get('REMOTE_ADDR') or 'unknown'
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded and getattr(settings, 'QUIZ_TRUST_FORWARDED', False):
+        address = forwarded.split(',')[0].strip()
+    return f"ip:{address}", 1.0
+
+
+def bucket_cache_key(client_key):
+    """Build the cache key of a client's token bucket"""
+    return f"quiz:ratelimit:{client_key}"
+
+
+def take_tokens(client_key, cost, rate, burst):
+    """Take cost tokens from a client's bucket, returns 0 or the seconds until they are available"""
+    cache = caches[getattr(settings, 'QUIZ_RATE_LIMIT_CACHE', 'default')]
+    key = bucket_cache_key(client_key)
+    now = time.time()
+
+    # Read and write are two cache calls, concurrent requests of one client may both pass
+    tokens, updated_at = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    retry_after = 0.0
+    if tokens >= cost:
+        tokens -= cost
+    else:
+        retry_after = (cost - tokens) / rate
+
+    # An untouched bucket is full again after burst / rate seconds, it can expire then
+    cache.set(key, (tokens, now), math.ceil(burst / rate))
+    return retry_after
+
+
+class RateLimitMiddleware:
+    """Reject generations and answers of clients that used up their token bucket with a 429"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        rate = getattr(settings, 'QUIZ_RATE_LIMIT_RATE', 0)
+        match = request.resolver_match
+        if rate <= 0 or match is None or request.method != 'POST':
+            return None
+
+        cost = getattr(settings, 'QUIZ_RATE_LIMIT_COSTS', {}).get(match.view_name)
+        if not cost:
+            return None
+
+        client_key, _ = identify_client(request)
+        retry_after = take_tokens(client_key, cost, rate, settings.QUIZ_RATE_LIMIT_BURST)
+        if not retry_after:
+            return None
+
+        response = JsonResponse({'error': 'Rate limit exceeded, please slow down'}, status=429)
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
@@ -1,3 +1,709 @@
-from django.test import TestCase
+import subprocess
+import sys
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .ai_service import ai_quiz_service, QuizPydantic, QuizQuestionPydantic
+from .analytics import load_answers
+from .cache import get_quiz
+from .checks import rate_limit_cache_check
+from .jobs import build_quiz_data, create_quiz_records, renew_leases, run_next_job
+from .model_router import ModelRouter, ModelTier
+from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, GenerationJob
+
+
+def create_quiz(num_questions=5, topic='Testing', difficulty='medium'):
+    """Create a quiz with its session and statistics rows"""
+    quiz = Quiz.objects.create(topic=topic, difficulty=difficulty, total_questions=num_questions)
+    for idx in range(num_questions):
+        QuizQuestion.objects.create(
+            quiz=quiz,
+            question=f'Question {idx + 1} about {topic}?',
+            option_a='Option A',
+            option_b='Option B',
+            option_c='Option C',
+            option_d='Option D',
+            correct_answer=idx % 4,
+            explanation=f'Explanation for question {idx + 1}',
+            difficulty=difficulty,
+            order=idx
+        )
+    quiz_session = QuizSession.objects.create(quiz=quiz)
+    QuizStatistics.objects.create(session=quiz_session)
+    return quiz
+
+
+class QuizViewQueryTests(TestCase):
+    """Guard the number of queries issued by the quiz pages"""
+
+    def setUp(self):
+        caches['quizzes'].clear()
+        self.quiz = create_quiz()
+        self.detail_url = reverse('quiz:quiz_detail', args=[self.quiz.session_id])
+        self.results_url = reverse('quiz:quiz_results', args=[self.quiz.session_id])
+        self.submit_url = reverse('quiz:submit_answer', args=[self.quiz.session_id])
+
+    def answer_all(self):
+        for idx in range(self.quiz.total_questions):
+            self.client.post(self.submit_url, {'selected_option': idx % 4})
+
+    def test_quiz_detail_queries(self):
+        # Quiz, its questions and the session
+        with self.assertNumQueries(3):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Question 1 about Testing?')
+
+        # The quiz is cached, only the session is read
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Question 1 about Testing?')
+
+    def test_answer_reads_only_the_session(self):
+        get_quiz(self.quiz.session_id)
+
+        # Session with its statistics, duplicate check, then the answer, session and statistics writes
+        with self.assertNumQueries(5):
+            self.client.post(self.submit_url, {'selected_option': 0})
+        stats = QuizStatistics.objects.get(session__quiz=self.quiz)
+        self.assertEqual((stats.total_questions_answered, stats.correct_answers, stats.percentage), (1, 1, 100.0))
+
+        with self.assertNumQueries(5):
+            self.client.post(self.submit_url, {'selected_option': 0})
+        stats.refresh_from_db()
+        self.assertEqual((stats.total_questions_answered, stats.incorrect_answers, stats.percentage), (2, 1, 50.0))
+
+    def test_generated_quiz_is_cached(self):
+        quiz = create_quiz_records(make_quiz_data('Cached', 3))
+
+        with self.assertNumQueries(0):
+            cached, questions = get_quiz(quiz.session_id)
+        self.assertEqual((cached.pk, cached.topic, cached.total_questions), (quiz.pk, 'Cached', 3))
+        self.assertEqual(
+            [(question.pk, question.question) for question in questions],
+            list(quiz.questions.order_by('order').values_list('pk', 'question'))
+        )
+
+    def test_answer_shows_next_question(self):
+        self.client.get(self.detail_url)
+        self.client.post(self.submit_url, {'selected_option': 0})
+
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Question 2 about Testing?')
+        self.assertEqual(response.context['quiz_session'].current_score, 1)
+
+    def test_detail_follows_answers_of_other_workers(self):
+        self.client.get(self.detail_url)
+        # An answer handled by another process only changes the session row
+        QuizSession.objects.filter(quiz=self.quiz).update(current_question_index=1, current_score=1)
+
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Question 2 about Testing?')
+        self.assertEqual(response.context['quiz_session'].current_score, 1)
+
+    def test_resubmitted_answer_is_ignored(self):
+        first = self.quiz.questions.order_by('order').first()
+        self.client.post(self.submit_url, {'selected_option': 0, 'question_id': first.pk})
+        self.client.post(self.submit_url, {'selected_option': 0, 'question_id': first.pk})
+
+        session = QuizSession.objects.get(quiz=self.quiz)
+        self.assertEqual(session.current_question_index, 1)
+        self.assertEqual(QuizAnswer.objects.filter(session=session).count(), 1)
+
+    def test_quiz_results_queries(self):
+        self.answer_all()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.results_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['detailed_results']), 5)
+        self.assertEqual(response.context['stats'].correct_answers, 5)
+
+    def test_unknown_session_id(self):
+        response = self.client.get('/quiz/not-a-uuid/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_restart_reopens_the_quiz(self):
+        self.answer_all()
+        self.client.get(self.results_url)
+
+        self.client.get(reverse('quiz:restart_quiz', args=[self.quiz.session_id]))
+        response = self.client.get(self.results_url)
+        self.assertRedirects(response, self.detail_url)
+        self.assertFalse(QuizAnswer.objects.exists())
+
+
+def make_quiz_data(topic, num_questions):
+    """Build the structured output the AI service would return"""
+    return QuizPydantic(
+        topic=topic,
+        difficulty='easy',
+        questions=[
+            QuizQuestionPydantic(
+                question=f'Generated {topic} question {idx + 1}?',
+                option_a='A', option_b='B', option_c='C', option_d='D',
+                correct_answer=0,
+                explanation='Generated explanation',
+                difficulty='easy'
+            )
+            for idx in range(num_questions)
+        ]
+    )
+
+
+class AsyncGenerateQuizTests(TestCase):
+    """The async generation view awaits the LLM and persists the quiz"""
+
+    def test_generate_quiz_async(self):
+        generate = AsyncMock(return_value=make_quiz_data('Async Python', 3))
+        with patch.object(ai_quiz_service, 'agenerate_quiz', generate):
+            response = self.client.post(reverse('quiz:generate_quiz_async'), {
+                'topic': 'Async Python', 'difficulty': 'easy', 'num_questions': 3
+            })
+
+        generate.assert_awaited_once_with('Async Python', 'easy', 3)
+        quiz = Quiz.objects.get()
+        self.assertRedirects(response, reverse('quiz:quiz_detail', args=[quiz.session_id]))
+        self.assertEqual(quiz.questions.count(), 3)
+        self.assertTrue(QuizStatistics.objects.filter(session__quiz=quiz).exists())
+        self.assertEqual(self.client.session['quiz_session_id'], str(quiz.session_id))
+
+    def test_generate_quiz_async_requires_post(self):
+        response = self.client.get(reverse('quiz:generate_quiz_async'))
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(QUIZ_GENERATION_WORKERS=0, QUIZ_SHORT_QUIZ_QUESTIONS=5, QUIZ_RATE_LIMIT_RATE=0, QUIZ_QUESTION_BANK=False,
+                   QUIZ_CLIENT_WEIGHTS='partner-key=3')
+class GenerationJobTests(TestCase):
+    """Generation requests are queued and run by the worker pool"""
+
+    def post_generate(self, topic, num_questions, **extra):
+        return self.client.post(reverse('quiz:generate_quiz'), {
+            'topic': topic, 'difficulty': 'easy', 'num_questions': num_questions
+        }, **extra)
+
+    def run_queue(self):
+        """Run every queued job, returns the topics in the order they ran"""
+        topics = []
+        def generate(topic, difficulty, num_questions):
+            topics.append(topic)
+            return make_quiz_data(topic, num_questions)
+
+        with patch.object(ai_quiz_service, 'generate_quiz', side_effect=generate):
+            while run_next_job():
+                pass
+        return topics
+
+    def test_generate_enqueues_job(self):
+        with patch.object(ai_quiz_service, 'generate_quiz') as generate:
+            response = self.post_generate('Queued Python', 3)
+        generate.assert_not_called()
+
+        job = GenerationJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertRedirects(response, reverse('quiz:generation_status', args=[job.pk]))
+
+        status = self.client.get(reverse('quiz:job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], 'queued')
+        self.assertIsNone(status['quiz_url'])
+
+    def test_worker_runs_job(self):
+        self.post_generate('Queued Python', 3)
+        job = GenerationJob.objects.get()
+
+        with patch.object(ai_quiz_service, 'generate_quiz', return_value=make_quiz_data('Queued Python', 3)):
+            self.assertTrue(run_next_job())
+        self.assertFalse(run_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.quiz.questions.count(), 3)
+
+        status = self.client.get(reverse('quiz:job_status', args=[job.pk])).json()
+        self.assertEqual(status['quiz_id'], str(job.quiz.session_id))
+        response = self.client.get(status['quiz_url'])
+        self.assertRedirects(response, reverse('quiz:quiz_detail', args=[job.quiz.session_id]))
+
+    def test_failed_job_records_error(self):
+        self.post_generate('Broken', 3)
+
+        with patch.object(ai_quiz_service, 'generate_quiz', side_effect=RuntimeError('LLM unavailable')):
+            run_next_job()
+
+        job = GenerationJob.objects.get()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'LLM unavailable')
+
+    def test_short_quizzes_run_first(self):
+        self.post_generate('Long quiz', 15, REMOTE_ADDR='10.0.0.1')
+        self.post_generate('Short quiz', 3, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(self.run_queue(), ['Short quiz', 'Long quiz'])
+
+    def test_heavy_client_does_not_starve_others(self):
+        for number in range(3):
+            self.post_generate(f'Heavy {number}', 5, REMOTE_ADDR='10.0.0.1')
+        self.post_generate('Light', 5, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(self.run_queue(), ['Heavy 0', 'Light', 'Heavy 1', 'Heavy 2'])
+        self.assertEqual(GenerationJob.objects.filter(client='ip:10.0.0.1').count(), 3)
+
+    def test_weighted_api_key(self):
+        for number in range(3):
+            self.post_generate(f'Address {number}', 6, REMOTE_ADDR='10.0.0.1')
+        for number in range(3):
+            self.post_generate(f'Partner {number}', 6, HTTP_X_API_KEY='partner-key')
+
+        # Weight 3 makes a partner job cost 2 instead of 6, earlier jobs win ties
+        self.assertEqual(self.run_queue(), [
+            'Partner 0', 'Partner 1', 'Address 0', 'Partner 2', 'Address 1', 'Address 2'
+        ])
+        self.assertFalse(GenerationJob.objects.filter(client__contains='partner').exists())
+
+    @override_settings(QUIZ_GENERATION_LEASE_SECONDS=60)
+    def test_expired_lease_is_requeued_by_the_next_claim(self):
+        self.post_generate('Abandoned', 3)
+        self.post_generate('Still running', 3)
+        abandoned, running = GenerationJob.objects.order_by('created_at')
+        GenerationJob.objects.filter(pk__in=[abandoned.pk, running.pk]).update(
+            status='running', updated_at=timezone.now() - timedelta(seconds=120)
+        )
+        # A live worker renews its job's lease, the dead one's expires
+        self.assertEqual(renew_leases([running.pk]), 1)
+
+        self.assertEqual(self.run_queue(), ['Abandoned'])
+        abandoned.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(abandoned.status, 'completed')
+        self.assertEqual(running.status, 'running')
+
+
+@override_settings(QUIZ_GENERATION_WORKERS=0, QUIZ_RATE_LIMIT_RATE=0.5, QUIZ_RATE_LIMIT_BURST=25)
+class RateLimitTests(TestCase):
+    """Clients that used up their token bucket are turned away with a 429"""
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+
+    def post_generate(self, **extra):
+        return self.client.post(reverse('quiz:generate_quiz'), {
+            'topic': 'Throttled', 'difficulty': 'easy', 'num_questions': 3
+        }, **extra)
+
+    def test_generation_limit(self):
+        self.assertEqual(self.post_generate().status_code, 302)
+        self.assertEqual(self.post_generate().status_code, 302)
+
+        response = self.post_generate()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(GenerationJob.objects.count(), 2)
+
+        # Other clients have buckets of their own, reads are not limited
+        self.assertEqual(self.post_generate(REMOTE_ADDR='10.0.0.9').status_code, 302)
+        job = GenerationJob.objects.first()
+        self.assertEqual(self.client.get(reverse('quiz:job_status', args=[job.pk])).status_code, 200)
+
+    def test_answers_cost_less(self):
+        quiz = create_quiz_records(make_quiz_data('Throttled', 3))
+        session_id = quiz.session_id
+        self.post_generate()
+        self.post_generate()
+
+        # 5 tokens left after two generations, enough for answers but not for another quiz
+        url = reverse('quiz:submit_answer', args=[session_id])
+        for _ in range(5):
+            self.assertNotEqual(self.client.post(url, {'selected_option': 0}).status_code, 429)
+        self.assertEqual(self.client.post(url, {'selected_option': 0}).status_code, 429)
+
+    def test_buckets_are_shared_by_default(self):
+        self.assertEqual(settings.CACHES['ratelimit']['BACKEND'], 'django.core.cache.backends.filebased.FileBasedCache')
+        self.assertEqual(rate_limit_cache_check(None), [])
+
+    def test_per_process_buckets_warn_with_several_workers(self):
+        with override_settings(QUIZ_RATE_LIMIT_CACHE='default'):
+            with patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+                self.assertEqual([warning.id for warning in rate_limit_cache_check(None)], ['quiz.W001'])
+            with patch.dict('os.environ', {'WEB_CONCURRENCY': '1'}):
+                self.assertEqual(rate_limit_cache_check(None), [])
+
+
+def insert_rows(model, fields, rows):
+    """Insert tuples of field values into a model's table"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})",
+            list(rows)
+        )
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    QUIZ_ADMIN_EXACT_COUNT_LIMIT=1000, QUIZ_ADMIN_BATCH_SIZE=500
+)
+class AdminPerformanceTests(TestCase):
+    """Admin pages and bulk actions run a fixed number of queries on 100k answers"""
+
+    QUIZZES = 2000
+    QUESTIONS = 50  # Per quiz, and answers per session
+
+    @classmethod
+    def setUpTestData(cls):
+        quizzes = Quiz.objects.bulk_create(
+            Quiz(topic=f'Topic {number}', total_questions=cls.QUESTIONS) for number in range(cls.QUIZZES)
+        )
+        sessions = QuizSession.objects.bulk_create(
+            QuizSession(quiz=quiz, current_question_index=cls.QUESTIONS, is_completed=True) for quiz in quizzes
+        )
+        QuizStatistics.objects.bulk_create(QuizStatistics(session=quiz_session) for quiz_session in sessions)
+        # Questions and answers go in as plain rows, 100k model instances take seconds to build
+        insert_rows(QuizQuestion, [
+            'quiz', 'question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'explanation',
+            'difficulty', 'order'
+        ], (
+            (quiz.pk, f'Question {order} of {quiz.topic}?', 'A', 'B', 'C', 'D', 0, 'Because', 'medium', order)
+            for quiz in quizzes for order in range(cls.QUESTIONS)
+        ))
+        session_of_quiz = {quiz_session.quiz_id: quiz_session.pk for quiz_session in sessions}
+        answered_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        # Four answers out of five correct
+        insert_rows(QuizAnswer, ['session', 'question', 'selected_option', 'is_correct', 'score_change', 'answered_at'], (
+            (session_of_quiz[quiz_id], question_id, 0, order % 5 != 0, 1, answered_at)
+            for question_id, quiz_id, order in QuizQuestion.objects.values_list('id', 'quiz_id', 'order').iterator()
+        ))
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def changelist_url(self, model):
+        return reverse(f'admin:quiz_{model._meta.model_name}_changelist')
+
+    def test_changelists(self):
+        # Session, user, row count estimate and the page of rows joined with its foreign keys
+        for model in (Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics):
+            with self.subTest(model=model.__name__), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.changelist_url(model))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(queries), 4)
+            self.assertFalse([query['sql'] for query in queries if 'COUNT(' in query['sql']])
+
+        # Small tables are still counted exactly
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url(GenerationJob))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue([query['sql'] for query in queries if 'COUNT(' in query['sql']])
+
+    def test_change_form_uses_raw_ids(self):
+        answer = QuizAnswer.objects.first()
+        # No select of every session and question of the database
+        with self.assertNumQueries(10):
+            response = self.client.get(reverse('admin:quiz_quizanswer_change', args=[answer.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    def test_purge_old_quizzes(self):
+        old = Quiz.objects.order_by('pk').values_list('pk', flat=True)[:self.QUIZZES // 2]
+        Quiz.objects.filter(pk__in=list(old)).update(created_at=timezone.now() - timedelta(days=100))
+
+        # Two batches of 500 quizzes, a handful of queries each whatever the number of answers
+        with self.assertNumQueries(22):
+            response = self.client.post(self.changelist_url(Quiz) + '?older_than=90', {
+                'action': 'purge_selected', 'select_across': '1', 'index': '0', '_selected_action': [old[0]],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Quiz.objects.count(), self.QUIZZES // 2)
+        self.assertEqual(QuizAnswer.objects.count(), self.QUIZZES // 2 * self.QUESTIONS)
+        self.assertEqual(QuizQuestion.objects.count(), self.QUIZZES // 2 * self.QUESTIONS)
+        self.assertEqual(QuizSession.objects.count(), self.QUIZZES // 2)
+        self.assertEqual(QuizStatistics.objects.count(), self.QUIZZES // 2)
+
+    def test_pages_after_a_purge(self):
+        # Purging the oldest half leaves the largest primary key, the estimate still says 2000 quizzes
+        Quiz.objects.filter(pk__in=list(Quiz.objects.order_by('pk').values_list('pk', flat=True)[:self.QUIZZES // 2])).delete()
+        url = self.changelist_url(Quiz)
+        self.assertContains(self.client.get(url), f'?p={self.QUIZZES // 100}')
+
+        # A page past the last row shows the last page, counted exactly
+        response = self.client.get(url, {'p': self.QUIZZES // 100 - 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].paginator.num_pages, self.QUIZZES // 2 // 100)
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        self.assertNotContains(response, f'?p={self.QUIZZES // 100}"')
+
+    def test_recompute_statistics(self):
+        selected = QuizStatistics.objects.first().pk
+        # One UPDATE per batch of 500 statistics
+        with self.assertNumQueries(12):
+            response = self.client.post(self.changelist_url(QuizStatistics), {
+                'action': 'recompute_selected', 'select_across': '1', 'index': '0', '_selected_action': [selected],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(QuizStatistics.objects.values_list('total_questions_answered', 'correct_answers', 'incorrect_answers', 'percentage')),
+            {(50, 40, 10, 80.0)}
+        )
+
+
+class LazyAIServiceTests(TestCase):
+    """Importing the app must not pull in the LLM SDKs"""
+
+    def test_views_import_skips_llm_sdks(self):
+        script = (
+            "import os, sys, django\n"
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizbot.settings')\n"
+            "django.setup()\n"
+            "import quiz.views, quiz.admin\n"
+            "heavy = [m for m in ('google.generativeai', 'langchain_google_genai', 'langchain') if m in sys.modules]\n"
+            "print(','.join(heavy))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), '')
+
+
+class QuestionBankTests(TestCase):
+    """New quizzes reuse stored questions and only generate the shortfall"""
+
+    def test_full_quiz_from_bank(self):
+        create_quiz_records(make_quiz_data('Python Basics', 3))
+
+        with patch.object(ai_quiz_service, 'generate_quiz') as generate:
+            quiz_data = build_quiz_data('python basics', 'easy', 3)
+        generate.assert_not_called()
+        self.assertEqual(len(quiz_data.questions), 3)
+
+    def test_generates_only_shortfall(self):
+        create_quiz_records(make_quiz_data('Python Basics', 2))
+
+        with patch.object(ai_quiz_service, 'generate_quiz', return_value=make_quiz_data('Python', 3)) as generate:
+            quiz_data = build_quiz_data('Python Basics', 'easy', 5)
+        generate.assert_called_once_with('Python Basics', 'easy', 3)
+        self.assertEqual(len(quiz_data.questions), 5)
+
+    def test_copies_and_other_topics_are_skipped(self):
+        create_quiz_records(make_quiz_data('Python Basics', 2))
+        create_quiz_records(make_quiz_data('Python Basics', 2))
+        create_quiz_records(make_quiz_data('Rust Basics', 2))
+
+        with patch.object(ai_quiz_service, 'generate_quiz', return_value=make_quiz_data('Python', 2)):
+            quiz_data = build_quiz_data('Python Basics', 'easy', 4)
+        self.assertEqual(len({question.question for question in quiz_data.questions}), 4)
+        self.assertFalse(any('Rust' in question.question for question in quiz_data.questions))
+
+    def test_fallback_questions_are_not_reused(self):
+        create_quiz_records(ai_quiz_service.create_fallback_quiz('Python Basics', 'easy', 3))
+
+        with patch.object(ai_quiz_service, 'generate_quiz', return_value=make_quiz_data('Python Basics', 3)) as generate:
+            build_quiz_data('Python Basics', 'easy', 3)
+        generate.assert_called_once_with('Python Basics', 'easy', 3)
+
+
+class PaginationTests(TestCase):
+    """Answers and leaderboard are paged with cursors"""
+
+    def collect_pages(self, url, key, limit):
+        rows, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(url, params).json()
+            rows += data[key]
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                return rows, pages
+
+    def test_answers_pages(self):
+        quiz = create_quiz(num_questions=7)
+        quiz_session = quiz.session
+        for question in quiz.questions.all():
+            QuizAnswer.objects.create(
+                session=quiz_session, question=question, selected_option=0,
+                is_correct=question.correct_answer == 0, score_change=0
+            )
+        # Identical timestamps, pages must still split on the primary key
+        QuizAnswer.objects.update(answered_at=quiz_session.started_at)
+        url = reverse('quiz:session_answers', args=[quiz.session_id])
+
+        answers, pages = self.collect_pages(url, 'answers', 3)
+        self.assertEqual(pages, 3)
+        self.assertEqual([answer['question_index'] for answer in answers], list(range(7)))
+
+        # The session, then the answers tied with the cursor fill the page
+        cursor = self.client.get(url, {'limit': 3}).json()['next_cursor']
+        with self.assertNumQueries(2):
+            self.client.get(url, {'limit': 3, 'cursor': cursor})
+
+    def test_leaderboard_pages(self):
+        scores = [5, 9, 5, 1, 5, -2]
+        for score in scores:
+            QuizSession.objects.filter(quiz=create_quiz(num_questions=1)).update(
+                current_score=score, current_question_index=1
+            )
+        create_quiz(num_questions=1)  # Not started, not ranked
+
+        entries, pages = self.collect_pages(reverse('quiz:leaderboard'), 'leaderboard', 2)
+        self.assertEqual(pages, 3)
+        self.assertEqual([entry['score'] for entry in entries], sorted(scores, reverse=True))
+
+    def test_invalid_cursor_and_limit(self):
+        url = reverse('quiz:leaderboard')
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 'ten'}).status_code, 400)
+
+
+class AnalyticsTests(TestCase):
+    """Per-topic and per-question statistics over every answer"""
+
+    def setUp(self):
+        # Strong players get questions 1 and 3 right but pick option C on question 2, keyed B
+        for number in range(10):
+            strong = number < 5
+            quiz = create_quiz(num_questions=3, topic='Python')
+            picks = [0, 2, 2] if strong else [3, 1, 0]
+            for question, selected in zip(quiz.questions.order_by('order'), picks):
+                QuizAnswer.objects.create(
+                    session=quiz.session, question=question, selected_option=selected,
+                    is_correct=question.correct_answer == selected, score_change=0
+                )
+        rust = create_quiz(num_questions=1, topic='Rust')
+        QuizAnswer.objects.create(
+            session=rust.session, question=rust.questions.get(), selected_option=0, is_correct=True, score_change=0
+        )
+        self.url = reverse('quiz:answer_analytics')
+
+    def test_copies_of_a_question_are_one_question(self):
+        with self.assertNumQueries(2):
+            columns = load_answers()
+        self.assertEqual(len(columns['question']), 31)
+        self.assertEqual(len(columns['labels']), 4)
+        self.assertEqual(columns['session'].max(), 10)
+
+    def test_report(self):
+        self.client.force_login(User.objects.create_user('staff', password='secret', is_staff=True))
+        data = self.client.get(self.url, {'min_answers': 5}).json()
+
+        self.assertEqual((data['answers'], data['sessions'], data['questions']), (31, 11, 4))
+        self.assertEqual({topic['topic']: topic['accuracy'] for topic in data['topics']}, {'Python': 0.5, 'Rust': 1.0})
+        questions = {question['question']: question for question in data['question_stats']}
+        first, second = questions['Question 1 about Python?'], questions['Question 2 about Python?']
+        self.assertEqual((first['p_value'], first['discrimination'], first['flags']), (0.5, 1.0, []))
+        self.assertEqual(second['option_counts'], [0, 5, 5, 0])
+        self.assertEqual(second['discrimination'], -1.0)
+        self.assertEqual(second['flags'], ['ambiguous'])
+        self.assertEqual(questions['Question 1 about Rust?']['flags'], [])
+
+        flagged = self.client.get(self.url, {'min_answers': 5, 'flagged_only': 'true'}).json()
+        self.assertEqual([question['question'] for question in flagged['question_stats']], ['Question 2 about Python?'])
+        self.assertEqual(self.client.get(self.url, {'limit': 'all'}).status_code, 400)
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(User.objects.create_user('player', password='secret'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class FakeChatModel:
+    """Local stand-in for a chat model, answering with canned responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+
+class ModelRoutingTests(TestCase):
+    """Quizzes start on the routed model tier and escalate when an answer is unusable"""
+
+    def setUp(self):
+        self.valid = make_quiz_data('Python', 6).model_dump_json()
+        self.fast, self.standard, self.strong = FakeChatModel(), FakeChatModel(), FakeChatModel()
+        ai_quiz_service._router = ModelRouter(
+            [
+                ModelTier('fast', 'fast-model', 0.7, self.fast),
+                ModelTier('standard', 'standard-model', 0.7, self.standard),
+                ModelTier('strong', 'strong-model', 0.4, self.strong),
+            ],
+            routes={'easy': 'fast', 'medium': 'standard', 'hard': 'strong'},
+            short_quiz_questions=3
+        )
+
+    def tearDown(self):
+        ai_quiz_service._router = None
+
+    def test_routes_by_difficulty_and_size(self):
+        self.fast.responses = [self.valid, self.valid]
+        self.strong.responses = [self.valid]
+        ai_quiz_service.generate_quiz('Python', 'hard', 2)  # Short quizzes start on the fastest tier
+        ai_quiz_service.generate_quiz('Python', 'easy', 6)
+        ai_quiz_service.generate_quiz('Python', 'hard', 6)
+        self.assertEqual((len(self.fast.prompts), len(self.standard.prompts), len(self.strong.prompts)), (2, 0, 1))
+
+    def test_unusable_answer_escalates(self):
+        self.fast.responses = ['Sorry, I cannot help with that']
+        self.standard.responses = ['{"topic": "Python", "difficulty": "easy", "questions": []}']
+        self.strong.responses = [self.valid]
+        quiz = ai_quiz_service.generate_quiz('Python', 'easy', 6)
+        self.assertFalse(quiz.is_fallback)
+        self.assertEqual(len(quiz.questions), 6)
+
+        tiers = self.client.get(reverse('quiz:model_stats')).json()['tiers']
+        self.assertEqual([tier['success_rate'] for tier in tiers], [0.0, 0.0, 1.0])
+        self.assertEqual(tiers[0]['errors'], {'ValueError': 1})
+
+    def test_fallback_after_every_tier_failed(self):
+        self.fast.responses = ['no quiz']
+        self.standard.responses = ['no quiz']
+        self.strong.responses = ['{"broken": ']
+        quiz = ai_quiz_service.generate_quiz('Python', 'easy', 6)
+        self.assertTrue(quiz.is_fallback)
+
+
+class SessionIdMigrationTests(TransactionTestCase):
+    """Migration 0002 turns session IDs into UUIDs and logs the ones it has to replace"""
+
+    def migrate(self, target=None):
+        """Migrate the quiz app to target, the latest migration by default, and return the models of that state"""
+        executor = MigrationExecutor(connection)
+        node = ('quiz', target) if target else executor.loader.graph.leaf_nodes('quiz')[0]
+        executor.migrate([node])
+        executor.loader.build_graph()
+        return executor.loader.project_state([node]).apps
+
+    def tearDown(self):
+        self.migrate()
+
+    def test_unparseable_ids_are_replaced_and_logged(self):
+        old_apps = self.migrate('0001_initial')
+        Quiz = old_apps.get_model('quiz', 'Quiz')
+        kept = Quiz.objects.create(topic='Kept', session_id='0f8fad5b-d9cb-469f-a165-70867728950e')
+        legacy = Quiz.objects.create(topic='Legacy', session_id='legacy-1')
+
+        with self.assertLogs('quiz.migrations.0002_uuid_session_id_and_indexes', 'WARNING') as logs:
+            new_apps = self.migrate('0002_uuid_session_id_and_indexes')
+        Quiz = new_apps.get_model('quiz', 'Quiz')
+        self.assertEqual(str(Quiz.objects.get(pk=kept.pk).session_id), '0f8fad5b-d9cb-469f-a165-70867728950e')
+        replaced = Quiz.objects.get(pk=legacy.pk).session_id
+        self.assertIn(f"'legacy-1' is not a UUID, replaced by {replaced}", logs.output[0])
+        self.assertIn('1 quiz session ids were not UUIDs', logs.output[1])
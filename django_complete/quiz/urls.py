@@ -7,11 +7,19 @@ urlpatterns = [
     # Main pages
     path('', views.index, name='index'),
     path('generate/', views.generate_quiz, name='generate_quiz'),
-    path('quiz/<str:session_id>/', views.quiz_detail, name='quiz_detail'),
-    path('quiz/<str:session_id>/submit/', views.submit_answer, name='submit_answer'),
-    path('quiz/<str:session_id>/results/', views.quiz_results, name='quiz_results'),
-    path('quiz/<str:session_id>/restart/', views.restart_quiz, name='restart_quiz'),
+    path('generate/async/', views.generate_quiz_async, name='generate_quiz_async'),
+    path('generate/<uuid:job_id>/', views.generation_status, name='generation_status'),
+    path('quiz/<uuid:session_id>/', views.quiz_detail, name='quiz_detail'),
+    path('quiz/<uuid:session_id>/submit/', views.submit_answer, name='submit_answer'),
+    path('quiz/<uuid:session_id>/results/', views.quiz_results, name='quiz_results'),
+    path('quiz/<uuid:session_id>/restart/', views.restart_quiz, name='restart_quiz'),
     
     # API endpoints
-    path('api/quiz/<str:session_id>/status/', views.quiz_status, name='quiz_status'),
+    path('api/quiz/<uuid:session_id>/status/', views.quiz_status, name='quiz_status'),
+    path('api/quiz/<uuid:session_id>/answers/', views.session_answers, name='session_answers'),
+    path('api/leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('api/jobs/<uuid:job_id>/events/', views.job_events, name='job_events'),
+    path('api/models/', views.model_stats, name='model_stats'),
+    path('api/analytics/', views.answer_analytics, name='answer_analytics'),
 ]
@@ -1,14 +1,35 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import sync_to_async
+import asyncio
 import json
 import uuid
 
-from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, GenerationJob, JobStatusChoice
 from .ai_service import ai_quiz_service
+from .jobs import create_quiz_records, enqueue_generation, worker_pool
+from .cache import get_quiz
+from .question_bank import find_bank_questions, merge_quiz_data
+from .pagination import InvalidCursor, keyset_page, page_size
+from .ratelimit import identify_client
+
+
+# Columns needed to render the quiz pages, the quiz and its questions come from the quiz cache
+DETAIL_SESSION_FIELDS = (
+    'id', 'quiz_id', 'current_score', 'current_question_index', 'is_completed',
+)
+RESULTS_SESSION_FIELDS = DETAIL_SESSION_FIELDS + (
+    'started_at',
+    'statistics__id', 'statistics__session_id', 'statistics__total_questions_answered',
+    'statistics__correct_answers', 'statistics__incorrect_answers', 'statistics__percentage',
+)
 
 
 def index(request):
@@ -16,62 +37,143 @@ def index(request):
     return render(request, 'quiz/index.html')
 
 
+def parse_generation_form(request):
+    """Read and normalise the quiz generation form, returns None without a topic"""
+    topic = request.POST.get('topic', '').strip()
+    difficulty = request.POST.get('difficulty', 'medium')
+    num_questions = int(request.POST.get('num_questions', 10))
+    
+    if not topic:
+        return None
+    
+    # Validate inputs
+    if difficulty not in ['easy', 'medium', 'hard']:
+        difficulty = 'medium'
+    
+    if num_questions < 1 or num_questions > 20:
+        num_questions = 10
+    
+    return topic, difficulty, num_questions
+
+
+def store_generated_quiz(request, quiz_data):
+    """Save a generated quiz and remember it in the Django session"""
+    quiz = create_quiz_records(quiz_data)
+    
+    # Store quiz session ID in Django session
+    request.session['quiz_session_id'] = str(quiz.session_id)
+    
+    return quiz
+
+
 @require_http_methods(["POST"])
 def generate_quiz(request):
-    """Generate a new quiz using AI"""
+    """Queue the generation of a new quiz and show its progress page"""
     try:
-        # Get form data
-        topic = request.POST.get('topic', '').strip()
-        difficulty = request.POST.get('difficulty', 'medium')
-        num_questions = int(request.POST.get('num_questions', 10))
+        form = parse_generation_form(request)
+        if form is None:
+            messages.error(request, 'Topic is required')
+            return redirect('quiz:index')
+        
+        topic, difficulty, num_questions = form
         
-        if not topic:
+        # The AI call runs in a background worker, the request returns right away
+        client, weight = identify_client(request)
+        job = enqueue_generation(topic, difficulty, num_questions, client=client, weight=weight)
+        
+        return redirect('quiz:generation_status', job_id=job.pk)
+        
+    except Exception as e:
+        messages.error(request, f'Error generating quiz: {str(e)}')
+        return redirect('quiz:index')
+
+
+def generation_status(request, job_id):
+    """Progress page of a queued quiz generation"""
+    job = get_object_or_404(GenerationJob, pk=job_id)
+    
+    if job.status == JobStatusChoice.COMPLETED:
+        request.session['quiz_session_id'] = str(job.quiz.session_id)
+        return redirect('quiz:quiz_detail', session_id=job.quiz.session_id)
+    
+    if job.status == JobStatusChoice.FAILED:
+        messages.error(request, f'Error generating quiz: {job.error}')
+        return redirect('quiz:index')
+    
+    worker_pool.ensure_started()
+    return render(request, 'quiz/generation_status.html', {'job': job})
+
+
+def job_status_data(job):
+    """JSON-serializable state of a generation job"""
+    data = {
+        'job_id': str(job.pk),
+        'status': job.status,
+        'topic': job.topic,
+        'num_questions': job.num_questions,
+        'error': job.error or None,
+        'quiz_url': None,
+    }
+    if job.status == JobStatusChoice.COMPLETED and job.quiz_id:
+        data['quiz_id'] = str(job.quiz.session_id)
+        data['quiz_url'] = reverse('quiz:generation_status', args=[job.pk])
+    return data
+
+
+@require_http_methods(["GET"])
+def job_status(request, job_id):
+    """API endpoint to poll a generation job (JSON response)"""
+    job = GenerationJob.objects.select_related('quiz').filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    
+    worker_pool.ensure_started()
+    return JsonResponse(job_status_data(job))
+
+
+async def job_events(request, job_id):
+    """API endpoint streaming a generation job's status as server-sent events"""
+    get_job = sync_to_async(
+        lambda: GenerationJob.objects.select_related('quiz').filter(pk=job_id).first()
+    )
+    if await get_job() is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    
+    async def event_stream():
+        last_status = None
+        while True:
+            job = await get_job()
+            if job.status != last_status:
+                last_status = job.status
+                yield f"event: {last_status}\ndata: {json.dumps(job_status_data(job))}\n\n"
+            if job.is_finished:
+                break
+            await asyncio.sleep(worker_pool.poll_interval)
+    
+    return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+
+
+async def generate_quiz_async(request):
+    """Generate a new quiz using AI without pinning a worker thread (served under ASGI)"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    try:
+        form = parse_generation_form(request)
+        if form is None:
             messages.error(request, 'Topic is required')
             return redirect('quiz:index')
         
-        # Validate inputs
-        if difficulty not in ['easy', 'medium', 'hard']:
-            difficulty = 'medium'
-        
-        if num_questions < 1 or num_questions > 20:
-            num_questions = 10
-        
-        # Generate quiz using AI
-        quiz_data = ai_quiz_service.generate_quiz(topic, difficulty, num_questions)
-        
-        # Create quiz in database
-        with transaction.atomic():
-            # Create the quiz
-            quiz = Quiz.objects.create(
-                session_id=str(uuid.uuid4()),
-                topic=quiz_data.topic,
-                difficulty=quiz_data.difficulty,
-                total_questions=len(quiz_data.questions)
-            )
-            
-            # Create questions
-            for idx, question_data in enumerate(quiz_data.questions):
-                QuizQuestion.objects.create(
-                    quiz=quiz,
-                    question=question_data.question,
-                    option_a=question_data.option_a,
-                    option_b=question_data.option_b,
-                    option_c=question_data.option_c,
-                    option_d=question_data.option_d,
-                    correct_answer=question_data.correct_answer,
-                    explanation=question_data.explanation,
-                    difficulty=question_data.difficulty,
-                    order=idx
-                )
-            
-            # Create quiz session
-            quiz_session = QuizSession.objects.create(quiz=quiz)
-            
-            # Create statistics
-            QuizStatistics.objects.create(session=quiz_session)
-        
-        # Store quiz session ID in Django session
-        request.session['quiz_session_id'] = quiz.session_id
+        topic, difficulty, num_questions = form
+        
+        # Reuse bank questions, the event loop keeps serving other requests while the LLM writes the rest
+        banked = await sync_to_async(find_bank_questions)(topic, difficulty, num_questions)
+        missing = num_questions - len(banked)
+        generated = await ai_quiz_service.agenerate_quiz(topic, difficulty, missing) if missing else None
+        quiz_data = merge_quiz_data(topic, difficulty, banked, generated)
+        
+        # The ORM and session store are sync-only, run the writes in a thread
+        quiz = await sync_to_async(store_generated_quiz)(request, quiz_data)
         
         return redirect('quiz:quiz_detail', session_id=quiz.session_id)
         
@@ -83,28 +185,30 @@ def generate_quiz(request):
 def quiz_detail(request, session_id):
     """Display quiz questions"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
-        
-        # Get current question
-        questions = quiz.questions.all()
+        # Only the session row is read, the quiz and its questions are cached
+        quiz, questions = get_quiz(session_id)
+        quiz_session = get_object_or_404(QuizSession.objects.only(*DETAIL_SESSION_FIELDS), quiz_id=quiz.pk)
+        quiz_session.quiz = quiz
+        total_questions = quiz.total_questions
         current_index = quiz_session.current_question_index
         
-        if current_index >= len(questions):
+        current_question = None
+        if current_index < len(questions):
+            current_question = questions[current_index]
+        
+        if current_question is None:
             # Quiz completed, redirect to results
             return redirect('quiz:quiz_results', session_id=session_id)
         
-        current_question = questions[current_index]
-        
         # Calculate progress
-        progress_percentage = ((current_index) / len(questions)) * 100
+        progress_percentage = ((current_index) / total_questions) * 100
         
         context = {
             'quiz': quiz,
             'quiz_session': quiz_session,
             'current_question': current_question,
             'question_number': current_index + 1,
-            'total_questions': len(questions),
+            'total_questions': total_questions,
             'progress_percentage': progress_percentage,
             'options': current_question.options,
         }
@@ -120,8 +224,9 @@ def quiz_detail(request, session_id):
 def submit_answer(request, session_id):
     """Submit an answer for a quiz question"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        # The quiz is cached, the session and its statistics are the only rows read
+        quiz, questions = get_quiz(session_id)
+        quiz_session = get_object_or_404(QuizSession.objects.select_related('statistics'), quiz_id=quiz.pk)
         
         # Get submitted answer
         selected_option = request.POST.get('selected_option')
@@ -132,7 +237,6 @@ def submit_answer(request, session_id):
         selected_option = int(selected_option)
         
         # Get current question
-        questions = quiz.questions.all()
         current_index = quiz_session.current_question_index
         
         if current_index >= len(questions):
@@ -140,11 +244,16 @@ def submit_answer(request, session_id):
         
         current_question = questions[current_index]
         
+        # A resubmitted form (double click, refresh, retry) names a question that was already answered
+        posted_question = request.POST.get('question_id')
+        if posted_question and posted_question != str(current_question.pk):
+            return redirect('quiz:quiz_detail', session_id=session_id)
+        
         # Check if already answered
         existing_answer = QuizAnswer.objects.filter(
             session=quiz_session, 
             question=current_question
-        ).first()
+        ).exists()
         
         if existing_answer:
             # Already answered, move to next question
@@ -177,7 +286,7 @@ def submit_answer(request, session_id):
         
         # Update statistics
         stats = quiz_session.statistics
-        stats.update_statistics()
+        stats.record_answer(is_correct)
         
         return redirect('quiz:quiz_detail', session_id=session_id)
         
@@ -189,31 +298,41 @@ def submit_answer(request, session_id):
 def quiz_results(request, session_id):
     """Display quiz results"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        # Session and statistics joined, the quiz and its questions are cached
+        quiz, questions = get_quiz(session_id)
+        quiz_session = get_object_or_404(
+            QuizSession.objects.select_related('statistics').only(*RESULTS_SESSION_FIELDS),
+            quiz_id=quiz.pk
+        )
+        quiz_session.quiz = quiz
         
         if not quiz_session.is_completed:
             return redirect('quiz:quiz_detail', session_id=session_id)
         
-        # Get all answers with questions
-        answers = quiz_session.answers.select_related('question').order_by('question__order')
-        
         # Get statistics
         stats = quiz_session.statistics
         
-        # Prepare detailed results
+        # Prepare detailed results, in question order
+        answers = {
+            question_id: (selected_option, is_correct)
+            for question_id, selected_option, is_correct
+            in quiz_session.answers.values_list('question_id', 'selected_option', 'is_correct')
+        }
         detailed_results = []
-        for answer in answers:
-            question = answer.question
+        for question in questions:
+            if question.pk not in answers:
+                continue
+            selected_option, is_correct = answers[question.pk]
+            options = question.options
             detailed_results.append({
                 'question': question.question,
-                'options': question.options,
-                'selected_option': answer.selected_option,
+                'options': options,
+                'selected_option': selected_option,
                 'correct_answer': question.correct_answer,
-                'is_correct': answer.is_correct,
+                'is_correct': is_correct,
                 'explanation': question.explanation,
-                'selected_text': question.options[answer.selected_option],
-                'correct_text': question.options[question.correct_answer],
+                'selected_text': options[selected_option],
+                'correct_text': options[question.correct_answer],
             })
         
         context = {
@@ -233,8 +352,8 @@ def quiz_results(request, session_id):
 def restart_quiz(request, session_id):
     """Restart the quiz from the beginning"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        quiz, _ = get_quiz(session_id)
+        quiz_session = get_object_or_404(QuizSession.objects.select_related('statistics'), quiz_id=quiz.pk)
         
         # Reset session data
         quiz_session.current_score = 0
@@ -265,12 +384,12 @@ def restart_quiz(request, session_id):
 def quiz_status(request, session_id):
     """API endpoint to get quiz status (JSON response)"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        quiz, _ = get_quiz(session_id)
+        quiz_session = get_object_or_404(QuizSession.objects.select_related('statistics'), quiz_id=quiz.pk)
         stats = quiz_session.statistics
         
         data = {
-            'quiz_id': session_id,
+            'quiz_id': str(session_id),
             'topic': quiz.topic,
             'difficulty': quiz.difficulty,
             'total_questions': quiz.total_questions,
@@ -289,3 +408,90 @@ def quiz_status(request, session_id):
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_http_methods(["GET"])
+def session_answers(request, session_id):
+    """API endpoint paging through the answers of a quiz session, oldest first"""
+    quiz_session = QuizSession.objects.filter(quiz__session_id=session_id).only('id').first()
+    if quiz_session is None:
+        return JsonResponse({'error': 'Quiz session not found'}, status=404)
+    
+    try:
+        answers, next_cursor = keyset_page(
+            QuizAnswer.objects.filter(session=quiz_session).select_related('question').only(
+                'answered_at', 'selected_option', 'is_correct', 'score_change',
+                'question__question', 'question__order',
+            ),
+            'answered_at', page_size(request, default=20), request.GET.get('cursor'), parse_value=parse_datetime
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'answers': [
+            {
+                'question_index': answer.question.order,
+                'question': answer.question.question,
+                'selected_option': answer.selected_option,
+                'is_correct': answer.is_correct,
+                'score_change': answer.score_change,
+                'answered_at': answer.answered_at.isoformat(),
+            }
+            for answer in answers
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+@require_http_methods(["GET"])
+def leaderboard(request):
+    """API endpoint paging through quiz sessions by score, best first"""
+    try:
+        sessions, next_cursor = keyset_page(
+            QuizSession.objects.filter(current_question_index__gt=0).select_related('quiz', 'statistics').only(
+                'current_score', 'quiz__session_id', 'quiz__topic',
+                'statistics__id', 'statistics__session_id', 'statistics__total_questions_answered',
+                'statistics__percentage',
+            ),
+            'current_score', page_size(request, default=10), request.GET.get('cursor'), descending=True
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'leaderboard': [
+            {
+                'session_id': str(quiz_session.quiz.session_id)[:8],
+                'topic': quiz_session.quiz.topic,
+                'score': quiz_session.current_score,
+                'percentage': quiz_session.statistics.percentage,
+                'questions_answered': quiz_session.statistics.total_questions_answered,
+            }
+            for quiz_session in sessions
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+@require_http_methods(["GET"])
+def model_stats(request):
+    """API endpoint reporting how each model tier performed, to tune the routes"""
+    return JsonResponse({'tiers': ai_quiz_service.model_stats()})
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def answer_analytics(request):
+    """API endpoint with the accuracy of every topic and the statistics of every question, staff only"""
+    try:
+        min_answers = int(request.GET.get('min_answers', 30))
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'min_answers and limit must be integers'}, status=400)
+    flagged_only = request.GET.get('flagged_only', '').lower() in ('1', 'true', 'yes')
+
+    # NumPy is imported on the first report rather than with the views
+    from .analytics import analytics_report, load_answers
+
+    return JsonResponse(analytics_report(load_answers(), min_answers, flagged_only, limit))
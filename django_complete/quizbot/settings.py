@@ -51,6 +51,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "quiz.ratelimit.RateLimitMiddleware",  # Token buckets per client for generations and answers
 ]
 
 ROOT_URLCONF = "quizbot.urls"
@@ -157,6 +158,82 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # AI Configuration
 GOOGLE_GENERATIVE_AI_API_KEY = config('GOOGLE_GENERATIVE_AI_API_KEY', default='your-api-key-here')
+# Model tiers, fastest first (name=model:temperature), and the tier each difficulty starts on
+QUIZ_MODEL_TIERS = config(
+    'QUIZ_MODEL_TIERS',
+    default='fast=gemini-1.5-flash-8b:0.7,standard=gemini-1.5-flash:0.7,strong=gemini-1.5-pro:0.4'
+)
+QUIZ_MODEL_ROUTES = config('QUIZ_MODEL_ROUTES', default='easy=fast,medium=standard,hard=standard')
 
 # Template directories
 TEMPLATES[0]['DIRS'] = [BASE_DIR / 'templates']
+
+# Generated quizzes never change, each is cached whole with its questions by session ID in the QUIZ_OBJECT_CACHE
+# cache: locmem (per process), file (a directory) or redis (a redis:// URL, needs the redis package)
+QUIZ_OBJECT_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'quizzes'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache' / 'quizzes')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+QUIZ_OBJECT_CACHE_BACKEND = config('QUIZ_OBJECT_CACHE_BACKEND', default='locmem')
+QUIZ_OBJECT_CACHE_TIMEOUT = config('QUIZ_OBJECT_CACHE_TIMEOUT', default=86400, cast=int)
+QUIZ_OBJECT_CACHE = 'quizzes'
+
+_quiz_cache_backend, _quiz_cache_location = QUIZ_OBJECT_CACHE_BACKENDS[QUIZ_OBJECT_CACHE_BACKEND]
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    QUIZ_OBJECT_CACHE: {
+        'BACKEND': _quiz_cache_backend,
+        'LOCATION': config('QUIZ_OBJECT_CACHE_LOCATION', default=_quiz_cache_location),
+        'TIMEOUT': QUIZ_OBJECT_CACHE_TIMEOUT,
+    },
+}
+if QUIZ_OBJECT_CACHE_BACKEND != 'redis':
+    # Culled past this many quizzes, Redis evicts by its own maxmemory policy instead
+    CACHES[QUIZ_OBJECT_CACHE]['OPTIONS'] = {
+        'MAX_ENTRIES': config('QUIZ_OBJECT_CACHE_MAX_ENTRIES', default=10000, cast=int),
+    }
+
+# Rate limit buckets must be shared by the worker processes, each keeps its own with locmem and N workers
+# then allow N times the rate: file (a directory, one host, the default) or redis (every host)
+QUIZ_RATE_LIMIT_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'ratelimit'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache' / 'ratelimit')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/2'),
+}
+QUIZ_RATE_LIMIT_CACHE_BACKEND = config('QUIZ_RATE_LIMIT_CACHE_BACKEND', default='file')
+_rate_cache_backend, _rate_cache_location = QUIZ_RATE_LIMIT_CACHE_BACKENDS[QUIZ_RATE_LIMIT_CACHE_BACKEND]
+CACHES['ratelimit'] = {
+    'BACKEND': _rate_cache_backend,
+    'LOCATION': config('QUIZ_RATE_LIMIT_CACHE_LOCATION', default=_rate_cache_location),
+}
+
+# Background quiz generation
+QUIZ_GENERATION_WORKERS = config('QUIZ_GENERATION_WORKERS', default=2, cast=int)  # Threads per process, 0 disables
+QUIZ_SHORT_QUIZ_QUESTIONS = config('QUIZ_SHORT_QUIZ_QUESTIONS', default=5, cast=int)  # Quizzes up to this size win ties
+QUIZ_GENERATION_LEASE_SECONDS = config('QUIZ_GENERATION_LEASE_SECONDS', default=600, cast=int)
+# Fair queuing weight of API keys sent as X-API-Key ("key=weight,..."), other clients weigh 1
+QUIZ_CLIENT_WEIGHTS = config('QUIZ_CLIENT_WEIGHTS', default='')
+
+# Token bucket per API key or client address: refilled at RATE tokens per second up to BURST, 0 disables it.
+# Buckets live in the QUIZ_RATE_LIMIT_CACHE cache, the 'ratelimit' cache above unless another alias is named
+QUIZ_RATE_LIMIT_RATE = config('QUIZ_RATE_LIMIT_RATE', default=2.0, cast=float)
+QUIZ_RATE_LIMIT_BURST = config('QUIZ_RATE_LIMIT_BURST', default=60.0, cast=float)
+QUIZ_RATE_LIMIT_CACHE = config('QUIZ_RATE_LIMIT_CACHE', default='ratelimit')
+QUIZ_RATE_LIMIT_COSTS = {
+    'quiz:generate_quiz': config('QUIZ_RATE_COST_GENERATE', default=10.0, cast=float),
+    'quiz:generate_quiz_async': config('QUIZ_RATE_COST_GENERATE', default=10.0, cast=float),
+    'quiz:submit_answer': config('QUIZ_RATE_COST_ANSWER', default=1.0, cast=float),
+}
+# Only behind a proxy that sets X-Forwarded-For, clients could pick their address otherwise
+QUIZ_TRUST_FORWARDED = config('QUIZ_TRUST_FORWARDED', default=False, cast=bool)
+
+# Reuse questions of earlier quizzes on the same topic before calling the LLM
+QUIZ_QUESTION_BANK = config('QUIZ_QUESTION_BANK', default=True, cast=bool)
+
+# Admin changelists of tables with more rows than this show an estimated count instead of running COUNT(*)
+QUIZ_ADMIN_EXACT_COUNT_LIMIT = config('QUIZ_ADMIN_EXACT_COUNT_LIMIT', default=10000, cast=int)
+# Quizzes or statistics rows handled per statement by the bulk admin actions
+QUIZ_ADMIN_BATCH_SIZE = config('QUIZ_ADMIN_BATCH_SIZE', default=500, cast=int)
@@ -1,5 +1,6 @@
 import requests
 import json
+import time
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -30,10 +31,28 @@ class APIClient:
             }
             response = requests.post(f"{self.base_url}/quiz/generate", json=data)
             response.raise_for_status()
-            return response.json()
+            queued = response.json()
+            return self.wait_for_job(queued["job_id"])
         except requests.RequestException as e:
             return {"error": str(e)}
     
+    def wait_for_job(self, job_id, timeout=120, interval=0.5):
+        """Poll a queued generation job until it finishes"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            response = requests.get(f"{self.base_url}/quiz/jobs/{job_id}")
+            response.raise_for_status()
+            job = response.json()
+            
+            if job["status"] == "completed":
+                return job["result"]
+            if job["status"] == "failed":
+                return {"error": job.get("error") or "Quiz generation failed"}
+            
+            time.sleep(interval)
+        
+        return {"error": "Timed out waiting for quiz generation"}
+    
     def submit_answer(self, session_id, question_index, selected_option):
         try:
             data = {
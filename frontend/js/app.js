@@ -106,7 +106,14 @@ class QuizBot {
         }),
       });
 
-      const data = await response.json();
+      const queued = await response.json();
+
+      if (!queued.success) {
+        throw new Error(queued.error || "Failed to queue quiz");
+      }
+
+      // Generation runs in the background, wait for the job to finish
+      const data = await this.waitForJob(queued.job_id);
 
       if (data.success) {
         this.currentQuiz = data.quiz;
@@ -125,6 +132,33 @@ class QuizBot {
     }
   }
 
+  async waitForJob(jobId, intervalMs = 1000, timeoutMs = 120000) {
+    // A job left running by a crashed worker is only requeued after its lease, give up before that
+    const deadline = Date.now() + timeoutMs;
+
+    while (Date.now() < deadline) {
+      let response;
+      let job;
+      try {
+        response = await fetch(`${this.apiUrl}/quiz/jobs/${jobId}`);
+        job = await response.json();
+      } catch (error) {
+        return { success: false, error: `Could not check the quiz generation: ${error.message}` };
+      }
+
+      if (job.status === "completed") {
+        return job.result;
+      }
+      if (job.status === "failed" || !response.ok) {
+        return { success: false, error: job.error || "Quiz generation failed" };
+      }
+
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+
+    return { success: false, error: "Quiz generation timed out, please try again" };
+  }
+
   startQuiz() {
     this.showScreen("quizScreen");
     document.getElementById("quizTopic").textContent = this.currentQuiz.topic;
@@ -210,8 +244,10 @@ class QuizBot {
         score_change: result.score_change,
       };
 
-      // Update score
-      this.score += result.score_change;
+      // Update score, a repeated answer was already counted
+      if (!result.duplicate) {
+        this.score += result.score_change;
+      }
       this.updateScoreDisplay();
 
       // Show feedback
@@ -4,8 +4,15 @@ QuizBot - AI-Powered Quiz Generator
 
 This script starts the QuizBot backend server.
 Make sure to set up your Google API key in the .env file before running.
+
+Usage:
+    python run_server.py                  # Development: single process with auto-reload
+    python run_server.py --prod           # Production: one worker per CPU core
+    python run_server.py --prod --workers 4 --port 8080
 """
 
+import argparse
+import importlib.util
 import os
 import sys
 import uvicorn
@@ -14,10 +21,72 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Session store shared by the worker processes when none is configured
+DEFAULT_SHARED_SESSION_STORE = "sqlite:///quizbot_sessions.sqlite3"
+# Rate limit buckets shared by the worker processes when none are configured
+DEFAULT_SHARED_RATE_LIMIT = "sqlite:///quizbot_rate_limit.sqlite3"
+# Idempotency keys shared by the worker processes when none are configured
+DEFAULT_SHARED_IDEMPOTENCY = "sqlite:///quizbot_idempotency.sqlite3"
+
+
+def parse_args():
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(description="Start the QuizBot backend server")
+    parser.add_argument("--prod", action="store_true", help="Run multiple workers without auto-reload")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes in production mode (default: CPU count)")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument("--grace", type=int, default=int(os.getenv("QUIZBOT_SHUTDOWN_GRACE", "30")),
+                        help="Seconds to let in-flight generations finish on shutdown")
+    return parser.parse_args()
+
+
+def server_options(args):
+    """Build the uvicorn options for the selected mode"""
+    if not args.prod:
+        return {"reload": True, "reload_dirs": ["backend"]}
+
+    # Sessions must live outside the worker processes, otherwise a session created
+    # by one worker is unknown to the others
+    if args.workers > 1 and not os.getenv("QUIZBOT_SESSION_STORE"):
+        os.environ["QUIZBOT_SESSION_STORE"] = DEFAULT_SHARED_SESSION_STORE
+    # Buffered session writes are only seen by the worker holding them, another worker
+    # would read the old row, write it back and drop them
+    if args.workers > 1 and os.getenv("QUIZBOT_SESSION_WRITE_BEHIND", "0") == "1":
+        print("ERROR: QUIZBOT_SESSION_WRITE_BEHIND=1 only works with a single worker.")
+        print("Run with --workers 1 or unset QUIZBOT_SESSION_WRITE_BEHIND.")
+        sys.exit(1)
+    # Per-process buckets would let a client spend the limit once per worker
+    if args.workers > 1 and not os.getenv("QUIZBOT_RATE_LIMIT"):
+        os.environ["QUIZBOT_RATE_LIMIT"] = DEFAULT_SHARED_RATE_LIMIT
+    # A retry may reach another worker than the request it repeats
+    if args.workers > 1 and not os.getenv("QUIZBOT_IDEMPOTENCY"):
+        os.environ["QUIZBOT_IDEMPOTENCY"] = DEFAULT_SHARED_IDEMPOTENCY
+    os.environ["QUIZBOT_SHUTDOWN_GRACE"] = str(args.grace)
+
+    # uvicorn picks uvloop and httptools on its own when they are installed
+    from backend.http_protocol import NoDelayHTTPProtocol
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    print(f"⚙️  {args.workers} workers, {loop} event loop, {http} HTTP parser")
+    print(f"💾 Session store: {os.getenv('QUIZBOT_SESSION_STORE', 'memory')}")
+    print(f"🚦 Rate limit: {os.getenv('QUIZBOT_RATE_LIMIT', 'memory')}")
+
+    return {
+        "workers": args.workers,
+        "loop": "auto",
+        "http": NoDelayHTTPProtocol,
+        "timeout_graceful_shutdown": args.grace,
+    }
+
+
 def main():
     """Main entry point for the application"""
-    # Check if Google API key is set
-    if not os.getenv("GOOGLE_API_KEY"):
+    args = parse_args()
+
+    # Check if Google API key is set (the offline fake LLM does not need one)
+    if not os.getenv("GOOGLE_API_KEY") and os.getenv("QUIZBOT_FAKE_LLM") is None:
         print("ERROR: GOOGLE_API_KEY not found in environment variables.")
         print("Please:")
         print("1. Copy .env.example to .env")
@@ -25,20 +94,21 @@ def main():
         print("3. Run the script again")
         sys.exit(1)
     
-    print("🚀 Starting QuizBot Backend Server...")
-    print("📡 API will be available at: http://localhost:8000")
-    print("📚 API documentation at: http://localhost:8000/docs")
+    print(f"🚀 Starting QuizBot Backend Server ({'production' if args.prod else 'development'} mode)...")
+    print(f"📡 API will be available at: http://localhost:{args.port}")
+    print(f"📚 API documentation at: http://localhost:{args.port}/docs")
     print("🔄 To stop the server, press Ctrl+C")
     
+    options = server_options(args)
+    
     # Start the server
     try:
         uvicorn.run(
             "backend.main:app",
-            host="0.0.0.0",
-            port=8000,
-            reload=True,
-            reload_dirs=["backend"],
-            access_log=True
+            host=args.host,
+            port=args.port,
+            access_log=True,
+            **options
         )
     except KeyboardInterrupt:
         print("\n👋 QuizBot server stopped.")
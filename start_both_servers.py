@@ -2,178 +2,269 @@
 """
 Complete setup script for Quiz Bot with Django Frontend
 Starts both FastAPI backend and Django frontend
+
+Both servers start concurrently and are reported ready as soon as they answer
+HTTP requests. Their stdout and stderr are streamed with a name prefix, and a
+server that crashes is restarted with exponential backoff.
+
+Usage:
+    python start_both_servers.py
+    python start_both_servers.py --startup-timeout 30 --max-restarts 0   # CI: fail fast
 """
 
+import argparse
 import os
 import sys
 import subprocess
 import time
 import signal
 import threading
+import urllib.error
+import urllib.request
 from pathlib import Path
 
-class QuizBotLauncher:
-    def __init__(self):
-        self.backend_process = None
-        self.frontend_process = None
-        self.project_root = Path(__file__).parent
-        
-    def start_backend(self):
-        """Start the FastAPI backend server"""
-        print("🚀 Starting FastAPI Backend...")
-        backend_dir = self.project_root / "backend"
-        
+
+class ManagedProcess:
+    """A supervised server process: start, readiness check, output streaming and restarts"""
+
+    def __init__(self, name, argv, cwd, health_url, max_restarts=5, backoff_max=30.0):
+        self.name = name
+        self.argv = argv
+        self.cwd = cwd
+        self.health_url = health_url
+        self.max_restarts = max_restarts
+        self.backoff_max = backoff_max
+        self.process = None
+        self.restarts = 0
+        self.started_at = 0.0
+
+    def start(self):
+        """Spawn the process and stream both of its output pipes"""
+        # A new process group lets stop() reach the children of the process too
+        # (Django's autoreloader runs the real server in a child process)
+        group_options = (
+            {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt"
+            else {"start_new_session": True}
+        )
+        self.process = subprocess.Popen(
+            self.argv, cwd=self.cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, bufsize=1, env={**os.environ, "PYTHONUNBUFFERED": "1"}, **group_options
+        )
+        self.started_at = time.monotonic()
+
+        # One reader per pipe, so a full stderr buffer can never block the child
+        for stream, prefix in ((self.process.stdout, self.name), (self.process.stderr, f"{self.name}!")):
+            threading.Thread(target=self._pump, args=(stream, prefix), daemon=True).start()
+
+    @staticmethod
+    def _pump(stream, prefix):
+        """Print every line of a pipe until it closes"""
+        for line in iter(stream.readline, ""):
+            print(f"[{prefix}] {line.rstrip()}", flush=True)
+        stream.close()
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def is_responding(self):
+        """True once the server answers HTTP, whatever the status code"""
         try:
-            os.chdir(backend_dir)
-            self.backend_process = subprocess.Popen([
-                sys.executable, "main.py"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            
-            # Wait a bit for the backend to start
-            time.sleep(3)
-            
-            if self.backend_process.poll() is None:
-                print("✅ FastAPI Backend started on http://localhost:8000")
+            with urllib.request.urlopen(self.health_url, timeout=1):
                 return True
-            else:
-                print("❌ Failed to start FastAPI Backend")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Error starting backend: {e}")
+        except urllib.error.HTTPError as e:
+            return e.code < 500
+        except OSError:
             return False
-    
-    def start_frontend(self):
-        """Start the Django frontend server"""
-        print("🚀 Starting Django Frontend...")
-        frontend_dir = self.project_root / "django_frontend"
-        
-        try:
-            os.chdir(frontend_dir)
-            
-            # Run migrations first
-            print("Running Django migrations...")
-            migration_result = subprocess.run([
-                sys.executable, "manage.py", "migrate"
-            ], capture_output=True, text=True)
-            
-            if migration_result.returncode != 0:
-                print(f"⚠️  Migration warning: {migration_result.stderr}")
-            
-            # Start Django server
-            self.frontend_process = subprocess.Popen([
-                sys.executable, "manage.py", "runserver", "8001"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            
-            # Wait a bit for the frontend to start
-            time.sleep(3)
-            
-            if self.frontend_process.poll() is None:
-                print("✅ Django Frontend started on http://localhost:8001")
+
+    def wait_ready(self, timeout):
+        """Poll the health URL until it answers, returns False on timeout or early exit"""
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            if not self.is_running():
+                return False
+            if self.is_responding():
                 return True
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        return False
+
+    def restart_delay(self):
+        """Backoff before the next restart, or None when the restart budget is spent"""
+        # A process that stayed up for a while earns a fresh restart budget
+        if time.monotonic() - self.started_at > self.backoff_max:
+            self.restarts = 0
+        if self.restarts >= self.max_restarts:
+            return None
+        self.restarts += 1
+        return min(2 ** (self.restarts - 1), self.backoff_max)
+
+    def stop(self, timeout=5):
+        """Terminate the process group, killing it if it does not exit in time"""
+        if not self.is_running():
+            return
+        self._signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=timeout)
+            print(f"✅ {self.name} stopped")
+        except subprocess.TimeoutExpired:
+            self._signal(signal.SIGKILL if os.name != "nt" else signal.SIGTERM)
+            self.process.wait()
+            print(f"🔪 {self.name} force killed")
+
+    def _signal(self, signum):
+        try:
+            if os.name == "nt":
+                self.process.terminate()
             else:
-                print("❌ Failed to start Django Frontend")
-                return False
-                
+                os.killpg(self.process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+class QuizBotLauncher:
+    def __init__(self, backend_port=8000, frontend_port=8001, startup_timeout=60.0, max_restarts=5):
+        self.project_root = Path(__file__).resolve().parent
+        self.backend_port = backend_port
+        self.frontend_port = frontend_port
+        self.startup_timeout = startup_timeout
+        self.stopping = threading.Event()
+
+        self.backend = ManagedProcess(
+            "Backend",
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "0.0.0.0", "--port", str(backend_port)],
+            cwd=self.project_root,
+            health_url=f"http://127.0.0.1:{backend_port}/health",
+            max_restarts=max_restarts
+        )
+        self.frontend = ManagedProcess(
+            "Frontend",
+            [sys.executable, "manage.py", "runserver", str(frontend_port)],
+            cwd=self.project_root / "django_frontend",
+            health_url=f"http://127.0.0.1:{frontend_port}/",
+            max_restarts=max_restarts
+        )
+        self.servers = [self.backend, self.frontend]
+
+    def migrate_frontend(self):
+        """Apply the Django migrations before the frontend starts"""
+        print("Running Django migrations...")
+        migration_result = subprocess.run([
+            sys.executable, "manage.py", "migrate"
+        ], cwd=self.frontend.cwd, capture_output=True, text=True)
+
+        if migration_result.returncode != 0:
+            print(f"⚠️  Migration warning: {migration_result.stderr}")
+
+    def start_server(self, server, results):
+        """Start one server and record whether it became ready"""
+        print(f"🚀 Starting {server.name}...")
+        try:
+            if server is self.frontend:
+                self.migrate_frontend()
+            server.start()
         except Exception as e:
-            print(f"❌ Error starting frontend: {e}")
-            return False
-    
-    def monitor_processes(self):
-        """Monitor both processes and show their output"""
-        def read_output(process, name):
-            while process and process.poll() is None:
-                try:
-                    line = process.stdout.readline()
-                    if line:
-                        print(f"[{name}] {line.strip()}")
-                except:
-                    break
-        
-        if self.backend_process:
-            backend_thread = threading.Thread(
-                target=read_output, 
-                args=(self.backend_process, "Backend"),
-                daemon=True
-            )
-            backend_thread.start()
-        
-        if self.frontend_process:
-            frontend_thread = threading.Thread(
-                target=read_output, 
-                args=(self.frontend_process, "Frontend"),
-                daemon=True
-            )
-            frontend_thread.start()
-    
+            print(f"❌ Error starting {server.name}: {e}")
+            results[server.name] = False
+            return
+
+        started = time.monotonic()
+        results[server.name] = server.wait_ready(self.startup_timeout)
+        if results[server.name]:
+            print(f"✅ {server.name} ready in {time.monotonic() - started:.1f}s")
+        else:
+            print(f"❌ {server.name} did not become ready within {self.startup_timeout:.0f}s")
+
+    def start_servers(self):
+        """Start both servers concurrently, returns True when both are ready"""
+        results = {}
+        threads = [
+            threading.Thread(target=self.start_server, args=(server, results), daemon=True)
+            for server in self.servers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return all(results.get(server.name) for server in self.servers)
+
+    def supervise(self):
+        """Restart crashed servers with backoff until stopped, returns False if one gave up"""
+        while not self.stopping.is_set():
+            for server in self.servers:
+                if server.is_running():
+                    continue
+
+                delay = server.restart_delay()
+                if delay is None:
+                    print(f"❌ {server.name} keeps crashing (exit code {server.process.returncode}), giving up")
+                    return False
+
+                print(f"⚠️  {server.name} exited with code {server.process.returncode}, restarting in {delay:.0f}s")
+                if self.stopping.wait(delay):
+                    return True
+                server.start()
+                if server.wait_ready(self.startup_timeout):
+                    print(f"✅ {server.name} restarted")
+            self.stopping.wait(0.5)
+        return True
+
     def stop_servers(self):
         """Stop both servers"""
         print("\n🛑 Stopping servers...")
-        
-        if self.backend_process:
-            self.backend_process.terminate()
-            try:
-                self.backend_process.wait(timeout=5)
-                print("✅ Backend stopped")
-            except subprocess.TimeoutExpired:
-                self.backend_process.kill()
-                print("🔪 Backend force killed")
-        
-        if self.frontend_process:
-            self.frontend_process.terminate()
-            try:
-                self.frontend_process.wait(timeout=5)
-                print("✅ Frontend stopped")
-            except subprocess.TimeoutExpired:
-                self.frontend_process.kill()
-                print("🔪 Frontend force killed")
-    
+        self.stopping.set()
+        for server in self.servers:
+            server.stop()
+
     def run(self):
-        """Main run method"""
+        """Main run method, returns the process exit code"""
         print("🎯 Quiz Bot Launcher")
         print("=" * 50)
-        
-        # Setup signal handler for graceful shutdown
+
+        # Turn SIGTERM into the same clean shutdown as Ctrl+C
         def signal_handler(signum, frame):
-            self.stop_servers()
-            sys.exit(0)
-        
-        signal.signal(signal.SIGINT, signal_handler)
+            raise KeyboardInterrupt
+
         signal.signal(signal.SIGTERM, signal_handler)
-        
-        # Start backend
-        if not self.start_backend():
-            print("❌ Failed to start backend. Exiting.")
-            return
-        
-        # Start frontend
-        if not self.start_frontend():
-            print("❌ Failed to start frontend. Stopping backend.")
-            self.stop_servers()
-            return
-        
-        print("\n" + "=" * 50)
-        print("🎉 Both servers are running!")
-        print("📱 Django Frontend: http://localhost:8001")
-        print("🔧 FastAPI Backend:  http://localhost:8000")
-        print("📚 API Docs:         http://localhost:8000/docs")
-        print("\n💡 Make sure you have your .env file with GOOGLE_API_KEY")
-        print("⚡ Press Ctrl+C to stop both servers")
-        print("=" * 50)
-        
-        # Monitor processes
-        self.monitor_processes()
-        
+
         try:
-            # Wait for processes to end
-            while (self.backend_process and self.backend_process.poll() is None) or \
-                  (self.frontend_process and self.frontend_process.poll() is None):
-                time.sleep(1)
+            if not self.start_servers():
+                print("❌ Failed to start the servers. Exiting.")
+                return 1
+
+            print("\n" + "=" * 50)
+            print("🎉 Both servers are running!")
+            print(f"📱 Django Frontend: http://localhost:{self.frontend_port}")
+            print(f"🔧 FastAPI Backend:  http://localhost:{self.backend_port}")
+            print(f"📚 API Docs:         http://localhost:{self.backend_port}/docs")
+            print("\n💡 Make sure you have your .env file with GOOGLE_API_KEY")
+            print("⚡ Press Ctrl+C to stop both servers")
+            print("=" * 50)
+
+            return 0 if self.supervise() else 1
         except KeyboardInterrupt:
-            pass
+            return 0
         finally:
             self.stop_servers()
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the FastAPI backend and the Django frontend")
+    parser.add_argument("--backend-port", type=int, default=8000)
+    parser.add_argument("--frontend-port", type=int, default=8001)
+    parser.add_argument("--startup-timeout", type=float, default=60.0,
+                        help="Seconds each server has to start answering requests")
+    parser.add_argument("--max-restarts", type=int, default=5,
+                        help="Consecutive restarts of a crashing server before giving up")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    launcher = QuizBotLauncher()
-    launcher.run()
+    args = parse_args()
+    launcher = QuizBotLauncher(
+        backend_port=args.backend_port,
+        frontend_port=args.frontend_port,
+        startup_timeout=args.startup_timeout,
+        max_restarts=args.max_restarts
+    )
+    sys.exit(launcher.run())
@@ -0,0 +1,82 @@
+import numpy as np
+from backend.analytics import AnswerColumns, analytics_report, columns_from_sessions
+from backend.score_manager import ScoreManager
+
+
+def answer_all(scores, quiz, picks):
+    """Session of the quiz answered with the given options"""
+    session_id = scores.create_session(quiz)
+    for index, option in enumerate(picks):
+        scores.submit_answer(session_id, index, option)
+    return session_id
+
+
+def test_questions_sharing_an_explanation_stay_apart(make_quiz):
+    quiz = make_quiz(3)
+    for question in quiz.questions:
+        question.explanation = "See the documentation."
+    scores = ScoreManager()
+    answer_all(scores, quiz, [0, 1, 2])
+
+    columns = columns_from_sessions(scores.user_sessions.items())
+    assert columns.question_labels == [question.question for question in quiz.questions]
+    report = analytics_report(columns, min_answers=1)
+    assert report["questions"] == 3
+    assert {item["question"] for item in report["question_stats"]} == set(columns.question_labels)
+
+
+def test_copies_of_a_question_are_one_question(make_quiz):
+    scores = ScoreManager()
+    quiz = make_quiz(2)
+    answer_all(scores, quiz, [0, 1])
+    copy = make_quiz(2)
+    copy.questions[0].question = copy.questions[0].question.upper().rstrip("?")
+    answer_all(scores, copy, [3, 3])
+    # The same texts under another topic are other questions
+    answer_all(scores, make_quiz(2, topic="Other"), [0, 0])
+
+    columns = columns_from_sessions(scores.user_sessions.items())
+    assert len(columns.question) == 6
+    assert columns.question_labels == ["Question 0 about Testing?", "Question 1 about Testing?",
+                                       "Question 0 about Other?", "Question 1 about Other?"]
+    assert columns.question.tolist() == [0, 1, 0, 1, 2, 3]
+
+
+def test_sessions_without_question_texts_fall_back_to_explanations(make_quiz):
+    scores = ScoreManager()
+    session_id = answer_all(scores, make_quiz(2), [0, 0])
+    del scores.user_sessions[session_id]["questions"]
+
+    columns = columns_from_sessions(scores.user_sessions.items())
+    assert columns.question_labels == ["Explanation 0", "Explanation 1"]
+
+
+def test_miskeyed_question_is_flagged_ambiguous():
+    # Strong sessions 0-4 answer questions 0 and 2 right but pick option 2 on question 1, keyed 1
+    sessions, picks = [], []
+    for session in range(10):
+        strong = session < 5
+        sessions += [session] * 3
+        picks += [0, 2, 2] if strong else [3, 1, 0]
+    selected = np.array(picks, dtype=np.int8)
+    question_answer = np.array([0, 1, 2], dtype=np.int8)
+    question = np.tile(np.arange(3, dtype=np.int32), 10)
+    columns = AnswerColumns(
+        question=question,
+        session=np.array(sessions, dtype=np.int32),
+        selected=selected,
+        correct=selected == question_answer[question],
+        question_topic=np.zeros(3, dtype=np.int32),
+        question_answer=question_answer,
+        question_difficulty=np.zeros(3, dtype=np.int8),
+        topics=["Testing"],
+        question_labels=["First?", "Second?", "Third?"]
+    )
+
+    report = analytics_report(columns, min_answers=5)
+    items = {item["question"]: item for item in report["question_stats"]}
+    assert (items["First?"]["p_value"], items["First?"]["discrimination"], items["First?"]["flags"]) == (0.5, 1.0, [])
+    assert items["Second?"]["option_counts"] == [0, 5, 5, 0]
+    assert items["Second?"]["discrimination"] == -1.0
+    assert items["Second?"]["flags"] == ["ambiguous"]
+    assert report["flagged_questions"] == 1
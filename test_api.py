@@ -2,13 +2,39 @@
 """
 Test script for QuizBot API
 
-This script tests the basic functionality of the QuizBot API.
+This script tests the basic functionality of the QuizBot API, and doubles as a
+load generator for it.
+
+Usage:
+    python test_api.py                                       # Functional smoke test
+    python test_api.py --load --offline --users 50 --duration 30 --json load.json
+    python test_api.py --load --mode open --rate 200 --mix generate=1,answer=6,score=2,leaderboard=1
+    python test_api.py --load --offline --compare baseline.json
+
+--offline starts a private backend on a free port with the fake LLM
+(QUIZBOT_FAKE_LLM=1), so the load test needs neither network access nor an API key.
+Latencies are recorded in an HdrHistogram when the optional ``hdrhistogram``
+package is installed, and reports are JSON files that can be diffed across commits.
 """
 
+import argparse
 import asyncio
 import aiohttp
 import json
-from typing import Dict, Any
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+try:
+    from hdrh.histogram import HdrHistogram
+except ImportError:  # Optional dependency, fall back to exact percentiles
+    HdrHistogram = None
 
 class QuizBotTester:
     def __init__(self, base_url: str = "http://localhost:8000"):
@@ -36,21 +62,41 @@ class QuizBotTester:
             }
             
             async with session.post(f"{self.base_url}/quiz/generate", json=payload) as response:
-                data = await response.json()
-                
-                if data.get('success'):
-                    self.session_id = data['session_id']
-                    print(f"✅ Quiz Generated: {data['quiz']['topic']}")
-                    print(f"   Questions: {data['quiz']['total_questions']}")
-                    print(f"   Session ID: {self.session_id}")
-                    return data
-                else:
-                    print(f"❌ Quiz Generation Failed: {data.get('error', 'Unknown error')}")
-                    return {}
+                queued = await response.json()
+            
+            if not queued.get('success'):
+                print(f"❌ Quiz Generation Failed: {queued.get('error', 'Unknown error')}")
+                return {}
+            
+            print(f"⏳ Quiz Queued: job {queued['job_id']}")
+            data = await self.wait_for_job(session, queued['job_id'])
+            
+            if data.get('success'):
+                self.session_id = data['session_id']
+                print(f"✅ Quiz Generated: {data['quiz']['topic']}")
+                print(f"   Questions: {data['quiz']['total_questions']}")
+                print(f"   Session ID: {self.session_id}")
+                return data
+            else:
+                print(f"❌ Quiz Generation Failed: {data.get('error', 'Unknown error')}")
+                return {}
         except Exception as e:
             print(f"❌ Quiz Generation Error: {e}")
             return {}
     
+    async def wait_for_job(self, session: aiohttp.ClientSession, job_id: str, interval: float = 0.5) -> Dict[Any, Any]:
+        """Poll a generation job until it has completed or failed"""
+        while True:
+            async with session.get(f"{self.base_url}/quiz/jobs/{job_id}") as response:
+                job = await response.json()
+            
+            if job.get('status') == 'completed':
+                return job['result']
+            if job.get('status') == 'failed' or response.status != 200:
+                return {'success': False, 'error': job.get('error', 'Quiz generation failed')}
+            
+            await asyncio.sleep(interval)
+    
     async def test_submit_answer(self, session: aiohttp.ClientSession, question_index: int = 0, selected_option: int = 0) -> Dict[Any, Any]:
         """Test answer submission"""
         if not self.session_id:
@@ -142,10 +188,365 @@ class QuizBotTester:
             print("=" * 50)
             print("🎉 All tests completed!")
 
-async def main():
+class LatencyRecorder:
+    """Latency distribution of one operation, in milliseconds"""
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        self.errors = 0
+        self.count = 0
+        # 1 microsecond to 10 minutes with 3 significant digits
+        self.histogram = HdrHistogram(1, 600_000_000, 3) if HdrHistogram else None
+        self.samples: List[int] = []
+
+    def record(self, latency_s: float, ok: bool = True):
+        """Record one request"""
+        if not ok:
+            self.errors += 1
+        self.count += 1
+        micros = max(1, int(latency_s * 1_000_000))
+        if self.histogram is not None:
+            self.histogram.record_value(micros)
+        else:
+            self.samples.append(micros)
+
+    def percentile_ms(self, percentile: float) -> float:
+        if self.histogram is not None:
+            return self.histogram.get_value_at_percentile(percentile) / 1000
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(percentile / 100 * len(ordered))) - 1))
+        return ordered[index] / 1000
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        """Counts, throughput and latency percentiles"""
+        stats = {
+            "count": self.count,
+            "errors": self.errors,
+            "throughput_rps": round(self.count / elapsed_s, 2) if elapsed_s else 0.0,
+        }
+        for percentile in self.PERCENTILES:
+            stats[f"p{percentile:g}_ms"] = round(self.percentile_ms(percentile), 3)
+        stats["max_ms"] = round(self.percentile_ms(100), 3)
+        if self.histogram is not None and self.count:
+            # Compressed histogram, can be decoded and plotted with the HdrHistogram tools
+            stats["hdr"] = self.histogram.encode().decode()
+        return stats
+
+
+class LoadGenerator:
+    """
+    Drives the API with concurrent virtual users and a weighted mix of operations
+
+    Closed loop: each virtual user sends its next request once the previous one
+    returned (plus an optional think time). Open loop: requests arrive at a fixed
+    Poisson rate whatever the response times, and latencies are measured from the
+    scheduled start so queueing delay is not hidden (no coordinated omission).
+    """
+
+    OPERATIONS = ("generate", "answer", "score", "leaderboard")
+
+    def __init__(self, base_url: str, mix: Dict[str, float], users: int = 10, duration: float = 30.0,
+                 mode: str = "closed", rate: float = 50.0, think_time: float = 0.0,
+                 num_questions: int = 5, seed: Optional[int] = None):
+        self.base_url = base_url
+        self.mix = mix
+        self.users = users
+        self.duration = duration
+        self.mode = mode
+        self.rate = rate
+        self.think_time = think_time
+        self.num_questions = num_questions
+        self.random = random.Random(seed)
+        self.sessions: List[str] = []
+        self.recorders = {name: LatencyRecorder() for name in self.OPERATIONS + ("generate_complete",)}
+
+    def pick_operation(self) -> str:
+        operations = list(self.mix)
+        return self.random.choices(operations, weights=[self.mix[op] for op in operations])[0]
+
+    async def generate(self, session: aiohttp.ClientSession, scheduled: Optional[float] = None) -> bool:
+        """Queue a quiz, then follow its job to completion"""
+        started = scheduled or time.perf_counter()
+        payload = {
+            "topic": f"Load test topic {self.random.randrange(1000)}",
+            "num_questions": self.num_questions,
+            "difficulty": self.random.choice(["easy", "medium", "hard"])
+        }
+        async with session.post(f"{self.base_url}/quiz/generate", json=payload) as response:
+            queued = await response.json()
+        # "generate" is the time to get the job accepted, "generate_complete" the time to the finished quiz
+        accepted = response.status == 202
+        self.recorders["generate"].record(time.perf_counter() - started, accepted)
+        if not accepted:
+            return False
+
+        while True:
+            async with session.get(f"{self.base_url}/quiz/jobs/{queued['job_id']}") as response:
+                job = await response.json()
+            if job.get("status") in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.05)
+
+        ok = job["status"] == "completed"
+        self.recorders["generate_complete"].record(time.perf_counter() - started, ok)
+        if ok:
+            self.sessions.append(job["result"]["session_id"])
+        return ok
+
+    async def answer(self, session: aiohttp.ClientSession) -> bool:
+        payload = {
+            "question_index": self.random.randrange(self.num_questions),
+            "selected_option": self.random.randrange(4)
+        }
+        session_id = self.random.choice(self.sessions)
+        async with session.post(f"{self.base_url}/quiz/answer?session_id={session_id}", json=payload) as response:
+            await response.read()
+            return response.status == 200
+
+    async def score(self, session: aiohttp.ClientSession) -> bool:
+        async with session.get(f"{self.base_url}/quiz/score/{self.random.choice(self.sessions)}") as response:
+            await response.read()
+            return response.status == 200
+
+    async def leaderboard(self, session: aiohttp.ClientSession) -> bool:
+        async with session.get(f"{self.base_url}/quiz/leaderboard") as response:
+            await response.read()
+            return response.status == 200
+
+    async def execute(self, session: aiohttp.ClientSession, operation: str, scheduled: float):
+        """Run one operation and record its latency from the scheduled start"""
+        if operation != "generate" and not self.sessions:
+            operation = "generate"
+        try:
+            if operation == "generate":
+                # Records its own latencies
+                await self.generate(session, scheduled)
+                return
+            ok = await getattr(self, operation)(session)
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError):
+            ok = False
+        self.recorders[operation].record(time.perf_counter() - scheduled, ok)
+
+    async def virtual_user(self, session: aiohttp.ClientSession, deadline: float):
+        while time.perf_counter() < deadline:
+            await self.execute(session, self.pick_operation(), time.perf_counter())
+            if self.think_time:
+                await asyncio.sleep(self.random.expovariate(1 / self.think_time))
+
+    async def open_loop(self, session: aiohttp.ClientSession, deadline: float):
+        tasks = set()
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self.execute(session, self.pick_operation(), next_arrival))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_arrival += self.random.expovariate(self.rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def warm_up(self, session: aiohttp.ClientSession, quizzes: int = 3):
+        """Create a few sessions so the first answers have something to hit"""
+        results = await asyncio.gather(*(self.generate(session) for _ in range(quizzes)))
+        if not any(results):
+            raise RuntimeError("Warm-up quiz generation failed, is the quiz generator available?")
+        self.recorders["generate"] = LatencyRecorder()
+        self.recorders["generate_complete"] = LatencyRecorder()
+
+    async def run(self) -> Dict[str, Any]:
+        """Run the load test and return the report"""
+        # The users share one connection pool sized to the concurrency
+        limit = self.users if self.mode == "closed" else 0
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit)) as session:
+            await self.warm_up(session)
+
+            started = time.perf_counter()
+            deadline = started + self.duration
+            if self.mode == "closed":
+                await asyncio.gather(*(self.virtual_user(session, deadline) for _ in range(self.users)))
+            else:
+                await self.open_loop(session, deadline)
+            elapsed = time.perf_counter() - started
+
+        return {
+            "config": {
+                "mode": self.mode,
+                "users": self.users if self.mode == "closed" else None,
+                "rate_rps": self.rate if self.mode == "open" else None,
+                "duration_s": self.duration,
+                "think_time_s": self.think_time,
+                "mix": self.mix,
+                "num_questions": self.num_questions,
+            },
+            "commit": current_commit(),
+            "histogram": "hdr" if HdrHistogram else "exact",
+            "elapsed_s": round(elapsed, 3),
+            "operations": {
+                name: recorder.summary(elapsed) for name, recorder in self.recorders.items() if recorder.count
+            },
+        }
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse a workload mix such as 'generate=1,answer=6,score=2,leaderboard=1'"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in LoadGenerator.OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}', expected one of {LoadGenerator.OPERATIONS}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def current_commit() -> Optional[str]:
+    """Commit of the working tree, so reports can be matched to the code they measured"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class OfflineBackend:
+    """Backend started on a free port with the fake LLM and private databases"""
+
+    def __init__(self, latency_ms: float, workers: int):
+        self.latency_ms = latency_ms
+        self.workers = workers
+        self.process = None
+        self.tmp = None
+        self.base_url = None
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {
+            **os.environ,
+            "QUIZBOT_FAKE_LLM": "1",
+            "QUIZBOT_FAKE_LLM_LATENCY_MS": str(self.latency_ms),
+            "QUIZBOT_JOB_DB": str(Path(self.tmp.name) / "jobs.sqlite3"),
+        }
+        # QUIZBOT_QUESTION_BANK=off measures every quiz going through the LLM
+        env.setdefault("QUIZBOT_QUESTION_BANK", str(Path(self.tmp.name) / "questions.sqlite3"))
+        # Every virtual user shares one address, the rate limit would measure itself instead of the server
+        env.setdefault("QUIZBOT_RATE_LIMIT", "off")
+        if self.workers > 1:
+            env["QUIZBOT_SESSION_STORE"] = f"sqlite:///{Path(self.tmp.name) / 'sessions.sqlite3'}"
+        # Server logs go to a file, they would drown the report
+        self.log_path = Path(self.tmp.name) / "backend.log"
+        self.log_file = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "run_server.py", "--prod", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(self.workers)],
+            cwd=Path(__file__).parent, env=env, stdout=self.log_file, stderr=subprocess.STDOUT
+        )
+        self._wait_healthy()
+        return self
+
+    def _wait_healthy(self, timeout: float = 60.0):
+        import urllib.request
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Offline backend exited during startup:\n{self.log_path.read_text()[-2000:]}")
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/health", timeout=1) as response:
+                    if json.loads(response.read())["status"] == "healthy":
+                        return
+            except OSError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError(f"Offline backend not healthy after {timeout}s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+        self.log_file.close()
+        self.tmp.cleanup()
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'operation':<20}{'count':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'max ms':>10}")
+    for name, stats in report["operations"].items():
+        print(f"{name:<20}{stats['count']:>8}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['p99.9_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+
+
+def print_comparison(baseline: Dict[str, Any], report: Dict[str, Any]):
+    """Relative change of throughput and latency against an earlier report"""
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    print(f"{'operation':<20}{'rps':>10}{'p50':>10}{'p99':>10}")
+    for name, stats in report["operations"].items():
+        before = baseline["operations"].get(name)
+        if not before:
+            continue
+
+        def change(key):
+            return f"{(stats[key] - before[key]) / before[key] * 100:+.1f}%" if before[key] else "n/a"
+
+        print(f"{name:<20}{change('throughput_rps'):>10}{change('p50_ms'):>10}{change('p99_ms'):>10}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="QuizBot API smoke test and load generator")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--load", action="store_true", help="Run a load test instead of the smoke test")
+    parser.add_argument("--offline", action="store_true", help="Load test a private backend using the fake LLM")
+    parser.add_argument("--fake-latency-ms", type=float, default=200.0, help="Fake LLM response time (--offline)")
+    parser.add_argument("--server-workers", type=int, default=1, help="Backend worker processes (--offline)")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users (closed loop)")
+    parser.add_argument("--rate", type=float, default=50.0, help="Arrival rate in requests/s (open loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between requests of a user (s)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate=1,answer=6,score=2,leaderboard=1"))
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--seed", type=int, help="Seed for reproducible request sequences")
+    parser.add_argument("--json", type=Path, help="Write the report to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Earlier JSON report to compare against")
+    return parser.parse_args()
+
+
+async def run_load_test(args, base_url: str) -> Dict[str, Any]:
+    generator = LoadGenerator(
+        base_url, args.mix, users=args.users, duration=args.duration, mode=args.mode,
+        rate=args.rate, think_time=args.think_time, num_questions=args.num_questions, seed=args.seed
+    )
+    print(f"🔥 {args.mode} loop load test against {base_url} for {args.duration:g}s...")
+    return await generator.run()
+
+
+def main():
     """Main function to run tests"""
-    tester = QuizBotTester()
-    await tester.run_tests()
+    args = parse_args()
+
+    if not args.load:
+        tester = QuizBotTester(args.base_url)
+        asyncio.run(tester.run_tests())
+        return
+
+    if args.offline:
+        with OfflineBackend(args.fake_latency_ms, args.server_workers) as backend:
+            report = asyncio.run(run_load_test(args, backend.base_url))
+    else:
+        report = asyncio.run(run_load_test(args, args.base_url))
+
+    print_report(report)
+    if args.compare:
+        print_comparison(json.loads(args.compare.read_text()), report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.json}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,110 @@
+import os
+import time
+import pytest
+from backend.event_log import EventLog, RECORD_HEADER
+from backend.score_manager import ScoreManager
+
+
+def open_manager(directory, snapshot_every=0):
+    event_log = EventLog(str(directory), fsync_interval=0, snapshot_every=snapshot_every)
+    return ScoreManager(event_log=event_log), event_log
+
+
+def test_replay_cuts_off_a_torn_last_frame(tmp_path, make_quiz):
+    manager, event_log = open_manager(tmp_path)
+    session_id = manager.create_session(make_quiz(3))
+    manager.submit_answer(session_id, 0, 0)
+    event_log.close()
+    _, segment = event_log.segments()[-1]
+    intact_size = os.path.getsize(segment)
+    with open(segment, "ab") as log:
+        # A crash in the middle of an append: the header promises more than was written
+        log.write(RECORD_HEADER.pack(100, 0) + b'{"type": "answ')
+
+    manager, event_log = open_manager(tmp_path)
+
+    assert os.path.getsize(segment) == intact_size
+    assert event_log.last_seq == 2
+    assert manager.get_score(session_id).total_questions_answered == 1
+    manager.submit_answer(session_id, 1, 1)
+    event_log.close()
+    manager, event_log = open_manager(tmp_path)
+    assert manager.get_score(session_id).total_questions_answered == 2
+    event_log.close()
+
+
+def test_replay_rejects_a_corrupted_record_before_the_end(tmp_path, make_quiz):
+    manager, event_log = open_manager(tmp_path)
+    session_id = manager.create_session(make_quiz(3))
+    manager.submit_answer(session_id, 0, 0)
+    _, segment = event_log.segments()[-1]
+    with open(segment, "r+b") as log:
+        log.seek(RECORD_HEADER.size + 2)
+        log.write(b"#")
+
+    with pytest.raises(ValueError, match="Corrupted event 1"):
+        list(event_log.replay())
+    event_log.close()
+
+
+def test_recovery_loads_the_snapshot_and_replays_its_tail(tmp_path, make_quiz):
+    manager, event_log = open_manager(tmp_path)
+    first = manager.create_session(make_quiz(4))
+    manager.submit_answer(first, 0, 0)
+    manager.write_snapshot()
+    second = manager.create_session(make_quiz(4))
+    manager.submit_answer(first, 1, 0)
+    manager.submit_answer(second, 2, 2)
+    expected = {session_id: manager.get_session_summary(session_id) for session_id in (first, second)}
+    event_log.close()
+
+    assert event_log.latest_snapshot_seq() == 2
+    manager, event_log = open_manager(tmp_path)
+    assert [seq for seq, _ in event_log.replay(after_seq=2)] == [3, 4, 5]
+    for session_id, summary in expected.items():
+        assert manager.get_session_summary(session_id) == summary
+    event_log.close()
+
+
+def test_snapshots_are_written_in_the_background(tmp_path, make_quiz):
+    manager, event_log = open_manager(tmp_path, snapshot_every=3)
+    session_id = manager.create_session(make_quiz(4))
+    for question_index in range(3):
+        manager.submit_answer(session_id, question_index, 0)
+
+    deadline = time.monotonic() + 5
+    while event_log.latest_snapshot_seq() < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert event_log.latest_snapshot_seq() >= 3
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+    event_log.close()
+
+
+def test_failed_snapshot_does_not_fail_the_answer(tmp_path, make_quiz, monkeypatch):
+    manager, event_log = open_manager(tmp_path, snapshot_every=1)
+
+    def full_disk(seq, state):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(event_log, "write_snapshot", full_disk)
+
+    session_id = manager.create_session(make_quiz(2))
+    assert manager.submit_answer(session_id, 0, 0).correct
+    assert manager.get_score(session_id).total_questions_answered == 1
+    event_log.close()
+
+
+def test_replaying_deletions_of_missing_sessions(tmp_path, make_quiz):
+    manager, event_log = open_manager(tmp_path)
+    session_id = manager.create_session(make_quiz(2))
+    manager.submit_answer(session_id, 0, 0)
+    manager.delete_session(session_id)
+    # Two cleanups deleting the same expired session
+    event_log.append({"type": "deleted", "session_id": session_id})
+    manager.write_snapshot()
+    event_log.append({"type": "deleted", "session_id": session_id})
+    event_log.close()
+
+    manager, event_log = open_manager(tmp_path)
+    assert session_id not in manager.user_sessions
+    assert manager.get_leaderboard() == []
+    event_log.close()
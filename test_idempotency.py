@@ -0,0 +1,116 @@
+import hashlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import backend.main
+from backend.idempotency import (
+    IN_PROGRESS, MISMATCH, IdempotencyMiddleware, MemoryIdempotencyStore, SQLiteIdempotencyStore, StoredResponse
+)
+
+RESPONSE = StoredResponse(201, [("content-type", "application/json")], b'{"id":1}')
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def build(**options):
+        if request.param == "memory":
+            return MemoryIdempotencyStore(**options)
+        return SQLiteIdempotencyStore(str(tmp_path / "keys.sqlite3"), **options)
+    return build
+
+
+def test_store_replays_and_rejects(make_store):
+    store = make_store()
+    assert store.begin("key", "body") is None
+    assert store.begin("key", "body") == IN_PROGRESS
+    store.complete("key", "body", RESPONSE)
+    assert store.begin("key", "body") == RESPONSE
+    assert store.begin("key", "other body") == MISMATCH
+
+    store.release("key")
+    assert store.begin("key", "other body") is None
+
+
+def test_abandoned_key_is_free_after_its_lease(make_store):
+    store = make_store(lease=0)
+    assert store.begin("key", "body") is None
+    assert store.begin("key", "other body") is None
+
+
+@pytest.fixture
+def counted():
+    """Client of an app counting the calls of its endpoint, which fails while status says so"""
+    calls = {"count": 0, "status": 201}
+
+    async def create(request):
+        calls["count"] += 1
+        return JSONResponse({"call": calls["count"], "body": (await request.json())}, status_code=calls["status"])
+
+    app = Starlette(routes=[Route("/items", create, methods=["POST"])])
+    store = MemoryIdempotencyStore()
+    app.add_middleware(IdempotencyMiddleware, store=store, paths=["/items"])
+    return TestClient(app), store, calls
+
+
+def test_retry_is_replayed(counted):
+    client, _, calls = counted
+    first = client.post("/items", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+    retry = client.post("/items", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+
+    assert (first.status_code, retry.status_code) == (201, 201)
+    assert retry.json() == first.json() == {"call": 1, "body": {"name": "a"}}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert calls["count"] == 1
+    # Without a key, or with another one, the endpoint runs again
+    assert client.post("/items", json={"name": "a"}).json()["call"] == 2
+    assert client.post("/items", json={"name": "a"}, headers={"Idempotency-Key": "k2"}).json()["call"] == 3
+
+
+def test_same_key_with_another_body_is_rejected(counted):
+    client, store, calls = counted
+    client.post("/items", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+
+    response = client.post("/items", json={"name": "b"}, headers={"Idempotency-Key": "k1"})
+    assert response.status_code == 422
+    assert calls["count"] == 1
+
+
+def test_retry_while_running_gets_a_conflict(counted):
+    client, store, calls = counted
+    # Same client, path and key as a request that is still running
+    running_key = "ip:testclient /items k2"
+    body = b'{"name":"a"}'
+    assert store.begin(running_key, hashlib.sha256(body).hexdigest()) is None
+
+    response = client.post("/items", content=body, headers={"Idempotency-Key": "k2", "Content-Type": "application/json"})
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "1"
+    assert calls["count"] == 0
+
+
+def test_failures_are_not_recorded(counted):
+    client, _, calls = counted
+    calls["status"] = 503
+    assert client.post("/items", json={}, headers={"Idempotency-Key": "k1"}).status_code == 503
+    calls["status"] = 201
+    assert client.post("/items", json={}, headers={"Idempotency-Key": "k1"}).status_code == 201
+    assert calls["count"] == 2
+    assert client.post("/items", json={}, headers={"Idempotency-Key": "x" * 256}).status_code == 400
+
+
+def test_answer_retry_is_counted_once(client, make_quiz):
+    session_id = backend.main.score_manager.create_session(make_quiz(3))
+    for _ in range(2):
+        response = client.post("/quiz/answer", params={"session_id": session_id},
+                               json={"question_index": 0, "selected_option": 0}, headers={"Idempotency-Key": "answer-1"})
+        assert response.status_code == 200
+    assert response.headers["idempotent-replayed"] == "true"
+    assert len(backend.main.score_manager.user_sessions[session_id]["answers"]) == 1
+
+    conflict = client.post("/quiz/answer", params={"session_id": session_id},
+                           json={"question_index": 0, "selected_option": 1}, headers={"Idempotency-Key": "answer-1"})
+    assert conflict.status_code == 422
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+from backend.irt import estimate_ability, fit_items, probability, select_item
+
+
+def simulate(rng, theta, a, b, item, person):
+    """Outcomes of the answers drawn from the two-parameter logistic model"""
+    return rng.random(len(item)) < probability(theta[person], a[item], b[item])
+
+
+def test_ability_estimate_converges_to_the_true_ability():
+    rng = np.random.default_rng(3)
+    a, b = np.full(400, 1.5), rng.uniform(-2, 2, 400)
+    correct = simulate(rng, np.array([1.0]), a, b, np.arange(400), np.zeros(400, dtype=np.int64))
+
+    errors = []
+    for answered in (10, 50, 400):
+        theta, error = estimate_ability(a[:answered], b[:answered], correct[:answered])
+        errors.append(error)
+    assert abs(theta - 1.0) < 0.2
+    assert errors == sorted(errors, reverse=True)
+    assert errors[-1] < 0.15
+
+
+def test_ability_estimate_stays_finite():
+    # Without answers, the prior (cut off at the ends of the grid)
+    theta, error = estimate_ability(np.array([]), np.array([]), np.array([], dtype=bool), prior_mean=-1.0)
+    assert abs(theta + 1.0) < 0.01 and abs(error - 1.0) < 0.02
+    a, b = np.ones(5), np.zeros(5)
+    high, _ = estimate_ability(a, b, np.ones(5, dtype=bool))
+    low, _ = estimate_ability(a, b, np.zeros(5, dtype=bool))
+    assert 0 < high < 4 and -4 < low < 0
+    assert abs(high + low) < 1e-9
+
+
+def test_select_item_takes_the_most_informative_unanswered_question():
+    a, b = np.ones(5), np.array([-2.0, -1.0, 0.0, 1.0, 2.0])
+    assert select_item(0.9, a, b, []) == 3
+    assert select_item(0.9, a, b, [3]) in (2, 4)
+    assert select_item(0.0, a, b, range(5)) is None
+    # With a random draw, one of the three best
+    assert {select_item(0.0, a, b, [], rng=random.Random(seed)) for seed in range(30)} == {1, 2, 3}
+
+
+def test_fit_recovers_the_question_parameters():
+    rng = np.random.default_rng(7)
+    persons, items = 3000, 20
+    true_a, true_b = rng.uniform(0.7, 2.0, items), np.linspace(-1.5, 1.5, items)
+    theta = rng.normal(size=persons)
+    # Every player answers 10 random questions
+    person = np.repeat(np.arange(persons), 10)
+    item = np.concatenate([rng.choice(items, 10, replace=False) for _ in range(persons)])
+    correct = simulate(rng, theta, true_a, true_b, item, person)
+
+    a, b, iterations = fit_items(item, person, correct, np.ones(items), np.zeros(items), iterations=100)
+    assert iterations < 100
+    assert np.abs(b - true_b).max() < 0.3
+    assert np.corrcoef(a, true_a)[0, 1] > 0.8
+
+    # Starting from the fit, it is already converged
+    assert fit_items(item, person, correct, a, b, iterations=100)[2] <= 2
@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from backend.job_queue import JobQueue
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def backdate(queue, job_id, seconds):
+    queue._connect().execute(
+        "UPDATE jobs SET updated_at = ? WHERE id = ?",
+        ((datetime.now() - timedelta(seconds=seconds)).isoformat(), job_id)
+    )
+
+
+def test_expired_lease_is_requeued_by_the_next_claim(tmp_path):
+    runs = []
+    queue = JobQueue(handler=lambda payload: runs.append(payload["n"]) or {"n": payload["n"]},
+                     db_path=str(tmp_path / "jobs.sqlite3"), lease_seconds=60)
+    job_id = queue.submit({"n": 1})
+    # Claimed by a worker that died without finishing it, in a process that kept running
+    assert queue._claim_next()["id"] == job_id
+    assert queue.get_job(job_id)["status"] == "running"
+    assert not queue.run_next()
+
+    backdate(queue, job_id, 120)
+    assert queue.run_next()
+    assert runs == [1]
+    assert queue.get_job(job_id)["status"] == "completed"
+
+
+def test_running_jobs_keep_their_lease(tmp_path):
+    runs, release = [], threading.Event()
+
+    def handler(payload):
+        runs.append(payload["n"])
+        release.wait(10)
+        return {}
+
+    queue = JobQueue(handler=handler, db_path=str(tmp_path / "jobs.sqlite3"), concurrency=2,
+                     lease_seconds=0.3, poll_interval=0.01)
+    queue.start()
+    try:
+        job_id = queue.submit({"n": 1})
+        wait_for(lambda: runs)
+        # Several leases go by, the idle worker must not take the job over
+        time.sleep(1.0)
+        assert queue.get_job(job_id)["status"] == "running"
+        release.set()
+        wait_for(lambda: queue.get_job(job_id)["status"] == "completed")
+    finally:
+        release.set()
+        queue.stop(timeout=5)
+    assert runs == [1]
+
+
+def test_purge_finished_keeps_recent_and_unfinished_jobs(tmp_path):
+    queue = JobQueue(handler=lambda payload: {}, db_path=str(tmp_path / "jobs.sqlite3"))
+    old, recent, queued = queue.submit({}), queue.submit({}), queue.submit({})
+    queue.run_next()
+    queue.run_next()
+    backdate(queue, old, 7200)
+    backdate(queue, queued, 7200)
+
+    assert queue.purge_finished(3600) == 1
+    assert queue.get_job(old) is None
+    assert queue.get_job(recent)["status"] == "completed"
+    assert queue.get_job(queued)["status"] == "queued"
@@ -0,0 +1,79 @@
+import pytest
+from backend.score_manager import InvalidCursorError, ScoreManager
+from backend.session_store import SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def scores(request, tmp_path):
+    """ScoreManager ranking sessions itself, or through the SQLite store's index"""
+    if request.param == "memory":
+        return ScoreManager()
+    return ScoreManager(SQLiteSessionStore(str(tmp_path / "sessions.sqlite3")))
+
+
+def play(scores, make_quiz, correct: int, answered: int = 4) -> str:
+    """Session answering `answered` questions, the first `correct` of them right"""
+    quiz = make_quiz(answered)
+    session_id = scores.create_session(quiz)
+    for index, question in enumerate(quiz.questions):
+        selected = question.correct_answer if index < correct else (question.correct_answer + 1) % 4
+        scores.submit_answer(session_id, index, selected)
+    return session_id
+
+
+def walk(scores, limit: int):
+    """Every leaderboard entry, page by page"""
+    entries, cursor = [], None
+    while True:
+        page = scores.get_leaderboard_page(limit, cursor)
+        entries += page["leaderboard"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return entries
+
+
+def test_pages_add_up_to_the_whole_leaderboard(scores, make_quiz):
+    for correct in (0, 1, 2, 3, 4, 2, 1):
+        play(scores, make_quiz, correct)
+    whole = scores.get_leaderboard_page(100)["leaderboard"]
+    assert walk(scores, 3) == whole
+    assert [entry["score"] for entry in whole] == sorted((entry["score"] for entry in whole), reverse=True)
+
+
+def test_cursor_is_stable_under_inserts(scores, make_quiz):
+    for correct in (1, 2, 3, 4):
+        play(scores, make_quiz, correct)
+    first = scores.get_leaderboard_page(2)
+    rest_before = walk(scores, 100)[2:]
+
+    # New sessions above and below the cursor: the next pages neither repeat nor skip anyone
+    play(scores, make_quiz, 4)
+    play(scores, make_quiz, 4)
+    low = play(scores, make_quiz, 0)
+    second = scores.get_leaderboard_page(100, first["next_cursor"])["leaderboard"]
+    seen = {entry["session_id"] for entry in first["leaderboard"]}
+    assert not seen & {entry["session_id"] for entry in second}
+    assert [entry for entry in second if entry["session_id"] != low[:8]] == rest_before
+    assert second[-1]["session_id"] == low[:8]
+
+
+def test_answer_pages_continue_after_new_answers(scores, make_quiz):
+    quiz = make_quiz(6)
+    session_id = scores.create_session(quiz)
+    for index in range(3):
+        scores.submit_answer(session_id, index, 0)
+    first = scores.get_session_summary(session_id, limit=2)
+    assert [answer["question_index"] for answer in first["answers"]] == [0, 1]
+
+    for index in range(3, 6):
+        scores.submit_answer(session_id, index, 0)
+    second = scores.get_session_summary(session_id, limit=10, cursor=first["next_cursor"])
+    assert [answer["question_index"] for answer in second["answers"]] == [2, 3, 4, 5]
+    assert second["next_cursor"] is None
+
+
+def test_invalid_cursors(scores, client):
+    for cursor in ("not-a-cursor", "WyJhIl0"):  # The second is ["a"], valid JSON of the wrong shape
+        with pytest.raises(InvalidCursorError):
+            scores.get_leaderboard_page(10, cursor)
+        assert client.get("/quiz/leaderboard", params={"cursor": cursor}).status_code == 400
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+from backend.question_bank import QuestionBank
+
+SUBJECTS = ["photosynthesis in plant leaves", "the boiling point of water at sea level",
+            "Roman emperors after Augustus", "prime factorization of large integers"]
+
+
+@pytest.fixture
+def distinct_questions(make_quiz):
+    """Questions about unrelated subjects, none a near-duplicate of another"""
+    def build(count: int):
+        questions = make_quiz(count).questions
+        return [question.model_copy(update={"question": f"What do you know about {subject}?"})
+                for question, subject in zip(questions, SUBJECTS)]
+    return build
+
+
+def test_near_duplicates_are_stored_once(tmp_path, distinct_questions):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    questions = distinct_questions(3)
+    copy = questions[0].model_copy(update={"question": "What do you know about Photosynthesis in plant leaves"})
+
+    assert bank.add_questions("Testing", questions + [copy]) == 3
+    assert bank.add_questions("Testing", questions) == 0
+    assert bank.count() == 3
+
+
+def test_failed_insert_leaves_no_phantom_in_the_index(tmp_path, distinct_questions):
+    path = str(tmp_path / "bank.sqlite3")
+    bank = QuestionBank(path)
+    bank.load_similarity_index()
+    other = sqlite3.connect(path)
+    other.execute("CREATE TRIGGER full BEFORE INSERT ON questions BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    other.commit()
+    questions = distinct_questions(2)
+
+    with pytest.raises(sqlite3.IntegrityError):
+        bank.add_questions("Testing", questions)
+    other.execute("DROP TRIGGER full")
+    other.commit()
+    assert bank.add_questions("Testing", questions) == 2
+
+
+def test_workers_see_each_others_questions(tmp_path, distinct_questions):
+    path = str(tmp_path / "bank.sqlite3")
+    first, second = QuestionBank(path), QuestionBank(path)
+    first.load_similarity_index()
+    second.load_similarity_index()
+    questions = distinct_questions(3)
+
+    assert first.add_questions("Testing", questions[:2]) == 2
+    # The second worker's index was built before, it catches up inside its own insert
+    assert second.add_questions("Testing", questions) == 1
+    assert first.add_questions("Testing", questions) == 0
+    assert first.count() == 3
+
+
+def test_index_is_rebuilt_from_the_database(tmp_path, distinct_questions):
+    path = str(tmp_path / "bank.sqlite3")
+    questions = distinct_questions(2)
+    QuestionBank(path).add_questions("Testing", questions)
+
+    restarted = QuestionBank(path)
+    restarted.load_similarity_index()
+    assert len(restarted._index) == 2
+    assert restarted.add_questions("Testing", questions) == 0
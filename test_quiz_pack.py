@@ -0,0 +1,79 @@
+import pytest
+from backend import quiz_pack
+from backend.question_bank import QuestionBank
+from backend.quiz_pack import HEADER, QuizPack, QuizPackError, dumps_pack, export_bank, import_bank, write_pack
+
+CODECS = ["none", "gzip"] + (["zstd"] if quiz_pack.zstandard is not None else [])
+
+
+@pytest.fixture
+def quizzes(make_quiz):
+    return [make_quiz(3, topic="Astronomy"), make_quiz(2, topic="Chemistry")]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip(tmp_path, quizzes, codec):
+    path = tmp_path / "quizzes.qpk"
+    write_pack(str(path), quizzes, codec)
+
+    with QuizPack.open(str(path), verify=True) as pack:
+        assert (pack.codec, pack.quiz_count, len(pack)) == (codec, 2, 5)
+        assert list(pack.quizzes()) == quizzes
+        assert pack.quiz(1) == quizzes[1]
+        assert pack.question(4) == quizzes[1].questions[1]
+        # "Option A" and the other options are stored once for all five questions
+        assert pack.string_count < 5 * 6 + 2
+        with pytest.raises(IndexError):
+            pack.question(5)
+
+
+def test_corrupted_body_fails_the_crc_check(quizzes):
+    data = bytearray(dumps_pack(quizzes))
+    data[HEADER.size + 10] ^= 0xFF
+
+    with pytest.raises(QuizPackError, match="CRC"):
+        QuizPack.loads(bytes(data))
+    # Without verification the pack still opens, reading it is at the caller's risk
+    QuizPack.loads(bytes(data), verify=False).close()
+
+
+@pytest.mark.parametrize("damage, message", [
+    (lambda data: data[:HEADER.size - 1], "too short"),
+    (lambda data: b"ZIP!" + data[4:], "Not a quiz pack"),
+    (lambda data: data[:4] + b"\x09\x00" + data[6:], "version 9"),
+    (lambda data: data[:HEADER.size] + b"not gzip at all", "corrupted"),
+])
+def test_invalid_packs_raise_the_format_error(quizzes, damage, message):
+    data = dumps_pack(quizzes, "gzip")
+    with pytest.raises(QuizPackError, match=message):
+        QuizPack.loads(damage(data))
+
+
+def test_empty_file_is_not_a_pack(tmp_path, capsys):
+    path = tmp_path / "empty.qpk"
+    path.write_bytes(b"")
+
+    with pytest.raises(QuizPackError, match="too short"):
+        QuizPack.open(str(path))
+    with pytest.raises(SystemExit) as exit_info:
+        quiz_pack.main(["info", str(path)])
+    assert exit_info.value.code == 1
+    assert "too short" in capsys.readouterr().err
+
+
+def test_unknown_codec():
+    with pytest.raises(QuizPackError, match="Unknown codec"):
+        dumps_pack([], "brotli")
+
+
+def test_bank_export_and_import(tmp_path, quizzes):
+    source = QuestionBank(str(tmp_path / "source.sqlite3"))
+    for quiz in quizzes:
+        source.add_questions(quiz.topic, quiz.questions)
+    path = str(tmp_path / "bank.qpk")
+    exported = export_bank(source, path, "gzip")
+
+    target = QuestionBank(str(tmp_path / "target.sqlite3"))
+    assert import_bank(target, path) == exported == source.count()
+    # Importing again adds nothing, every question is a duplicate
+    assert import_bank(target, path) == 0
@@ -0,0 +1,11 @@
+import backend.main
+from backend.rate_limit import MemoryBucketStore, RateLimiter
+
+
+def test_adaptive_start_is_charged_its_own_cost(client, monkeypatch):
+    costs = {"generate": 10, "adaptive": 5, "answer": 1}
+    monkeypatch.setattr(backend.main, "rate_limiter", RateLimiter(MemoryBucketStore(), rate=0.001, burst=10, costs=costs))
+
+    # The empty bank answers 404, the bucket is charged before
+    statuses = [client.post("/quiz/adaptive", json={"topic": "Astronomy"}).status_code for _ in range(3)]
+    assert statuses == [404, 404, 429]
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import backend.main
+from backend.models import DifficultyLevel
+from backend.responses import encode_json, select_fields
+
+JOB = {
+    "status": "completed",
+    "result": {
+        "session_id": "abc",
+        "quiz": {"topic": "Astronomy", "questions": [
+            {"question": "First?", "options": ["A", "B"], "explanation": "Because"},
+            {"question": "Second?", "options": ["C", "D"], "explanation": "Also because"},
+        ]},
+    },
+}
+
+
+def test_nested_fields_are_selected_through_lists():
+    assert select_fields(JOB, "status,result.quiz.questions.question") == {
+        "status": "completed",
+        "result": {"quiz": {"questions": [{"question": "First?"}, {"question": "Second?"}]}},
+    }
+
+
+def test_whole_field_wins_over_its_parts():
+    assert select_fields(JOB, "result.quiz.topic,result.quiz") == {"result": {"quiz": JOB["result"]["quiz"]}}
+    assert select_fields(JOB, "result.quiz,result.quiz.topic") == {"result": {"quiz": JOB["result"]["quiz"]}}
+
+
+def test_missing_and_empty_fields():
+    assert select_fields(JOB, "status,nothing,result.nothing") == {"status": "completed", "result": {}}
+    assert select_fields(JOB, None) is JOB
+    assert select_fields(JOB, " , ") is JOB
+    for invalid in ("result..quiz", "result.", ".status"):
+        with pytest.raises(HTTPException) as error:
+            select_fields(JOB, invalid)
+        assert error.value.status_code == 400
+
+
+def test_encode_json_handles_datetimes_and_enums():
+    at = datetime(2024, 5, 1, 12, 30)
+    assert encode_json({"at": at, "level": DifficultyLevel.HARD, "text": "é"}).decode() == (
+        '{"at":"2024-05-01T12:30:00","level":"hard","text":"é"}'
+    )
+
+
+def test_session_endpoint_selects_fields(client, make_quiz):
+    session_id = backend.main.score_manager.create_session(make_quiz(3))
+    for index in range(3):
+        client.post("/quiz/answer", params={"session_id": session_id}, json={"question_index": index, "selected_option": 0})
+
+    data = client.get(f"/quiz/session/{session_id}", params={"fields": "score,answers.is_correct"}).json()
+    assert data == {"score": data["score"], "answers": [{"is_correct": True}, {"is_correct": False}, {"is_correct": False}]}
+    assert client.get(f"/quiz/session/{session_id}", params={"fields": "answers..x"}).status_code == 400
@@ -0,0 +1,116 @@
+import time
+import pytest
+from starlette.websockets import WebSocketDisconnect
+import backend.main
+from backend.rooms import CLOSE_NOT_FOUND, CLOSE_ROOM_CLOSED
+
+
+@pytest.fixture
+def room(client):
+    """Room playing a freshly generated three question quiz"""
+    job_id = client.post("/quiz/generate", json={"topic": "Rooms", "num_questions": 3}).json()["job_id"]
+    deadline = time.monotonic() + 30
+    while client.get(f"/quiz/jobs/{job_id}").json()["status"] != "completed":
+        assert time.monotonic() < deadline, "generation did not finish"
+        time.sleep(0.02)
+    response = client.post("/rooms", json={"job_id": job_id})
+    assert response.status_code == 201
+    return response.json()
+
+
+def receive(websocket, message_type):
+    """Next message of a type, the messages before it are skipped"""
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == message_type:
+            return message
+
+
+def correct_option(room_id, question_index):
+    room = backend.main.room_manager.get_room(room_id)
+    return room.template["answer_key"][question_index] & 0b11
+
+
+def test_players_answer_and_see_the_reveal(client, room):
+    room_id = room["room_id"]
+    with client.websocket_connect(f"/rooms/{room_id}/ws?host_token={room['host_token']}") as host, \
+            client.websocket_connect(f"/rooms/{room_id}/ws?name=Ann") as ann, \
+            client.websocket_connect(f"/rooms/{room_id}/ws?name=Bob") as bob:
+        assert receive(host, "welcome")["player_id"] is None
+        ann_id = receive(ann, "welcome")["player_id"]
+        receive(bob, "welcome")
+        assert client.get(f"/rooms/{room_id}").json()["players"] == 2
+
+        host.send_json({"type": "next"})
+        question = receive(ann, "question")
+        assert question["question_index"] == 0 and "correct_answer" not in question
+        receive(bob, "question")
+        receive(host, "question")
+
+        ann.send_json({"type": "answer", "question_index": 0, "selected_option": correct_option(room_id, 0)})
+        assert receive(ann, "answer_received")["question_index"] == 0
+        ann.send_json({"type": "answer", "question_index": 0, "selected_option": 0})
+        assert receive(ann, "error")["detail"] == "Question already answered"
+        bob.send_json({"type": "answer", "question_index": 0, "selected_option": 0})
+        receive(bob, "answer_received")
+
+        # Everyone answered, the reveal does not wait for the host
+        reveal = receive(host, "reveal")
+        assert reveal["correct_answer"] == correct_option(room_id, 0)
+        standings = receive(ann, "standings")
+        while ann_id not in [entry["player_id"] for entry in standings["changed"]]:
+            standings = receive(ann, "standings")
+        assert [entry["score"] > 0 for entry in standings["changed"] if entry["player_id"] == ann_id] == [True]
+
+        host.send_json({"type": "end"})
+        assert receive(bob, "finished")["standings"][0]["player_id"] == ann_id
+
+
+def test_reveal_once_the_last_unanswered_player_leaves(client, room):
+    room_id = room["room_id"]
+    with client.websocket_connect(f"/rooms/{room_id}/ws?host_token={room['host_token']}") as host, \
+            client.websocket_connect(f"/rooms/{room_id}/ws?name=Ann") as ann:
+        receive(host, "welcome")
+        receive(ann, "welcome")
+        with client.websocket_connect(f"/rooms/{room_id}/ws?name=Slow") as slow:
+            slow_id = receive(slow, "welcome")["player_id"]
+            host.send_json({"type": "next"})
+            receive(ann, "question")
+            ann.send_json({"type": "answer", "question_index": 0, "selected_option": 1})
+            receive(ann, "answer_received")
+
+        assert receive(ann, "reveal")["question_index"] == 0
+        standings = receive(host, "standings")
+        while slow_id not in standings["removed"]:
+            standings = receive(host, "standings")
+        assert client.get(f"/rooms/{room_id}").json()["state"] == "reveal"
+        assert client.get(f"/rooms/{room_id}").json()["players"] == 1
+
+
+def test_closing_an_idle_room_disconnects_its_clients(client, room, monkeypatch):
+    room_id = room["room_id"]
+    with client.websocket_connect(f"/rooms/{room_id}/ws?host_token={room['host_token']}") as host, \
+            client.websocket_connect(f"/rooms/{room_id}/ws?name=Ann") as ann:
+        receive(host, "welcome")
+        receive(ann, "welcome")
+        player_room = backend.main.room_manager.get_room(room_id)
+        session_id = next(iter(player_room.players.values())).session_id
+        monkeypatch.setattr(backend.main.room_manager, "idle_timeout", 0)
+
+        with pytest.raises(WebSocketDisconnect) as closed:
+            receive(ann, "never")
+        assert closed.value.code == CLOSE_ROOM_CLOSED
+        with pytest.raises(WebSocketDisconnect) as closed:
+            receive(host, "never")
+        assert closed.value.code == CLOSE_ROOM_CLOSED
+
+    assert client.get(f"/rooms/{room_id}").status_code == 404
+    assert player_room.state == "closed" and not player_room.players
+    assert session_id not in backend.main.room_manager.scores.user_sessions
+
+
+def test_unknown_room_is_refused(client):
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/rooms/NOROOM/ws?name=Ann") as websocket:
+            websocket.receive_json()
+    assert refused.value.code == CLOSE_NOT_FOUND
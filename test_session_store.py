@@ -0,0 +1,157 @@
+import threading
+import time
+import pytest
+from backend.score_manager import ScoreManager
+from backend.session_store import SQLiteSessionStore, SessionStoreBusyError, WriteBehindSessionStore
+
+
+class PausingStore(SQLiteSessionStore):
+    """Store pausing after every read, as a worker busy between reading a session and writing it back"""
+
+    def __init__(self, db_path: str, read: threading.Event):
+        super().__init__(db_path)
+        self.read = read
+
+    def __getitem__(self, session_id):
+        session = super().__getitem__(session_id)
+        self.read.set()
+        time.sleep(0.2)
+        return session
+
+
+def answer_while_paused(path, session_id, first_answer, second_answer):
+    """Answer through a pausing worker and, while it is paused, through another worker on the same file"""
+    read = threading.Event()
+    slow, fast = ScoreManager(PausingStore(path, read)), ScoreManager(SQLiteSessionStore(path))
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(slow=slow.submit_answer(session_id, *first_answer)))
+    thread.start()
+    read.wait()
+    results["fast"] = fast.submit_answer(session_id, *second_answer)
+    thread.join()
+    return results
+
+
+def test_workers_sharing_a_file_keep_every_answer(tmp_path, make_quiz):
+    path = str(tmp_path / "sessions.sqlite3")
+    session_id = ScoreManager(SQLiteSessionStore(path)).create_session(make_quiz(4))
+
+    answer_while_paused(path, session_id, (0, 0), (1, 1))
+
+    session = SQLiteSessionStore(path)[session_id]
+    assert sorted(answer["question_index"] for answer in session["answers"]) == [0, 1]
+    assert session["correct_count"] == 2
+
+
+def test_workers_sharing_a_file_score_a_question_once(tmp_path, make_quiz):
+    path = str(tmp_path / "sessions.sqlite3")
+    session_id = ScoreManager(SQLiteSessionStore(path)).create_session(make_quiz(4))
+
+    results = answer_while_paused(path, session_id, (0, 0), (0, 3))
+
+    assert [results["slow"].duplicate, results["fast"].duplicate] == [False, True]
+    assert results["fast"].correct is True
+    session = SQLiteSessionStore(path)[session_id]
+    assert len(session["answers"]) == 1
+    assert session["score"] == results["slow"].score_change
+
+
+def test_transaction_rolls_back_on_error(tmp_path, make_quiz):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    session_id = ScoreManager(store).create_session(make_quiz(3))
+    session = store[session_id]
+    try:
+        with store.transaction():
+            with store.transaction():
+                session["score"] = 42
+                store[session_id] = session
+            raise RuntimeError("answer rejected")
+    except RuntimeError:
+        pass
+    assert store[session_id]["score"] == 0
+
+
+class JammedStore(SQLiteSessionStore):
+    """Store whose batch writes hang until released, as a disk that cannot keep up"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write_batch(self, changes):
+        self.writing.set()
+        self.release.wait()
+        super().write_batch(changes)
+
+
+def test_write_behind_flush_writes_pending_changes_once(tmp_path, make_quiz):
+    path = str(tmp_path / "sessions.sqlite3")
+    buffered = WriteBehindSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    manager = ScoreManager(buffered)
+    session_id = manager.create_session(make_quiz(3))
+    manager.submit_answer(session_id, 0, 0)
+    manager.submit_answer(session_id, 1, 0)
+
+    # Reads of this process see the buffer, the file only has the session once flushed
+    assert len(buffered[session_id]["answers"]) == 2
+    assert session_id not in SQLiteSessionStore(path)
+    assert buffered.flush() == 1
+    assert len(SQLiteSessionStore(path)[session_id]["answers"]) == 2
+
+    del buffered[session_id]
+    assert session_id not in buffered
+    assert session_id in SQLiteSessionStore(path)
+    assert buffered.flush() == 1
+    assert session_id not in SQLiteSessionStore(path)
+    buffered.close()
+
+
+def test_write_behind_close_drains_the_buffer(tmp_path, make_quiz):
+    path = str(tmp_path / "sessions.sqlite3")
+    buffered = WriteBehindSessionStore(SQLiteSessionStore(path), flush_interval=60, batch_size=1000)
+    manager = ScoreManager(buffered)
+    session_ids = [manager.create_session(make_quiz(2)) for _ in range(20)]
+    manager.submit_answer(session_ids[0], 1, 1)
+
+    buffered.close()
+
+    store = SQLiteSessionStore(path)
+    assert sorted(store) == sorted(session_ids)
+    assert store[session_ids[0]]["score"] == 2
+
+
+def test_write_behind_backpressure_gives_up(tmp_path, make_quiz):
+    jammed = JammedStore(str(tmp_path / "sessions.sqlite3"))
+    buffered = WriteBehindSessionStore(jammed, flush_interval=0.01, max_pending=1, backpressure_timeout=0.1)
+    manager = ScoreManager(buffered)
+    session_id = manager.create_session(make_quiz(3))
+    assert jammed.writing.wait(5)
+
+    # The session being written stays readable, one more change fits in the buffer
+    manager.submit_answer(session_id, 0, 0)
+    with pytest.raises(SessionStoreBusyError):
+        manager.create_session(make_quiz(3))
+
+    jammed.release.set()
+    buffered.close()
+    assert len(SQLiteSessionStore(jammed.db_path)[session_id]["answers"]) == 1
+
+
+def test_backed_up_session_writes_return_503(tmp_path, make_quiz, client, monkeypatch):
+    import backend.main
+
+    jammed = JammedStore(str(tmp_path / "sessions.sqlite3"))
+    buffered = WriteBehindSessionStore(jammed, flush_interval=0.01, max_pending=1, backpressure_timeout=0.1)
+    manager = ScoreManager(buffered)
+    monkeypatch.setattr(backend.main, "score_manager", manager)
+    session_id = manager.create_session(make_quiz(3))
+    assert jammed.writing.wait(5)
+    buffered["filler"] = buffered[session_id]
+
+    response = client.post(f"/quiz/answer?session_id={session_id}", json={"question_index": 0, "selected_option": 0})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    jammed.release.set()
+    buffered.close()
@@ -0,0 +1,50 @@
+import numpy as np
+from backend.similarity import MinHashIndex, normalize_question, question_features
+
+
+def words(start: int, count: int) -> str:
+    return " ".join(f"term{number}" for number in range(start, start + count))
+
+
+def test_rephrasings_share_their_features():
+    assert normalize_question("What are the planets of the Solar System?") == ["planet", "solar", "system"]
+    assert question_features("Which planets orbit the Sun?") == question_features("which PLANET orbits the sun")
+    # Only stopwords: the whole text is the feature
+    assert question_features("Who is it?") == {"who is it?"}
+
+
+def test_batch_signatures_match_single_ones():
+    index = MinHashIndex()
+    texts = ["What is photosynthesis?", "Name the largest ocean on Earth", words(0, 30)]
+    assert np.array_equal(index.signatures(texts), np.stack([index.signature(text) for text in texts]))
+
+
+def test_estimate_follows_jaccard_similarity():
+    index = MinHashIndex(num_perm=128, bands=16)
+    # 10 shared words of 30 distinct ones, a Jaccard similarity of 1/3
+    estimates = [
+        (index.signature(words(pair * 100, 20)) == index.signature(words(pair * 100 + 10, 20))).mean()
+        for pair in range(50)
+    ]
+    assert abs(np.mean(estimates) - 1 / 3) < 0.03
+
+
+def test_threshold_separates_near_duplicates_from_other_questions():
+    index = MinHashIndex(threshold=0.7)
+    index.add_many([words(pair * 100, 20) for pair in range(100)])
+
+    # 19 of 21 words shared: similarity 0.9, one in 10 may slip through the bands
+    found = sum(index.find_duplicate(words(pair * 100 + 1, 20)) == pair for pair in range(100))
+    assert found >= 90
+    # 10 of 30 words shared: similarity 0.33
+    assert all(index.find_duplicate(words(pair * 100 + 10, 20)) is None for pair in range(100))
+    assert index.query(words(0, 20)) == [(0, 1.0)]
+
+
+def test_recent_inserts_are_found_before_and_after_merging():
+    index = MinHashIndex(merge_every=4)
+    ids = [index.add_if_new(words(number * 100, 10)) for number in range(10)]
+    assert ids == list(range(10))
+    assert all(index.add_if_new(words(number * 100, 10)) is None for number in range(10))
+    assert len(index) == 10
+    assert index.add_many([]) == range(10, 10)